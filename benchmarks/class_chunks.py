@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Compares the peak memory used by the compiler and the build time for a
+header with a very large class when the class is finished by a single
+function (class_chunk_size = 0) and when it is split into chunks.
+
+Generates and builds a project for each chunk size that wraps the same
+class. The peak memory is the largest resident set size of any process
+started by the build, which is the compiler. Only works on unix.
+
+Usage: python benchmarks/class_chunks.py [--methods N] [--chunk-size N]
+"""
+
+import argparse
+import pathlib
+import subprocess
+import sys
+import tempfile
+
+# Runs the build in a new process, so that the peak memory of the processes
+# that it waits for only includes the build
+_BUILD_SCRIPT = """
+import resource, subprocess, sys, time
+start = time.perf_counter()
+subprocess.check_call(sys.argv[1:])
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+"""
+
+
+def _generate(path: pathlib.Path, mod: str, chunk_size: int, nmethods: int):
+    inc = path / "src" / "chunkbench" / "include"
+    yml = path / "semiwrap"
+    inc.mkdir(parents=True)
+    yml.mkdir()
+
+    (path / "src" / "chunkbench" / "__init__.py").write_text("")
+
+    lines = ["#pragma once", "", "#include <string>", "", "struct Big {"]
+    ylines = ["classes:", "  Big:", "    methods:"]
+    for i in range(nmethods):
+        lines.append(
+            f'    std::string m{i}(int x, const std::string &s = "{i}") '
+            "{ return s + std::to_string(x); }"
+        )
+        ylines.append(f"      m{i}:")
+    lines.append("};")
+    (inc / "big.h").write_text("\n".join(lines) + "\n")
+    (yml / "big.yml").write_text("\n".join(ylines) + "\n")
+
+    toml = [
+        "[build-system]",
+        'build-backend = "hatchling.build"',
+        'requires = ["semiwrap", "hatch-meson", "hatchling"]',
+        "",
+        "[project]",
+        'name = "chunkbench"',
+        'version = "0.0.1"',
+        "",
+        "[tool.hatch.build.hooks.semiwrap]",
+        "[tool.hatch.build.hooks.meson]",
+        "",
+        "[tool.hatch.build.targets.wheel]",
+        'packages = ["src/chunkbench"]',
+        "",
+        "[tool.semiwrap]",
+        f'[tool.semiwrap.extension_modules."chunkbench._{mod}"]',
+        'yaml_path = "semiwrap"',
+        'includes = ["src/chunkbench/include"]',
+        f"class_chunk_size = {chunk_size}",
+        f'[tool.semiwrap.extension_modules."chunkbench._{mod}".headers]',
+        'big = "big.h"',
+    ]
+    meson = [
+        "project('chunkbench', ['cpp'], default_options: ['cpp_std=c++20', 'optimization=2'])",
+        "subdir('semiwrap')",
+        f"chunkbench__{mod}_sources += files('src/{mod}.cpp')",
+        "subdir('semiwrap/modules')",
+    ]
+    (path / "src" / f"{mod}.cpp").write_text(
+        f"#include <semiwrap_init.chunkbench._{mod}.hpp>\n"
+        "SEMIWRAP_PYBIND11_MODULE(m) { initWrapper(m); }\n"
+    )
+
+    (path / "pyproject.toml").write_text("\n".join(toml))
+    (path / "meson.build").write_text("\n".join(meson) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--methods", type=int, default=400)
+    parser.add_argument("--chunk-size", type=int, default=100)
+    args = parser.parse_args()
+
+    modes = (("single", 0), ("chunked", args.chunk_size))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+
+        results = []
+        for mod, chunk_size in modes:
+            project = tmpdir / "project" / mod
+            _generate(project, mod, chunk_size, args.methods)
+
+            print(f"building {mod}...", flush=True)
+            out = subprocess.check_output(
+                [
+                    sys.executable,
+                    "-c",
+                    _BUILD_SCRIPT,
+                    sys.executable,
+                    "-m",
+                    "pip",
+                    "--disable-pip-version-check",
+                    "install",
+                    "-q",
+                    "--no-build-isolation",
+                    "--no-deps",
+                    "--target",
+                    str(tmpdir / "install" / mod),
+                    str(project),
+                ]
+            )
+            elapsed, maxrss = out.split()[-2:]
+            results.append((mod, chunk_size, float(elapsed), int(maxrss)))
+
+        print(f"methods: {args.methods}")
+        print(f"{'':>8}  {'chunk':>6}  {'build':>10}  {'peak memory':>12}")
+        for mod, chunk_size, elapsed, maxrss in results:
+            print(
+                f"{mod:>8}  {chunk_size:>6}  {elapsed:>9.1f}s  {maxrss / 1024:>10.0f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
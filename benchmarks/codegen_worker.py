@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Measures the per-target overhead of running semiwrap code generation commands
+as separate processes versus through the persistent codegen worker.
+
+Runs header2dat + dat2cpp for each header in the sw-test project both ways,
+checks that the outputs are byte-identical, and prints the mean time per
+target.
+
+Usage: python benchmarks/codegen_worker.py [--repeat N]
+"""
+
+import argparse
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+import typing as T
+
+root = pathlib.Path(__file__).resolve().parent.parent
+sw_root = root / "src" / "semiwrap"
+sw_test = root / "tests" / "cpp" / "sw-test"
+ft_include = sw_test / "src" / "swtest" / "ft" / "include"
+ft_yaml = sw_test / "semiwrap" / "ft"
+
+
+def _headers() -> T.List[T.Tuple[str, pathlib.Path, pathlib.Path]]:
+    headers = []
+    for yml in sorted(ft_yaml.glob("*.yml")):
+        h = ft_include / f"{yml.stem}.h"
+        if h.exists():
+            headers.append((yml.stem, yml, h))
+    return headers
+
+
+def _commands(
+    prefix: T.List[str], outdir: pathlib.Path, casters: pathlib.Path
+) -> T.List[T.List[str]]:
+    cmds = []
+    for name, yml, h in _headers():
+        dat = outdir / f"{name}.dat"
+        cmds.append(
+            prefix
+            + [
+                "header2dat",
+                "-I",
+                str(ft_include),
+                name,
+                str(yml),
+                str(h),
+                str(ft_include),
+                str(casters),
+                str(dat),
+                str(outdir / f"{name}.d"),
+                "pcpp",
+                "c++20",
+                "ignored",
+            ]
+        )
+        cmds.append(prefix + ["dat2cpp", str(dat), str(outdir / f"{name}.cpp")])
+    return cmds
+
+
+def _run(cmds: T.List[T.List[str]]) -> T.Tuple[float, int]:
+    ok = 0
+    start = time.perf_counter()
+    for cmd in cmds:
+        r = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if r.returncode == 0:
+            ok += 1
+    return time.perf_counter() - start, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+        direct_out = tmpdir / "direct"
+        worker_out = tmpdir / "worker"
+        direct_out.mkdir()
+        worker_out.mkdir()
+
+        casters = tmpdir / "casters.pkl"
+        subprocess.check_call(
+            [
+                sys.executable,
+                "-m",
+                "semiwrap.cmd.resolve_casters",
+                str(casters),
+                str(tmpdir / "casters.d"),
+                str(sw_root / "semiwrap.pybind11.json"),
+            ]
+        )
+
+        direct_cmds = [
+            [sys.executable, "-m", f"semiwrap.cmd.{cmd[0]}"] + cmd[1:]
+            for cmd in _commands([], direct_out, casters)
+        ]
+        worker_prefix = [sys.executable, "-m", "semiwrap.cmd.worker", str(tmpdir)]
+        worker_cmds = _commands(worker_prefix, worker_out, casters)
+
+        num_cmds = len(direct_cmds)
+
+        # start the worker before timing so that only the steady state is measured
+        subprocess.check_call(worker_prefix + ["gen_libinit", str(tmpdir / "x.py")])
+
+        direct_times = []
+        worker_times = []
+        for _ in range(args.repeat):
+            t, direct_ok = _run(direct_cmds)
+            direct_times.append(t)
+            t, worker_ok = _run(worker_cmds)
+            worker_times.append(t)
+
+        # verify the outputs are identical
+        mismatched = []
+        for dfile in sorted(direct_out.iterdir()):
+            if dfile.suffix == ".d":
+                # depfiles contain the path of the output
+                continue
+            wfile = worker_out / dfile.name
+            if not wfile.exists() or wfile.read_bytes() != dfile.read_bytes():
+                mismatched.append(dfile.name)
+
+        direct_best = min(direct_times)
+        worker_best = min(worker_times)
+
+        print(f"targets:          {num_cmds} ({direct_ok} succeeded)")
+        print(
+            f"separate process: {direct_best:.3f}s total, "
+            f"{direct_best / num_cmds * 1000:.1f}ms per target"
+        )
+        print(
+            f"codegen worker:   {worker_best:.3f}s total, "
+            f"{worker_best / num_cmds * 1000:.1f}ms per target"
+        )
+        print(f"speedup:          {direct_best / worker_best:.1f}x")
+
+        if mismatched:
+            print("ERROR: outputs differ:", ", ".join(mismatched))
+            sys.exit(1)
+        else:
+            print("outputs are byte-identical")
+
+
+if __name__ == "__main__":
+    main()
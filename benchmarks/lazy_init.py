@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Compares how long it takes to import an extension module that is initialized
+when it is imported with one that sets lazy_init = true.
+
+Generates and builds a project for each mode that wraps the same headers,
+and then measures in a new python process each time:
+
+* importing the module
+* importing the module and using one class
+* importing the module and accessing everything in it
+
+Usage: python benchmarks/lazy_init.py [--headers N] [--classes N] [--methods N]
+"""
+
+import argparse
+import pathlib
+import subprocess
+import sys
+import tempfile
+import typing as T
+
+MODULES = ("eager", "lazy")
+
+
+def _generate(
+    path: pathlib.Path, mod: str, nheaders: int, nclasses: int, nmethods: int
+):
+    inc = path / "src" / "lazybench" / "include"
+    yml = path / "semiwrap"
+    inc.mkdir(parents=True)
+    yml.mkdir()
+
+    (path / "src" / "lazybench" / "__init__.py").write_text("")
+
+    for i in range(nheaders):
+        lines = ["#pragma once", ""]
+        ylines = ["classes:"]
+        for j in range(nclasses):
+            lines.append(f"/** C{i}_{j} documentation */")
+            lines.append(f"struct C{i}_{j} {{")
+            ylines.append(f"  C{i}_{j}:")
+            ylines.append("    methods:")
+            for k in range(nmethods):
+                name = f"m{j}_{k}"
+                lines.append(f"    /** {name} documentation */")
+                lines.append(
+                    f"    int {name}(int x, double y = 1.0) {{ return x + {k}; }}"
+                )
+                ylines.append(f"      {name}:")
+            lines.append("};")
+            lines.append("")
+        (inc / f"h{i}.h").write_text("\n".join(lines))
+        (yml / f"h{i}.yml").write_text("\n".join(ylines) + "\n")
+
+    toml = [
+        "[build-system]",
+        'build-backend = "hatchling.build"',
+        'requires = ["semiwrap", "hatch-meson", "hatchling"]',
+        "",
+        "[project]",
+        'name = "lazybench"',
+        'version = "0.0.1"',
+        "",
+        "[tool.hatch.build.hooks.semiwrap]",
+        "[tool.hatch.build.hooks.meson]",
+        "",
+        "[tool.hatch.build.targets.wheel]",
+        'packages = ["src/lazybench"]',
+        "",
+        "[tool.semiwrap]",
+        f'[tool.semiwrap.extension_modules."lazybench._{mod}"]',
+        'yaml_path = "semiwrap"',
+        'includes = ["src/lazybench/include"]',
+        f"lazy_init = {'true' if mod == 'lazy' else 'false'}",
+        f'[tool.semiwrap.extension_modules."lazybench._{mod}".headers]',
+        *(f'h{i} = "h{i}.h"' for i in range(nheaders)),
+    ]
+    meson = [
+        "project('lazybench', ['cpp'], default_options: ['cpp_std=c++20', 'optimization=2'])",
+        "subdir('semiwrap')",
+        f"lazybench__{mod}_sources += files('src/{mod}.cpp')",
+        "subdir('semiwrap/modules')",
+    ]
+    (path / "src" / f"{mod}.cpp").write_text(
+        f"#include <semiwrap_init.lazybench._{mod}.hpp>\n"
+        "SEMIWRAP_PYBIND11_MODULE(m) { initWrapper(m); }\n"
+    )
+
+    (path / "pyproject.toml").write_text("\n".join(toml))
+    (path / "meson.build").write_text("\n".join(meson) + "\n")
+
+
+def _time(target: pathlib.Path, code: str, repeat: int) -> float:
+    script = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"{code}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    times = []
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, "-c", script],
+            env={"PYTHONPATH": str(target)},
+        )
+        times.append(float(out))
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--headers", type=int, default=50)
+    parser.add_argument("--classes", type=int, default=10)
+    parser.add_argument("--methods", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+
+        for mod in MODULES:
+            project = tmpdir / "project" / mod
+            _generate(project, mod, args.headers, args.classes, args.methods)
+
+            print(f"building {mod}...", flush=True)
+            subprocess.check_call(
+                [
+                    sys.executable,
+                    "-m",
+                    "pip",
+                    "--disable-pip-version-check",
+                    "install",
+                    "-q",
+                    "--no-build-isolation",
+                    "--no-deps",
+                    "--target",
+                    str(tmpdir / "install" / mod),
+                    str(project),
+                ]
+            )
+
+        ncls = args.headers * args.classes
+        print(f"classes: {ncls}, methods: {ncls * args.methods}")
+        print(f"{'':>8}  {'import':>10}  {'one class':>10}  {'everything':>10}")
+
+        for mod in MODULES:
+            target = tmpdir / "install" / mod
+            imp = f"import lazybench._{mod} as m"
+            results: T.List[float] = [
+                _time(target, imp, args.repeat),
+                _time(target, f"{imp}\nm.C0_0().m0_0(1)", args.repeat),
+                _time(target, f"{imp}\nfor n in dir(m): getattr(m, n)", args.repeat),
+            ]
+            print(f"{mod:>8}  " + "  ".join(f"{t * 1000:>8.1f}ms" for t in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compares cxxheaderparser's pcpp preprocessor with the one that header2dat
+uses, which discards included content early and shares tokenized include
+files between headers.
+
+Preprocesses each header in the sw-test project, and each header in a
+generated project where every header includes the same deep chain of
+include files. Checks that the outputs are identical, and prints the total
+time for each preprocessor (the cached version is run with a cold and a warm
+cache).
+
+Usage: python benchmarks/pcpp_cache.py [--depth N] [--headers N]
+"""
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+import typing as T
+
+from cxxheaderparser.preprocessor import (
+    PreprocessorError,
+    make_pcpp_preprocessor as make_cxxheaderparser_preprocessor,
+)
+
+root = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root / "src"))
+
+from semiwrap.autowrap.preprocessor import make_pcpp_preprocessor  # noqa: E402
+
+sw_test = root / "tests" / "cpp"
+ft_include = sw_test / "sw-test" / "src" / "swtest" / "ft" / "include"
+base_include = sw_test / "sw-test-base" / "src" / "swtest_base" / "cpp"
+
+
+def _generate_deep(
+    path: pathlib.Path, depth: int, nheaders: int
+) -> T.List[pathlib.Path]:
+    inc = path / "inc"
+    inc.mkdir()
+    for i in range(depth):
+        lines = ["#pragma once"]
+        if i + 1 < depth:
+            lines.append(f'#include "common{i + 1}.h"')
+        lines.append(f"#define COMMON{i}_VALUE {i}")
+        for j in range(100):
+            lines.append(
+                f"struct S{i}_{j} {{ int a; double b; /* comment {j} */ "
+                f"int get() const {{ return a + COMMON{i}_VALUE; }} }};"
+            )
+        (inc / f"common{i}.h").write_text("\n".join(lines) + "\n")
+
+    headers = []
+    for i in range(nheaders):
+        h = path / f"h{i}.h"
+        h.write_text(f'#include "common0.h"\nclass H{i} {{ public: int x(); }};\n')
+        headers.append(h)
+    return headers
+
+
+def _run(make, headers, include_paths) -> T.Tuple[float, T.List[str]]:
+    outputs = []
+    start = time.perf_counter()
+    for h in headers:
+        preprocess = make(include_paths=include_paths)
+        try:
+            outputs.append(preprocess(str(h), None))
+        except PreprocessorError as e:
+            # some test headers contain #error on purpose
+            outputs.append(str(e))
+    return time.perf_counter() - start, outputs
+
+
+def _compare(name: str, headers, include_paths, cache_dir: pathlib.Path):
+    def _cached(**kwargs):
+        return make_pcpp_preprocessor(token_cache_path=cache_dir, **kwargs)
+
+    t_old, expected = _run(make_cxxheaderparser_preprocessor, headers, include_paths)
+    t_cold, cold = _run(_cached, headers, include_paths)
+    t_warm, warm = _run(_cached, headers, include_paths)
+
+    if cold != expected or warm != expected:
+        print(f"{name}: outputs differ!")
+        sys.exit(1)
+
+    print(f"{name} ({len(headers)} headers):")
+    print(f"  cxxheaderparser: {t_old:.2f}s")
+    print(f"  cold cache:      {t_cold:.2f}s ({t_old / t_cold:.1f}x)")
+    print(f"  warm cache:      {t_warm:.2f}s ({t_old / t_warm:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--depth", type=int, default=30)
+    parser.add_argument("--headers", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = pathlib.Path(tmp)
+
+        headers = sorted(ft_include.glob("**/*.h"))
+        _compare(
+            "sw-test",
+            headers,
+            [str(ft_include), str(base_include)],
+            tmp_path / "cache1",
+        )
+
+        deep = tmp_path / "deep"
+        deep.mkdir()
+        headers = _generate_deep(deep, args.depth, args.headers)
+        _compare("deep includes", headers, [str(deep / "inc")], tmp_path / "cache2")
+
+
+if __name__ == "__main__":
+    main()
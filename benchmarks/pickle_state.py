@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Compares how long it takes to pickle and unpickle a wrapped struct using the
+generated pickle support (pickle: {}) with a copyreg reducer that reads and
+writes each attribute from python, which is what had to be done before.
+
+Generates and builds a project for each mode that wraps the same struct,
+and then measures in a new python process a round trip of a list of
+objects through pickle, and the size of the pickled data.
+
+Usage: python benchmarks/pickle_state.py [--fields N] [--objects N]
+"""
+
+import argparse
+import pathlib
+import subprocess
+import sys
+import tempfile
+
+MODES = ("attributes", "pickle")
+
+
+def _generate(path: pathlib.Path, mode: str, nfields: int):
+    inc = path / "src" / "picklebench" / "include"
+    yml = path / "semiwrap"
+    inc.mkdir(parents=True)
+    yml.mkdir()
+
+    (path / "src" / "picklebench" / "__init__.py").write_text("")
+
+    lines = ["#pragma once", "", "struct State {"]
+    ylines = ["classes:", "  State:"]
+    if mode == "pickle":
+        ylines.append("    pickle: {}")
+    ylines.append("    attributes:")
+    for i in range(nfields):
+        lines.append(f"    double v{i} = {i};")
+        ylines.append(f"      v{i}:")
+    lines.append("};")
+    (inc / "state.h").write_text("\n".join(lines) + "\n")
+    (yml / "state.yml").write_text("\n".join(ylines) + "\n")
+
+    mod = f"_{mode}"
+    toml = [
+        "[build-system]",
+        'build-backend = "hatchling.build"',
+        'requires = ["semiwrap", "hatch-meson", "hatchling"]',
+        "",
+        "[project]",
+        'name = "picklebench"',
+        'version = "0.0.1"',
+        "",
+        "[tool.hatch.build.hooks.semiwrap]",
+        "[tool.hatch.build.hooks.meson]",
+        "",
+        "[tool.hatch.build.targets.wheel]",
+        'packages = ["src/picklebench"]',
+        "",
+        "[tool.semiwrap]",
+        f'[tool.semiwrap.extension_modules."picklebench.{mod}"]',
+        'yaml_path = "semiwrap"',
+        'includes = ["src/picklebench/include"]',
+        f'[tool.semiwrap.extension_modules."picklebench.{mod}".headers]',
+        'state = "state.h"',
+    ]
+    meson = [
+        "project('picklebench', ['cpp'], default_options: ['cpp_std=c++20', 'optimization=2'])",
+        "subdir('semiwrap')",
+        f"picklebench_{mod}_sources += files('src/{mode}.cpp')",
+        "subdir('semiwrap/modules')",
+    ]
+    (path / "src" / f"{mode}.cpp").write_text(
+        f"#include <semiwrap_init.picklebench.{mod}.hpp>\n"
+        "SEMIWRAP_PYBIND11_MODULE(m) { initWrapper(m); }\n"
+    )
+
+    (path / "pyproject.toml").write_text("\n".join(toml))
+    (path / "meson.build").write_text("\n".join(meson) + "\n")
+
+
+def _time(target: pathlib.Path, mode: str, args: argparse.Namespace):
+    names = [f"v{i}" for i in range(args.fields)]
+    script = (
+        "import copyreg, pickle, time\n"
+        f"from picklebench._{mode} import State\n"
+        f"names = {names!r}\n"
+        "def _restore(values):\n"
+        "    s = State()\n"
+        "    for n, v in zip(names, values):\n"
+        "        setattr(s, n, v)\n"
+        "    return s\n"
+        "def _reduce(s):\n"
+        "    return _restore, (tuple(getattr(s, n) for n in names),)\n"
+        f"if {mode!r} == 'attributes':\n"
+        "    copyreg.pickle(State, _reduce)\n"
+        f"objs = [State() for _ in range({args.objects})]\n"
+        "start = time.perf_counter()\n"
+        "data = pickle.dumps(objs, protocol=pickle.HIGHEST_PROTOCOL)\n"
+        "pickle.loads(data)\n"
+        "print(time.perf_counter() - start, len(data))\n"
+    )
+    times = []
+    for _ in range(args.repeat):
+        out = subprocess.check_output(
+            [sys.executable, "-c", script],
+            env={"PYTHONPATH": str(target)},
+        )
+        elapsed, size = out.split()
+        times.append(float(elapsed))
+    return min(times), int(size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fields", type=int, default=8)
+    parser.add_argument("--objects", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+
+        for mode in MODES:
+            project = tmpdir / "project" / mode
+            _generate(project, mode, args.fields)
+
+            print(f"building {mode}...", flush=True)
+            subprocess.check_call(
+                [
+                    sys.executable,
+                    "-m",
+                    "pip",
+                    "--disable-pip-version-check",
+                    "install",
+                    "-q",
+                    "--no-build-isolation",
+                    "--no-deps",
+                    "--target",
+                    str(tmpdir / "install" / mode),
+                    str(project),
+                ]
+            )
+
+        print(f"objects: {args.objects}, fields: {args.fields}")
+        print(f"{'':>12}  {'total':>10}  {'per object':>10}  {'size':>10}")
+
+        for mode in MODES:
+            elapsed, size = _time(tmpdir / "install" / mode, mode, args)
+            print(
+                f"{mode:>12}  {elapsed * 1000:>8.1f}ms  {elapsed * 1e9 / args.objects:>8.1f}ns  {size:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
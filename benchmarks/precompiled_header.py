@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Compares how long it takes to compile an extension module without a
+precompiled header and with precompiled_header = true.
+
+Generates a project for each mode that wraps the same headers, builds each
+of them from scratch, and reports the wall time of the build and the total
+time spent compiling, which is read from the ninja log of the build.
+
+Usage: python benchmarks/precompiled_header.py [--headers N] [--classes N]
+"""
+
+import argparse
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("none", "pch")
+
+
+def _generate(path: pathlib.Path, mode: str, nheaders: int, nclasses: int):
+    inc = path / "src" / "pchbench" / "include"
+    yml = path / "semiwrap"
+    inc.mkdir(parents=True)
+    yml.mkdir()
+
+    (path / "src" / "pchbench" / "__init__.py").write_text("")
+
+    # every header includes the same library header, like most projects do
+    (inc / "common.h").write_text(
+        "#pragma once\n"
+        "#include <functional>\n"
+        "#include <map>\n"
+        "#include <optional>\n"
+        "#include <string>\n"
+        "#include <vector>\n"
+    )
+
+    for i in range(nheaders):
+        lines = ["#pragma once", "", '#include "common.h"', ""]
+        ylines = ["classes:"]
+        for j in range(nclasses):
+            lines.append(f"struct C{i}_{j} {{")
+            lines.append(
+                "    std::optional<std::string> name(const std::vector<int> &v) "
+                "{ return std::to_string(v.size()); }"
+            )
+            lines.append("    std::map<std::string, double> values;")
+            lines.append("};")
+            lines.append("")
+            ylines.append(f"  C{i}_{j}:")
+            ylines.append("    methods:")
+            ylines.append("      name:")
+        (inc / f"h{i}.h").write_text("\n".join(lines))
+        (yml / f"h{i}.yml").write_text("\n".join(ylines) + "\n")
+
+    toml = [
+        "[build-system]",
+        'build-backend = "hatchling.build"',
+        'requires = ["semiwrap", "hatch-meson", "hatchling"]',
+        "",
+        "[project]",
+        'name = "pchbench"',
+        'version = "0.0.1"',
+        "",
+        "[tool.hatch.build.hooks.semiwrap]",
+        "[tool.hatch.build.hooks.meson]",
+        "",
+        "[tool.hatch.build.targets.wheel]",
+        'packages = ["src/pchbench"]',
+        "",
+        "[tool.semiwrap]",
+        f'[tool.semiwrap.extension_modules."pchbench._{mode}"]',
+        'yaml_path = "semiwrap"',
+        'includes = ["src/pchbench/include"]',
+        f"precompiled_header = {'true' if mode == 'pch' else 'false'}",
+        f'[tool.semiwrap.extension_modules."pchbench._{mode}".headers]',
+        *(f'h{i} = "h{i}.h"' for i in range(nheaders)),
+    ]
+    meson = [
+        "project('pchbench', ['cpp'], default_options: ['cpp_std=c++20', 'optimization=2'])",
+        "subdir('semiwrap')",
+        f"pchbench__{mode}_sources += files('src/{mode}.cpp')",
+        "subdir('semiwrap/modules')",
+    ]
+    (path / "src" / f"{mode}.cpp").write_text(
+        f"#include <semiwrap_init.pchbench._{mode}.hpp>\n"
+        "SEMIWRAP_PYBIND11_MODULE(m) { initWrapper(m); }\n"
+    )
+
+    (path / "pyproject.toml").write_text("\n".join(toml))
+    (path / "meson.build").write_text("\n".join(meson) + "\n")
+
+
+def _compile_time(project: pathlib.Path) -> float:
+    # sums the time of each compiler invocation, including the one that
+    # creates the precompiled header
+    total = 0
+    for log in project.glob("build/*/.ninja_log"):
+        for line in log.read_text().splitlines()[1:]:
+            start, end, _, output, _ = line.split("\t")
+            if output.endswith((".o", ".obj", ".gch", ".pch")):
+                total += int(end) - int(start)
+    return total / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--headers", type=int, default=20)
+    parser.add_argument("--classes", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+
+        results = []
+        for mode in MODES:
+            project = tmpdir / "project" / mode
+            _generate(project, mode, args.headers, args.classes)
+
+            print(f"building {mode}...", flush=True)
+            start = time.perf_counter()
+            subprocess.check_call(
+                [
+                    sys.executable,
+                    "-m",
+                    "pip",
+                    "--disable-pip-version-check",
+                    "install",
+                    "-q",
+                    "--no-build-isolation",
+                    "--no-deps",
+                    "--target",
+                    str(tmpdir / "install" / mode),
+                    str(project),
+                ]
+            )
+            elapsed = time.perf_counter() - start
+            results.append((mode, elapsed, _compile_time(project)))
+
+        print(f"headers: {args.headers}, classes: {args.headers * args.classes}")
+        print(f"{'':>6}  {'build':>10}  {'compiling':>10}")
+        for mode, elapsed, compiling in results:
+            print(f"{mode:>6}  {elapsed:>9.1f}s  {compiling:>9.1f}s")
+
+
+if __name__ == "__main__":
+    main()
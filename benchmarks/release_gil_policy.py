@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Compares how long it takes to call trivial getters when they release the
+GIL (release_gil_policy = "always") with when they don't
+(release_gil_policy = "skip_trivial").
+
+Generates and builds a project for each policy that wraps the same class,
+and then measures in a new python process each time a loop that calls its
+getters, optionally while other threads are also calling them.
+
+Usage: python benchmarks/release_gil_policy.py [--getters N] [--calls N] [--threads N]
+"""
+
+import argparse
+import pathlib
+import subprocess
+import sys
+import tempfile
+
+POLICIES = ("always", "skip_trivial")
+
+
+def _generate(path: pathlib.Path, policy: str, ngetters: int):
+    inc = path / "src" / "gilbench" / "include"
+    yml = path / "semiwrap"
+    inc.mkdir(parents=True)
+    yml.mkdir()
+
+    (path / "src" / "gilbench" / "__init__.py").write_text("")
+
+    lines = ["#pragma once", "", "struct Point {"]
+    ylines = ["classes:", "  Point:", "    methods:"]
+    for i in range(ngetters):
+        lines.append(f"    int m_v{i} = {i};")
+        lines.append(f"    int getV{i}() const {{ return m_v{i}; }}")
+        ylines.append(f"      getV{i}:")
+    lines.append("};")
+    (inc / "point.h").write_text("\n".join(lines) + "\n")
+    (yml / "point.yml").write_text("\n".join(ylines) + "\n")
+
+    mod = f"_{policy}"
+    toml = [
+        "[build-system]",
+        'build-backend = "hatchling.build"',
+        'requires = ["semiwrap", "hatch-meson", "hatchling"]',
+        "",
+        "[project]",
+        'name = "gilbench"',
+        'version = "0.0.1"',
+        "",
+        "[tool.hatch.build.hooks.semiwrap]",
+        "[tool.hatch.build.hooks.meson]",
+        "",
+        "[tool.hatch.build.targets.wheel]",
+        'packages = ["src/gilbench"]',
+        "",
+        "[tool.semiwrap]",
+        f'[tool.semiwrap.extension_modules."gilbench.{mod}"]',
+        'yaml_path = "semiwrap"',
+        'includes = ["src/gilbench/include"]',
+        f'release_gil_policy = "{policy}"',
+        f'[tool.semiwrap.extension_modules."gilbench.{mod}".headers]',
+        'point = "point.h"',
+    ]
+    meson = [
+        "project('gilbench', ['cpp'], default_options: ['cpp_std=c++20', 'optimization=2'])",
+        "subdir('semiwrap')",
+        f"gilbench_{mod}_sources += files('src/{policy}.cpp')",
+        "subdir('semiwrap/modules')",
+    ]
+    (path / "src" / f"{policy}.cpp").write_text(
+        f"#include <semiwrap_init.gilbench.{mod}.hpp>\n"
+        "SEMIWRAP_PYBIND11_MODULE(m) { initWrapper(m); }\n"
+    )
+
+    (path / "pyproject.toml").write_text("\n".join(toml))
+    (path / "meson.build").write_text("\n".join(meson) + "\n")
+
+
+def _time(target: pathlib.Path, policy: str, args: argparse.Namespace) -> float:
+    getters = ", ".join(f"p.getV{i}" for i in range(args.getters))
+    script = (
+        "import threading, time\n"
+        f"from gilbench._{policy} import Point\n"
+        "def loop():\n"
+        "    p = Point()\n"
+        f"    getters = [{getters}]\n"
+        f"    for _ in range({args.calls}):\n"
+        "        for g in getters:\n"
+        "            g()\n"
+        f"threads = [threading.Thread(target=loop) for _ in range({args.threads})]\n"
+        "start = time.perf_counter()\n"
+        "for t in threads: t.start()\n"
+        "loop()\n"
+        "for t in threads: t.join()\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    times = []
+    for _ in range(args.repeat):
+        out = subprocess.check_output(
+            [sys.executable, "-c", script],
+            env={"PYTHONPATH": str(target)},
+        )
+        times.append(float(out))
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--getters", type=int, default=10)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+
+        for policy in POLICIES:
+            project = tmpdir / "project" / policy
+            _generate(project, policy, args.getters)
+
+            print(f"building {policy}...", flush=True)
+            subprocess.check_call(
+                [
+                    sys.executable,
+                    "-m",
+                    "pip",
+                    "--disable-pip-version-check",
+                    "install",
+                    "-q",
+                    "--no-build-isolation",
+                    "--no-deps",
+                    "--target",
+                    str(tmpdir / "install" / policy),
+                    str(project),
+                ]
+            )
+
+        ncalls = args.getters * args.calls * (args.threads + 1)
+        print(f"calls: {ncalls}, threads: {args.threads + 1}")
+        print(f"{'':>12}  {'total':>10}  {'per call':>10}")
+
+        for policy in POLICIES:
+            elapsed = _time(tmpdir / "install" / policy, policy, args)
+            print(
+                f"{policy:>12}  {elapsed * 1000:>8.1f}ms  {elapsed * 1e9 / ncalls:>8.1f}ns"
+            )
+
+
+if __name__ == "__main__":
+    main()
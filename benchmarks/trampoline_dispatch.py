@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Measures how long it takes C++ to call a virtual function through a
+generated trampoline, using the VirtualCall class from the sw-test-base
+test project (which must be installed).
+
+C++ calls the virtual functions in a loop with the GIL released, for:
+
+* an instance of the C++ class (no trampoline is involved)
+* an instance of a python subclass that doesn't override anything
+* an instance of a python subclass that overrides one of the functions
+* the same subclass while other threads are holding the GIL
+
+Usage: python benchmarks/trampoline_dispatch.py [--calls N] [--repeat N]
+"""
+
+import argparse
+import threading
+import time
+import typing as T
+
+from swtest_base._module2 import VirtualCall, call_virtual_n
+
+
+class NotOverridden(VirtualCall):
+    pass
+
+
+class Overridden(VirtualCall):
+    def scale(self):
+        return 3
+
+
+def _time(obj: VirtualCall, calls: int, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call_virtual_n(obj, calls)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _busy(stop: threading.Event):
+    while not stop.is_set():
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=2)
+    args = parser.parse_args()
+
+    cases: T.List[T.Tuple[str, VirtualCall]] = [
+        ("C++ class", VirtualCall()),
+        ("not overridden", NotOverridden()),
+        ("overridden", Overridden()),
+    ]
+
+    # each call_virtual_n iteration makes two virtual calls
+    ncalls = args.calls * 2
+
+    print(f"{'':>24}  {'per call':>10}")
+    for name, obj in cases:
+        elapsed = _time(obj, args.calls, args.repeat)
+        print(f"{name:>24}  {elapsed * 1e9 / ncalls:>8.1f}ns")
+
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_busy, args=(stop,)) for _ in range(args.threads)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        # with contention for the GIL, only calls that need it are slowed down
+        elapsed = _time(NotOverridden(), args.calls, args.repeat)
+        name = f"+{args.threads} busy threads"
+        print(f"{name:>24}  {elapsed * 1e9 / ncalls:>8.1f}ns")
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Compares how long it takes to build an extension module that compiles the
+generated .cpp file for each header individually with one that sets
+unity_shards.
+
+Generates a project for each mode that wraps the same headers, and measures
+how long it takes to build and install each of them from scratch.
+
+Usage: python benchmarks/unity_shards.py [--headers N] [--classes N] [--shards N]
+"""
+
+import argparse
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _generate(path: pathlib.Path, mod: str, shards: int, nheaders: int, nclasses: int):
+    inc = path / "src" / "unitybench" / "include"
+    yml = path / "semiwrap"
+    inc.mkdir(parents=True)
+    yml.mkdir()
+
+    (path / "src" / "unitybench" / "__init__.py").write_text("")
+
+    for i in range(nheaders):
+        lines = [
+            "#pragma once",
+            "",
+            "#include <map>",
+            "#include <string>",
+            "#include <vector>",
+            "",
+        ]
+        ylines = ["classes:"]
+        for j in range(nclasses):
+            # vary the amount of code generated for each header
+            nmethods = 2 + (i * nclasses + j) % 8
+            lines.append(f"struct C{i}_{j} {{")
+            ylines.append(f"  C{i}_{j}:")
+            ylines.append("    methods:")
+            for k in range(nmethods):
+                lines.append(
+                    f"    std::string m{k}(const std::vector<int> &v, int x = {k}) "
+                    "{ return std::to_string(v.size() + x); }"
+                )
+                ylines.append(f"      m{k}:")
+            lines.append("    std::map<std::string, double> values;")
+            lines.append("};")
+            lines.append("")
+        (inc / f"h{i}.h").write_text("\n".join(lines))
+        (yml / f"h{i}.yml").write_text("\n".join(ylines) + "\n")
+
+    toml = [
+        "[build-system]",
+        'build-backend = "hatchling.build"',
+        'requires = ["semiwrap", "hatch-meson", "hatchling"]',
+        "",
+        "[project]",
+        'name = "unitybench"',
+        'version = "0.0.1"',
+        "",
+        "[tool.hatch.build.hooks.semiwrap]",
+        "[tool.hatch.build.hooks.meson]",
+        "",
+        "[tool.hatch.build.targets.wheel]",
+        'packages = ["src/unitybench"]',
+        "",
+        "[tool.semiwrap]",
+        f'[tool.semiwrap.extension_modules."unitybench._{mod}"]',
+        'yaml_path = "semiwrap"',
+        'includes = ["src/unitybench/include"]',
+        f"unity_shards = {shards}",
+        f'[tool.semiwrap.extension_modules."unitybench._{mod}".headers]',
+        *(f'h{i} = "h{i}.h"' for i in range(nheaders)),
+    ]
+    meson = [
+        "project('unitybench', ['cpp'], default_options: ['cpp_std=c++20', 'optimization=2'])",
+        "subdir('semiwrap')",
+        f"unitybench__{mod}_sources += files('src/{mod}.cpp')",
+        "subdir('semiwrap/modules')",
+    ]
+    (path / "src" / f"{mod}.cpp").write_text(
+        f"#include <semiwrap_init.unitybench._{mod}.hpp>\n"
+        "SEMIWRAP_PYBIND11_MODULE(m) { initWrapper(m); }\n"
+    )
+
+    (path / "pyproject.toml").write_text("\n".join(toml))
+    (path / "meson.build").write_text("\n".join(meson) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--headers", type=int, default=40)
+    parser.add_argument("--classes", type=int, default=4)
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    modes = (("separate", 0), ("unity", args.shards))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = pathlib.Path(tmp)
+
+        results = []
+        for mod, shards in modes:
+            project = tmpdir / "project" / mod
+            _generate(project, mod, shards, args.headers, args.classes)
+
+            print(f"building {mod}...", flush=True)
+            start = time.perf_counter()
+            subprocess.check_call(
+                [
+                    sys.executable,
+                    "-m",
+                    "pip",
+                    "--disable-pip-version-check",
+                    "install",
+                    "-q",
+                    "--no-build-isolation",
+                    "--no-deps",
+                    "--target",
+                    str(tmpdir / "install" / mod),
+                    str(project),
+                ]
+            )
+            results.append((mod, shards, time.perf_counter() - start))
+
+        print(f"headers: {args.headers}, classes: {args.headers * args.classes}")
+        print(f"{'':>10}  {'shards':>6}  {'build':>10}")
+        for mod, shards, elapsed in results:
+            print(f"{mod:>10}  {shards:>6}  {elapsed:>9.1f}s")
+
+
+if __name__ == "__main__":
+    main()
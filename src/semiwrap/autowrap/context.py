@@ -156,6 +156,13 @@ class GeneratedLambda:
     #: output parameters
     out_params: typing.List[ParamContext]
 
+    #: True if the return value is converted to a view
+    return_view: bool = False
+
+    #: Names to call the function with, if different from the names of the
+    #: parameters of the function
+    call_names: typing.Optional[typing.List[str]] = None
+
 
 @dataclass
 class FnTemplateImpl:
@@ -230,6 +237,10 @@ class FunctionContext:
 
     release_gil: bool
 
+    #: True if the parser thinks the function is too cheap to be worth
+    #: releasing the GIL for (see ReleaseGilPolicy)
+    trivial: bool
+
     # List of template instantiations
     template_impls: typing.Optional[typing.List[FnTemplateImpl]]
 
@@ -247,6 +258,9 @@ class FunctionContext:
 
     genlambda: typing.Optional[GeneratedLambda] = None
 
+    #: Lambda for the overload that accepts arrays
+    vectorized: typing.Optional[GeneratedLambda] = None
+
     #: Is this a constructor?
     is_constructor: bool = False
 
@@ -292,6 +306,9 @@ class PropContext:
     static: bool
     bitfield: bool
 
+    #: If set, C++ expression that creates a view of the property from self
+    view: typing.Optional[str] = None
+
 
 @dataclass
 class BaseClassData:
@@ -462,6 +479,15 @@ class ClassContext:
     public_properties: typing.List[PropContext] = field(default_factory=list)
     protected_properties: typing.List[PropContext] = field(default_factory=list)
 
+    #: If set, the C++ names of the fields that are saved when pickling
+    pickle_fields: typing.Optional[typing.List[str]] = None
+
+    #: Add to_tuple/from_tuple methods that use pickle_fields
+    pickle_tuple_methods: bool = False
+
+    #: Add __copy__/__deepcopy__ methods
+    copy_methods: bool = False
+
     #
     # Methods: the idea here is have a bunch of descriptive lists here so that
     # the j2 templates don't need logic to emit each method
@@ -542,6 +568,12 @@ class HeaderContext:
     #: True if <pybind11/operators.h> is needed
     need_operators_h: bool = False
 
+    #: True if any function or property returns a view
+    has_views: bool = False
+
+    #: True if <semiwrap_vectorize.h> is needed
+    need_vectorize_h: bool = False
+
     using_declarations: typing.List[PQName] = field(default_factory=list)
 
     # TODO: anon enums?
@@ -65,13 +65,16 @@ from ..casters import CastersData
 from ..config.autowrap_yml import (
     AutowrapConfigYaml,
     BufferData,
+    BufferOrder,
     BufferType,
     ClassData,
     EnumValue,
     FunctionData,
     ParamData,
     PropAccess,
+    ReleaseGilPolicy,
     ReturnValuePolicy,
+    ViewData,
 )
 from .generator_data import GeneratorData, OverloadTracker
 from .context import (
@@ -176,6 +179,24 @@ def _is_prop_readonly(dt: DecoratedType) -> bool:
             assert False
 
 
+def _is_trivial(fn: Function) -> bool:
+    """
+    Guesses whether a function is cheap enough that releasing the GIL to
+    call it costs more than the call itself: inline or noexcept const
+    methods, and constexpr functions. Virtual functions may be overridden by
+    something that isn't cheap, so they are never trivial.
+    """
+    if isinstance(fn, Method) and (fn.constructor or fn.virtual or fn.override):
+        return False
+    if fn.constexpr:
+        return True
+    if isinstance(fn, Method) and fn.const:
+        # noexcept(false) is the same as not specifying it
+        noexcept = fn.noexcept is not None and fn.noexcept.format() != "false"
+        return fn.has_body or noexcept
+    return False
+
+
 def _count_and_unwrap(
     dt: DecoratedType,
 ) -> typing.Tuple[typing.Union[Array, FunctionType, Type], int, int, bool]:
@@ -277,6 +298,13 @@ def _fmt_array_size(t: Array) -> typing.Optional[int]:
     return None
 
 
+def _fmt_view(
+    data: str, shape: typing.List[typing.Union[int, str]], readonly: bool
+) -> str:
+    dims = ", ".join(f"static_cast<py::ssize_t>({dim})" for dim in shape)
+    return f"semiwrap::make_view({data}, {{{dims}}}, {'true' if readonly else 'false'})"
+
+
 @dataclasses.dataclass
 class _ReturnParamContext:
     #: was x_type
@@ -304,6 +332,9 @@ class ClassStateData(typing.NamedTuple):
     defer_private_virtual_methods: typing.List[Method]
     defer_protected_fields: typing.List[Field]
 
+    # all non-static fields, for pickling
+    fields: typing.List[Field]
+
     # Needed for trampoline
     template_argument_list: str
     base_template_params: str
@@ -344,12 +375,14 @@ class AutowrapVisitor:
         casters: CastersData,
         report_only: bool,
         name_transforms: typing.Optional[NameTransforms] = None,
+        release_gil_policy: ReleaseGilPolicy = ReleaseGilPolicy.always,
     ) -> None:
         self.hctx = hctx
         self.gendata = gendata
         self.user_cfg = gendata.data
         self.report_only = report_only
         self.casters = casters
+        self.release_gil_policy = release_gil_policy
         self.name_transforms = name_transforms or resolve_name_transforms("default")
         self.function_name_transform = functools.partial(
             self.name_transforms.function, kind="function"
@@ -801,6 +834,7 @@ class AutowrapVisitor:
             defer_private_nonvirtual_methods=[],
             defer_private_virtual_methods=[],
             defer_protected_fields=[],
+            fields=[],
             # Trampoline data
             template_argument_list=template_argument_list,
             base_template_args=base_template_args_s,
@@ -955,6 +989,9 @@ class AutowrapVisitor:
         return bases, pybase_params
 
     def on_class_field(self, state: AWClassBlockState, f: Field) -> None:
+        if not f.static:
+            state.user_data.fields.append(f)
+
         # Ignore unnamed fields
         if not f.name:
             return
@@ -1023,6 +1060,29 @@ class AutowrapVisitor:
         else:
             cpp_type = f.type.format()
 
+        # arrays of a known size are always returned as a view
+        view = None
+        if propdata.view is not None or array_size:
+            shape = propdata.view.shape if propdata.view is not None else None
+            if is_array:
+                if shape is None:
+                    if not array_size:
+                        raise ValueError(
+                            f"{prop_name}: view of an array of unknown size needs a shape"
+                        )
+                    shape = [array_size]
+                data = f"self.{prop_name}"
+            else:
+                if shape is None:
+                    shape = [f"std::size(self.{prop_name})"]
+                data = f"std::data(self.{prop_name})"
+
+            readonly = prop_readonly or (
+                propdata.view is not None and propdata.view.readonly
+            )
+            view = _fmt_view(data, shape, readonly)
+            self.hctx.has_views = True
+
         props.append(
             PropContext(
                 py_name=py_name,
@@ -1035,6 +1095,7 @@ class AutowrapVisitor:
                 reference=isinstance(f.type, Reference),
                 static=f.static,
                 bitfield=f.bits is not None,
+                view=view,
             )
         )
 
@@ -1357,6 +1418,40 @@ class AutowrapVisitor:
         for m in cdata.defer_private_nonvirtual_methods:
             self._on_class_method_process_overload_only(state, m)
 
+        if class_data.pickle is not None:
+            self._on_class_pickle(state)
+
+    def _on_class_pickle(self, state: AWClassBlockState) -> None:
+        cdata = state.user_data
+        ctx = cdata.ctx
+        pickle = cdata.data.pickle
+        assert pickle is not None
+
+        # The state is only complete if every field can be read and written
+        if ctx.bases:
+            raise ValueError(
+                f"{cdata.cls_key}: pickle cannot be used with classes that have bases"
+            )
+
+        fields: typing.List[str] = []
+        for f in cdata.fields:
+            if (
+                not f.name
+                or f.access != "public"
+                or f.constexpr
+                or getattr(f.type, "const", False)
+                or f.bits is not None
+                or isinstance(f.type, (Array, Pointer, Reference, MoveReference))
+            ):
+                raise ValueError(
+                    f"{cdata.cls_key}: pickle requires all fields to be public and assignable ({f.name or 'unnamed field'})"
+                )
+            fields.append(f.name)
+
+        ctx.pickle_fields = fields
+        ctx.pickle_tuple_methods = pickle.tuple_methods
+        ctx.copy_methods = pickle.copy_methods
+
     def on_deduction_guide(
         self, state: NonClassBlockState, guide: DeductionGuide
     ) -> None:
@@ -1375,13 +1470,6 @@ class AutowrapVisitor:
         internal: bool,
         overload_tracker: OverloadTracker,
     ) -> FunctionContext:
-        # if cpp_code is specified, don't release the gil unless the user
-        # specifically asks for it
-        if data.no_release_gil is None:
-            release_gil = data.cpp_code is None
-        else:
-            release_gil = not data.no_release_gil
-
         all_params: typing.List[ParamContext] = []
         filtered_params: typing.List[ParamContext] = []
         keepalives = []
@@ -1425,6 +1513,17 @@ class AutowrapVisitor:
             if pctx.category == ParamCategory.OUT:
                 has_out_param = True
 
+        trivial = not has_out_param and not data.buffers and _is_trivial(fn)
+
+        # if cpp_code is specified, don't release the gil unless the user
+        # specifically asks for it
+        if data.no_release_gil is None:
+            release_gil = data.cpp_code is None and not (
+                trivial and self.release_gil_policy == ReleaseGilPolicy.skip_trivial
+            )
+        else:
+            release_gil = not data.no_release_gil
+
         return_value_policy = _rvp_map[data.return_value_policy]
 
         # Set up the function's name
@@ -1551,6 +1650,7 @@ class AutowrapVisitor:
             ifdef=data.ifdef,
             ifndef=data.ifndef,
             release_gil=release_gil,
+            trivial=trivial,
             template_impls=template_impls,
             virtual_xform=data.virtual_xform,
             is_overloaded=overload_tracker,
@@ -1558,9 +1658,14 @@ class AutowrapVisitor:
         )
 
         # Generate a special lambda wrapper only when needed
-        if not data.cpp_code and (has_out_param or fctx.has_buffers):
+        if not data.cpp_code and (
+            has_out_param or fctx.has_buffers or data.return_view is not None
+        ):
             self._on_fn_make_lambda(data, fctx)
 
+        if data.vectorize:
+            self._on_fn_vectorize(data, fctx)
+
         return fctx
 
     def _on_fn_param(
@@ -1722,6 +1827,7 @@ class AutowrapVisitor:
         * When an 'out' parameter is detected (a pointer receiving a value)
         * When a buffer + size parameter exists (either in or out)
         * When "renaming" a constructor overload to a static method
+        * When the return value is converted to a view
         """
 
         # Statements to insert before calling the function
@@ -1757,10 +1863,20 @@ class AutowrapVisitor:
         # Return values (original return value + any out parameters)
         fn_retval = fctx.cpp_return_type
         if fn_retval and fn_retval != "void":
-            call_start = "auto __ret = "
-            ret_params = [_ReturnParamContext(cpp_retname="__ret", cpp_type=fn_retval)]
+            if data.return_view is not None:
+                # the return value may be a reference to the storage
+                call_start = "auto &&__ret = "
+                retname = self._on_fn_return_view(data.return_view, fctx)
+            else:
+                call_start = "auto __ret = "
+                retname = "__ret"
+            ret_params = [_ReturnParamContext(cpp_retname=retname, cpp_type=fn_retval)]
             ret_params.extend(out_params)
         else:
+            if data.return_view is not None:
+                raise ValueError(
+                    f"{fctx.cpp_name}: return_view requires a function that returns a value"
+                )
             ret_params.extend(out_params)
 
         if len(ret_params) == 1 and ret_params[0].cpp_type != "void":
@@ -1780,6 +1896,12 @@ class AutowrapVisitor:
                 else:
                     lambda_pre.insert(0, f"{out.cpp_type} {out.arg_name} = {odef}")
 
+        # Buffers are requested and checked while holding the GIL, and then
+        # it is released for the call instead of for the entire lambda
+        if data.buffers and fctx.release_gil:
+            lambda_pre.append("py::gil_scoped_release __release")
+            fctx.release_gil = False
+
         pre = f";\n".join(lambda_pre) + ";"
 
         fctx.genlambda = GeneratedLambda(
@@ -1788,7 +1910,145 @@ class AutowrapVisitor:
             ret=lambda_ret,
             in_params=in_params,
             out_params=out_params,
+            return_view=data.return_view is not None,
+        )
+
+    def _on_fn_vectorize(self, data: FunctionData, fctx: FunctionContext):
+        """
+        Generates a lambda for an overload of the function that calls it
+        for each element of the arrays passed to the vectorized parameters
+        """
+        fn = fctx._fn
+        if (
+            data.cpp_code
+            or data.buffers
+            or data.return_view is not None
+            or fn.operator
+            or (isinstance(fn, Method) and fn.constructor)
+        ):
+            raise ValueError(
+                f"{fctx.cpp_name}: vectorize cannot be used with constructors, operators, cpp_code, buffers, or return_view"
+            )
+
+        names = set(data.vectorize or ())
+        in_params: typing.List[ParamContext] = []
+        out_params: typing.List[ParamContext] = []
+        call_names: typing.List[str] = []
+        vector_args: typing.List[str] = []
+
+        # (variable, type) of each array that is returned
+        results: typing.List[typing.Tuple[str, str]] = []
+        call_start = ""
+
+        fn_retval = fctx.cpp_return_type
+        if fn_retval and fn_retval != "void":
+            results.append(("__ret", f"std::decay_t<{fn_retval}>"))
+            call_start = "__ret[__i] = "
+
+        # statements inside of the loop before and after the call
+        loop_pre: typing.List[str] = []
+        loop_post: typing.List[str] = []
+
+        for pctx in fctx.all_params:
+            call_names.append(pctx.call_name)
+            if pctx.arg_name in names:
+                if pctx.category != ParamCategory.IN:
+                    raise ValueError(
+                        f"{fctx.cpp_name}: vectorized parameter {pctx.arg_name} must be an input"
+                    )
+                names.remove(pctx.arg_name)
+                in_params.append(
+                    dataclasses.replace(
+                        pctx,
+                        full_cpp_type=f"const semiwrap::VectorArg<{pctx.cpp_type_no_const}>&",
+                    )
+                )
+                call_names[-1] = f"{pctx.arg_name}[__i]"
+                vector_args.append(pctx.arg_name)
+
+            elif pctx.category == ParamCategory.IN:
+                in_params.append(pctx)
+                # the same argument is passed to every call, so it can't be moved
+                if pctx.call_name.startswith(("std::move(", "std::forward<")):
+                    call_names[-1] = pctx.arg_name
+
+            elif pctx.category in (ParamCategory.OUT, ParamCategory.TMP):
+                odef = pctx.default
+                if not odef:
+                    loop_pre.append(f"{pctx.cpp_type} {pctx.arg_name}{{}};")
+                elif odef.startswith("{"):
+                    loop_pre.append(f"{pctx.cpp_type} {pctx.arg_name}{odef};")
+                else:
+                    loop_pre.append(f"{pctx.cpp_type} {pctx.arg_name} = {odef};")
+
+                if pctx.category == ParamCategory.OUT:
+                    out_params.append(pctx)
+                    results.append((f"__{pctx.arg_name}", pctx.cpp_type))
+                    loop_post.append(f"__{pctx.arg_name}[__i] = {pctx.arg_name};")
+
+        if names:
+            raise ValueError(
+                f"{fctx.cpp_name}: cannot vectorize unknown parameters {', '.join(sorted(names))}"
+            )
+        if not results:
+            raise ValueError(
+                f"{fctx.cpp_name}: vectorize requires a return value or out parameter"
+            )
+
+        pre = [f"auto __shape = semiwrap::broadcast_shape({', '.join(vector_args)});"]
+        for rname, rtype in results:
+            pre.append(f"semiwrap::VectorResult<{rtype}> {rname}(__shape);")
+        if not data.no_release_gil:
+            pre.append("py::gil_scoped_release __release;")
+        pre.append(f"for (py::ssize_t __i = 0; __i < {results[0][0]}.size(); __i++) {{")
+        pre.extend(f"  {stmt}" for stmt in loop_pre)
+
+        ret = [f"  {stmt}" for stmt in loop_post]
+        ret.append("}")
+        if len(results) == 1:
+            ret.append(f"return {results[0][0]};")
+        else:
+            t = ", ".join(f"std::move({rname})" for rname, _ in results)
+            ret.append(f"return std::make_tuple({t});")
+
+        fctx.vectorized = GeneratedLambda(
+            pre="\n".join(pre),
+            call_start=f"  {call_start}",
+            ret="\n".join(ret),
+            in_params=in_params,
+            out_params=out_params,
+            call_names=call_names,
         )
+        self.hctx.need_vectorize_h = True
+
+    def _on_fn_return_view(self, view: ViewData, fctx: FunctionContext) -> str:
+        """
+        Returns an expression that creates a view of the storage referred to
+        by the return value of the function
+        """
+        rtype = fctx._fn.return_type
+        shape = view.shape
+
+        if isinstance(rtype, Pointer):
+            if shape is None:
+                raise ValueError(
+                    f"{fctx.cpp_name}: return_view needs a shape when a pointer is returned"
+                )
+            data = "__ret"
+        elif isinstance(rtype, (Type, MoveReference)) and "span" not in (
+            fctx.cpp_return_type or ""
+        ):
+            # the storage would be destroyed when the lambda returns
+            raise ValueError(
+                f"{fctx.cpp_name}: return_view requires a pointer, reference, or span to be returned"
+            )
+        else:
+            data = "std::data(__ret)"
+            if shape is None:
+                shape = ["std::size(__ret)"]
+
+        self.hctx.has_views = True
+        return _fmt_view(data, shape, view.readonly)
 
     def _apply_buffer_params(
         self,
@@ -1813,19 +2073,37 @@ class AutowrapVisitor:
                 raise ValueError(
                     f"buffer src({bufinfo.src}) is in multiple buffer specifications"
                 )
+            if bufinfo.len is None and bufinfo.shape is None:
+                raise ValueError(f"buffer src({bufinfo.src}) needs a len or shape")
+            if (
+                bufinfo.shape is not None
+                and bufinfo.ndim is not None
+                and len(bufinfo.shape) != bufinfo.ndim
+            ):
+                raise ValueError(
+                    f"buffer src({bufinfo.src}) has a shape with {len(bufinfo.shape)} dimensions, but ndim is {bufinfo.ndim}"
+                )
             # length can be shared
             # elif bufinfo.len in buflen_params:
             #     raise ValueError(
             #         f"buffer len({bufinfo.len}) is in multiple buffer specifications"
             #     )
             buffer_params[bufinfo.src] = bufinfo
-            buflen_params[bufinfo.len] = False
+            if bufinfo.len is not None:
+                buflen_params[bufinfo.len] = False
+            for dim in bufinfo.shape or ():
+                if isinstance(dim, str):
+                    buflen_params[dim] = False
 
         dups = set(buffer_params.keys()).intersection(buflen_params.keys())
         if dups:
             names = "', '".join(dups)
             raise ValueError(f"These params are both buffer src and len: '{names}'")
 
+        # size parameters that were set by a buffer that has a dtype, ndim, or
+        # shape; other buffers that have one must have the same size
+        checked_sizes: typing.Set[str] = set()
+
         for pctx in fctx.all_params:
             p_name = pctx.arg_name
             if p_name in buffer_params:
@@ -1836,13 +2114,6 @@ class AutowrapVisitor:
                 pctx.cpp_type = "const py::buffer"
                 pctx.full_cpp_type = "const py::buffer&"
 
-                # this doesn't seem to be true for bytearrays, which is silly
-                # x_lambda_pre.append(
-                #     f'if (PyBuffer_IsContiguous((Py_buffer*){p_name}.ptr(), \'C\') == 0) throw py::value_error("{p_name}: buffer must be contiguous")'
-                # )
-
-                # TODO: check for dimensions, strides, other dangerous things
-
                 # bufinfo was validated and converted before it got here
                 pctx.category = ParamCategory.IN
                 if bufinfo.type is BufferType.IN:
@@ -1850,11 +2121,63 @@ class AutowrapVisitor:
                 else:
                     lambda_pre += [f"auto {bname} = {p_name}.request(true)"]
 
-                lambda_pre += [f"{bufinfo.len} = {bname}.size * {bname}.itemsize"]
+                checked = (
+                    bufinfo.dtype is not None
+                    or bufinfo.ndim is not None
+                    or bufinfo.shape is not None
+                )
+                order = bufinfo.order
+                if order is None:
+                    order = BufferOrder.C if checked else BufferOrder.any
+
+                if bufinfo.ndim is not None:
+                    ndim = bufinfo.ndim
+                elif bufinfo.shape is not None:
+                    ndim = len(bufinfo.shape)
+                else:
+                    ndim = -1
+
+                # the wrapped function reads the buffer as if it were
+                # contiguous, so the layout is always checked
+                order_c = "A" if order is BufferOrder.any else order.value
+                if bufinfo.dtype:
+                    check = f"semiwrap::check_buffer<{bufinfo.dtype}>"
+                else:
+                    check = "semiwrap::check_buffer_layout"
+                lambda_pre.append(
+                    f"{check}({bname}, \"{p_name}\", {ndim}, '{order_c}')"
+                )
+
+                if bufinfo.dtype:
+                    size = f"{bname}.size"
+                else:
+                    size = f"{bname}.size * {bname}.itemsize"
+
+                sizes: typing.List[typing.Tuple[str, str]] = []
+                if bufinfo.len is not None:
+                    sizes.append((bufinfo.len, size))
+
+                for i, dim in enumerate(bufinfo.shape or ()):
+                    if isinstance(dim, int):
+                        lambda_pre.append(
+                            f'if ({bname}.shape[{i}] != {dim}) throw py::value_error("{p_name}: dimension {i} must have size {dim}")'
+                        )
+                    else:
+                        sizes.append((dim, f"{bname}.shape[{i}]"))
+
+                for sname, value in sizes:
+                    if checked and sname in checked_sizes:
+                        lambda_pre.append(
+                            f'if (static_cast<py::ssize_t>({sname}) != {value}) throw py::value_error("{p_name}: size does not match the other buffers ({sname})")'
+                        )
+                    else:
+                        lambda_pre.append(f"{sname} = {value}")
+                        if checked:
+                            checked_sizes.add(sname)
 
                 if bufinfo.minsz:
                     lambda_pre.append(
-                        f'if ({bufinfo.len} < {bufinfo.minsz}) throw py::value_error("{p_name}: minimum buffer size is {bufinfo.minsz}")'
+                        f'if ({size} < {bufinfo.minsz}) throw py::value_error("{p_name}: minimum buffer size is {bufinfo.minsz}")'
                     )
 
             elif p_name in buflen_params:
@@ -2130,6 +2453,7 @@ def parse_header(
     casters: CastersData,
     report_only: bool,
     name_transforms: typing.Optional[NameTransforms] = None,
+    release_gil_policy: ReleaseGilPolicy = ReleaseGilPolicy.always,
 ) -> HeaderContext:
     user_cfg = gendata.data
 
@@ -2144,7 +2468,9 @@ def parse_header(
     )
 
     # Parse the header using a custom visitor
-    visitor = AutowrapVisitor(hctx, gendata, casters, report_only, name_transforms)
+    visitor = AutowrapVisitor(
+        hctx, gendata, casters, report_only, name_transforms, release_gil_policy
+    )
     parser = CxxParser(
         str(header_path), None, visitor, parser_options, encoding=user_cfg.encoding
     )
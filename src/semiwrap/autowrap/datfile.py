@@ -0,0 +1,253 @@
+"""
+Reads and writes the .dat files created by header2dat
+
+A .dat file contains a HeaderContext, split into sections that can be decoded
+independently so that commands which only need part of a header (a single
+class, a single template instance, the class hierarchy) don't need to
+unpickle all of it.
+
+Layout::
+
+    magic | format version | schema hash | index length | index | sections...
+
+The index is a small pickled dictionary that contains the header name, class
+hierarchy, subpackages, and the offsets of each section. Each class that
+is not contained in another class has its own section (which includes its
+child classes), as does each template instance.
+"""
+
+import dataclasses
+import hashlib
+import pathlib
+import pickle
+import struct
+import typing as T
+
+import cxxheaderparser
+
+from ..util import PICKLE_PROTOCOL
+from . import context
+from .context import (
+    ClassContext,
+    FunctionContext,
+    HeaderContext,
+    TemplateInstanceContext,
+)
+
+#: Identifies a .dat file
+MAGIC = b"SWDAT"
+
+#: Increment this when the layout of the file changes
+FORMAT_VERSION = 1
+
+_prefix = struct.Struct(f"<{len(MAGIC)}sI32sQ")
+
+_schema_hash: T.Optional[bytes] = None
+
+
+def _get_schema_hash() -> bytes:
+    # The sections are pickled dataclasses, so a .dat file can only be read
+    # if the dataclass definitions are the same as when it was written
+    global _schema_hash
+    if _schema_hash is None:
+        h = hashlib.sha256(pathlib.Path(context.__file__).read_bytes())
+        h.update(cxxheaderparser.__version__.encode("utf-8"))
+        _schema_hash = h.digest()
+    return _schema_hash
+
+
+class DatFileError(Exception):
+    pass
+
+
+def _iter_classes(classes: T.List[ClassContext]) -> T.Iterator[ClassContext]:
+    for cls in classes:
+        yield cls
+        yield from _iter_classes(cls.child_classes)
+
+
+def dumps(hctx: HeaderContext) -> bytes:
+    """Serializes a HeaderContext to the contents of a .dat file"""
+
+    sections: T.List[bytes] = []
+
+    def _add(obj) -> int:
+        sections.append(pickle.dumps(obj, protocol=PICKLE_PROTOCOL))
+        return len(sections) - 1
+
+    # everything that isn't in its own section
+    base = dataclasses.replace(
+        hctx,
+        classes=[],
+        classes_with_trampolines=[],
+        template_instances=[],
+        enums=[],
+        functions=[],
+    )
+
+    base_section = _add(base)
+    globals_section = _add((hctx.enums, hctx.functions))
+
+    classes: T.Dict[str, int] = {}
+    class_sections: T.List[int] = []
+    for cls in hctx.classes:
+        idx = _add(cls)
+        class_sections.append(idx)
+        for c in _iter_classes([cls]):
+            classes[c.yml_id] = idx
+
+    templates: T.Dict[str, int] = {}
+    for tmpl in hctx.template_instances:
+        templates[tmpl.py_name] = _add(tmpl)
+
+    offsets = []
+    offset = 0
+    for section in sections:
+        offsets.append((offset, len(section)))
+        offset += len(section)
+
+    index = {
+        "hname": hctx.hname,
+        "class_hierarchy": hctx.class_hierarchy,
+        "subpackages": hctx.subpackages,
+        "offsets": offsets,
+        "base": base_section,
+        "globals": globals_section,
+        "class_sections": class_sections,
+        "classes": classes,
+        "trampolines": [cls.yml_id for cls in hctx.classes_with_trampolines],
+        "templates": templates,
+    }
+    index_data = pickle.dumps(index, protocol=PICKLE_PROTOCOL)
+
+    prefix = _prefix.pack(MAGIC, FORMAT_VERSION, _get_schema_hash(), len(index_data))
+    return b"".join([prefix, index_data, *sections])
+
+
+class DatFile:
+    """
+    Lazily decodes the contents of a .dat file. The index is read when the
+    file is opened, and each section is decoded the first time it is used.
+    """
+
+    def __init__(self, data: bytes, name: str = "<dat>") -> None:
+        self.name = name
+
+        try:
+            magic, version, schema_hash, index_len = _prefix.unpack_from(data)
+        except struct.error:
+            magic = None
+
+        if magic != MAGIC:
+            raise DatFileError(f"{name}: not a semiwrap .dat file")
+        if version != FORMAT_VERSION or schema_hash != _get_schema_hash():
+            raise DatFileError(
+                f"{name}: created by a different version of semiwrap, it must be regenerated"
+            )
+
+        start = _prefix.size
+        self._index = pickle.loads(data[start : start + index_len])
+        self._data = memoryview(data)[start + index_len :]
+        self._sections: T.Dict[int, T.Any] = {}
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> "DatFile":
+        with open(path, "rb") as fp:
+            return cls(fp.read(), str(path))
+
+    def _section(self, idx: int):
+        obj = self._sections.get(idx)
+        if obj is None:
+            offset, length = self._index["offsets"][idx]
+            obj = pickle.loads(self._data[offset : offset + length])
+            self._sections[idx] = obj
+        return obj
+
+    @property
+    def hname(self) -> str:
+        return self._index["hname"]
+
+    @property
+    def class_hierarchy(self) -> T.Dict[str, T.List[str]]:
+        return self._index["class_hierarchy"]
+
+    @property
+    def subpackages(self) -> T.Dict[str, str]:
+        return self._index["subpackages"]
+
+    @property
+    def class_ids(self) -> T.List[str]:
+        return list(self._index["classes"])
+
+    @property
+    def template_names(self) -> T.List[str]:
+        return list(self._index["templates"])
+
+    def _base(self) -> HeaderContext:
+        base = self._section(self._index["base"])
+        return dataclasses.replace(base)
+
+    def get_header(self) -> HeaderContext:
+        """Decodes everything"""
+        hctx = self._base()
+        hctx.enums, hctx.functions = self._section(self._index["globals"])
+        hctx.classes = [self._section(idx) for idx in self._index["class_sections"]]
+        hctx.classes_with_trampolines = self._get_trampoline_classes()
+        hctx.template_instances = [
+            self._section(idx) for idx in self._index["templates"].values()
+        ]
+        return hctx
+
+    def get_functions(self) -> T.List[FunctionContext]:
+        """Decodes the functions that aren't in a class"""
+        _, functions = self._section(self._index["globals"])
+        return functions
+
+    def get_partial_header(self, trampolines: bool = False) -> HeaderContext:
+        """
+        Decodes the parts of the header that aren't classes, templates, or
+        global functions/enums. If trampolines is True, then the classes that
+        have trampolines are also decoded.
+        """
+        hctx = self._base()
+        if trampolines:
+            hctx.classes_with_trampolines = self._get_trampoline_classes()
+        return hctx
+
+    def _get_trampoline_classes(self) -> T.List[ClassContext]:
+        result = []
+        for yml_id in self._index["trampolines"]:
+            result.append(self.get_class(yml_id))
+        return result
+
+    def get_class(self, yml_id: str) -> ClassContext:
+        idx = self._index["classes"].get(yml_id)
+        if idx is None:
+            base = self._section(self._index["base"])
+            msg = [
+                f"cannot find {yml_id} in {base.rel_fname}",
+                f"- config: {base.orig_yaml}",
+            ]
+
+            if self._index["classes"]:
+                msg.append("- found " + ", ".join(self._index["classes"]))
+
+            if base.ignored_classes:
+                msg.append("- ignored " + ", ".join(base.ignored_classes))
+
+            raise ValueError("\n".join(msg))
+
+        for cls in _iter_classes([self._section(idx)]):
+            if cls.yml_id == yml_id:
+                return cls
+
+        raise DatFileError(f"{self.name}: {yml_id} not found in its section")
+
+    def get_template(self, py_name: str) -> TemplateInstanceContext:
+        idx = self._index["templates"].get(py_name)
+        if idx is None:
+            base = self._section(self._index["base"])
+            raise ValueError(
+                f"internal error: cannot find {py_name} in {base.orig_yaml}"
+            )
+        return self._section(idx)
@@ -0,0 +1,253 @@
+"""
+pcpp based preprocessor used by header2dat
+
+This produces the same output as cxxheaderparser's pcpp preprocessor, but is
+much faster for headers that include lots of other headers:
+
+* The content of included files is discarded as soon as pcpp has processed
+  it, instead of being written out and filtered away afterwards
+* Tokenized include files are stored in a cache directory that is shared by
+  every header processed in a build. Tokenizing does not depend on which
+  macros are defined, so a commonly included file is only tokenized once
+  instead of once for every header that includes it.
+"""
+
+import hashlib
+import io
+import os
+import pathlib
+import marshal
+import re
+import tempfile
+import typing as T
+
+from cxxheaderparser.options import PreprocessorFunction
+from cxxheaderparser.preprocessor import PreprocessorError
+from pcpp import Action, OutputDirective, Preprocessor
+from pcpp.parser import LexToken
+
+from ..depfile import Depfile
+
+
+class TokenCache:
+    """
+    Stores the tokenized lines of files, keyed by a hash of the path
+    and content of the file.
+
+    pcpp modifies the tokens as it processes them, so new tokens are created
+    each time a file is retrieved from the cache. Tokens are stored as tuples
+    in marshal format, which is much faster to turn back into tokens than
+    pickle or tokenizing the file again.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, source: str, text: str) -> str:
+        h = hashlib.sha1(f"{marshal.version}\0{source}\0".encode("utf-8"))
+        h.update(text.encode("utf-8", "surrogateescape"))
+        return h.hexdigest()
+
+    def get(self, source: str, text: str) -> T.Optional[T.List[T.List[LexToken]]]:
+        try:
+            with open(self.path / self._key(source, text), "rb") as fp:
+                data = marshal.loads(fp.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        new_token = LexToken.__new__
+        lines = []
+        for tuples in data:
+            line = []
+            for type, value, lineno, lexpos in tuples:
+                tok = new_token(LexToken)
+                tok.type = type
+                tok.value = value
+                tok.lineno = lineno
+                tok.lexpos = lexpos
+                tok.source = source
+                line.append(tok)
+            lines.append(line)
+
+        return lines
+
+    def put(self, source: str, text: str, lines: T.List[T.List[LexToken]]):
+        data = marshal.dumps(
+            [[(t.type, t.value, t.lineno, t.lexpos) for t in line] for line in lines]
+        )
+
+        # other processes may be reading the cache, so write it atomically
+        self.path.mkdir(parents=True, exist_ok=True)
+        fd, tmpname = tempfile.mkstemp(dir=self.path, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(tmpname, self.path / self._key(source, text))
+        except BaseException:
+            os.unlink(tmpname)
+            raise
+
+
+class _SemiwrapPreprocessor(Preprocessor):
+    def __init__(
+        self,
+        encoding: T.Optional[str],
+        token_cache: T.Optional[TokenCache],
+    ):
+        Preprocessor.__init__(self)
+        self.errors: T.List[str] = []
+        self.assume_encoding = encoding
+        self.token_cache = token_cache
+        self.opened_files: T.Dict[str, bool] = {}
+
+    def on_error(self, file, line, msg):
+        self.errors.append(f"{file}:{line} error: {msg}")
+
+    def on_include_not_found(self, *ignored):
+        raise OutputDirective(Action.IgnoreAndPassThrough)
+
+    def on_comment(self, *ignored):
+        return True
+
+    def on_file_open(self, is_system_include, includepath):
+        fp = super().on_file_open(is_system_include, includepath)
+        self.opened_files[includepath] = True
+        return fp
+
+    def include(self, tokens, original_line):
+        # Only the content of the file being parsed is used, so don't bother
+        # passing most of the content of included files on to the output.
+        # The last non-blank line is passed on so that pcpp still emits a
+        # #line directive when it returns to the parsed file, which keeps the
+        # output identical to what cxxheaderparser would produce
+        t_ws = self.t_WS
+        tail: T.List[T.Any] = []
+        line: T.List[T.Any] = []
+        blank = True
+        for tok in super().include(tokens, original_line):
+            line.append(tok)
+            if tok.type not in t_ws:
+                blank = False
+            if tok.value and tok.value[0] == "\n":
+                if blank:
+                    tail.extend(line)
+                else:
+                    tail = line
+                line = []
+                blank = True
+
+        if blank:
+            tail.extend(line)
+        else:
+            tail = line
+
+        yield from tail
+
+    def group_lines(self, input, abssource):
+        # include_depth is only 0 for the file being parsed, which isn't
+        # worth caching since it isn't shared with other headers
+        if self.token_cache is None or self.include_depth == 0:
+            return super().group_lines(input, abssource)
+
+        lines = self.token_cache.get(abssource, input)
+        if lines is None:
+            lines = list(super().group_lines(input, abssource))
+            self.token_cache.put(abssource, input, lines)
+
+        return iter(lines)
+
+
+def make_pcpp_preprocessor(
+    *,
+    defines: T.List[str] = [],
+    include_paths: T.List[str] = [],
+    encoding: T.Optional[str] = None,
+    depfile: T.Optional[pathlib.Path] = None,
+    deptarget: T.Optional[T.List[str]] = None,
+    token_cache_path: T.Optional[pathlib.Path] = None,
+) -> PreprocessorFunction:
+    """
+    Creates a preprocessor function that uses pcpp to preprocess the input
+    text. Missing #include files are ignored.
+
+    :param defines: list of #define macros specified as "key value"
+    :param include_paths: list of directories to search for included files
+    :param encoding: If specified any include files are opened with this encoding
+    :param depfile: If specified, writes a depfile that contains the files that
+                    were included. Must also specify deptarget.
+    :param deptarget: Targets to put in the depfile
+    :param token_cache_path: Directory to cache tokenized include files in
+    """
+
+    token_cache = TokenCache(token_cache_path) if token_cache_path else None
+
+    def _preprocess_file(filename: str, content: T.Optional[str]) -> str:
+        pp = _SemiwrapPreprocessor(encoding, token_cache)
+        for p in include_paths:
+            pp.add_path(p)
+
+        for define in defines:
+            pp.define(define)
+
+        pp.line_directive = "#line"
+
+        if content is None:
+            with open(filename, "r", encoding=encoding) as cfp:
+                content = cfp.read()
+
+        pp.parse(content, filename)
+
+        if pp.errors:
+            raise PreprocessorError("\n".join(pp.errors))
+        elif pp.return_code:
+            raise PreprocessorError("failed with exit code %d" % pp.return_code)
+
+        fp = io.StringIO()
+        pp.write(fp)
+
+        if depfile is not None:
+            assert deptarget and len(deptarget) == 1
+            d = Depfile(pathlib.Path(deptarget[0]))
+            d.add(pathlib.Path(filename))
+            for dep in pp.opened_files:
+                d.add(pathlib.Path(dep))
+            d.write(depfile)
+
+        # pcpp emits the #line directive using the filename you pass in
+        # but will rewrite it if it's on the include path it uses. This
+        # is copied from cxxheaderparser/pcpp:
+        abssource = os.path.abspath(filename)
+        for rewrite in pp.rewrite_paths:
+            temp = re.sub(rewrite[0], rewrite[1], abssource)
+            if temp != abssource:
+                filename = temp
+                if os.sep != "/":
+                    filename = filename.replace(os.sep, "/")
+                break
+
+        return _filter_output(filename, fp.getvalue())
+
+    return _preprocess_file
+
+
+def _filter_output(fname: str, output: str) -> str:
+    # Included content is already gone, but the output may still contain
+    # #line directives for other files
+    line_ending = f'{fname}"'
+
+    new_output = io.StringIO()
+    keep = True
+
+    for line in output.splitlines(keepends=True):
+        if line.startswith("#line"):
+            keep = line.rstrip("\n").endswith(line_ending)
+
+        if keep:
+            new_output.write(line)
+
+    return new_output.getvalue()
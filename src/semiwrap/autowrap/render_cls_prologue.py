@@ -1,3 +1,5 @@
+import typing
+
 from .buffer import RenderBuffer
 from .context import HeaderContext
 
@@ -28,6 +30,9 @@ def render_class_prologue(r: RenderBuffer, hctx: HeaderContext):
     if hctx.need_operators_h:
         r.writeln(f"\n#include <pybind11/operators.h>")
 
+    if hctx.need_vectorize_h:
+        r.writeln(f"\n#include <semiwrap_vectorize.h>")
+
     if hctx.using_declarations:
         r.writeln()
         for decl in hctx.using_declarations:
@@ -39,3 +44,21 @@ def render_class_prologue(r: RenderBuffer, hctx: HeaderContext):
             f"#define SWGEN_ENABLE_{cls.full_cpp_name_identifier}_PROTECTED_CONSTRUCTORS"
         )
         r.writeln(f"#include <trampolines/{cls.full_cpp_name_identifier}.hpp>")
+
+
+def class_prologue_includes(hctx: HeaderContext) -> typing.List[str]:
+    """
+    The headers included by :func:`render_class_prologue` that are the same
+    wherever they are included, in the same order
+    """
+    includes = ["semiwrap.h"]
+    if hctx.has_vcheck:
+        includes.append("functional")
+    includes.extend(hctx.extra_includes_first)
+    includes.append(hctx.rel_fname)
+    includes.extend(hctx.type_caster_includes)
+    if hctx.need_operators_h:
+        includes.append("pybind11/operators.h")
+    if hctx.need_vectorize_h:
+        includes.append("semiwrap_vectorize.h")
+    return includes
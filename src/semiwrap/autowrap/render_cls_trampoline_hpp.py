@@ -1,5 +1,9 @@
+import dataclasses
+import typing
+
 from .buffer import RenderBuffer
 from .context import (
+    BaseClassData,
     HeaderContext,
     ClassContext,
     ClassTemplateData,
@@ -23,12 +27,95 @@ def using_signature(cls: ClassContext, fn: FunctionContext) -> str:
     return f"{cls.full_cpp_name_identifier}_{fn.cpp_name}"
 
 
-def render_cls_trampoline_hpp(ctx: HeaderContext, cls: ClassContext) -> str:
+@dataclasses.dataclass(frozen=True)
+class TrampolineBaseInfo:
+    """
+    What the trampoline of a class adds to the trampolines of the classes
+    that inherit from it
+    """
+
+    #: Signatures of the virtual methods that the trampoline overrides
+    virtual_methods: typing.Tuple[str, ...]
+
+    #: True if the trampoline adds anything other than virtual methods
+    other: bool
+
+    #: Bases of the class
+    bases: typing.Tuple[BaseClassData, ...]
+
+
+#: Maps the full C++ name of a class to its trampoline info
+TrampolineBases = typing.Dict[str, TrampolineBaseInfo]
+
+
+def trampoline_base_info(cls: ClassContext) -> typing.Optional[TrampolineBaseInfo]:
+    trampoline = cls.trampoline
+    if trampoline is None or cls.template is not None:
+        return None
+
+    other = bool(
+        trampoline.methods_to_disable
+        or trampoline.non_virtual_protected_methods
+        or cls.protected_properties
+        or trampoline.inline_code is not None
+    )
+    return TrampolineBaseInfo(
+        virtual_methods=tuple(
+            trampoline_signature(fn) for fn in trampoline.virtual_methods
+        ),
+        other=other,
+        bases=tuple(cls.bases),
+    )
+
+
+def trampoline_bases(
+    cls: ClassContext, known_bases: typing.Optional[TrampolineBases]
+) -> typing.List[BaseClassData]:
+    """
+    Returns the bases whose trampolines are used by the trampoline of cls.
+
+    The trampoline of a base is left out if everything that it adds is a
+    virtual method that cls overrides anyway, and the bases of that base
+    are used instead. Bases that aren't in known_bases are always used.
+    """
+    if not known_bases:
+        return list(cls.bases)
+
+    assert cls.trampoline is not None
+    overridden = {trampoline_signature(fn) for fn in cls.trampoline.virtual_methods}
+
+    result: typing.List[BaseClassData] = []
+
+    def _add(bases: typing.Iterable[BaseClassData]):
+        for base in bases:
+            info = known_bases.get(base.full_cpp_name)
+            if (
+                info is not None
+                and not base.template_params
+                and not info.other
+                and overridden.issuperset(info.virtual_methods)
+            ):
+                _add(info.bases)
+            elif base not in result:
+                result.append(base)
+
+    _add(cls.bases)
+    return result
+
+
+def render_cls_trampoline_hpp(
+    ctx: HeaderContext,
+    cls: ClassContext,
+    known_bases: typing.Optional[TrampolineBases] = None,
+) -> str:
     """
     Pieces that go into an trampoline file for a class
 
     - Trampoline base class (if applicable)
     - Template constructors/method fillers (if applicable)
+
+    If known_bases is specified, the trampolines of bases that don't add
+    anything to this trampoline are not included.
     """
 
     r = RenderBuffer()
@@ -53,7 +140,8 @@ def render_cls_trampoline_hpp(ctx: HeaderContext, cls: ClassContext) -> str:
             r.writeln(f"#include <{inc}>")
 
     if cls.trampoline is not None:
-        _render_cls_trampoline(r, ctx, cls, cls.trampoline)
+        bases = trampoline_bases(cls, known_bases)
+        _render_cls_trampoline(r, ctx, cls, cls.trampoline, bases)
 
     if cls.template is not None:
         _render_cls_template_impl(r, ctx, cls, cls.template)
@@ -67,7 +155,11 @@ def render_cls_trampoline_hpp(ctx: HeaderContext, cls: ClassContext) -> str:
 
 
 def _render_cls_trampoline(
-    r: RenderBuffer, hctx: HeaderContext, cls: ClassContext, trampoline: TrampolineData
+    r: RenderBuffer,
+    hctx: HeaderContext,
+    cls: ClassContext,
+    trampoline: TrampolineData,
+    bases: typing.List[BaseClassData],
 ):
     """
     Generate trampoline classes to be used for two purposes:
@@ -101,10 +193,10 @@ def _render_cls_trampoline(
         for fn in trampoline.methods_to_disable:
             r.writeln(f"#define SWGEN_DISABLE_{ trampoline_signature(fn) }")
 
-    # include override files for each base -- TODO: exclude some bases?
-    if cls.bases:
+    # include override files for each base
+    if bases:
         r.writeln()
-        for base in cls.bases:
+        for base in bases:
             r.writeln(f"#include <trampolines/{ base.full_cpp_name_identifier }.hpp>")
 
     if cls.namespace:
@@ -129,18 +221,18 @@ def _render_cls_trampoline(
         f"\ntemplate <{postcomma(template_parameter_list)}typename CfgBase = swgen::EmptyTrampolineCfg>"
     )
 
-    if cls.bases:
+    if bases:
         r.writeln(f"struct PyTrampolineCfg_{cls.cpp_name} :")
 
         with r.indent():
-            for base in cls.bases:
+            for base in bases:
                 r.writeln(
                     f"{base.namespace_}PyTrampolineCfg_{base.cls_name}<{postcomma(base.template_params)}"
                 )
 
             r.writeln("CfgBase")
 
-            for base in cls.bases:
+            for base in bases:
                 r.writeln(">")
     else:
         r.writeln(f"struct PyTrampolineCfg_{cls.cpp_name} : CfgBase")
@@ -158,7 +250,7 @@ def _render_cls_trampoline(
 
     r.writeln("};")
 
-    if cls.bases:
+    if bases:
         # To avoid multiple inheritance here, we define a single base with bases that
         # are all template bases..
         #
@@ -170,14 +262,14 @@ def _render_cls_trampoline(
         )
         r.writeln(f"using PyTrampolineBase_{cls.cpp_name} =")
 
-        for base in cls.bases:
+        for base in bases:
             r.rel_indent(2)
             r.writeln(f"{base.namespace_}PyTrampoline_{base.cls_name}<")
 
         with r.indent():
             r.writeln("PyTrampolineBase")
 
-            for base in reversed(cls.bases):
+            for base in reversed(bases):
                 if base.template_params:
                     r.writeln(f", {base.template_params}")
                 r.writeln(", PyTrampolineCfg>")
@@ -240,7 +332,7 @@ def _render_cls_trampoline(
                 all_names = ", ".join(p.arg_name for p in fn.all_params)
                 r.writeln(f"PyTrampoline_{cls.cpp_name}({all_decls}) :")
 
-                if cls.bases:
+                if bases:
                     r.writeln(
                         f"  PyTrampolineBase_{cls.cpp_name}<PyTrampolineBase{precomma(trampoline.tmpl_args)}, PyTrampolineCfg>({all_names})"
                     )
@@ -300,6 +392,12 @@ def _render_cls_trampoline_virtual_method(
     r.writeln(f"\n#ifndef SWGEN_DISABLE_{ trampoline_signature(fn) }")
     with r.indent():
 
+        # functions that have a C++ implementation remember whether they are
+        # overridden, so that calls that aren't can skip acquiring the GIL
+        if not (fn.trampoline_cpp_code or fn.ignore_pure or fn.is_pure_virtual):
+            slot = f"_sw_slot_{ trampoline_signature(fn) }"
+            r.writeln(f"mutable semiwrap::OverrideSlot {slot};")
+
         all_decls = ", ".join(p.decl for p in fn.all_params)
         const = " const" if fn.const else ""
         decl = f"{fn.cpp_return_type} {fn.cpp_name}({all_decls}){const}{fn.ref_qualifiers} override {{"
@@ -345,8 +443,8 @@ def _render_cls_trampoline_virtual_method(
                     r.write_trim(
                         f"""
                         using CxxCallBase = typename PyTrampolineCfg::override_base_{trampoline_signature(fn)};
-                        SEMIWRAP_OVERRIDE_CUSTOM_IMPL(PYBIND11_TYPE({fn.cpp_return_type}), LookupBase,
-                          "{fn.py_name}", {fn.cpp_name}, {all_names});
+                        SEMIWRAP_OVERRIDE_CACHED_CUSTOM_IMPL(PYBIND11_TYPE({fn.cpp_return_type}), LookupBase,
+                          "{fn.py_name}", {slot}, {fn.cpp_name}, {all_names});
                         return CxxCallBase::{fn.cpp_name}({all_vnames});
                         """
                     )
@@ -354,8 +452,8 @@ def _render_cls_trampoline_virtual_method(
                     r.write_trim(
                         f"""
                         using CxxCallBase = typename PyTrampolineCfg::override_base_{trampoline_signature(fn)};
-                        PYBIND11_OVERRIDE_IMPL(PYBIND11_TYPE({fn.cpp_return_type}), LookupBase,
-                          "{fn.py_name}", {all_names});
+                        SEMIWRAP_OVERRIDE_CACHED_IMPL(PYBIND11_TYPE({fn.cpp_return_type}), LookupBase,
+                          "{fn.py_name}", {slot}, {all_names});
                         return CxxCallBase::{fn.cpp_name}({all_vnames});
                         """
                     )
@@ -51,9 +51,11 @@ def _genmethod(
     fn: FunctionContext,
     trampoline_qualname: T.Optional[str],
     tmpl: str,
+    vectorized: bool = False,
 ):
     qualname = cls_qualname
     arg_params = fn.filtered_params
+    genlambda = fn.vectorized if vectorized else fn.genlambda
 
     if fn.ifdef:
         r.writeln(f"\n#ifdef {fn.ifdef}")
@@ -69,8 +71,7 @@ def _genmethod(
     elif fn.is_constructor:
         if fn.cpp_code:
             r.writeln(f"{varname}.def(py::init({fn.cpp_code})")
-        elif fn.genlambda:
-            genlambda = fn.genlambda
+        elif genlambda:
             arg_params = genlambda.in_params
             lam_params = [param.decl for param in arg_params]
             # TODO: trampoline
@@ -103,8 +104,7 @@ def _genmethod(
             cpp_code = inspect.cleandoc(fn.cpp_code)
             r.writeln(f"{fn_def}, {cpp_code}")
 
-        elif fn.genlambda:
-            genlambda = fn.genlambda
+        elif genlambda:
             arg_params = genlambda.in_params
 
             lam_params = [param.decl for param in genlambda.in_params]
@@ -150,14 +150,16 @@ def _genmethod(
 
     other_params = []
 
-    if fn.release_gil:
-        other_params.append("release_gil()")
+    # the vectorized overload releases the GIL itself and returns new arrays
+    if not vectorized:
+        if fn.release_gil:
+            other_params.append("release_gil()")
 
-    for nurse, patient in fn.keepalives:
-        other_params.append(f"py::keep_alive<{nurse}, {patient}>()")
+        for nurse, patient in fn.keepalives:
+            other_params.append(f"py::keep_alive<{nurse}, {patient}>()")
 
-    if fn.return_value_policy:
-        other_params.append(fn.return_value_policy)
+        if fn.return_value_policy:
+            other_params.append(fn.return_value_policy)
 
     if other_params:
         r.writeln(f"  , {', '.join(other_params)}")
@@ -190,7 +192,10 @@ def _gen_method_lambda(
         if genlambda.pre:
             r.writeln(genlambda.pre)
 
-        call_params = ", ".join(p.call_name for p in fn.all_params)
+        if genlambda.call_names is not None:
+            call_params = ", ".join(genlambda.call_names)
+        else:
+            call_params = ", ".join(p.call_name for p in fn.all_params)
 
         r.writeln(f"{genlambda.call_start}{call_qual}{tmpl}({call_params});")
 
@@ -209,6 +214,8 @@ def genmethod(
 ):
     if not fn.template_impls:
         _genmethod(r, varname, cls_qualname, fn, trampoline_qualname, "")
+        if fn.vectorized:
+            _genmethod(r, varname, cls_qualname, fn, trampoline_qualname, "", True)
     else:
         for tmpl in fn.template_impls:
             r.writeln("{")
@@ -224,6 +231,16 @@ def genmethod(
                     trampoline_qualname,
                     f"<{', '.join(tmpl.params)}>",
                 )
+                if fn.vectorized:
+                    _genmethod(
+                        r,
+                        varname,
+                        cls_qualname,
+                        fn,
+                        trampoline_qualname,
+                        f"<{', '.join(tmpl.params)}>",
+                        True,
+                    )
             r.writeln("}")
 
 
@@ -232,15 +249,10 @@ def _genprop(r: RenderBuffer, varname: str, qualname: str, prop: PropContext):
     if prop.doc:
         doc = mkdoc(", py::doc(", prop.doc, ")")
 
-    if prop.array_size:
+    if prop.view:
         r.writeln(
             f'{varname}.def_property_readonly("{prop.py_name}", []({qualname}& self) {{\n'
-            f"   return py::memoryview::from_buffer(\n"
-            f"      &self.{prop.cpp_name}, sizeof({prop.cpp_type}),\n"
-            f"      py::format_descriptor<{prop.cpp_type}>::value,\n"
-            f"      {{{prop.array_size}}}, {{sizeof({prop.cpp_type})}},\n"
-            f'      { "true" if prop.readonly else "false" }\n'
-            "   );\n"
+            f"   return {prop.view};\n"
             f"}}{doc});"
         )
     elif prop.array:
@@ -274,6 +286,26 @@ def _genprop(r: RenderBuffer, varname: str, qualname: str, prop: PropContext):
         )
 
 
+def _genpickle(r: RenderBuffer, varname: str, cls: ClassContext, fields: T.List[str]):
+    qualname = cls.full_cpp_name
+    members = "".join(f", &{qualname}::{name}" for name in fields)
+    to_tuple = f"semiwrap::fields_to_tuple(self{members})"
+    from_tuple = f"semiwrap::fields_from_tuple<{qualname}>(state{members})"
+
+    r.writeln(f"{varname}.def(py::pickle(")
+    with r.indent(2):
+        r.writeln(f"[](const {qualname} &self) {{ return {to_tuple}; }},")
+        r.writeln(f"[](py::tuple state) {{ return {from_tuple}; }}));")
+
+    if cls.pickle_tuple_methods:
+        r.writeln(
+            f'{varname}.def("to_tuple", [](const {qualname} &self) {{ return {to_tuple}; }});'
+        )
+        r.writeln(
+            f'{varname}.def_static("from_tuple", [](py::tuple state) {{ return {from_tuple}; }}, py::arg("state"));'
+        )
+
+
 def enum_decl(r: RenderBuffer, enum: EnumContext, varname: str):
     r.writeln(f"py::enum_<{ enum.full_cpp_name }> {varname};")
 
@@ -399,10 +431,28 @@ def cls_def_enum(r: RenderBuffer, cctx: ClassContext, varname: str):
 
 
 def cls_def(r: RenderBuffer, cls: ClassContext, varname: str):
+    for part in cls_def_parts(cls, varname):
+        r.writeln(part)
+
+
+def cls_def_parts(cls: ClassContext, varname: str) -> T.List[str]:
+    """
+    Renders the definitions for a class (and its child classes) as a list
+    of independent statements, in order. Each one can be placed in a
+    different function, as long as they are all called in the same order.
+    """
+    buffers: T.List[RenderBuffer] = []
+
+    def _part() -> RenderBuffer:
+        r = RenderBuffer()
+        buffers.append(r)
+        return r
+
     if cls.vcheck_fns:
         for fn in cls.vcheck_fns:
             assert fn.cpp_code is not None
 
+            r = _part()
             r.writeln("{")
             with r.indent():
                 r.writeln(f"auto vcheck = {fn.cpp_code.strip()};")
@@ -420,32 +470,47 @@ def cls_def(r: RenderBuffer, cls: ClassContext, varname: str):
             r.writeln("}")
 
     if cls.doc:
-        r.writeln(f'{varname}.doc() = {mkdoc("", cls.doc, "")};')
+        _part().writeln(f'{varname}.doc() = {mkdoc("", cls.doc, "")};')
 
     if cls.add_default_constructor:
-        r.writeln(f"{varname}.def(py::init<>(), release_gil());")
+        _part().writeln(f"{varname}.def(py::init<>(), release_gil());")
 
     for fn in cls.wrapped_public_methods:
-        genmethod(r, varname, cls.full_cpp_name, fn, None)
+        genmethod(_part(), varname, cls.full_cpp_name, fn, None)
 
     if cls.trampoline is not None:
         for fn in cls.wrapped_protected_methods:
-            genmethod(r, varname, cls.full_cpp_name, fn, cls.trampoline.var)
+            genmethod(_part(), varname, cls.full_cpp_name, fn, cls.trampoline.var)
 
     for prop in cls.public_properties:
-        _genprop(r, varname, cls.full_cpp_name, prop)
+        _genprop(_part(), varname, cls.full_cpp_name, prop)
 
     if cls.trampoline is not None:
         for prop in cls.protected_properties:
-            _genprop(r, varname, cls.trampoline.full_cpp_name, prop)
+            _genprop(_part(), varname, cls.trampoline.full_cpp_name, prop)
+
+    if cls.pickle_fields is not None:
+        _genpickle(_part(), varname, cls, cls.pickle_fields)
+
+    if cls.copy_methods:
+        qualname = cls.full_cpp_name
+        r = _part()
+        r.writeln(
+            f'{varname}.def("__copy__", [](const {qualname} &self) {{ return {qualname}(self); }});'
+        )
+        r.writeln(
+            f'{varname}.def("__deepcopy__", [](const {qualname} &self, py::dict) {{ return {qualname}(self); }}, py::arg("memo"));'
+        )
 
     if cls.inline_code:
+        r = _part()
         r.writeln(varname)
         with r.indent():
             r.write_trim(cls.inline_code)
         r.writeln(";")
 
     if cls.unnamed_enums:
+        r = _part()
         r.writeln()
         for enum in cls.unnamed_enums:
             for val in enum.values:
@@ -453,6 +518,10 @@ def cls_def(r: RenderBuffer, cls: ClassContext, varname: str):
                     f'{varname}.attr("{val.py_name}") = (int){val.full_cpp_name};'
                 )
 
+    parts = [b.getvalue() for b in buffers]
+
     for ccls in cls.child_classes:
         if not ccls.template:
-            cls_def(r, ccls, ccls.var_name)
+            parts.extend(cls_def_parts(ccls, ccls.var_name))
+
+    return [part for part in parts if part]
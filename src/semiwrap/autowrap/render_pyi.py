@@ -0,0 +1,999 @@
+"""
+Renders .pyi type stubs for an extension module from the data that was
+parsed from its headers, without importing the compiled module.
+
+The python names, parameters, docstrings, enums, and subpackages are known
+from the header data. Types are translated from their C++ names: builtin
+types and STL containers are mapped to their python equivalents, classes and
+enums that are wrapped by the same extension module are referenced by their
+python name, and everything else (including types that have a custom type
+caster, since the caster data doesn't record what python type the caster
+produces) becomes ``typing.Any``.
+"""
+
+import re
+import typing as T
+
+from ..casters import CastersData
+from .buffer import RenderBuffer
+from .context import (
+    ClassContext,
+    Documentation,
+    EnumContext,
+    FunctionContext,
+    HeaderContext,
+    ParamContext,
+    PropContext,
+    TemplateInstanceContext,
+)
+
+#: python keywords that can't be used as identifiers are already renamed
+#: by the parser, so only the name needs to be extracted
+_py_arg_re = re.compile(r'^py::arg\("([^"]*)"\)(.*)$', re.DOTALL)
+_py_arg_default_re = re.compile(r"^(?:\.\w+\([^)]*\))*\s*=")
+
+_ident_re = re.compile(r"[A-Za-z_]\w*")
+_ws_re = re.compile(r"\s+")
+_ptr_ws_re = re.compile(r"\s*([*&])\s*")
+
+_doc_escape_re = re.compile(r"\\(.)")
+_doc_escapes = {"n": "\n", "t": "\t"}
+
+_binary_operators = {
+    "-": "__sub__",
+    "+": "__add__",
+    "*": "__mul__",
+    "/": "__truediv__",
+    "%": "__mod__",
+    "&": "__and__",
+    "^": "__xor__",
+    "|": "__or__",
+    "==": "__eq__",
+    "!=": "__ne__",
+    ">": "__gt__",
+    ">=": "__ge__",
+    "<": "__lt__",
+    "<=": "__le__",
+    "+=": "__iadd__",
+    "-=": "__isub__",
+    "*=": "__imul__",
+    "/=": "__itruediv__",
+    "%=": "__imod__",
+    "&=": "__iand__",
+    "^=": "__ixor__",
+    "|=": "__ior__",
+}
+
+_unary_operators = {
+    "-": "__neg__",
+    "+": "__pos__",
+}
+
+# fmt: off
+_int_types = {
+    "short", "short int", "signed short", "signed short int",
+    "unsigned short", "unsigned short int",
+    "int", "signed", "signed int", "unsigned", "unsigned int",
+    "long", "long int", "signed long", "signed long int",
+    "unsigned long", "unsigned long int",
+    "long long", "long long int", "signed long long", "signed long long int",
+    "unsigned long long", "unsigned long long int",
+    "signed char", "unsigned char",
+    "int8_t", "int16_t", "int32_t", "int64_t",
+    "uint8_t", "uint16_t", "uint32_t", "uint64_t",
+    "size_t", "ssize_t", "ptrdiff_t", "intptr_t", "uintptr_t",
+    "py::ssize_t", "py::size_t",
+}
+
+_char_types = {"char", "wchar_t", "char8_t", "char16_t", "char32_t"}
+
+_simple_types = {
+    "void": "None",
+    "bool": "bool",
+    "float": "float",
+    "double": "float",
+    "long double": "float",
+    "std::string": "str",
+    "std::string_view": "str",
+    "std::wstring": "str",
+    "std::wstring_view": "str",
+    "std::u16string": "str",
+    "std::u32string": "str",
+    "std::nullopt_t": "None",
+    "std::nullptr_t": "None",
+    "py::object": "typing.Any",
+    "py::handle": "typing.Any",
+    "py::none": "None",
+    "py::str": "str",
+    "py::bytes": "bytes",
+    "py::bytearray": "bytearray",
+    "py::bool_": "bool",
+    "py::int_": "int",
+    "py::float_": "float",
+    "py::list": "list",
+    "py::dict": "dict",
+    "py::set": "set",
+    "py::tuple": "tuple",
+    "py::slice": "slice",
+    "py::type": "type",
+    "py::capsule": "typing.Any",
+    "py::memoryview": "memoryview",
+    "py::function": "collections.abc.Callable",
+    "py::iterable": "collections.abc.Iterable",
+    "py::iterator": "collections.abc.Iterator",
+    "py::sequence": "collections.abc.Sequence",
+    "py::buffer": "typing_extensions.Buffer",
+}
+
+#: sequence containers: (return type, parameter type)
+_sequence_types = {
+    "std::vector": ("list", "collections.abc.Sequence"),
+    "std::deque": ("list", "collections.abc.Sequence"),
+    "std::list": ("list", "collections.abc.Sequence"),
+    "std::array": ("list", "collections.abc.Sequence"),
+    "std::valarray": ("list", "collections.abc.Sequence"),
+    "std::set": ("set", "collections.abc.Set"),
+    "std::unordered_set": ("set", "collections.abc.Set"),
+}
+
+_mapping_types = {
+    "std::map": ("dict", "collections.abc.Mapping"),
+    "std::unordered_map": ("dict", "collections.abc.Mapping"),
+}
+
+#: wrappers that python sees as the type that they hold
+_holder_types = {
+    "std::shared_ptr",
+    "std::unique_ptr",
+    "std::reference_wrapper",
+    "py::detail::unchecked_reference",
+}
+# fmt: on
+
+_enum_methods = (
+    "def __eq__(self, other: typing.Any) -> bool: ...",
+    "def __getstate__(self) -> int: ...",
+    "def __hash__(self) -> int: ...",
+    "def __index__(self) -> int: ...",
+    "def __init__(self, value: int) -> None: ...",
+    "def __int__(self) -> int: ...",
+    "def __ne__(self, other: typing.Any) -> bool: ...",
+    "def __setstate__(self, state: int) -> None: ...",
+    "@property",
+    "def name(self) -> str: ...",
+    "@property",
+    "def value(self) -> int: ...",
+)
+
+_arithmetic_enum_methods = (
+    "def __and__(self, other: typing.Any) -> typing.Any: ...",
+    "def __ge__(self, other: typing.Any) -> bool: ...",
+    "def __gt__(self, other: typing.Any) -> bool: ...",
+    "def __invert__(self) -> typing.Any: ...",
+    "def __le__(self, other: typing.Any) -> bool: ...",
+    "def __lt__(self, other: typing.Any) -> bool: ...",
+    "def __or__(self, other: typing.Any) -> typing.Any: ...",
+    "def __rand__(self, other: typing.Any) -> typing.Any: ...",
+    "def __ror__(self, other: typing.Any) -> typing.Any: ...",
+    "def __rxor__(self, other: typing.Any) -> typing.Any: ...",
+    "def __xor__(self, other: typing.Any) -> typing.Any: ...",
+)
+
+
+def _decode_doc(*docs: Documentation) -> T.Optional[str]:
+    """Converts the C++ string literals stored in the header data back to text"""
+    parts = []
+    for doc in docs:
+        if doc:
+            for quoted in doc:
+                quoted = quoted.strip()
+                if len(quoted) >= 2 and quoted[0] == '"' and quoted[-1] == '"':
+                    quoted = quoted[1:-1]
+                parts.append(
+                    _doc_escape_re.sub(
+                        lambda m: _doc_escapes.get(m.group(1), m.group(1)), quoted
+                    )
+                )
+    text = "".join(parts).strip()
+    return text or None
+
+
+def _write_doc(r: RenderBuffer, doc: T.Optional[str]):
+    if doc:
+        doc = doc.replace("\\", "\\\\").replace('"""', '\\"""')
+        r.writeln('"""')
+        r.writeln(doc)
+        r.writeln('"""')
+
+
+def _split_args(s: str) -> T.List[str]:
+    """Splits on commas that aren't nested inside of brackets"""
+    args = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(s):
+        if c in "<([{":
+            depth += 1
+        elif c in ">)]}":
+            depth -= 1
+        elif c == "," and depth == 0:
+            args.append(s[start:i].strip())
+            start = i + 1
+    last = s[start:].strip()
+    if last or args:
+        args.append(last)
+    return args
+
+
+def _strip_qualifiers(t: str) -> T.Tuple[str, bool]:
+    """
+    Removes cv qualifiers, references, and pointers from a type. Returns the
+    type and whether it was a pointer.
+    """
+    t = _ptr_ws_re.sub(r"\1", _ws_re.sub(" ", t.strip()))
+    is_ptr = False
+    while True:
+        orig = t
+        for prefix in ("const ", "volatile ", "typename ", "struct ", "class "):
+            if t.startswith(prefix):
+                t = t[len(prefix) :].lstrip()
+        for suffix in (" const", " volatile", "const", "volatile"):
+            if t.endswith(suffix) and (
+                suffix[0] == " " or len(t) == len(suffix) or t[-len(suffix) - 1] in "*&"
+            ):
+                t = t[: -len(suffix)].rstrip()
+        if t.endswith("&"):
+            t = t.rstrip("&").rstrip()
+        elif t.endswith("*"):
+            t = t[:-1].rstrip()
+            is_ptr = True
+        if t == orig:
+            return t, is_ptr
+
+
+def _split_template(t: str) -> T.Optional[T.Tuple[str, T.List[str]]]:
+    """Splits ``name<args>`` into name and arguments"""
+    idx = t.find("<")
+    if idx == -1:
+        return t, []
+    if not t.endswith(">"):
+        # something like Foo<T>::type
+        return None
+    return t[:idx].strip(), _split_args(t[idx + 1 : -1])
+
+
+def _normalize_name(name: str) -> str:
+    if name.startswith("::"):
+        name = name[2:]
+    if name.startswith("pybind11::"):
+        name = f"py::{name[10:]}"
+    return name
+
+
+def _normalize_args(args: T.Iterable[str]) -> str:
+    return ",".join(_ws_re.sub("", str(a)) for a in args)
+
+
+def _substitute(cpp_type: str, subs: T.Dict[str, str]) -> str:
+    if not subs:
+        return cpp_type
+    return _ident_re.sub(lambda m: subs.get(m.group(0), m.group(0)), cpp_type)
+
+
+def _suffixes(name: str) -> T.List[str]:
+    parts = name.split("::")
+    return ["::".join(parts[i:]) for i in range(len(parts))]
+
+
+class _PyRef(T.NamedTuple):
+    #: subpackage that contains this, or None for the module itself
+    subpackage: T.Optional[str]
+    #: python name relative to the module that contains it
+    path: str
+
+
+class _Scope:
+    """Things to render into the module or a subpackage"""
+
+    def __init__(self) -> None:
+        self.enums: T.List[EnumContext] = []
+        self.classes: T.List[ClassContext] = []
+        self.instances: T.List[TemplateInstanceContext] = []
+        self.functions: T.List[FunctionContext] = []
+
+        #: set if there is custom code that could define anything
+        self.dynamic = False
+
+
+class PyiRenderer:
+    """
+    Renders the stubs for the module and each subpackage of a single
+    extension module
+
+    :param package_name: full python name of the extension module
+    :param headers: every header that is wrapped by the extension module
+    :param casters: type casters available to the extension module
+    """
+
+    def __init__(
+        self,
+        package_name: str,
+        headers: T.List[HeaderContext],
+        casters: CastersData,
+    ) -> None:
+        self.package_name = package_name
+        self.casters = casters
+
+        self.subpackages: T.List[str] = []
+        self._scopes: T.Dict[T.Optional[str], _Scope] = {None: _Scope()}
+
+        #: C++ name (and each shorter suffix of it): python names it refers to
+        self._types: T.Dict[str, T.List[_PyRef]] = {}
+
+        #: template class identifier: template class
+        self._templates: T.Dict[str, ClassContext] = {}
+
+        #: ids of classes that custom code may add attributes to
+        self._dynamic_classes: T.Set[int] = set()
+
+        #: id of class: template instances contained in that class
+        self._cls_instances: T.Dict[int, T.List[TemplateInstanceContext]] = {}
+
+        # set while rendering
+        self._current: T.Optional[str] = None
+        self._imports: T.Set[str] = set()
+        self._cpp_scopes: T.List[str] = []
+
+        for hctx in headers:
+            for name in hctx.subpackages:
+                if name not in self._scopes:
+                    self.subpackages.append(name)
+                    self._scopes[name] = _Scope()
+
+        # template instances can only be named once all classes are known
+        instance_refs: T.List[T.Tuple[TemplateInstanceContext, _PyRef]] = []
+        for hctx in headers:
+            self._collect(hctx, instance_refs)
+
+        for tmpl, ref in instance_refs:
+            tcls = self._templates.get(tmpl.full_cpp_name_identifier)
+            if tcls is not None:
+                self._add_type(tcls.dep_cpp_name, ref, _normalize_args(tmpl.params))
+
+    #
+    # Collect everything that's in the headers
+    #
+
+    def _add_type(self, cpp_name: str, ref: _PyRef, args: str = ""):
+        for suffix in _suffixes(_normalize_name(cpp_name)):
+            if args:
+                suffix = f"{suffix}<{args}>"
+            candidates = self._types.setdefault(suffix, [])
+            if ref not in candidates:
+                candidates.append(ref)
+
+    def _add_class(
+        self,
+        cls: ClassContext,
+        ref: _PyRef,
+        cls_vars: T.Dict[str, T.Tuple[ClassContext, _PyRef]],
+    ):
+        cls_vars[cls.var_name] = (cls, ref)
+        self._add_type(cls.full_cpp_name, ref)
+        for enum in cls.enums:
+            self._add_type(
+                enum.full_cpp_name, ref._replace(path=f"{ref.path}.{enum.py_name}")
+            )
+        for child in cls.child_classes:
+            if child.template is None:
+                child_ref = ref._replace(path=f"{ref.path}.{child.py_name}")
+                self._add_class(child, child_ref, cls_vars)
+
+    def _collect(
+        self,
+        hctx: HeaderContext,
+        instance_refs: T.List[T.Tuple[TemplateInstanceContext, _PyRef]],
+    ):
+        var_to_subpackage: T.Dict[str, T.Optional[str]] = {"m": None}
+        for name, var in hctx.subpackages.items():
+            var_to_subpackage[var] = name
+
+        # variable names are only unique within a single header
+        cls_vars: T.Dict[str, T.Tuple[ClassContext, _PyRef]] = {}
+
+        for enum in hctx.enums:
+            if not enum.py_name:
+                continue
+            subpackage = var_to_subpackage.get(enum.scope_var)
+            self._scopes[subpackage].enums.append(enum)
+            self._add_type(enum.full_cpp_name, _PyRef(subpackage, enum.py_name))
+
+        for cls in hctx.classes:
+            if cls.template is not None:
+                self._templates[cls.full_cpp_name_identifier] = cls
+                continue
+
+            subpackage = var_to_subpackage.get(cls.scope_var)
+            self._scopes[subpackage].classes.append(cls)
+            self._add_class(cls, _PyRef(subpackage, cls.py_name), cls_vars)
+
+        for tmpl in hctx.template_instances:
+            parent = cls_vars.get(tmpl.scope_var)
+            if parent is not None:
+                pcls, pref = parent
+                self._cls_instances.setdefault(id(pcls), []).append(tmpl)
+                ref = pref._replace(path=f"{pref.path}.{tmpl.py_name}")
+            else:
+                subpackage = var_to_subpackage.get(tmpl.scope_var)
+                self._scopes[subpackage].instances.append(tmpl)
+                ref = _PyRef(subpackage, tmpl.py_name)
+            instance_refs.append((tmpl, ref))
+
+        for fn in hctx.functions:
+            if not fn.ignore_py:
+                subpackage = var_to_subpackage.get(fn.scope_var)
+                self._scopes[subpackage].functions.append(fn)
+
+        # custom code can add anything to the variables that it references
+        if hctx.inline_code:
+            used = set(_ident_re.findall(hctx.inline_code))
+            for var, subpackage in var_to_subpackage.items():
+                if var in used:
+                    self._scopes[subpackage].dynamic = True
+            for var, (cls, _) in cls_vars.items():
+                if var in used:
+                    self._dynamic_classes.add(id(cls))
+
+    #
+    # Type translation
+    #
+
+    def _ref_expr(self, ref: _PyRef) -> str:
+        if ref.subpackage == self._current:
+            return ref.path
+        if self._current is None:
+            # subpackages are always imported by the module stub
+            return f"{ref.subpackage}.{ref.path}"
+
+        module = self.package_name
+        if ref.subpackage is not None:
+            module = f"{module}.{ref.subpackage}"
+        self._imports.add(f"import {module}")
+        return f"{module}.{ref.path}"
+
+    def _lookup(self, name: str, args: T.List[str]) -> T.Optional[str]:
+        key = name
+        if args:
+            key = f"{name}<{_normalize_args(args)}>"
+
+        # names are relative to the class that they're used in
+        for scope in reversed(self._cpp_scopes):
+            candidates = self._types.get(f"{scope}::{key}")
+            if candidates and len(candidates) == 1:
+                return self._ref_expr(candidates[0])
+
+        candidates = self._types.get(key)
+        if candidates and len(candidates) == 1:
+            return self._ref_expr(candidates[0])
+        return None
+
+    def _any(self) -> str:
+        self._imports.add("import typing")
+        return "typing.Any"
+
+    def _builtin(self, expr: str) -> str:
+        if "." in expr:
+            module = expr.rsplit(".", 1)[0]
+            self._imports.add(f"import {module}")
+        return expr
+
+    def py_type(
+        self, cpp_type: T.Optional[str], subs: T.Dict[str, str], param: bool = False
+    ) -> str:
+        """
+        Translates a C++ type into a python type annotation
+
+        :param param: the type is a parameter, so containers accept any
+                      sequence or mapping
+        """
+        if not cpp_type:
+            return "None"
+
+        cpp_type = _substitute(cpp_type, subs)
+        t, is_ptr = _strip_qualifiers(cpp_type)
+        if not t:
+            return self._any()
+
+        if t in _char_types:
+            return "str"
+
+        if t in _int_types or (t.startswith("std::") and t[5:] in _int_types):
+            return "int"
+
+        split = _split_template(t)
+        if split is None:
+            return self._any()
+
+        name, args = split
+        name = _normalize_name(name)
+
+        simple = _simple_types.get(name)
+        if simple is not None and not args:
+            return self._builtin(simple)
+
+        if name in _holder_types and args:
+            return self.py_type(args[0], {}, param)
+
+        if name in _sequence_types and args:
+            ret, ptype = _sequence_types[name]
+            inner = self.py_type(args[0], {}, param)
+            container = self._builtin(ptype) if param else ret
+            return f"{container}[{inner}]"
+
+        if name in _mapping_types and len(args) >= 2:
+            ret, ptype = _mapping_types[name]
+            k = self.py_type(args[0], {}, param)
+            v = self.py_type(args[1], {}, param)
+            container = self._builtin(ptype) if param else ret
+            return f"{container}[{k}, {v}]"
+
+        if name == "std::optional" and args:
+            inner = self.py_type(args[0], {}, param)
+            if inner == "None" or inner == "typing.Any":
+                return inner
+            return f"{inner} | None"
+
+        if name == "std::variant" and args:
+            options = list(dict.fromkeys(self.py_type(a, {}, param) for a in args))
+            if "typing.Any" in options:
+                return "typing.Any"
+            return " | ".join(options)
+
+        if name in ("std::pair", "std::tuple"):
+            if not args:
+                return "tuple[()]"
+            return f"tuple[{', '.join(self.py_type(a, {}, param) for a in args)}]"
+
+        if name == "std::function" and len(args) == 1:
+            return self._callable(args[0])
+
+        if name == "std::complex":
+            return "complex"
+
+        if name == "semiwrap::VectorArg" and args:
+            inner = self.py_type(args[0], {}, param)
+            buffer = self._builtin("typing_extensions.Buffer")
+            sequence = self._builtin("collections.abc.Sequence")
+            return f"{inner} | {buffer} | {sequence}[{inner}]"
+
+        # C++ types that have a custom type caster can become any python type
+        if name in self.casters:
+            return self._any()
+
+        found = self._lookup(name, args)
+        if found is not None:
+            return found
+
+        return self._any()
+
+    def _callable(self, sig: str) -> str:
+        self._imports.add("import collections.abc")
+        idx = sig.find("(")
+        if idx == -1 or not sig.endswith(")"):
+            return "collections.abc.Callable"
+
+        ret = self.py_type(sig[:idx], {})
+        params = [
+            self.py_type(a, {})
+            for a in _split_args(sig[idx + 1 : -1])
+            if a and a != "void"
+        ]
+        return f"collections.abc.Callable[[{', '.join(params)}], {ret}]"
+
+    #
+    # Rendering
+    #
+
+    def render_module(self) -> str:
+        """Renders the stub for the extension module"""
+        return self._render(None)
+
+    def render_subpackage(self, subpackage: str) -> str:
+        """Renders the stub for a subpackage of the extension module"""
+        if subpackage not in self._scopes:
+            raise ValueError(f"{self.package_name} has no subpackage {subpackage}")
+        return self._render(subpackage)
+
+    def _render(self, subpackage: T.Optional[str]) -> str:
+        self._current = subpackage
+        self._imports = set()
+
+        scope = self._scopes[subpackage]
+
+        body = RenderBuffer()
+        names: T.List[str] = []
+
+        for enum in scope.enums:
+            self._render_enum(body, enum)
+            names.append(enum.py_name)
+
+        for cls in scope.classes:
+            self._render_class(body, cls, cls.py_name, {})
+            names.append(cls.py_name)
+
+        for tmpl in scope.instances:
+            self._render_instance(body, tmpl, tmpl.py_name)
+            names.append(tmpl.py_name)
+
+        for fns in self._group_functions(scope.functions):
+            for fn, subs in fns:
+                self._render_function(body, fn, subs, None, _is_overloaded(fns))
+            names.append(fns[0][0].py_name)
+
+        if scope.dynamic:
+            self._imports.add("import typing")
+            body.writeln("def __getattr__(name: str) -> typing.Any: ...")
+
+        r = RenderBuffer()
+        r.writeln("from __future__ import annotations")
+        for imp in sorted(self._imports):
+            r.writeln(imp)
+
+        if subpackage is None and self.subpackages:
+            for name in self.subpackages:
+                r.writeln(f"from . import {name}")
+            names.extend(self.subpackages)
+
+        all_names = ", ".join(repr(n) for n in sorted(set(names)))
+        r.writeln(f"__all__: list[str] = [{all_names}]")
+
+        return r.getvalue() + body.getvalue()
+
+    def _group_functions(
+        self, fns: T.List[FunctionContext]
+    ) -> T.List[T.List[T.Tuple[FunctionContext, T.Dict[str, str]]]]:
+        """
+        Groups functions that have the same python name together so that
+        overloads are adjacent. Each function template instantiation is a
+        separate overload.
+        """
+        groups: T.Dict[str, T.List[T.Tuple[FunctionContext, T.Dict[str, str]]]] = {}
+        for fn in fns:
+            group = groups.setdefault(self._fn_py_name(fn), [])
+            if fn.template_impls:
+                for impl in fn.template_impls:
+                    group.append((fn, impl.types))
+            else:
+                group.append((fn, {}))
+        return list(groups.values())
+
+    def _fn_py_name(self, fn: FunctionContext) -> str:
+        if fn.operator:
+            if (
+                fn.cpp_code
+                and fn.cpp_code.strip().endswith("py::self")
+                and not (fn.cpp_code.strip().startswith("py::self"))
+            ):
+                return _unary_operators.get(fn.operator, fn.py_name)
+            return _binary_operators.get(fn.operator, fn.py_name)
+        return fn.py_name
+
+    def _render_enum(self, r: RenderBuffer, enum: EnumContext):
+        self._imports.add("import typing")
+        r.writeln(f"class {enum.py_name}:")
+        with r.indent(4):
+            _write_doc(r, _decode_doc(enum.doc))
+            for value in enum.values:
+                r.writeln(f"{value.py_name}: typing.ClassVar[{enum.py_name}]")
+            r.writeln(f"__members__: typing.ClassVar[dict[str, {enum.py_name}]]")
+            for line in _enum_methods:
+                r.writeln(line)
+            if enum.arithmetic:
+                for line in _arithmetic_enum_methods:
+                    r.writeln(line)
+
+    def _render_instance(
+        self, r: RenderBuffer, tmpl: TemplateInstanceContext, path: str
+    ):
+        tcls = self._templates.get(tmpl.full_cpp_name_identifier)
+        if tcls is None:
+            # defined in some other extension module
+            self._imports.add("import typing")
+            r.writeln(f"class {tmpl.py_name}:")
+            with r.indent(4):
+                _write_doc(r, _decode_doc(tmpl.doc_set or tmpl.doc_add))
+                r.writeln("def __getattr__(self, name: str) -> typing.Any: ...")
+            return
+
+        assert tcls.template is not None
+        names = [a.strip() for a in tcls.template.argument_list.split(",")]
+        subs = {n: str(p) for n, p in zip(names, tmpl.params)}
+        doc = tmpl.doc_set if tmpl.doc_set else tcls.doc
+        self._render_class(r, tcls, path, subs, doc, tmpl.doc_add)
+
+    def _render_class(
+        self,
+        r: RenderBuffer,
+        cls: ClassContext,
+        path: str,
+        subs: T.Dict[str, str],
+        doc: Documentation = None,
+        doc_add: Documentation = None,
+    ):
+        """
+        :param path: python name of the class relative to the stub
+        """
+        py_name = path.rsplit(".", 1)[-1]
+
+        bases = []
+        for base in cls.bases:
+            if base.template_params:
+                base_type = f"{base.dep_cpp_name}<{base.template_params}>"
+            else:
+                base_type = base.full_cpp_name
+            split = _split_template(_substitute(base_type, subs))
+            if split is not None:
+                found = self._lookup(_normalize_name(split[0]), split[1])
+                if found is not None:
+                    bases.append(found)
+
+        if bases:
+            r.writeln(f"class {py_name}({', '.join(bases)}):")
+        else:
+            r.writeln(f"class {py_name}:")
+
+        if doc is None:
+            doc = cls.doc
+        doc_text = _decode_doc(doc, doc_add)
+
+        children = [c for c in cls.child_classes if c.template is None]
+        instances = self._cls_instances.get(id(cls), [])
+
+        props = list(cls.public_properties)
+        methods = list(cls.wrapped_public_methods)
+        if cls.trampoline is not None:
+            props.extend(cls.protected_properties)
+            methods.extend(cls.wrapped_protected_methods)
+        props = [p for p in props if p.array_size or not p.array]
+
+        groups = self._group_functions([fn for fn in methods if not fn.ignore_py])
+        has_constructor = any(fns[0][0].is_constructor for fns in groups)
+        dynamic = bool(cls.inline_code) or id(cls) in self._dynamic_classes
+
+        if not (
+            doc_text
+            or cls.enums
+            or children
+            or instances
+            or cls.unnamed_enums
+            or props
+            or groups
+            or cls.add_default_constructor
+            or cls.pickle_fields is not None
+            or cls.copy_methods
+            or dynamic
+        ):
+            with r.indent(4):
+                r.writeln("pass")
+            return
+
+        self._cpp_scopes.append(_normalize_name(cls.dep_cpp_name))
+        with r.indent(4):
+            _write_doc(r, doc_text)
+
+            for enum in cls.enums:
+                self._render_enum(r, enum)
+
+            for child in children:
+                self._render_class(r, child, f"{path}.{child.py_name}", subs)
+
+            for tmpl in instances:
+                self._render_instance(r, tmpl, f"{path}.{tmpl.py_name}")
+
+            for enum in cls.unnamed_enums:
+                for value in enum.values:
+                    self._imports.add("import typing")
+                    r.writeln(f"{value.py_name}: typing.ClassVar[int]")
+
+            for prop in props:
+                self._render_prop(r, prop, subs)
+
+            if cls.add_default_constructor:
+                if has_constructor:
+                    self._imports.add("import typing")
+                    r.writeln("@typing.overload")
+                r.writeln("def __init__(self) -> None: ...")
+
+            for fns in groups:
+                overloaded = _is_overloaded(fns) or (
+                    cls.add_default_constructor and fns[0][0].is_constructor
+                )
+                for fn, fn_subs in fns:
+                    self._render_function(r, fn, {**subs, **fn_subs}, path, overloaded)
+
+            if cls.pickle_fields is not None:
+                r.writeln("def __getstate__(self) -> tuple: ...")
+                r.writeln("def __setstate__(self, state: tuple) -> None: ...")
+                if cls.pickle_tuple_methods:
+                    r.writeln("def to_tuple(self) -> tuple: ...")
+                    r.writeln("@staticmethod")
+                    r.writeln(f"def from_tuple(state: tuple) -> {path}: ...")
+
+            if cls.copy_methods:
+                r.writeln(f"def __copy__(self) -> {path}: ...")
+                r.writeln(f"def __deepcopy__(self, memo: dict) -> {path}: ...")
+
+            if dynamic:
+                # custom code could define anything
+                self._imports.add("import typing")
+                r.writeln("def __getattr__(self, name: str) -> typing.Any: ...")
+
+        self._cpp_scopes.pop()
+
+    def _render_prop(self, r: RenderBuffer, prop: PropContext, subs: T.Dict[str, str]):
+        doc = _decode_doc(prop.doc)
+        if prop.view:
+            r.writeln("@property")
+            ptype = "memoryview"
+        else:
+            ptype = self.py_type(prop.cpp_type, subs)
+            if prop.static:
+                self._imports.add("import typing")
+                r.writeln(f"{prop.py_name}: typing.ClassVar[{ptype}]")
+                return
+            if not prop.readonly:
+                r.writeln(f"{prop.py_name}: {ptype}")
+                return
+            r.writeln("@property")
+
+        if doc:
+            r.writeln(f"def {prop.py_name}(self) -> {ptype}:")
+            with r.indent(4):
+                _write_doc(r, doc)
+        else:
+            r.writeln(f"def {prop.py_name}(self) -> {ptype}: ...")
+
+    def _render_params(
+        self, params: T.List[ParamContext], subs: T.Dict[str, str]
+    ) -> T.List[str]:
+        rendered: T.List[T.Tuple[str, bool]] = []
+        for i, param in enumerate(params):
+            cpp_type, _ = _strip_qualifiers(_substitute(param.full_cpp_type, subs))
+            cpp_type = _normalize_name(cpp_type)
+            if cpp_type == "py::args":
+                rendered.append(("*args: typing.Any", False))
+                self._imports.add("import typing")
+                continue
+            elif cpp_type == "py::kwargs":
+                rendered.append(("**kwargs: typing.Any", False))
+                self._imports.add("import typing")
+                continue
+
+            m = _py_arg_re.match(param.py_arg)
+            if m is not None:
+                name, rest = m.groups()
+                has_default = bool(_py_arg_default_re.match(rest))
+            else:
+                name = param.arg_name or f"arg{i}"
+                has_default = False
+
+            ptype = self.py_type(param.full_cpp_type, subs, param=True)
+            rendered.append((f"{name}: {ptype}", has_default))
+
+        # python doesn't allow parameters without defaults to follow
+        # parameters that have defaults
+        result = []
+        required_after = False
+        for text, has_default in reversed(rendered):
+            if has_default and not required_after:
+                text = f"{text} = ..."
+            elif not text.startswith("*"):
+                required_after = True
+            result.append(text)
+        result.reverse()
+        return result
+
+    def _render_function(
+        self,
+        r: RenderBuffer,
+        fn: FunctionContext,
+        subs: T.Dict[str, str],
+        cls_name: T.Optional[str],
+        overloaded: bool,
+        vectorized: bool = False,
+    ):
+        py_name = self._fn_py_name(fn)
+
+        if vectorized:
+            assert fn.vectorized is not None
+            params = self._render_params(fn.vectorized.in_params, subs)
+        elif fn.genlambda is not None:
+            params = self._render_params(fn.genlambda.in_params, subs)
+        else:
+            params = self._render_params(fn.filtered_params, subs)
+
+        if vectorized:
+            assert fn.vectorized is not None
+            nresults = len(fn.vectorized.out_params)
+            if fn.cpp_return_type and fn.cpp_return_type != "void":
+                nresults += 1
+            if nresults == 1:
+                ret = "memoryview"
+            else:
+                ret = f"tuple[{', '.join(['memoryview'] * nresults)}]"
+        elif fn.is_constructor:
+            ret = "None"
+        elif fn.operator:
+            ret = self.py_type(fn.cpp_return_type, subs)
+            code = (fn.cpp_code or "").strip()
+            if py_name in _unary_operators.values():
+                params = []
+            elif code.startswith("py::self") and code.endswith("py::self"):
+                assert cls_name is not None
+                params = [f"other: {cls_name}"]
+            elif not code.startswith("py::self"):
+                # custom operator implementation
+                self._imports.add("import typing")
+                params = ["*args: typing.Any"]
+                ret = "typing.Any"
+        elif fn.cpp_code:
+            # custom implementation can return anything
+            ret = self._any()
+        elif fn.genlambda is not None:
+            rets = []
+            if fn.genlambda.return_view:
+                rets.append("memoryview")
+            elif fn.cpp_return_type and fn.cpp_return_type != "void":
+                rets.append(self.py_type(fn.cpp_return_type, subs))
+            rets.extend(self.py_type(p.cpp_type, subs) for p in fn.genlambda.out_params)
+            if not rets:
+                ret = "None"
+            elif len(rets) == 1:
+                ret = rets[0]
+            else:
+                ret = f"tuple[{', '.join(rets)}]"
+        else:
+            ret = self.py_type(fn.cpp_return_type, subs)
+
+        if cls_name is not None:
+            if fn.is_static_method:
+                r.writeln("@staticmethod")
+            else:
+                params.insert(0, "self")
+
+        if overloaded:
+            self._imports.add("import typing")
+            r.writeln("@typing.overload")
+
+        sig = f"def {py_name}({', '.join(params)}) -> {ret}:"
+        doc = _decode_doc(fn.doc)
+        if doc:
+            r.writeln(sig)
+            with r.indent(4):
+                _write_doc(r, doc)
+        else:
+            r.writeln(f"{sig} ...")
+
+        if fn.vectorized is not None and not vectorized:
+            self._render_function(r, fn, subs, cls_name, True, vectorized=True)
+
+
+def _is_overloaded(fns: T.List[T.Tuple[FunctionContext, T.Dict[str, str]]]) -> bool:
+    return len(fns) > 1 or fns[0][0].vectorized is not None
+
+
+def render_pyi(
+    package_name: str,
+    headers: T.List[HeaderContext],
+    casters: CastersData,
+) -> T.Tuple[str, T.Dict[str, str]]:
+    """
+    Renders the stubs for an extension module. Returns the content of the
+    module stub, and the content of each subpackage stub.
+    """
+    renderer = PyiRenderer(package_name, headers, casters)
+    module = renderer.render_module()
+    subpackages = {
+        name: renderer.render_subpackage(name) for name in renderer.subpackages
+    }
+    return module, subpackages
@@ -20,16 +20,16 @@ def render_template_inst_cpp(
         namespace swgen {{
         
         using BindType = swgen::bind_{ tmpl_data.full_cpp_name_identifier }<{tmpl_params}>;
-        static std::unique_ptr<BindType> inst;
+        static semiwrap::PerInterpreter<std::unique_ptr<BindType>> inst;
 
         { tmpl_data.binder_typename }::{ tmpl_data.binder_typename }(py::module &m, const char * clsName)
         {{
-          inst = std::make_unique<BindType>(m, clsName);
+          inst.get() = std::make_unique<BindType>(m, clsName);
         }}
 
         void { tmpl_data.binder_typename }::finish(const char *set_doc, const char *add_doc)
         {{
-          inst->finish(set_doc, add_doc);
+          inst.get()->finish(set_doc, add_doc);
           inst.reset();
         }}
 
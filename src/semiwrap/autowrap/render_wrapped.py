@@ -1,15 +1,26 @@
+import typing as T
+
 from .buffer import RenderBuffer
 from .context import HeaderContext
 
 from . import render_pybind11 as rpybind11
 from .render_cls_prologue import render_class_prologue
 
+#: Default maximum number of definitions in each function that finishes a class
+DEFAULT_CLASS_CHUNK_SIZE = 100
+
 
-def render_wrapped_cpp(hctx: HeaderContext) -> str:
+def render_wrapped_cpp(
+    hctx: HeaderContext, class_chunk_size: int = DEFAULT_CLASS_CHUNK_SIZE
+) -> str:
     """
     This contains the primary binding code generated from parsing a single
     header file. There are also per-class headers generated (templates,
     trampolines), and those are included/used by this.
+
+    The definitions for each class are in their own function, and classes
+    with more than class_chunk_size definitions are split into several
+    functions. If class_chunk_size is 0, classes are never split.
     """
     r = RenderBuffer()
 
@@ -115,9 +126,12 @@ def render_wrapped_cpp(hctx: HeaderContext) -> str:
 
             r.writeln("m(m)")
 
-        if hctx.enums or hctx.classes:
+        if hctx.enums or hctx.classes or hctx.has_views:
             r.writeln("{")
             with r.indent():
+                if hctx.has_views:
+                    r.writeln("semiwrap::register_view_exporter();\n")
+
                 # enums can go in the initializer because they cant have dependencies,
                 # and then we dont need to figure out class dependencies for enum arguments
 
@@ -134,33 +148,61 @@ def render_wrapped_cpp(hctx: HeaderContext) -> str:
         else:
             r.writeln("{}")
 
+        # Compilers need a lot of memory for functions that contain many
+        # definitions, so each class is finished by its own function(s)
+        # instead of putting everything into finish()
+        cls_finish_fns: T.List[str] = []
+        for cls in hctx.classes:
+            if cls.template:
+                continue
+
+            parts = rpybind11.cls_def_parts(cls, cls.var_name)
+            chunks = [parts]
+            if class_chunk_size > 0 and len(parts) > class_chunk_size:
+                chunks = [
+                    parts[i : i + class_chunk_size]
+                    for i in range(0, len(parts), class_chunk_size)
+                ]
+
+            for i, chunk in enumerate(chunks, start=1):
+                fn_name = f"finish_{cls.var_name}"
+                if i > 1:
+                    fn_name = f"{fn_name}_{i}"
+                cls_finish_fns.append(fn_name)
+
+                r.writeln(f"\nSEMIWRAP_NOINLINE void {fn_name}() {{")
+                with r.indent():
+                    rpybind11.cls_auto_using(r, cls)
+                    for part in chunk:
+                        r.writeln(part)
+                r.writeln("}")
+
         r.writeln("\nvoid finish() {\n")
 
         with r.indent():
 
             # Templates
             for tdata in hctx.template_instances:
-                r.writeln(f"\n{tdata.var_name}.finish(")
+                r.writeln("\n{")
                 with r.indent():
-                    if tdata.doc_set:
-                        r.writeln(f'{rpybind11.mkdoc("", tdata.doc_set, "")},')
-                    else:
-                        r.writeln("nullptr,")
-
-                    if tdata.doc_add:
-                        r.writeln(rpybind11.mkdoc("", tdata.doc_add, ""))
-                    else:
-                        r.writeln("nullptr")
-                r.writeln(");")
+                    r.writeln(f'SEMIWRAP_PROFILE_TEMPLATE("{tdata.py_name}");')
+                    r.writeln(f"{tdata.var_name}.finish(")
+                    with r.indent():
+                        if tdata.doc_set:
+                            r.writeln(f'{rpybind11.mkdoc("", tdata.doc_set, "")},')
+                        else:
+                            r.writeln("nullptr,")
+
+                        if tdata.doc_add:
+                            r.writeln(rpybind11.mkdoc("", tdata.doc_add, ""))
+                        else:
+                            r.writeln("nullptr")
+                    r.writeln(");")
+                r.writeln("}")
 
             # Class methods
-            for cls in hctx.classes:
-                if not cls.template:
-                    r.writeln("{")
-                    with r.indent():
-                        rpybind11.cls_auto_using(r, cls)
-                        rpybind11.cls_def(r, cls, cls.var_name)
-                    r.writeln("}")
+            for fn_name in cls_finish_fns:
+                r.writeln(f"{fn_name}();")
 
             # Global methods
             if hctx.functions:
@@ -178,15 +220,17 @@ def render_wrapped_cpp(hctx: HeaderContext) -> str:
     r.writeln(
         f"}}; // struct semiwrap_{hctx.hname}_initializer\n"
         "\n"
-        f"static std::unique_ptr<semiwrap_{hctx.hname}_initializer> cls;\n"
+        "// Only used while the module is being imported, or by the lazy loader\n"
+        "// while it holds its lock, so this only needs to be per interpreter\n"
+        f"static semiwrap::PerInterpreter<std::unique_ptr<semiwrap_{hctx.hname}_initializer>> semiwrap_{hctx.hname}_instance;\n"
         "\n"
         f"void begin_init_{hctx.hname}(py::module &m) {{\n"
-        f"  cls = std::make_unique<semiwrap_{hctx.hname}_initializer>(m);\n"
+        f"  semiwrap_{hctx.hname}_instance.get() = std::make_unique<semiwrap_{hctx.hname}_initializer>(m);\n"
         "}\n"
         "\n"
         f"void finish_init_{hctx.hname}() {{\n"
-        "  cls->finish();\n"
-        "  cls.reset();\n"
+        f"  semiwrap_{hctx.hname}_instance.get()->finish();\n"
+        f"  semiwrap_{hctx.hname}_instance.reset();\n"
         "}\n"
     )
 
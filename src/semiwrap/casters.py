@@ -1,6 +1,8 @@
 import dataclasses
 import json
+import os
 import pathlib
+import pickle
 import typing as T
 
 from .config.util import parse_input
@@ -53,3 +55,26 @@ class TypeData:
 
 #: content of pickle file used internally
 CastersData = T.Dict[str, TypeData]
+
+
+_casters_cache: T.Dict[str, T.Tuple[T.Tuple[int, int], CastersData]] = {}
+
+
+def load_casters_data(fname) -> CastersData:
+    """
+    Loads the pickle written by resolve_casters. The result is cached so that
+    a long running process (such as the codegen worker) only loads it once.
+    """
+    fname = os.fspath(fname)
+    st = os.stat(fname)
+    key = (st.st_mtime_ns, st.st_size)
+
+    cached = _casters_cache.get(fname)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(fname, "rb") as fp:
+        data = pickle.load(fp)
+
+    _casters_cache[fname] = (key, data)
+    return data
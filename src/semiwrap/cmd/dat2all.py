@@ -0,0 +1,94 @@
+"""
+Creates all of the output files for a header from a .dat file created by
+parsing a header. This is equivalent to running dat2cpp, dat2trampoline,
+dat2tmplcpp, and dat2tmplhpp for each output, but only loads the .dat file
+once.
+"""
+
+import argparse
+import pathlib
+import typing as T
+
+from ..autowrap.datfile import DatFile
+from ..autowrap.render_cls_trampoline_hpp import render_cls_trampoline_hpp
+from ..autowrap.render_tmpl_inst import (
+    render_template_inst_cpp,
+    render_template_inst_hpp,
+)
+from ..autowrap.render_wrapped import DEFAULT_CLASS_CHUNK_SIZE, render_wrapped_cpp
+from ..util import maybe_write_file
+from .gen_trampoline_bases import load_trampoline_bases
+
+
+def _write_all(
+    input_dat: pathlib.Path,
+    output_cpp: pathlib.Path,
+    trampolines: T.List[T.Tuple[str, pathlib.Path]],
+    tmpl_cpps: T.List[T.Tuple[str, pathlib.Path]],
+    tmpl_hpp: T.Optional[pathlib.Path],
+    class_chunk_size: int = DEFAULT_CLASS_CHUNK_SIZE,
+    trampoline_bases: T.Optional[pathlib.Path] = None,
+):
+    dat = DatFile.load(input_dat)
+    hctx = dat.get_header()
+
+    known_bases = None
+    if trampoline_bases is not None:
+        known_bases = load_trampoline_bases(trampoline_bases)
+
+    content = render_wrapped_cpp(hctx, class_chunk_size)
+    maybe_write_file(output_cpp, content, encoding="utf-8")
+
+    for yml_id, output_hpp in trampolines:
+        cls = dat.get_class(yml_id)
+        content = render_cls_trampoline_hpp(hctx, cls, known_bases)
+        maybe_write_file(output_hpp, content, encoding="utf-8")
+
+    for py_name, output_tmpl_cpp in tmpl_cpps:
+        tmpl = dat.get_template(py_name)
+        content = render_template_inst_cpp(hctx, tmpl)
+        maybe_write_file(output_tmpl_cpp, content, encoding="utf-8")
+
+    if tmpl_hpp is not None:
+        content = render_template_inst_hpp(hctx)
+        maybe_write_file(tmpl_hpp, content, encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input_dat", type=pathlib.Path)
+    parser.add_argument("output_cpp", type=pathlib.Path)
+    parser.add_argument(
+        "--trampoline",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("YML_ID", "OUTPUT_HPP"),
+    )
+    parser.add_argument(
+        "--tmpl-cpp",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("PY_NAME", "OUTPUT_CPP"),
+    )
+    parser.add_argument("--tmpl-hpp", type=pathlib.Path)
+    parser.add_argument(
+        "--class-chunk-size", type=int, default=DEFAULT_CLASS_CHUNK_SIZE
+    )
+    parser.add_argument("--trampoline-bases", type=pathlib.Path)
+    args = parser.parse_args()
+
+    _write_all(
+        args.input_dat,
+        args.output_cpp,
+        [(yml_id, pathlib.Path(out)) for yml_id, out in args.trampoline],
+        [(py_name, pathlib.Path(out)) for py_name, out in args.tmpl_cpp],
+        args.tmpl_hpp,
+        args.class_chunk_size,
+        args.trampoline_bases,
+    )
+
+
+if __name__ == "__main__":
+    main()
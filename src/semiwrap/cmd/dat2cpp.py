@@ -2,33 +2,34 @@
 Creates an output .cpp file from a .dat file created by parsing a header
 """
 
-import inspect
+import argparse
 import pathlib
-import pickle
-import sys
 
-from ..autowrap.context import HeaderContext
-from ..autowrap.render_wrapped import render_wrapped_cpp
+from ..autowrap.datfile import DatFile
+from ..autowrap.render_wrapped import DEFAULT_CLASS_CHUNK_SIZE, render_wrapped_cpp
+from ..util import maybe_write_file
 
 
-def _write_wrapper_cpp(input_dat: pathlib.Path, output_cpp: pathlib.Path):
-    with open(input_dat, "rb") as fp:
-        hctx = pickle.load(fp)
-
-    assert isinstance(hctx, HeaderContext)
-
-    content = render_wrapped_cpp(hctx)
-    output_cpp.write_text(content, encoding="utf-8")
+def _write_wrapper_cpp(
+    input_dat: pathlib.Path,
+    output_cpp: pathlib.Path,
+    class_chunk_size: int = DEFAULT_CLASS_CHUNK_SIZE,
+):
+    hctx = DatFile.load(input_dat).get_header()
+    content = render_wrapped_cpp(hctx, class_chunk_size)
+    maybe_write_file(output_cpp, content, encoding="utf-8")
 
 
 def main():
-    try:
-        _, input_dat, output_cpp = sys.argv
-    except ValueError:
-        print(inspect.cleandoc(__doc__ or ""), file=sys.stderr)
-        sys.exit(1)
-
-    _write_wrapper_cpp(pathlib.Path(input_dat), pathlib.Path(output_cpp))
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input_dat", type=pathlib.Path)
+    parser.add_argument("output_cpp", type=pathlib.Path)
+    parser.add_argument(
+        "--class-chunk-size", type=int, default=DEFAULT_CLASS_CHUNK_SIZE
+    )
+    args = parser.parse_args()
+
+    _write_wrapper_cpp(args.input_dat, args.output_cpp, args.class_chunk_size)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+"""
+Creates the .pyi files for an extension module from the .dat files created
+by parsing its headers. Unlike make_pyi, this does not need to import the
+compiled extension module.
+"""
+
+import argparse
+import pathlib
+import typing as T
+
+from ..autowrap.datfile import DatFile
+from ..autowrap.render_pyi import PyiRenderer
+from ..casters import load_casters_data
+from ..util import maybe_write_file
+
+
+def _write_pyi(
+    package_name: str,
+    casters_path: pathlib.Path,
+    output_pyi: pathlib.Path,
+    subpackages: T.List[T.Tuple[str, pathlib.Path]],
+    input_dats: T.List[pathlib.Path],
+):
+    casters = load_casters_data(casters_path)
+    headers = [DatFile.load(input_dat).get_header() for input_dat in input_dats]
+
+    renderer = PyiRenderer(package_name, headers, casters)
+
+    missing = set(renderer.subpackages) - {name for name, _ in subpackages}
+    if missing:
+        raise ValueError(
+            f"{package_name}: no output specified for subpackages {sorted(missing)}"
+        )
+
+    maybe_write_file(output_pyi, renderer.render_module(), encoding="utf-8")
+
+    for name, output in subpackages:
+        content = renderer.render_subpackage(name)
+        maybe_write_file(output, content, encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("package_name")
+    parser.add_argument("in_casters", type=pathlib.Path)
+    parser.add_argument("output_pyi", type=pathlib.Path)
+    parser.add_argument(
+        "--subpackage",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("NAME", "OUTPUT_PYI"),
+    )
+    parser.add_argument("input_dat", nargs="+", type=pathlib.Path)
+    args = parser.parse_args()
+
+    _write_pyi(
+        args.package_name,
+        args.in_casters,
+        args.output_pyi,
+        [(name, pathlib.Path(out)) for name, out in args.subpackage],
+        args.input_dat,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,27 +4,20 @@ Creates a template instance .cpp file from a .dat file created by parsing a head
 
 import inspect
 import pathlib
-import pickle
 import sys
 
-from ..autowrap.context import HeaderContext
+from ..autowrap.datfile import DatFile
 from ..autowrap.render_tmpl_inst import render_template_inst_cpp
+from ..util import maybe_write_file
 
 
 def _write_wrapper_cpp(input_dat: pathlib.Path, py_name: str, output_cpp: pathlib.Path):
-    with open(input_dat, "rb") as fp:
-        hctx = pickle.load(fp)
-
-    assert isinstance(hctx, HeaderContext)
-
-    for tmpl in hctx.template_instances:
-        if tmpl.py_name == py_name:
-            break
-    else:
-        raise ValueError(f"internal error: cannot find {py_name} in {hctx.orig_yaml}")
-
+    # the class prologue needs the classes that have trampolines
+    dat = DatFile.load(input_dat)
+    hctx = dat.get_partial_header(trampolines=True)
+    tmpl = dat.get_template(py_name)
     content = render_template_inst_cpp(hctx, tmpl)
-    output_cpp.write_text(content, encoding="utf-8")
+    maybe_write_file(output_cpp, content, encoding="utf-8")
 
 
 def main():
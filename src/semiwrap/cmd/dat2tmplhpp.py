@@ -2,21 +2,19 @@
 
 import inspect
 import pathlib
-import pickle
 import sys
 
-from ..autowrap.context import HeaderContext
+from ..autowrap.datfile import DatFile
 from ..autowrap.render_tmpl_inst import render_template_inst_hpp
+from ..util import maybe_write_file
 
 
 def _write_tmpl_hpp(input_dat: pathlib.Path, output_hpp: pathlib.Path):
-    with open(input_dat, "rb") as fp:
-        hctx = pickle.load(fp)
-
-    assert isinstance(hctx, HeaderContext)
-
+    dat = DatFile.load(input_dat)
+    hctx = dat.get_partial_header()
+    hctx.template_instances = [dat.get_template(n) for n in dat.template_names]
     content = render_template_inst_hpp(hctx)
-    output_hpp.write_text(content, encoding="utf-8")
+    maybe_write_file(output_hpp, content, encoding="utf-8")
 
 
 def main():
@@ -2,63 +2,43 @@
 Creates an output .hpp file from a .dat file created by parsing a header
 """
 
-import inspect
+import argparse
 import pathlib
-import pickle
-import sys
+import typing as T
 
-from ..autowrap.context import HeaderContext, ClassContext
+from ..autowrap.datfile import DatFile
 from ..autowrap.render_cls_trampoline_hpp import render_cls_trampoline_hpp
-
-
-def _get_classes(hctx: HeaderContext):
-    def _get_child_classes(c: ClassContext):
-        for c in c.child_classes:
-            yield c
-            _get_child_classes(c)
-
-    for cls in hctx.classes:
-        yield cls
-        yield from _get_child_classes(cls)
-
-
-def _write_wrapper_cpp(input_dat: pathlib.Path, yml_id: str, output_hpp: pathlib.Path):
-    with open(input_dat, "rb") as fp:
-        hctx = pickle.load(fp)
-
-    assert isinstance(hctx, HeaderContext)
-
-    avail = []
-    for cls in _get_classes(hctx):
-        avail.append(cls.yml_id)
-        if cls.yml_id == yml_id:
-            break
-    else:
-        msg = [
-            f"cannot find {yml_id} in {hctx.rel_fname}",
-            f"- config: {hctx.orig_yaml}",
-        ]
-
-        if avail:
-            msg.append("- found " + ", ".join(avail))
-
-        if hctx.ignored_classes:
-            msg.append("- ignored " + ", ".join(hctx.ignored_classes))
-
-        raise ValueError("\n".join(msg))
-
-    content = render_cls_trampoline_hpp(hctx, cls)
-    output_hpp.write_text(content, encoding="utf-8")
+from ..util import maybe_write_file
+from .gen_trampoline_bases import load_trampoline_bases
+
+
+def _write_wrapper_cpp(
+    input_dat: pathlib.Path,
+    yml_id: str,
+    output_hpp: pathlib.Path,
+    trampoline_bases: T.Optional[pathlib.Path] = None,
+):
+    dat = DatFile.load(input_dat)
+    hctx = dat.get_partial_header()
+    cls = dat.get_class(yml_id)
+    known_bases = None
+    if trampoline_bases is not None:
+        known_bases = load_trampoline_bases(trampoline_bases)
+    content = render_cls_trampoline_hpp(hctx, cls, known_bases)
+    maybe_write_file(output_hpp, content, encoding="utf-8")
 
 
 def main():
-    try:
-        _, input_dat, yml_id, output_hpp = sys.argv
-    except ValueError:
-        print(inspect.cleandoc(__doc__ or ""), file=sys.stderr)
-        sys.exit(1)
-
-    _write_wrapper_cpp(pathlib.Path(input_dat), yml_id, pathlib.Path(output_hpp))
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input_dat", type=pathlib.Path)
+    parser.add_argument("yml_id")
+    parser.add_argument("output_hpp", type=pathlib.Path)
+    parser.add_argument("--trampoline-bases", type=pathlib.Path)
+    args = parser.parse_args()
+
+    _write_wrapper_cpp(
+        args.input_dat, args.yml_id, args.output_hpp, args.trampoline_bases
+    )
 
 
 if __name__ == "__main__":
@@ -12,6 +12,7 @@ import sys
 import typing as T
 
 from ..autowrap.buffer import RenderBuffer
+from ..util import maybe_write_file
 
 
 def _write_libinit_py(
@@ -32,7 +33,7 @@ def _write_libinit_py(
     for mod in modules:
         r.writeln(f"import {mod}")
 
-    init_py.write_text(r.getvalue(), encoding="utf-8")
+    maybe_write_file(init_py, r.getvalue(), encoding="utf-8")
 
 
 def main():
@@ -1,25 +1,29 @@
 """
-Usage: module_name output_hpp input_dat[, input_dat...]
-
 Generates a header file that contains initialization functions for pybind11 bindings
 
 You must include the header "autogen_module_init.hpp", and call initWrapper() from
 your pybind11 module declaration.
 """
 
+import argparse
 import pathlib
-import pickle
-import sys
 import typing as T
 
 import toposort
 
 from ..autowrap.buffer import RenderBuffer
-from ..autowrap.context import HeaderContext
+from ..autowrap.datfile import DatFile
+from ..util import maybe_write_file
 
 
 def _write_wrapper_hpp(
-    module_name: str, output_hpp: pathlib.Path, *input_dat: pathlib.Path
+    module_name: str,
+    output_hpp: pathlib.Path,
+    *input_dat: pathlib.Path,
+    lazy: bool = False,
+    profile: bool = False,
+    free_threaded: bool = False,
+    per_interpreter_gil: bool = False,
 ):
     # Need to ensure that wrapper initialization is called in base order
     # so we have to toposort it here based on the class hierarchy determined
@@ -27,15 +31,23 @@ def _write_wrapper_hpp(
     types2name = {}
     types2deps = {}
     ordering = []
+    functions: T.Dict[str, T.List[str]] = {}
 
     for datfile in input_dat:
-        with open(datfile, "rb") as fp:
-            hctx = pickle.load(fp)
+        # only the index is needed, none of the classes are decoded
+        dat = DatFile.load(datfile)
 
-        assert isinstance(hctx, HeaderContext)
+        name = dat.hname
+        dep = dat.class_hierarchy
 
-        name = hctx.hname
-        dep = hctx.class_hierarchy
+        if lazy:
+            # Functions are added by the second part of the initialization,
+            # so the lazy loader needs to know which header they are in
+            names = []
+            for fn in dat.get_functions():
+                if fn.scope_var == "m" and not fn.ignore_py and fn.py_name not in names:
+                    names.append(fn.py_name)
+            functions[name] = names
 
         # make sure objects without classes are also included!
         if not dep:
@@ -61,13 +73,28 @@ def _write_wrapper_hpp(
     r = RenderBuffer()
     r.writeln("// This file is autogenerated, DO NOT EDIT")
     r.writeln("")
+    r.writeln("#pragma once")
+    r.writeln("#include <semiwrap.h>")
+    if lazy:
+        r.writeln("#include <semiwrap_lazy.h>")
+    if profile:
+        r.writeln("#include <semiwrap_profile.h>")
+    r.writeln()
+
+    module_args = f"{module_name}, variable"
+    if free_threaded:
+        # Tells free-threaded builds of python that the GIL doesn't need
+        # to be enabled when the module is imported
+        module_args += ", py::mod_gil_not_used()"
+    if per_interpreter_gil:
+        # Allows the module to be imported by subinterpreters that have
+        # their own GIL
+        module_args += ", py::multiple_interpreters::per_interpreter_gil()"
+
     r.write_trim(
         f"""
-        #pragma once
-        #include <semiwrap.h>
-
         // Use this to define your module instead of PYBIND11_MODULE
-        #define SEMIWRAP_PYBIND11_MODULE(variable) PYBIND11_MODULE({module_name}, variable)
+        #define SEMIWRAP_PYBIND11_MODULE(variable) PYBIND11_MODULE({module_args})
 
         // TODO: namespace semiwrap::autogen {{
 
@@ -83,30 +110,83 @@ def _write_wrapper_hpp(
         )
         r.writeln()
 
-    r.writeln("static void initWrapper(py::module &m) {")
-    with r.indent():
-        for name in ordering:
-            r.writeln(f"begin_init_{name}(m);")
+    prefix = ""
+    if profile:
+        # wrap each initialization function so it records how long it takes
+        prefix = "profile_"
+        r.writeln(
+            "static semiwrap::PerInterpreter<semiwrap::InitProfile *> sw_init_profile;"
+        )
         r.writeln()
         for name in ordering:
-            r.writeln(f"finish_init_{name}();")
+            r.write_trim(
+                f"""
+                static void profile_begin_init_{name}(py::module &m) {{
+                  sw_init_profile.get()->begin("{name}", &begin_init_{name}, m);
+                }}
+                static void profile_finish_init_{name}() {{
+                  sw_init_profile.get()->finish("{name}", &finish_init_{name});
+                }}
+                """
+            )
+            r.writeln()
+
+    r.writeln("static void initWrapper(py::module &m) {")
+    with r.indent():
+        if profile:
+            r.writeln("sw_init_profile.get() = semiwrap::InitProfile::create(m);")
+
+        if lazy:
+            r.writeln("auto lazy = semiwrap::LazyModule::create(m);")
+            for name in ordering:
+                deps = _initializer_list(sorted(to_sort.get(name, ())))
+                fns = _initializer_list(functions[name])
+                r.writeln(
+                    f"lazy->add({_quote(name)}, &{prefix}begin_init_{name}, &{prefix}finish_init_{name}, {deps}, {fns});"
+                )
+            r.writeln("lazy->install();")
+        else:
+            for name in ordering:
+                r.writeln(f"{prefix}begin_init_{name}(m);")
+            r.writeln()
+            for name in ordering:
+                r.writeln(f"{prefix}finish_init_{name}();")
+
+        if profile:
+            r.writeln("sw_init_profile.get()->report();")
 
     r.writeln("}")
 
-    output_hpp.write_text(r.getvalue(), encoding="utf-8")
+    maybe_write_file(output_hpp, r.getvalue(), encoding="utf-8")
+
+
+def _quote(s: str) -> str:
+    return f'"{s}"'
+
+
+def _initializer_list(items: T.Iterable[str]) -> str:
+    return "{" + ", ".join(_quote(i) for i in items) + "}"
 
 
 def main():
-    try:
-        module_name = sys.argv[1]
-        output_hpp = sys.argv[2]
-        inputs = sys.argv[3:]
-    except Exception as e:
-        print(__doc__, file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lazy", action="store_true")
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--free-threaded", action="store_true")
+    parser.add_argument("--per-interpreter-gil", action="store_true")
+    parser.add_argument("module_name")
+    parser.add_argument("output_hpp", type=pathlib.Path)
+    parser.add_argument("input_dat", nargs="*", type=pathlib.Path)
+    args = parser.parse_args()
 
     _write_wrapper_hpp(
-        module_name, pathlib.Path(output_hpp), *[pathlib.Path(i) for i in inputs]
+        args.module_name,
+        args.output_hpp,
+        *args.input_dat,
+        lazy=args.lazy,
+        profile=args.profile,
+        free_threaded=args.free_threaded,
+        per_interpreter_gil=args.per_interpreter_gil,
     )
 
 
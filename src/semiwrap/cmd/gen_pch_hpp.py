@@ -0,0 +1,48 @@
+"""
+Generates the header that is precompiled for an extension module. It
+includes the headers that at least half of the module's generated files
+start with, in the order that they are first included.
+"""
+
+import inspect
+import pathlib
+import sys
+import typing as T
+
+from ..autowrap.buffer import RenderBuffer
+from ..autowrap.datfile import DatFile
+from ..autowrap.render_cls_prologue import class_prologue_includes
+from ..util import maybe_write_file
+
+
+def _write_pch_hpp(output_hpp: pathlib.Path, *input_dat: pathlib.Path):
+    counts: T.Dict[str, int] = {}
+    for datfile in input_dat:
+        hctx = DatFile.load(datfile).get_partial_header()
+        for inc in dict.fromkeys(class_prologue_includes(hctx)):
+            counts[inc] = counts.get(inc, 0) + 1
+
+    r = RenderBuffer()
+    r.writeln("// This file is autogenerated. DO NOT EDIT")
+    r.writeln("#pragma once")
+    r.writeln()
+    r.writeln("#include <semiwrap.h>")
+    for inc, count in counts.items():
+        if inc != "semiwrap.h" and count * 2 >= len(input_dat):
+            r.writeln(f"#include <{inc}>")
+
+    maybe_write_file(output_hpp, r.getvalue(), encoding="utf-8")
+
+
+def main():
+    try:
+        _, output_hpp, *input_dat = sys.argv
+    except ValueError:
+        print(inspect.cleandoc(__doc__ or ""), file=sys.stderr)
+        sys.exit(1)
+
+    _write_pch_hpp(pathlib.Path(output_hpp), *map(pathlib.Path, input_dat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Summarizes what the trampoline of each class in an extension module's .dat
+files adds to the trampolines of the classes that inherit from it, so that
+a trampoline doesn't need to include the trampolines of bases that don't
+add anything to it.
+"""
+
+import inspect
+import pathlib
+import pickle
+import sys
+
+from ..autowrap.datfile import DatFile
+from ..autowrap.render_cls_trampoline_hpp import (
+    TrampolineBases,
+    trampoline_base_info,
+)
+from ..util import PICKLE_PROTOCOL, maybe_write_file
+
+
+def load_trampoline_bases(path: pathlib.Path) -> TrampolineBases:
+    with open(path, "rb") as fp:
+        return pickle.load(fp)
+
+
+def _write_trampoline_bases(output: pathlib.Path, *input_dat: pathlib.Path):
+    known_bases: TrampolineBases = {}
+    for datfile in input_dat:
+        hctx = DatFile.load(datfile).get_partial_header(trampolines=True)
+        for cls in hctx.classes_with_trampolines:
+            info = trampoline_base_info(cls)
+            if info is not None:
+                known_bases[cls.full_cpp_name] = info
+
+    data = pickle.dumps(known_bases, protocol=PICKLE_PROTOCOL)
+    maybe_write_file(output, data)
+
+
+def main():
+    try:
+        _, output, *input_dat = sys.argv
+    except ValueError:
+        print(inspect.cleandoc(__doc__ or ""), file=sys.stderr)
+        sys.exit(1)
+
+    _write_trampoline_bases(pathlib.Path(output), *map(pathlib.Path, input_dat))
+
+
+if __name__ == "__main__":
+    main()
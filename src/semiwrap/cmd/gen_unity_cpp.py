@@ -0,0 +1,127 @@
+"""
+Groups the .cpp files generated for a module's headers into a fixed number
+of unity build shards, so the headers that they all include are only parsed
+once per shard instead of once per generated file.
+
+Sources are assigned to the shards using the estimated compile cost of each
+header's YAML file, so that the shards take roughly the same time to compile.
+"""
+
+import argparse
+import os
+import pathlib
+import typing as T
+
+from ..autowrap.buffer import RenderBuffer
+from ..autowrap.datfile import DatFile
+from ..compile_cost import estimate, get_weights, yaml_features
+from ..config.autowrap_yml import AutowrapConfigYaml
+from ..util import maybe_write_file
+
+
+def _assign_shards(
+    costs: T.List[T.Tuple[str, float]], nshards: int
+) -> T.List[T.List[int]]:
+    # Place the most expensive sources first, each in the shard with the
+    # least work so far. Ties are broken by name so the result is stable
+    order = sorted(range(len(costs)), key=lambda i: (-costs[i][1], costs[i][0]))
+    loads = [0.0] * nshards
+    shards: T.List[T.List[int]] = [[] for _ in range(nshards)]
+    for i in order:
+        shard = min(range(nshards), key=lambda s: (loads[s], s))
+        loads[shard] += costs[i][1]
+        shards[shard].append(i)
+
+    # keep the original order within each shard
+    for members in shards:
+        members.sort()
+    return shards
+
+
+def _write_unity_cpp(
+    output_cpp: T.List[pathlib.Path],
+    sources: T.List[T.Tuple[pathlib.Path, pathlib.Path]],
+    weights: T.Dict[str, float],
+):
+    costs = []
+    defines = []
+    for input_dat, _ in sources:
+        dat = DatFile.load(input_dat)
+        hctx = dat.get_partial_header(trampolines=True)
+
+        # the same estimate that the build plan orders sources by
+        try:
+            ayml = AutowrapConfigYaml.from_file(hctx.orig_yaml)
+        except FileNotFoundError:
+            ayml = AutowrapConfigYaml()
+        costs.append((dat.hname, estimate(weights, yaml_features(ayml))))
+
+        # Each generated file defines this for its own classes before
+        # including their trampoline. In a shard, another file may include
+        # the trampoline first, so define them all before anything else
+        defines.append(
+            [cls.full_cpp_name_identifier for cls in hctx.classes_with_trampolines]
+        )
+
+    shards = _assign_shards(costs, len(output_cpp))
+
+    for output, members in zip(output_cpp, shards):
+        r = RenderBuffer()
+        r.writeln("// This file is autogenerated. DO NOT EDIT")
+
+        if any(defines[i] for i in members):
+            r.writeln()
+            for i in members:
+                for ident in defines[i]:
+                    r.writeln(f"#define SWGEN_ENABLE_{ident}_PROTECTED_CONSTRUCTORS")
+
+        if members:
+            r.writeln()
+            for i in members:
+                cpp = sources[i][1]
+                rel = pathlib.Path(os.path.relpath(cpp, output.parent)).as_posix()
+                r.writeln(f'#include "{rel}"')
+
+        maybe_write_file(output, r.getvalue(), encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--output",
+        dest="output_cpp",
+        action="append",
+        type=pathlib.Path,
+        required=True,
+    )
+    parser.add_argument(
+        "--source",
+        dest="sources",
+        action="append",
+        nargs=2,
+        type=pathlib.Path,
+        metavar=("INPUT_DAT", "INPUT_CPP"),
+        default=[],
+    )
+    parser.add_argument(
+        "--compile-cost",
+        dest="compile_cost",
+        action="append",
+        metavar="NAME=SECONDS",
+        default=[],
+        help="compile cost weight that overrides the default",
+    )
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.compile_cost:
+        name, _, value = item.partition("=")
+        overrides[name] = float(value)
+
+    _write_unity_cpp(
+        args.output_cpp, [tuple(s) for s in args.sources], get_weights(overrides)
+    )
+
+
+if __name__ == "__main__":
+    main()
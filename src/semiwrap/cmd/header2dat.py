@@ -13,15 +13,19 @@ from cxxheaderparser import preprocessor
 
 import yaml
 
+from ..autowrap import datfile
 from ..autowrap.cxxparser import parse_header
 from ..autowrap.generator_data import GeneratorData
-from ..casters import CastersData
-from ..config.autowrap_yml import AutowrapConfigYaml
+from ..autowrap.preprocessor import make_pcpp_preprocessor
+from ..casters import CastersData, load_casters_data
+from ..config.autowrap_yml import AutowrapConfigYaml, ReleaseGilPolicy
+from ..header_cache import HeaderCache
 from ..name_transform import (
     NameTransformConfig,
     merge_name_transform_configs,
     resolve_name_transforms,
 )
+from ..util import PICKLE_PROTOCOL, maybe_write_file
 
 
 def format_missing(report) -> str:
@@ -55,6 +59,8 @@ def generate_wrapper(
     name_transform_parameter: typing.Optional[str],
     name_transform_known_words: typing.List[str],
     warn_on_missing_header: bool = True,
+    pp_cache_dir: typing.Optional[pathlib.Path] = None,
+    release_gil_policy: typing.Optional[str] = None,
 ):
 
     try:
@@ -92,6 +98,11 @@ def generate_wrapper(
         known_words=selected_known_words,
     )
 
+    if data.release_gil_policy is not None:
+        selected_release_gil_policy = data.release_gil_policy
+    else:
+        selected_release_gil_policy = ReleaseGilPolicy(release_gil_policy or "always")
+
     deptarget = None
     if dst_depfile is not None:
         assert dst_dat is not None
@@ -108,52 +119,93 @@ def generate_wrapper(
     #   .. cxxheaderparser's msvc support doesn't generate a depfile, so it's not usable
     #      without breaking incremental build
     else:
-        make_preprocessor = preprocessor.make_pcpp_preprocessor
-
-    popts = ParserOptions(
-        preprocessor=make_preprocessor(
-            defines=pp_defines,
-            include_paths=include_paths,
-            encoding=data.encoding,
-            depfile=dst_depfile,
-            deptarget=deptarget,
-        )
+
+        def make_preprocessor(*args, **kwargs):
+            return make_pcpp_preprocessor(
+                token_cache_path=pp_cache_dir, *args, **kwargs
+            )
+
+    preprocess = make_preprocessor(
+        defines=pp_defines,
+        include_paths=include_paths,
+        encoding=data.encoding,
+        depfile=dst_depfile,
+        deptarget=deptarget,
     )
 
     gendata = GeneratorData(data, src_yml)
 
+    # update-yaml needs the parser to run, so it never uses the cache
+    cache = None if report_only else HeaderCache.from_env()
+    cache_key = None
+    cached = None
+
     try:
-        hctx = parse_header(
-            name,
-            src_h,
-            src_h_root,
-            gendata,
-            popts,
-            casters,
-            report_only,
-            name_transforms=name_transforms,
-        )
+        if cache is None:
+            popts = ParserOptions(preprocessor=preprocess)
+        else:
+            # Preprocess first, the result is part of the cache key. This
+            # also writes the depfile, so it is correct even on a cache hit
+            content = preprocess(str(src_h), None)
+            popts = ParserOptions(preprocessor=lambda filename, _: content)
+
+            cache_key = cache.make_key(
+                name,
+                str(src_yml),
+                src_yml.read_bytes(),
+                str(src_h),
+                str(src_h_root),
+                pickle.dumps(casters, protocol=PICKLE_PROTOCOL),
+                repr(inherited_name_transform),
+                selected_release_gil_policy.value,
+                content,
+            )
+            cached = cache.get(cache_key)
+
+        if cached is None:
+            hctx = parse_header(
+                name,
+                src_h,
+                src_h_root,
+                gendata,
+                popts,
+                casters,
+                report_only,
+                name_transforms=name_transforms,
+                release_gil_policy=selected_release_gil_policy,
+            )
     except Exception as e:
         raise ValueError(f"processing {src_h}") from e
 
-    missing = gendata.get_missing()
+    if cached is not None:
+        dat, missing = pickle.loads(cached)
+    else:
+        missing = gendata.get_missing()
+        dat = None
+        if dst_dat is not None or cache_key is not None:
+            dat = datfile.dumps(hctx)
+        if cache_key is not None:
+            cache.put(cache_key, pickle.dumps((dat, missing), protocol=PICKLE_PROTOCOL))
 
     if not report_only and missing and not data.defaults.ignore:
         print("WARNING: some items not in", src_yml, "for", src_h)
         print(format_missing(missing))
 
     if dst_dat is not None:
-        with open(dst_dat, "wb") as fp:
-            pickle.dump(hctx, fp)
+        maybe_write_file(dst_dat, dat)
 
     return missing
 
 
-def make_argparser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(description=__doc__)
+def add_common_arguments(parser: argparse.ArgumentParser):
+    """Arguments that are the same for every header in an extension module"""
     parser.add_argument("-I", "--include-paths", action="append", default=[])
     parser.add_argument("-D", "--defines", action="append", default=[])
     parser.add_argument("--cpp")
+    parser.add_argument("--pp-cache-dir", type=pathlib.Path)
+    parser.add_argument(
+        "--release-gil-policy", choices=[p.value for p in ReleaseGilPolicy]
+    )
     parser.add_argument("--name-transform-default")
     parser.add_argument("--name-transform-function")
     parser.add_argument("--name-transform-method")
@@ -166,6 +218,11 @@ def make_argparser() -> argparse.ArgumentParser:
         default=[],
         dest="name_transform_known_words",
     )
+
+
+def make_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
     parser.add_argument("name")
     parser.add_argument("src_yml", type=pathlib.Path)
     parser.add_argument("src_h", type=pathlib.Path)
@@ -180,9 +237,8 @@ def make_argparser() -> argparse.ArgumentParser:
     return parser
 
 
-def main():
-    parser = make_argparser()
-    args = parser.parse_args()
+def run(args: argparse.Namespace):
+    """Processes a single header using arguments parsed by make_argparser"""
 
     if not args.update_yaml:
         dst_dat = args.dst_dat
@@ -190,8 +246,7 @@ def main():
         report_only = False
         warn_on_missing_header = True
 
-        with open(args.in_casters, "rb") as fp:
-            casters = pickle.load(fp)
+        casters = load_casters_data(args.in_casters)
     else:
         dst_dat = None
         dst_depfile = None
@@ -199,7 +254,8 @@ def main():
         warn_on_missing_header = False
         casters = {}
 
-    compiler_args = args.compiler_args
+    compiler_args = list(args.compiler_args)
+    defines = list(args.defines)
 
     if args.compiler_flavor == "gcc":
         compiler_args.append(f"-std={args.cpp_std}")
@@ -207,7 +263,7 @@ def main():
         compiler_args.append(f"/std:{args.cpp_std}")
 
     if args.cpp and args.compiler_flavor != "gcc":
-        args.defines.append(f"__cplusplus {args.cpp}")
+        defines.append(f"__cplusplus {args.cpp}")
 
     missing = generate_wrapper(
         name=args.name,
@@ -220,7 +276,9 @@ def main():
         compiler_flavor=args.compiler_flavor,
         compiler_args=compiler_args,
         casters=casters,
-        pp_defines=args.defines,
+        pp_defines=defines,
+        pp_cache_dir=args.pp_cache_dir,
+        release_gil_policy=args.release_gil_policy,
         report_only=report_only,
         warn_on_missing_header=warn_on_missing_header,
         name_transform_default=args.name_transform_default,
@@ -239,5 +297,10 @@ def main():
             fp.write(report)
 
 
+def main():
+    parser = make_argparser()
+    run(parser.parse_args())
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,129 @@
+"""
+Parses all of the headers of an extension module and writes an intermediate
+dat file for each of them. This is equivalent to running header2dat for each
+header, but the headers are parsed in parallel by a pool of processes that
+only need to start up and load the type casters once.
+
+All headers share a single depfile.
+"""
+
+import argparse
+import concurrent.futures
+import copy
+import os
+import pathlib
+import sys
+import tempfile
+import traceback
+import typing as T
+
+from ..casters import load_casters_data
+from . import header2dat
+
+
+def make_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__)
+    header2dat.add_common_arguments(parser)
+    parser.add_argument(
+        "--header",
+        nargs=5,
+        action="append",
+        default=[],
+        dest="headers",
+        metavar=("NAME", "SRC_YML", "SRC_H", "SRC_H_ROOT", "DST_DAT"),
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=None)
+    parser.add_argument("in_casters", type=pathlib.Path)
+    parser.add_argument("dst_depfile", type=pathlib.Path)
+    parser.add_argument("compiler_flavor")
+    parser.add_argument("cpp_std")
+    parser.add_argument("compiler_args", nargs="+")
+    parser.add_argument("--update-yaml", action="store_true", default=False)
+    return parser
+
+
+def split_headers(
+    args: argparse.Namespace, depfile_dir: T.Optional[pathlib.Path]
+) -> T.List[argparse.Namespace]:
+    """
+    Converts arguments parsed by make_argparser into arguments for
+    header2dat.run, one for each header. Each header writes its depfile
+    to depfile_dir.
+    """
+    hargs_list = []
+    for i, (name, src_yml, src_h, src_h_root, dst_dat) in enumerate(args.headers):
+        hargs = copy.copy(args)
+        del hargs.headers
+        del hargs.jobs
+        hargs.name = name
+        hargs.src_yml = pathlib.Path(src_yml)
+        hargs.src_h = pathlib.Path(src_h)
+        hargs.src_h_root = pathlib.Path(src_h_root)
+        hargs.dst_dat = pathlib.Path(dst_dat)
+        hargs.dst_depfile = None if depfile_dir is None else depfile_dir / f"{i}.d"
+        hargs_list.append(hargs)
+
+    return hargs_list
+
+
+def _run_header(hargs: argparse.Namespace) -> T.Optional[str]:
+    try:
+        header2dat.run(hargs)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def run_all(
+    hargs_list: T.List[argparse.Namespace], jobs: T.Optional[int] = None
+) -> T.List[T.Optional[str]]:
+    """
+    Runs header2dat for each set of arguments in parallel. Returns the
+    formatted exception for each header that failed, or None if it succeeded.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(hargs_list))
+
+    if jobs <= 1:
+        return [_run_header(hargs) for hargs in hargs_list]
+
+    # Loaded here so that on platforms that fork, the worker processes
+    # inherit the loaded caster data instead of each loading it again
+    for in_casters in {h.in_casters for h in hargs_list if not h.update_yaml}:
+        load_casters_data(in_casters)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_run_header, hargs_list))
+
+
+def main():
+    parser = make_argparser()
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        depfile_dir = None if args.update_yaml else pathlib.Path(tmpdir)
+        hargs_list = split_headers(args, depfile_dir)
+
+        results = run_all(hargs_list, args.jobs)
+
+        failed = False
+        for hargs, result in zip(hargs_list, results):
+            if result is not None:
+                failed = True
+                print(f"error processing {hargs.src_h}:", file=sys.stderr)
+                print(result, file=sys.stderr)
+
+        if failed:
+            sys.exit(1)
+
+        if depfile_dir is not None:
+            # Each header's depfile names its own .dat file as the target,
+            # and ninja accepts multiple targets in a single depfile
+            with open(args.dst_depfile, "w") as fp:
+                for hargs in hargs_list:
+                    fp.write(hargs.dst_depfile.read_text())
+
+
+if __name__ == "__main__":
+    main()
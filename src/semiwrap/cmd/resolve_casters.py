@@ -10,6 +10,7 @@ import sys
 
 from ..casters import CastersData, load_typecaster_json_data, TypeData
 from ..depfile import Depfile
+from ..util import PICKLE_PROTOCOL, maybe_write_file
 
 
 def _update_all_casters(type_caster_cfg: pathlib.Path, all_casters: CastersData):
@@ -63,8 +64,7 @@ def main():
     d.write(depfile)
 
     # write the pickled data
-    with open(outfile, "wb") as fp:
-        pickle.dump(content, fp)
+    maybe_write_file(outfile, pickle.dumps(content, protocol=PICKLE_PROTOCOL))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,438 @@
+"""
+Persistent code generation worker
+
+Usage: build_root command [args...]
+
+Runs `semiwrap.cmd.<command>` with the specified arguments. Instead of paying
+for a new interpreter and re-importing cxxheaderparser, sphinxify, etc for
+each generated file, the request is forwarded to a long running server that
+has already imported everything. The server forks a child for each request,
+so requests are isolated from each other and the output is identical to
+running the command directly.
+
+The server is started automatically by the first request for a build
+directory, and exits after it has been idle for SEMIWRAP_WORKER_IDLE_TIMEOUT
+seconds (default: 60). On platforms without fork() or unix sockets, the
+command is ran in this process instead.
+
+This module is imported by every request, so it must only import things
+that are fast to import.
+"""
+
+import array
+import hashlib
+import json
+import os
+import pathlib
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import typing as T
+
+from ..util import installed_record
+
+#: Modules that are imported by the server before accepting requests
+PRELOAD_MODULES = (
+    "semiwrap.cmd.dat2all",
+    "semiwrap.cmd.dat2cpp",
+    "semiwrap.cmd.dat2pyi",
+    "semiwrap.cmd.dat2tmplcpp",
+    "semiwrap.cmd.dat2tmplhpp",
+    "semiwrap.cmd.dat2trampoline",
+    "semiwrap.cmd.gen_libinit",
+    "semiwrap.cmd.gen_modinit_hpp",
+    "semiwrap.cmd.gen_pch_hpp",
+    "semiwrap.cmd.gen_pkgconf",
+    "semiwrap.cmd.gen_trampoline_bases",
+    "semiwrap.cmd.gen_unity_cpp",
+    "semiwrap.cmd.header2dat",
+    "semiwrap.cmd.header2dat_batch",
+    "semiwrap.cmd.publish_casters",
+    "semiwrap.cmd.resolve_casters",
+)
+
+_DEFAULT_IDLE_TIMEOUT = 60.0
+_CONNECT_TIMEOUT = 30.0
+
+# stdin, stdout, stderr
+_NUM_FDS = 3
+
+_is_supported = hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+def _install_fingerprint(sw_root: pathlib.Path) -> str:
+    """
+    Changes when semiwrap is upgraded or edited. This is computed by every
+    request, so it avoids looking at every file unless it has to.
+    """
+    record = installed_record(sw_root)
+    if record is not None:
+        return f"{record}\0{os.stat(record).st_mtime_ns}"
+
+    # Editable installs and source checkouts can be edited at any time
+    mtime = 0
+    for root, _, files in os.walk(sw_root):
+        for f in files:
+            if f.endswith(".py"):
+                mtime = max(mtime, os.stat(os.path.join(root, f)).st_mtime_ns)
+    return str(mtime)
+
+
+def _semiwrap_token() -> str:
+    # If semiwrap is upgraded or edited, a new server must be started so that
+    # it doesn't keep serving stale code
+    sw_root = pathlib.Path(__file__).resolve().parent.parent
+    fingerprint = _install_fingerprint(sw_root)
+    pythonpath = os.environ.get("PYTHONPATH", "")
+    return f"{sys.executable}\0{pythonpath}\0{sw_root}\0{fingerprint}"
+
+
+def _socket_dir() -> pathlib.Path:
+    """
+    The sockets live in a directory that only this user can access, otherwise
+    another user could impersonate the server and receive our environment
+    and stdio, or connect to our server and run commands as us
+    """
+    uid = os.getuid()
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    path = pathlib.Path(base) / f"semiwrap-{uid}"
+
+    try:
+        path.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+
+    # it may have been created by someone else
+    st = os.lstat(path)
+    if (
+        not stat.S_ISDIR(st.st_mode)
+        or st.st_uid != uid
+        or stat.S_IMODE(st.st_mode) & 0o077
+    ):
+        raise RuntimeError(
+            f"{path} must be a directory that is only accessible by uid {uid}"
+        )
+
+    return path
+
+
+def socket_path(build_root: str) -> pathlib.Path:
+    """
+    Unix socket paths are limited to ~100 characters, so the socket is named
+    after the build directory instead of living in it
+    """
+    key = f"{os.path.abspath(build_root)}\0{_semiwrap_token()}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return _socket_dir() / f"{digest}.sock"
+
+
+def _peer_uid(sock: socket.socket) -> T.Optional[int]:
+    """Returns the uid of the process on the other end, if the OS can tell us"""
+    so_peercred = getattr(socket, "SO_PEERCRED", None)
+    if so_peercred is None:
+        return None
+
+    creds = sock.getsockopt(socket.SOL_SOCKET, so_peercred, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+#
+# Client
+#
+
+
+def _run_local(command: str, argv: T.List[str]) -> int:
+    import importlib
+
+    module = importlib.import_module(f"semiwrap.cmd.{command}")
+    sys.argv = [module.__file__ or command] + argv
+    try:
+        module.main()
+    except SystemExit as e:
+        return _exit_code(e)
+    return 0
+
+
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    elif isinstance(e.code, int):
+        return e.code
+
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def _spawn_server(path: pathlib.Path):
+    subprocess.Popen(
+        [sys.executable, "-m", "semiwrap.cmd.worker", "--serve", str(path)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        close_fds=True,
+    )
+
+
+def _connect(path: pathlib.Path) -> socket.socket:
+    spawned = False
+    deadline = time.monotonic() + _CONNECT_TIMEOUT
+    delay = 0.01
+
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(path))
+            return sock
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+
+        if not spawned:
+            _spawn_server(path)
+            spawned = True
+
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"semiwrap worker did not start at {path}")
+
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("semiwrap worker closed connection unexpectedly")
+        buf += chunk
+    return buf
+
+
+def run_request(build_root: str, command: str, argv: T.List[str]) -> int:
+    """
+    Sends a request to the worker for build_root (starting it if needed),
+    and returns the exit code of the command
+    """
+    sock = _connect(socket_path(build_root))
+    with sock:
+        # don't send our environment or stdio to another user's process
+        uid = _peer_uid(sock)
+        if uid is not None and uid != os.getuid():
+            raise RuntimeError(f"semiwrap worker is owned by uid {uid}")
+
+        request = json.dumps(
+            {
+                "command": command,
+                "argv": argv,
+                "cwd": os.getcwd(),
+                "env": dict(os.environ),
+            }
+        ).encode("utf-8")
+
+        # The child writes directly to our stdio
+        fds = array.array("i", [0, 1, 2])
+        sock.sendmsg(
+            [struct.pack("!I", len(request)), request],
+            [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)],
+        )
+
+        (retval,) = struct.unpack("!i", _recv_exact(sock, 4))
+        return retval
+
+
+#
+# Server
+#
+
+
+def _recv_request(conn: socket.socket) -> T.Tuple[T.Dict[str, T.Any], T.List[int]]:
+    fds = array.array("i")
+    msg, ancdata, _, _ = conn.recvmsg(4, socket.CMSG_LEN(_NUM_FDS * fds.itemsize))
+    for level, ctype, data in ancdata:
+        if level == socket.SOL_SOCKET and ctype == socket.SCM_RIGHTS:
+            fds.frombytes(data[: len(data) - (len(data) % fds.itemsize)])
+
+    (length,) = struct.unpack("!I", msg + _recv_exact(conn, 4 - len(msg)))
+    request = json.loads(_recv_exact(conn, length).decode("utf-8"))
+    return request, list(fds)
+
+
+def _prewarm(command: str, argv: T.List[str]):
+    # Load things shared between requests in the server so that each forked
+    # child inherits them instead of loading them again
+    if command in ("header2dat", "header2dat_batch"):
+        from . import header2dat, header2dat_batch
+        from ..casters import load_casters_data
+        from ..header_cache import semiwrap_fingerprint
+
+        if command == "header2dat":
+            parser = header2dat.make_argparser()
+        else:
+            parser = header2dat_batch.make_argparser()
+
+        args, _ = parser.parse_known_args(argv)
+        if not args.update_yaml:
+            load_casters_data(args.in_casters)
+            semiwrap_fingerprint()
+
+
+def _reap_children(children: T.Set[int]):
+    for pid in list(children):
+        try:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            done = pid
+        if done:
+            children.discard(pid)
+
+
+def _bind(path: pathlib.Path) -> T.Optional[T.Tuple[socket.socket, T.IO[str]]]:
+    import fcntl
+
+    # Only one server may own a socket path; the lock is held until exit
+    lock_fd = os.open(
+        path.with_suffix(".lock"), os.O_WRONLY | os.O_CREAT | os.O_NOFOLLOW, 0o600
+    )
+    lock_fp = os.fdopen(lock_fd, "w")
+    try:
+        fcntl.flock(lock_fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_fp.close()
+        return None
+
+    # any existing socket was left behind by a server that died
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen(64)
+    return listener, lock_fp
+
+
+def serve(path: pathlib.Path, idle_timeout: float):
+    import importlib
+
+    for modname in PRELOAD_MODULES:
+        importlib.import_module(modname)
+
+    bound = _bind(path)
+    if bound is None:
+        return
+
+    listener, lock_fp = bound
+
+    children: T.Set[int] = set()
+    listener.settimeout(1.0)
+    last_active = time.monotonic()
+
+    try:
+        while True:
+            _reap_children(children)
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                if children:
+                    last_active = time.monotonic()
+                elif time.monotonic() - last_active > idle_timeout:
+                    break
+                continue
+
+            last_active = time.monotonic()
+            with conn:
+                uid = _peer_uid(conn)
+                if uid is not None and uid != os.getuid():
+                    continue
+
+                conn.settimeout(_CONNECT_TIMEOUT)
+                try:
+                    request, fds = _recv_request(conn)
+                except (OSError, ValueError):
+                    continue
+
+                try:
+                    _prewarm(request["command"], request["argv"])
+                except Exception:
+                    # the child will report any errors
+                    pass
+
+                pid = os.fork()
+                if pid == 0:
+                    listener.close()
+                    _serve_forked(conn, request, fds)
+
+                for fd in fds:
+                    os.close(fd)
+                children.add(pid)
+    finally:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        listener.close()
+        lock_fp.close()
+
+
+def _serve_forked(
+    conn: socket.socket, request: T.Dict[str, T.Any], fds: T.List[int]
+) -> T.NoReturn:
+    retval = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for target, fd in enumerate(fds[:_NUM_FDS]):
+            os.dup2(fd, target)
+            os.close(fd)
+
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+
+        retval = _run_local(request["command"], request["argv"])
+    except SystemExit as e:
+        retval = _exit_code(e)
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            conn.sendall(struct.pack("!i", retval))
+        finally:
+            os._exit(0)
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--serve":
+        idle_timeout = float(
+            os.environ.get("SEMIWRAP_WORKER_IDLE_TIMEOUT", _DEFAULT_IDLE_TIMEOUT)
+        )
+        serve(pathlib.Path(sys.argv[2]), idle_timeout)
+        return
+
+    if len(sys.argv) < 3:
+        print(__doc__, file=sys.stderr)
+        sys.exit(1)
+
+    build_root, command = sys.argv[1:3]
+    argv = sys.argv[3:]
+
+    if _is_supported and os.environ.get("SEMIWRAP_WORKER_DISABLE") != "1":
+        retval = run_request(build_root, command, argv)
+    else:
+        retval = _run_local(command, argv)
+
+    sys.exit(retval)
+
+
+if __name__ == "__main__":
+    main()
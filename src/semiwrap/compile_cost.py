@@ -0,0 +1,112 @@
+"""
+Estimates how long the .cpp file generated for a header takes to compile
+
+The build plan is created before any headers are parsed, so the estimate is
+computed from the counts of things that the header's YAML file configures.
+Because those files are usually created by ``semiwrap update-yaml``, they list
+nearly everything that ends up in the generated file.
+
+The estimate is a weighted sum of the counts. The default weights were fitted
+to the compile times of semiwrap's tests, and ``semiwrap compile-costs`` fits
+them to the compile times of an existing build of a project.
+"""
+
+import typing as T
+
+from .config.autowrap_yml import AutowrapConfigYaml, FunctionData
+
+#: Counts that the estimate is computed from
+FEATURES = ("classes", "methods", "functions", "overloads", "attributes", "enums")
+
+#: Seconds per item of each feature, and ``base`` for the time it takes to
+#: compile a file that has nothing in it
+DEFAULT_WEIGHTS: T.Dict[str, float] = {
+    "base": 5.0,
+    "classes": 0.1,
+    "methods": 0.06,
+    "functions": 0.14,
+    "overloads": 0.02,
+    "attributes": 0.05,
+    "enums": 0.3,
+}
+
+
+def yaml_features(ayml: AutowrapConfigYaml) -> T.Dict[str, int]:
+    """Counts the things configured by a YAML file that aren't ignored"""
+
+    features = dict.fromkeys(FEATURES, 0)
+
+    def _count_fns(fns: T.Dict[str, FunctionData], key: str):
+        for fn in fns.values():
+            if fn.ignore:
+                continue
+            features[key] += 1
+            # the first overload was counted as the function
+            overloads = [o for o in fn.overloads.values() if not o.ignore]
+            features["overloads"] += max(len(overloads) - 1, 0)
+
+    _count_fns(ayml.functions, "functions")
+    features["enums"] += sum(1 for e in ayml.enums.values() if not e.ignore)
+
+    for cls in ayml.classes.values():
+        if cls.ignore:
+            continue
+        features["classes"] += 1
+        _count_fns(cls.methods, "methods")
+        features["attributes"] += sum(
+            1 for a in cls.attributes.values() if not a.ignore
+        )
+        features["enums"] += sum(1 for e in cls.enums.values() if not e.ignore)
+
+    return features
+
+
+def get_weights(overrides: T.Dict[str, float]) -> T.Dict[str, float]:
+    """Returns the default weights updated with the configured weights"""
+    unknown = set(overrides) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(
+            f"unknown compile_cost weights {', '.join(sorted(unknown))} "
+            f"(expected {', '.join(DEFAULT_WEIGHTS)})"
+        )
+    return {**DEFAULT_WEIGHTS, **overrides}
+
+
+def estimate(weights: T.Dict[str, float], features: T.Dict[str, int]) -> float:
+    """Returns the estimated compile time in seconds"""
+    return weights["base"] + sum(weights[f] * features[f] for f in FEATURES)
+
+
+def fit(
+    samples: T.Sequence[T.Tuple[T.Dict[str, int], float]], iterations: int = 2000
+) -> T.Dict[str, float]:
+    """
+    Fits the weights to a list of (features, seconds) samples. The weights are
+    never negative, so that adding something to a header never makes it
+    cheaper to compile.
+    """
+    names = ("base", *FEATURES)
+    columns = [[1.0] * len(samples)]
+    columns += [[float(s[0][f]) for s in samples] for f in FEATURES]
+
+    # non-negative least squares by coordinate descent
+    weights = [0.0] * len(names)
+    residual = [seconds for _, seconds in samples]
+    norms = [sum(x * x for x in col) for col in columns]
+
+    for _ in range(iterations):
+        changed = 0.0
+        for j, col in enumerate(columns):
+            if norms[j] == 0:
+                continue
+            step = sum(x * r for x, r in zip(col, residual)) / norms[j]
+            new = max(weights[j] + step, 0.0)
+            delta = new - weights[j]
+            if delta:
+                weights[j] = new
+                residual = [r - delta * x for x, r in zip(col, residual)]
+                changed = max(changed, abs(delta))
+        if changed < 1e-9:
+            break
+
+    return dict(zip(names, weights))
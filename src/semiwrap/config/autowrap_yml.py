@@ -61,10 +61,23 @@ class BufferType(str, enum.Enum):
     INOUT = "inout"
 
 
+class BufferOrder(str, enum.Enum):
+    #: The buffer must be C contiguous (row major)
+    C = "C"
+
+    #: The buffer must be Fortran contiguous (column major)
+    F = "F"
+
+    #: The buffer must be C or Fortran contiguous
+    any = "any"
+
+
 @dataclasses.dataclass(frozen=True)
 class BufferData:
     """
     Specify that a parameter uses the buffer protocol
+
+    .. seealso:: :ref:`autowrap_buffers`
     """
 
     #: Indicates what type of python buffer is required
@@ -75,12 +88,53 @@ class BufferData:
 
     #: Name of the C++ length parameter. An out-only parameter, it will be set
     #: to the size of the python buffer, and will be returned so the caller can
-    #: determine how many bytes were written
-    len: str
+    #: determine how many bytes were written. Only optional if ``shape`` is
+    #: specified.
+    len: Optional[str] = None
 
     #: If specified, the minimum size of the python buffer
     minsz: Optional[int] = None
 
+    #: C++ type of the elements of the buffer. If specified, the format of the
+    #: python buffer must match it, and the length parameter is set to the
+    #: number of elements instead of the number of bytes.
+    dtype: Optional[str] = None
+
+    #: If specified, the number of dimensions that the python buffer must have
+    ndim: Optional[int] = None
+
+    #: Size of each dimension of the python buffer. Each item is either the
+    #: size that the dimension must have, or the name of a C++ parameter that
+    #: is set to its size. If a parameter is used by more than one buffer
+    #: that has a dtype, ndim, or shape, their sizes must be the same.
+    shape: Optional[List[Union[int, str]]] = None
+
+    #: Memory layout that the python buffer must have. Defaults to ``C`` if
+    #: ``dtype``, ``ndim``, or ``shape`` is specified, otherwise ``any``.
+    order: Optional[BufferOrder] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class ViewData:
+    """
+    Return contiguous C++ storage to python as a memoryview that refers to
+    it instead of copying it. The memoryview keeps the first argument of the
+    function (``self`` for methods and properties) alive.
+
+    .. seealso:: :ref:`autowrap_views`
+    """
+
+    #: Size of each dimension of the view. Each item is either an integer or
+    #: a C++ expression, which can refer to the parameters of the function,
+    #: ``self``, and the return value as ``__ret``. Required when a pointer
+    #: is returned, otherwise defaults to the ``std::size`` of the return
+    #: value.
+    shape: Optional[List[Union[int, str]]] = None
+
+    #: If True, the view is read-only even if the storage isn't const. Views
+    #: of const storage are always read-only.
+    readonly: bool = False
+
 
 class ReturnValuePolicy(enum.Enum):
     """
@@ -110,6 +164,23 @@ class ReturnValuePolicy(enum.Enum):
     automatic_reference = "automatic_reference"
 
 
+class ReleaseGilPolicy(str, enum.Enum):
+    """
+    Determines which functions release the GIL when they are called, unless
+    ``no_release_gil`` is specified for the function.
+
+    .. seealso:: :ref:`release_gil_policy`
+    """
+
+    #: Release the GIL for every function that doesn't specify ``cpp_code``
+    always = "always"
+
+    #: Don't release the GIL for functions that are classified as trivial:
+    #: inline or ``noexcept`` const methods and ``constexpr`` functions.
+    #: Releasing and reacquiring the GIL costs more than calling these.
+    skip_trivial = "skip_trivial"
+
+
 @dataclasses.dataclass(frozen=True)
 class OverloadData:
     """
@@ -171,7 +242,7 @@ class OverloadData:
     subpackage: Optional[str] = None
 
     #: By default, semiwrap will release the GIL whenever a wrapped
-    #: function is called.
+    #: function is called. Overrides ``release_gil_policy``.
     no_release_gil: Optional[bool] = None
 
     #: Configures parameters that can receive objects that implement the buffer protocol
@@ -185,6 +256,19 @@ class OverloadData:
     #: https://pybind11.readthedocs.io/en/stable/advanced/functions.html#return-value-policies
     return_value_policy: ReturnValuePolicy = ReturnValuePolicy.automatic
 
+    #: Names of parameters that also accept arrays. If specified, an overload
+    #: is added that accepts buffers or sequences for these parameters, calls
+    #: the function for each element without the GIL, and returns the
+    #: results (and any out parameters) as arrays.
+    #:
+    #: .. seealso:: :ref:`autowrap_vectorize`
+    vectorize: Optional[List[str]] = None
+
+    #: Return a view of the storage referred to by the return value instead
+    #: of copying it. The function must return a pointer, a reference to a
+    #: contiguous container, or a span.
+    return_view: Optional[ViewData] = None
+
     #: If this is a function template, this is a list of instantiations
     #: that you wish to provide. This is a list of lists, where the inner
     #: list is the template parameters for that function
@@ -283,6 +367,12 @@ class PropData:
     #: Text to append to the (autoconverted) docstring
     doc_append: Optional[str] = None
 
+    #: Return a view of the storage of this property instead of copying it.
+    #: The property must be a contiguous container or an array. The python
+    #: property is always read-only, but elements of the view can be
+    #: modified unless the property is readonly.
+    view: Optional[ViewData] = None
+
 
 @dataclasses.dataclass(frozen=True)
 class EnumValue:
@@ -334,6 +424,25 @@ class EnumData:
     arithmetic: bool = False
 
 
+@dataclasses.dataclass(frozen=True)
+class PickleData:
+    """
+    Generate pickle support for a class from its fields. All of the fields
+    of the class must be public and assignable, and the class must be
+    default constructible.
+
+    .. seealso:: :ref:`autowrap_pickle`
+    """
+
+    #: Also add a ``to_tuple`` method and a static ``from_tuple`` method that
+    #: convert the class to and from a tuple of its fields
+    tuple_methods: bool = False
+
+    #: Also add ``__copy__`` and ``__deepcopy__`` methods that use the copy
+    #: constructor of the class
+    copy_methods: bool = False
+
+
 @dataclasses.dataclass(frozen=True)
 class ClassData:
     #: Docstring for the class
@@ -413,6 +522,10 @@ class ClassData:
     #: implicit constructors.
     nodelete: bool = False
 
+    #: Generate ``__getstate__`` and ``__setstate__`` that save the fields of
+    #: the class as a tuple, so that it can be pickled
+    pickle: Optional[PickleData] = None
+
     #: Set the python name of the class to this
     rename: Optional[str] = None
 
@@ -581,6 +694,12 @@ class AutowrapConfigYaml:
     #: When specified, replaces known words inherited from pyproject.toml.
     known_words: Optional[List[str]] = None
 
+    #: Which functions release the GIL when they are called. Overrides the
+    #: ``release_gil_policy`` specified in pyproject.toml.
+    #:
+    #: .. seealso:: :ref:`release_gil_policy`
+    release_gil_policy: Optional[ReleaseGilPolicy] = None
+
     #: Specify raw C++ code that will be inserted at the end of the
     #: autogenerated file, inside a function. This is useful for extending
     #: your classes or providing other customizations. The following C++
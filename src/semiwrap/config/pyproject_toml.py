@@ -7,6 +7,7 @@ import re
 from typing import Dict, List, Optional, Union
 
 from ..name_transform import NameTransformSpec
+from .autowrap_yml import ReleaseGilPolicy
 
 _arch_re = re.compile(r"\{\{\s*ARCH\s*\}\}")
 _os_re = re.compile(r"\{\{\s*OS\s*\}\}")
@@ -108,6 +109,12 @@ class ExtensionModuleConfig:
     #: Overrides ``[tool.semiwrap].name_transform`` and is overridden by YAML files.
     name_transform: NameTransformSpec = None
 
+    #: Which functions release the GIL when they are called. Overrides
+    #: ``[tool.semiwrap].release_gil_policy`` and is overridden by YAML files.
+    #:
+    #: .. seealso:: :ref:`release_gil_policy`
+    release_gil_policy: Optional[ReleaseGilPolicy] = None
+
     #: Name of generated file that ensures the shared libraries and any
     #: dependencies are loaded. Defaults to ``_init_XXX.py``, where XXX
     #: is the last element of the package name
@@ -179,6 +186,84 @@ class ExtensionModuleConfig:
     #:
     yaml_path: Optional[str] = None
 
+    #: If True, all of the source files generated for a header are created by
+    #: a single build command that loads the parsed header data once, instead
+    #: of a separate command for each generated file. This is much faster for
+    #: headers that contain many classes or template instantiations.
+    single_pass_codegen: bool = False
+
+    #: If True, all of the headers are parsed by a single build command that
+    #: parses them in parallel using a pool of processes, instead of a
+    #: separate command for each header. This avoids starting a new python
+    #: process for every header, but whenever any header changes all of them
+    #: are parsed again.
+    #:
+    #: .. note:: Requires ninja 1.10 or newer
+    batch_parse_headers: bool = False
+
+    #: The definitions for each class are put into their own function instead
+    #: of a single function for every class in a header, because compilers
+    #: need a lot of memory to compile very large functions. Classes with more
+    #: than this many methods, overloads, and properties are split into
+    #: several functions. Defaults to 100, set it to 0 to never split classes.
+    class_chunk_size: Optional[int] = None
+
+    #: If greater than zero, the .cpp files generated for each header are not
+    #: compiled individually, but are grouped into this many unity build
+    #: shards. Each shard only parses pybind11 and the other headers that the
+    #: generated files have in common once, which makes a full build much
+    #: faster, but changing one header recompiles its entire shard. The
+    #: headers are assigned to shards so that each shard takes about the
+    #: same time to compile.
+    #:
+    #: .. seealso:: :ref:`unity_shards`
+    unity_shards: int = 0
+
+    #: If True, the headers that most of the generated files for this module
+    #: include first (semiwrap, pybind11, type casters, and the wrapped
+    #: headers) are compiled once into a precompiled header, which is used
+    #: by every source file of the module.
+    #:
+    #: .. seealso:: :ref:`precompiled_header`
+    precompiled_header: bool = False
+
+    #: If True, the .pyi type stubs for this module are generated from the
+    #: parsed headers instead of importing the built module and running
+    #: pybind11-stubgen on it. The stubs are generated while the module is
+    #: being compiled, and are also generated when cross-compiling.
+    #:
+    #: Types that are converted by a custom type caster, or that are wrapped
+    #: by a different extension module, are annotated as ``typing.Any``.
+    stubs_from_headers: bool = False
+
+    #: If True, the methods, functions, and docstrings for the contents of
+    #: each header are not added to the module when it is imported, but
+    #: the first time that something defined by the header is accessed. This
+    #: makes importing a module that wraps many headers much faster when
+    #: only a few of them are used.
+    #:
+    #: .. seealso:: :ref:`lazy_init`
+    lazy_init: bool = False
+
+    #: If True, the module records how long the initialization of each
+    #: header takes when it is imported.
+    #:
+    #: .. seealso:: :ref:`profile_init`
+    profile_init: bool = False
+
+    #: If True, the module declares that it can run without the GIL on
+    #: free-threaded builds of python. Overrides
+    #: ``[tool.semiwrap].free_threaded``.
+    #:
+    #: .. seealso:: :ref:`free_threaded`
+    free_threaded: Optional[bool] = None
+
+    #: If True, the module can be imported by subinterpreters that have their
+    #: own GIL. Overrides ``[tool.semiwrap].per_interpreter_gil``.
+    #:
+    #: .. seealso:: :ref:`per_interpreter_gil`
+    per_interpreter_gil: Optional[bool] = None
+
     #: If True, skip this wrapper
     ignore: bool = False
 
@@ -201,6 +286,33 @@ class SemiwrapToolConfig:
     #: or YAML file.
     name_transform: NameTransformSpec = None
 
+    #: Which functions release the GIL when they are called, unless overridden
+    #: by an extension module or YAML file. Defaults to ``always``.
+    #:
+    #: .. seealso:: :ref:`release_gil_policy`
+    release_gil_policy: Optional[ReleaseGilPolicy] = None
+
+    #: If True, all extension modules declare that they can run without the
+    #: GIL on free-threaded builds of python, unless overridden by an
+    #: extension module.
+    #:
+    #: .. seealso:: :ref:`free_threaded`
+    free_threaded: bool = False
+
+    #: If True, all extension modules can be imported by subinterpreters that
+    #: have their own GIL, unless overridden by an extension module.
+    #:
+    #: .. seealso:: :ref:`per_interpreter_gil`
+    per_interpreter_gil: bool = False
+
+    #: Weights used to estimate how long the .cpp file generated for each
+    #: header takes to compile, which is used to compile the most expensive
+    #: files first. Use ``semiwrap compile-costs`` to fit them to an existing
+    #: build of your project.
+    #:
+    #: .. seealso:: :ref:`compile_cost`
+    compile_cost: Dict[str, float] = dataclasses.field(default_factory=dict)
+
     #: List of headers for the scan-headers tool to ignore
     scan_headers_ignore: List[str] = dataclasses.field(default_factory=list)
 
@@ -0,0 +1,285 @@
+"""
+Content-addressed cache of header2dat results
+
+Parsing a header is expensive, but the result only depends on the
+preprocessed header and a handful of other inputs. When
+SEMIWRAP_HEADER_CACHE_DIR is set, header2dat stores its results in that
+directory keyed by a hash of those inputs, and reuses them when the same
+header is parsed again -- even from a different build directory or when
+building a different wheel.
+
+The cache is bounded to SEMIWRAP_HEADER_CACHE_SIZE megabytes (default: 1024),
+and the least recently used entries are removed when it grows too large.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import typing as T
+
+from .util import installed_record
+
+CACHE_DIR_ENV = "SEMIWRAP_HEADER_CACHE_DIR"
+CACHE_SIZE_ENV = "SEMIWRAP_HEADER_CACHE_SIZE"
+
+_DEFAULT_MAX_SIZE_MB = 1024
+
+_HIT = b"h"
+_MISS = b"m"
+_EVICT = b"e"
+
+#: When the stats file grows larger than this, its events are added to the
+#: counters in the counts file
+_STATS_COMPACT_SIZE = 64 * 1024
+
+_fingerprint: T.Optional[bytes] = None
+
+
+def semiwrap_fingerprint() -> bytes:
+    """
+    Identifies the code that produces header2dat results: the versions of
+    semiwrap and the parser, and the contents of semiwrap itself (so that
+    editable installs invalidate the cache when semiwrap is modified)
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        from importlib import metadata
+
+        h = hashlib.sha256()
+        for dist in ("semiwrap", "cxxheaderparser", "sphinxify"):
+            try:
+                version = metadata.version(dist)
+            except metadata.PackageNotFoundError:
+                version = "unknown"
+            h.update(f"{dist}={version}\0".encode("utf-8"))
+
+        sw_root = pathlib.Path(__file__).resolve().parent
+        record = installed_record(sw_root)
+        if record is not None:
+            # has the hash of every file, so the sources don't need to be read
+            h.update(record.read_bytes())
+        else:
+            for path in sorted(sw_root.rglob("*.py")):
+                h.update(path.relative_to(sw_root).as_posix().encode("utf-8"))
+                h.update(path.read_bytes())
+
+        _fingerprint = h.digest()
+
+    return _fingerprint
+
+
+class HeaderCache:
+    def __init__(self, path: pathlib.Path, max_size: int) -> None:
+        #: root directory of the cache
+        self.path = path
+
+        #: maximum size of all entries in bytes
+        self.max_size = max_size
+
+        self.entries_path = path / "entries"
+        self.stats_path = path / "stats"
+        self.counts_path = path / "counts"
+
+        #: estimate of the size of all entries, so that the entries only need
+        #: to be listed when the cache might be too large
+        self.size_path = path / "size"
+
+    @classmethod
+    def from_env(cls) -> T.Optional["HeaderCache"]:
+        """Returns the cache configured by the environment, if any"""
+        path = os.environ.get(CACHE_DIR_ENV)
+        if not path:
+            return None
+
+        max_size_mb = float(os.environ.get(CACHE_SIZE_ENV, _DEFAULT_MAX_SIZE_MB))
+        return cls(pathlib.Path(path), int(max_size_mb * 1024 * 1024))
+
+    def make_key(self, *parts: T.Union[str, bytes]) -> str:
+        h = hashlib.sha256(semiwrap_fingerprint())
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode("utf-8")
+            # length prefix so that adjacent parts cannot be confused
+            h.update(len(part).to_bytes(8, "little"))
+            h.update(part)
+        return h.hexdigest()
+
+    def _entry_path(self, key: str) -> pathlib.Path:
+        return self.entries_path / key[:2] / key
+
+    def get(self, key: str) -> T.Optional[bytes]:
+        entry = self._entry_path(key)
+        try:
+            data = entry.read_bytes()
+        except FileNotFoundError:
+            self._record(_MISS)
+            return None
+
+        # mtime is used to track when an entry was last used
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        self._record(_HIT)
+        return data
+
+    def put(self, key: str, data: bytes):
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # write atomically, other processes may be reading it
+        fd, tmpname = tempfile.mkstemp(dir=entry.parent, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(tmpname, entry)
+        except BaseException:
+            os.unlink(tmpname)
+            raise
+
+        # Concurrent puts may lose an update to the estimate, but it is
+        # corrected each time that the entries are listed
+        size = self._read_int(self.size_path)
+        if size is None or size + len(data) > self.max_size:
+            self._evict()
+        else:
+            self._write_atomic(self.size_path, str(size + len(data)).encode())
+
+    def _read_int(self, path: pathlib.Path) -> T.Optional[int]:
+        try:
+            return int(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, path: pathlib.Path, data: bytes):
+        fd, tmpname = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(tmpname, path)
+        except OSError:
+            try:
+                os.unlink(tmpname)
+            except OSError:
+                pass
+
+    def _iter_entries(
+        self,
+    ) -> T.Generator[T.Tuple[pathlib.Path, os.stat_result], None, None]:
+        if not self.entries_path.exists():
+            return
+
+        for subdir in self.entries_path.iterdir():
+            for entry in subdir.iterdir():
+                if entry.name.startswith(".tmp"):
+                    continue
+                try:
+                    yield entry, entry.stat()
+                except FileNotFoundError:
+                    # removed by another process
+                    pass
+
+    def _evict(self):
+        entries = list(self._iter_entries())
+        total = sum(st.st_size for _, st in entries)
+        if total <= self.max_size:
+            self._write_atomic(self.size_path, str(total).encode())
+            return
+
+        # remove least recently used entries until there's some headroom, so
+        # that eviction doesn't happen on every store
+        target = self.max_size * 0.9
+        entries.sort(key=lambda e: e[1].st_mtime_ns)
+        evicted = 0
+        for entry, st in entries:
+            if total <= target:
+                break
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+            total -= st.st_size
+            evicted += 1
+
+        self._write_atomic(self.size_path, str(total).encode())
+        self._record(_EVICT * evicted)
+
+    def _record(self, events: bytes):
+        # Each event is a single byte appended to the stats file. Small
+        # appends are atomic, so no locking is needed when many processes
+        # are using the cache at once
+        if not events:
+            return
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.stats_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+            try:
+                os.write(fd, events)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+
+            if size > _STATS_COMPACT_SIZE:
+                self._compact_stats()
+        except OSError:
+            pass
+
+    def _read_counts(self) -> T.Dict[str, int]:
+        try:
+            with open(self.counts_path) as fp:
+                counts = json.load(fp)
+        except (OSError, ValueError):
+            counts = {}
+        return {k: counts.get(k, 0) for k in ("hits", "misses", "evictions")}
+
+    def _compact_stats(self):
+        # Only one process can rename the stats file; the others append to a
+        # new one. Events appended by processes that opened the old file
+        # just before it was renamed may be lost, which is fine for stats.
+        compacting = self.stats_path.with_name(f".stats.{os.getpid()}")
+        try:
+            os.replace(self.stats_path, compacting)
+        except FileNotFoundError:
+            return
+
+        try:
+            events = compacting.read_bytes()
+            counts = self._read_counts()
+            counts["hits"] += events.count(_HIT)
+            counts["misses"] += events.count(_MISS)
+            counts["evictions"] += events.count(_EVICT)
+            self._write_atomic(self.counts_path, json.dumps(counts).encode())
+        finally:
+            compacting.unlink()
+
+    def stats(self) -> T.Dict[str, int]:
+        try:
+            events = self.stats_path.read_bytes()
+        except FileNotFoundError:
+            events = b""
+
+        counts = self._read_counts()
+        entries = list(self._iter_entries())
+        return {
+            "hits": counts["hits"] + events.count(_HIT),
+            "misses": counts["misses"] + events.count(_MISS),
+            "evictions": counts["evictions"] + events.count(_EVICT),
+            "entries": len(entries),
+            "size": sum(st.st_size for _, st in entries),
+        }
+
+    def clear(self):
+        for entry, _ in self._iter_entries():
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+
+        for path in (self.stats_path, self.counts_path, self.size_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
@@ -9,6 +9,7 @@ import typing as T
 from hatchling.plugin import hookimpl
 from hatchling.builders.hooks.plugin.interface import BuildHookInterface
 
+from .plan_cache import PlanCache
 from .render_meson import render_meson_to_file
 
 from .config.pyproject_toml import SemiwrapHatchlingConfig
@@ -40,6 +41,7 @@ class SemiwrapBuildHook(BuildHookInterface):
         stage0_build_path = project_root / config.autogen_build_path
         stage0_meson_build = stage0_build_path / "meson.build"
         stage0_gitignore = stage0_build_path / ".gitignore"
+        stage0_plan_cache = stage0_build_path / ".plan-cache"
 
         if config.module_build_path is not None:
             stage1_build_path = project_root / config.module_build_path
@@ -61,6 +63,7 @@ class SemiwrapBuildHook(BuildHookInterface):
                 stage0_meson_build,
                 stage1_meson_build,
                 trampoline_meson_build,
+                PlanCache.from_env(stage0_plan_cache),
             )
         except Exception as e:
             # Reading the stack trace is annoying, most of the time the exception content
@@ -103,6 +106,14 @@ class SemiwrapBuildHook(BuildHookInterface):
         if not stage0_gitignore.exists():
             stage0_gitignore.write_text(
                 "/meson.build\n"
+                f"/{stage0_plan_cache.name}\n"
                 f"/{stage1_build_path.name}/meson.build\n"
                 f"/{trampoline_build_path.name}/meson.build\n"
             )
+        else:
+            # .gitignore files written by older versions don't ignore the cache
+            ignored = stage0_gitignore.read_text()
+            if f"/{stage0_plan_cache.name}\n" not in ignored:
+                if ignored and not ignored.endswith("\n"):
+                    ignored += "\n"
+                stage0_gitignore.write_text(f"{ignored}/{stage0_plan_cache.name}\n")
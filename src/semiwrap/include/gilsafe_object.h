@@ -22,6 +22,10 @@ namespace semiwrap {
 
     Assigning, moves, copies, and destruction acquire the GIL; only converting
     this back into a python object requires holding the GIL.
+
+    On free-threaded builds of python acquiring the GIL only attaches the
+    thread to the interpreter, so like any other C++ object a gilsafe_t must
+    not be modified by one thread while another thread is using it.
 */
 template <typename T>
 class gilsafe_t final {
@@ -4,11 +4,36 @@
 
 #include <pybind11/pybind11.h>
 
+#include <atomic>
+#include <iterator>
+#include <mutex>
+#include <string>
+#include <type_traits>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
 namespace py = pybind11;
 
 // Use this to release the gil
 typedef py::call_guard<py::gil_scoped_release> release_gil;
 
+// Defined for modules that set profile_init = true
+#ifdef SEMIWRAP_PROFILE_INIT
+#include <semiwrap_profile.h>
+#define SEMIWRAP_PROFILE_TEMPLATE(name) semiwrap::InitProfileTemplateScope _sw_profile_scope(name)
+#else
+#define SEMIWRAP_PROFILE_TEMPLATE(name)
+#endif
+
+// Used for the functions that finish the initialization of each class, so
+// the compiler doesn't merge them back into one huge function
+#if defined(_MSC_VER)
+#define SEMIWRAP_NOINLINE __declspec(noinline)
+#else
+#define SEMIWRAP_NOINLINE __attribute__((noinline))
+#endif
+
 // empty trampoline configuration base
 namespace swgen {
 struct EmptyTrampolineCfg {};
@@ -29,6 +54,398 @@ template <class T> py::handle __get_handle(const T *this_ptr) {
     return py::detail::get_object_handle(this_ptr, this_type);
 }
 
+namespace semiwrap {
+
+/*
+    Each trampoline has one of these for every virtual function that has a
+    C++ implementation. It remembers whether the python type of the instance
+    overrides the function, so that calls to a function that isn't overridden
+    can go directly to the C++ implementation without acquiring the GIL.
+
+    The result is thrown away when the python type (or one of its bases) is
+    modified, which CPython signals by changing the type's version tag. Like
+    pybind11, attributes that are set on the instance itself are ignored.
+*/
+class OverrideSlot final {
+public:
+    OverrideSlot() = default;
+
+    // A copy is a different instance, which may have a different type
+    OverrideSlot(const OverrideSlot &) {}
+    OverrideSlot &operator=(const OverrideSlot &) { return *this; }
+
+    // True if the function isn't overridden. Doesn't need the GIL.
+    bool is_inactive() const noexcept {
+        unsigned int tag = m_tag.load(std::memory_order_acquire);
+        return tag != 0 && tag == current_tag(m_type.load(std::memory_order_relaxed));
+    }
+
+    // Same as py::get_override, but records the result. Needs the GIL.
+    template <class T> py::function get_override(const T *this_ptr, const char *name) {
+        m_tag.store(0, std::memory_order_relaxed);
+
+        auto tinfo = py::detail::get_type_info(typeid(T));
+        py::handle self = tinfo ? py::detail::get_object_handle(this_ptr, tinfo) : py::handle();
+        if (!self) {
+            return py::function();
+        }
+
+        PyTypeObject *type = Py_TYPE(self.ptr());
+        auto key = std::make_pair(reinterpret_cast<const PyObject *>(type), name);
+
+        // pybind11 never forgets that a function isn't overridden, so this
+        // makes it look again in case the type was modified
+        if (!m_overridden.load(std::memory_order_relaxed)) {
+            py::detail::with_internals([&key](py::detail::internals &internals) {
+                internals.inactive_override_cache.erase(key);
+            });
+        }
+
+        // the tag must be retrieved before the lookup, so that a modification
+        // made while looking isn't missed
+        unsigned int tag = assign_tag(type, name);
+
+        py::function override = py::detail::get_type_override(this_ptr, tinfo, name);
+
+        // get_override also returns nothing when it's called from the python
+        // override, so only pybind11's cache says whether it is overridden
+        bool inactive = !override && py::detail::with_internals([&key](py::detail::internals &internals) {
+            return internals.inactive_override_cache.count(key) != 0;
+        });
+
+        m_overridden.store(!inactive, std::memory_order_relaxed);
+        if (inactive && tag != 0) {
+            m_type.store(type, std::memory_order_relaxed);
+            m_tag.store(tag, std::memory_order_release);
+        }
+
+        return override;
+    }
+
+private:
+    // Assigns a version tag to the type and returns it, or 0 if it can't be
+    // used to detect modifications
+    static unsigned int assign_tag(PyTypeObject *type, const char *name) {
+#if defined(PYPY_VERSION) || defined(GRAALVM_PYTHON)
+        (void)type;
+        (void)name;
+        return 0;
+#elif PY_VERSION_HEX >= 0x030C0000
+        (void)name;
+        return PyUnstable_Type_AssignVersionTag(type) ? current_tag(type) : 0;
+#else
+        // looking up an attribute assigns a version tag to the type and its bases
+        PyObject *pyname = PyUnicode_InternFromString(name);
+        if (!pyname) {
+            throw py::error_already_set();
+        }
+        _PyType_Lookup(type, pyname);
+        Py_DECREF(pyname);
+        return current_tag(type);
+#endif
+    }
+
+    static unsigned int current_tag(PyTypeObject *type) noexcept {
+#if defined(PYPY_VERSION) || defined(GRAALVM_PYTHON)
+        (void)type;
+        return 0;
+#else
+        if (!type) {
+            return 0;
+        }
+#if PY_VERSION_HEX < 0x030C0000
+        // older versions only clear this flag when the type is modified
+        if (!(relaxed_load(type->tp_flags) & Py_TPFLAGS_VALID_VERSION_TAG)) {
+            return 0;
+        }
+#endif
+        return relaxed_load(type->tp_version_tag);
+#endif
+    }
+
+    // Another thread can write these while holding the GIL
+    template <typename V> static V relaxed_load(V &value) noexcept {
+#ifdef __cpp_lib_atomic_ref
+        return std::atomic_ref<V>(value).load(std::memory_order_relaxed);
+#else
+        return *const_cast<volatile V *>(&value);
+#endif
+    }
+
+    std::atomic<unsigned int> m_tag{0};
+    std::atomic<PyTypeObject *> m_type{nullptr};
+    std::atomic<bool> m_overridden{false};
+};
+
+// Defined for modules that set per_interpreter_gil = true
+#if defined(SEMIWRAP_PER_INTERPRETER_GIL) && PY_VERSION_HEX >= 0x03090000
+#define SEMIWRAP_PER_INTERPRETER_STATE
+#endif
+
+/*
+    Holds the state that generated code keeps while a module is being
+    initialized. A module that supports a GIL per interpreter can be imported
+    by several interpreters at the same time, so each of them gets its own
+    value. Needs the GIL.
+*/
+template <typename T> class PerInterpreter final {
+public:
+    T &get() {
+#ifdef SEMIWRAP_PER_INTERPRETER_STATE
+        std::lock_guard<std::mutex> lock(m_mutex);
+        return m_values[PyInterpreterState_Get()];
+#else
+        return m_value;
+#endif
+    }
+
+    // Restores the default value for the current interpreter
+    void reset() {
+        T value{};
+#ifdef SEMIWRAP_PER_INTERPRETER_STATE
+        {
+            std::lock_guard<std::mutex> lock(m_mutex);
+            auto found = m_values.find(PyInterpreterState_Get());
+            if (found == m_values.end()) {
+                return;
+            }
+            value = std::move(found->second);
+            m_values.erase(found);
+        }
+#else
+        std::swap(value, m_value);
+#endif
+        // the old value is destroyed here, without holding the lock
+    }
+
+private:
+#ifdef SEMIWRAP_PER_INTERPRETER_STATE
+    std::mutex m_mutex;
+    std::unordered_map<PyInterpreterState *, T> m_values;
+#else
+    T m_value{};
+#endif
+};
+
+/*
+    Used by the generated code to check the python buffers that are passed
+    to parameters that specify a dtype, ndim, or shape. ndim is -1 if any
+    number of dimensions is allowed, and order is 'C' or 'F' if the buffer
+    must be contiguous in that order, or 'A' if either is fine.
+*/
+inline void check_buffer_layout(const py::buffer_info &info, const char *name,
+                                py::ssize_t ndim, char order) {
+    if (ndim >= 0 && info.ndim != ndim) {
+        throw py::value_error(std::string(name) + ": expected a buffer with " +
+                              std::to_string(ndim) + " dimensions, got " +
+                              std::to_string(info.ndim));
+    }
+
+    auto contiguous = [&info](bool c_order) {
+        py::ssize_t expected = info.itemsize;
+        for (py::ssize_t i = 0; i < info.ndim; i++) {
+            py::ssize_t dim = c_order ? info.ndim - 1 - i : i;
+            // the stride of a dimension with a single element doesn't matter
+            if (info.shape[dim] != 1 && info.strides[dim] != expected) {
+                return false;
+            }
+            expected *= info.shape[dim];
+        }
+        return true;
+    };
+
+    if ((order == 'C' || order == 'A') && contiguous(true)) {
+        return;
+    }
+    if ((order == 'F' || order == 'A') && contiguous(false)) {
+        return;
+    }
+
+    const char *layout = order == 'C' ? "C contiguous" : order == 'F' ? "Fortran contiguous" : "contiguous";
+    throw py::value_error(std::string(name) + ": buffer must be " + layout);
+}
+
+// Also checks that the format of the buffer matches the element type
+template <typename T>
+void check_buffer(const py::buffer_info &info, const char *name, py::ssize_t ndim,
+                  char order) {
+    if (!info.item_type_is_equivalent_to<T>()) {
+        throw py::type_error(std::string(name) + ": expected a buffer with format '" +
+                             py::format_descriptor<T>::format() + "', got '" +
+                             info.format + "'");
+    }
+    check_buffer_layout(info, name, ndim, order);
+}
+
+/*
+    Used by the generated pickle support to convert the fields of an object
+    (specified as pointers to members) to and from a tuple
+*/
+template <typename T, typename... Members>
+py::tuple fields_to_tuple(const T &self, Members... members) {
+    return py::make_tuple(self.*members...);
+}
+
+template <typename T, typename... Members>
+T fields_from_tuple(const py::tuple &state, Members... members) {
+    if (state.size() != sizeof...(Members)) {
+        throw py::value_error("expected a tuple with " + std::to_string(sizeof...(Members)) +
+                              " items, got " + std::to_string(state.size()));
+    }
+
+    T self{};
+    size_t i = 0;
+    ((self.*members = state[i++].template cast<
+                      typename std::remove_reference<decltype(self.*members)>::type>()),
+     ...);
+    return self;
+}
+
+/*
+    Contiguous C++ storage that is returned to python as a memoryview that
+    refers to it instead of a copy. Used by the generated code for functions
+    and properties that return a view.
+*/
+template <typename T> struct View {
+    T *data;
+    std::vector<py::ssize_t> shape;
+    bool readonly;
+};
+
+// Views of const storage are always read-only
+template <typename T>
+View<T> make_view(T *data, std::vector<py::ssize_t> shape, bool readonly) {
+    return View<T>{data, std::move(shape), readonly || std::is_const<T>::value};
+}
+
+namespace detail {
+
+// Exports the buffer of a view, and keeps the object that owns the storage
+// alive for as long as something refers to the buffer
+struct ViewExporter {
+    py::object owner;
+    void *data;
+    py::ssize_t itemsize;
+    std::string format;
+    std::vector<py::ssize_t> shape;
+    bool readonly;
+};
+
+} // namespace detail
+
+// Called when a module that returns views is initialized. Each module
+// registers its own copy of the type, so it is local to the module.
+inline void register_view_exporter() {
+    if (py::detail::get_local_type_info(typeid(detail::ViewExporter))) {
+        return;
+    }
+
+    py::class_<detail::ViewExporter>(py::handle(), "_SemiwrapView", py::module_local(),
+                                     py::buffer_protocol())
+        .def_buffer([](detail::ViewExporter &self) {
+            return py::buffer_info(self.data, self.itemsize, self.format,
+                                   static_cast<py::ssize_t>(self.shape.size()), self.shape,
+                                   py::detail::c_strides(self.shape, self.itemsize),
+                                   self.readonly);
+        });
+}
+
+namespace detail {
+
+// Creates a memoryview of storage that is kept alive by owner
+inline py::memoryview make_memoryview(py::object owner, void *data, py::ssize_t itemsize,
+                                      std::string format, std::vector<py::ssize_t> shape,
+                                      bool readonly) {
+    register_view_exporter();
+    ViewExporter exporter{std::move(owner), data, itemsize,
+                          std::move(format), std::move(shape), readonly};
+    return py::memoryview(py::cast(std::move(exporter)));
+}
+
+} // namespace detail
+
+} // namespace semiwrap
+
+namespace pybind11 {
+namespace detail {
+
+// The owner of the storage is the first argument of the function, which is
+// self for methods and properties
+template <typename T> struct type_caster<semiwrap::View<T>> {
+    static constexpr auto name = const_name("memoryview");
+
+    static handle cast(const semiwrap::View<T> &src, return_value_policy /* policy */,
+                       handle parent) {
+        using U = typename std::remove_const<T>::type;
+        return semiwrap::detail::make_memoryview(
+                   reinterpret_borrow<object>(parent ? parent : handle(Py_None)),
+                   const_cast<U *>(src.data), static_cast<ssize_t>(sizeof(U)),
+                   format_descriptor<U>::format(), src.shape, src.readonly)
+            .release();
+    }
+};
+
+} // namespace detail
+} // namespace pybind11
+
+// pybind11 keeps the return value of an override in a static variable when
+// it returns a reference or pointer to a temporary value. Without the GIL (or
+// with a GIL for each interpreter) two threads could use it at the same time,
+// so each thread gets its own.
+#if defined(Py_GIL_DISABLED) || defined(SEMIWRAP_PER_INTERPRETER_GIL)
+#define SEMIWRAP_OVERRIDE_CASTER static thread_local
+#else
+#define SEMIWRAP_OVERRIDE_CASTER static
+#endif
+
+// Same as the end of PYBIND11_OVERRIDE_IMPL
+#define SEMIWRAP_OVERRIDE_RETURN(ret_type, o)                                                    \
+    PYBIND11_WARNING_PUSH                                                                        \
+    PYBIND11_WARNING_DISABLE_MSVC(4127)                                                          \
+    if PYBIND11_MAYBE_CONSTEXPR (                                                                \
+        py::detail::cast_is_temporary_value_reference<ret_type>::value                           \
+        && !py::detail::is_same_ignoring_cvref<ret_type, PyObject *>::value) {                   \
+        SEMIWRAP_OVERRIDE_CASTER py::detail::override_caster_t<ret_type> caster;                 \
+        return py::detail::cast_ref<ret_type>(std::move(o), caster);                             \
+    } else {                                                                                     \
+        return py::detail::cast_safe<ret_type>(std::move(o));                                    \
+    }                                                                                            \
+    PYBIND11_WARNING_POP
+
+// On free-threaded builds gil_scoped_acquire doesn't lock anything, but it
+// is still needed so that the thread is attached to the interpreter before
+// any python code is called
+#define SEMIWRAP_OVERRIDE_IMPL(ret_type, cname, name, ...)                                       \
+    do {                                                                                         \
+        py::gil_scoped_acquire gil;                                                              \
+        py::function override = py::get_override(static_cast<const cname *>(this), name);       \
+        if (override) {                                                                          \
+            auto o = override(__VA_ARGS__);                                                      \
+            SEMIWRAP_OVERRIDE_RETURN(PYBIND11_TYPE(ret_type), o);                                \
+        }                                                                                        \
+    } while (false)
+
+#define SEMIWRAP_OVERRIDE_CACHED_IMPL(ret_type, cname, name, slot, ...)                          \
+    do {                                                                                         \
+        if (slot.is_inactive()) break;                                                           \
+        py::gil_scoped_acquire gil;                                                              \
+        py::function override = slot.get_override(static_cast<const cname *>(this), name);       \
+        if (override) {                                                                          \
+            auto o = override(__VA_ARGS__);                                                      \
+            SEMIWRAP_OVERRIDE_RETURN(PYBIND11_TYPE(ret_type), o);                                \
+        }                                                                                        \
+    } while (false)
+
+#define SEMIWRAP_OVERRIDE_CACHED_CUSTOM_IMPL(ret_type, cname, name, slot, ...)                   \
+    do {                                                                                         \
+        if (slot.is_inactive()) break;                                                           \
+        py::gil_scoped_acquire gil;                                                              \
+        py::function override = slot.get_override(static_cast<const cname *>(this), name);       \
+        if (override) {                                                                          \
+            return custom_fn(override);                                                          \
+        }                                                                                        \
+    } while (false)
+
 #define SEMIWRAP_OVERRIDE_CUSTOM_IMPL(ret_type, cname, name, ...)                         \
     do {                                                                                  \
         py::gil_scoped_acquire gil;                                                       \
@@ -66,7 +483,7 @@ template <class T> py::handle __get_handle(const T *this_ptr) {
 
 #define SEMIWRAP_OVERRIDE_PURE_NAME(pyname, ret_type, cname, name, fn, ...)                      \
     {                                                                                            \
-        PYBIND11_OVERRIDE_IMPL(PYBIND11_TYPE(ret_type), PYBIND11_TYPE(cname), name, __VA_ARGS__);\
+        SEMIWRAP_OVERRIDE_IMPL(PYBIND11_TYPE(ret_type), PYBIND11_TYPE(cname), name, __VA_ARGS__);\
         SEMIWRAP_OVERRIDE_PURE_POST_IMPL(pyname, PYBIND11_TYPE(cname), name);                    \
     }
 
@@ -0,0 +1,438 @@
+#pragma once
+
+// Used by modules that set lazy_init = true
+
+#include <pybind11/pybind11.h>
+
+#include <initializer_list>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+namespace py = pybind11;
+
+namespace semiwrap {
+
+/*
+    Normally each header's wrappers are initialized in two parts when the
+    module is imported: the first part registers the classes with pybind11,
+    and the second part adds the methods, functions, docstrings, etc.
+
+    This only does the first part when the module is imported, so that
+    every type is known to pybind11 from the start. Everything that it added
+    to the module is then hidden, and the second part for a header is done
+    the first time that something it defines is accessed via the module's
+    __getattr__ (after the headers that contain its base classes).
+
+    pybind11 allocates every instance of a class with its tp_alloc, so that
+    is replaced until the class's header is initialized. An instance that is
+    returned from a function before the class was accessed via the module is
+    then complete before it reaches python, including its operators.
+
+    Initializing a header may release the GIL, and free-threaded builds of
+    python don't have one, so the hooks only let one thread at a time
+    initialize headers. Other threads wait for it to finish.
+*/
+class LazyModule final : public std::enable_shared_from_this<LazyModule> {
+public:
+    using begin_fn = void (*)(py::module_ &);
+    using finish_fn = void (*)();
+
+    static std::shared_ptr<LazyModule> create(py::module_ &m) {
+        auto lazy = std::shared_ptr<LazyModule>(new LazyModule());
+        lazy->m_module = m;
+        lazy->scope_for(m);
+        return lazy;
+    }
+
+    // Performs the first part of the initialization for a header. The headers
+    // listed in deps must already have been added.
+    void add(const char *name, begin_fn begin, finish_fn finish,
+             std::initializer_list<const char *> deps,
+             std::initializer_list<const char *> functions) {
+        size_t idx = m_headers.size();
+        m_headers.emplace_back();
+        m_headers[idx].name = name;
+        m_headers[idx].finish = finish;
+        for (auto dep : deps) {
+            m_headers[idx].deps.push_back(m_index.at(dep));
+        }
+        m_index[name] = idx;
+
+        std::vector<py::set> before;
+        for (auto &scope : m_scopes) {
+            before.emplace_back(scope_dict(scope));
+        }
+
+        // the initializer keeps a reference to the module until it is finished
+        begin(m_module);
+
+        // Any new submodule is added to the end of m_scopes while this runs
+        for (size_t i = 0; i < m_scopes.size(); i++) {
+            py::dict d = scope_dict(m_scopes[i]);
+            std::vector<std::pair<py::object, py::object>> added;
+            for (auto item : d) {
+                if (is_dunder(item.first) ||
+                    (i < before.size() && before[i].contains(item.first))) {
+                    continue;
+                }
+                added.emplace_back(py::reinterpret_borrow<py::object>(item.first),
+                                   py::reinterpret_borrow<py::object>(item.second));
+            }
+
+            if (!added.empty() && i != 0) {
+                add_scope_header(i, idx);
+            }
+
+            for (auto &attr : added) {
+                if (PyDict_DelItem(d.ptr(), attr.first.ptr()) != 0) {
+                    throw py::error_already_set();
+                }
+
+                m_scopes[i].names[attr.first.cast<std::string>()].push_back(idx);
+                m_headers[idx].hidden.push_back({i, attr.first, attr.second});
+
+                if (PyModule_Check(attr.second.ptr())) {
+                    add_scope_header(scope_for(attr.second), idx);
+                } else if (PyType_Check(attr.second.ptr())) {
+                    hook_type(idx, attr.second);
+                }
+            }
+        }
+
+        for (auto fn : functions) {
+            m_scopes[0].names[fn].push_back(idx);
+        }
+    }
+
+    // Called after all headers have been added
+    void install() {
+        auto self = shared_from_this();
+        m_remaining = m_headers.size();
+
+        for (size_t i = 0; i < m_scopes.size(); i++) {
+            auto &scope = m_scopes[i];
+            scope.getattr = py::cpp_function(
+                [self, i](py::str name) { return self->module_getattr(i, name); },
+                py::name("__getattr__"));
+            scope.dir = py::cpp_function(
+                [self, i]() { return self->module_dir(i); }, py::name("__dir__"));
+
+            scope.mod.attr("__getattr__") = scope.getattr;
+            scope.mod.attr("__dir__") = scope.dir;
+        }
+
+        if (m_remaining == 0) {
+            uninstall();
+        }
+    }
+
+private:
+    LazyModule() = default;
+
+    struct Hidden {
+        size_t scope;
+        py::object name;
+        py::object value;
+    };
+
+    struct Header {
+        std::string name;
+        finish_fn finish = nullptr;
+        std::vector<size_t> deps;
+        std::vector<Hidden> hidden;
+        std::vector<py::object> types;
+        py::object init;
+        bool done = false;
+    };
+
+    struct Scope {
+        py::module_ mod;
+        // attribute name: headers that define it
+        std::unordered_map<std::string, std::vector<size_t>> names;
+        // headers that add anything to a submodule
+        std::vector<size_t> headers;
+        py::object getattr;
+        py::object dir;
+    };
+
+    using lock_type = std::unique_lock<std::recursive_mutex>;
+
+    // The thread that is initializing a header can lock this again if it
+    // accesses something that isn't initialized yet
+    lock_type lock() {
+        lock_type lock(m_mutex, std::try_to_lock);
+        if (!lock.owns_lock()) {
+            // the thread that holds the lock may need the GIL to finish
+            py::gil_scoped_release release;
+            lock.lock();
+        }
+        return lock;
+    }
+
+    static bool is_dunder(py::handle name) {
+        Py_ssize_t len = 0;
+        const char *s = PyUnicode_AsUTF8AndSize(name.ptr(), &len);
+        if (!s) {
+            throw py::error_already_set();
+        }
+        return len > 4 && s[0] == '_' && s[1] == '_' && s[len - 1] == '_' &&
+               s[len - 2] == '_';
+    }
+
+    static py::dict scope_dict(const Scope &scope) {
+        return py::reinterpret_borrow<py::dict>(PyModule_GetDict(scope.mod.ptr()));
+    }
+
+    size_t scope_for(py::handle mod) {
+        for (size_t i = 0; i < m_scopes.size(); i++) {
+            if (m_scopes[i].mod.is(mod)) {
+                return i;
+            }
+        }
+        m_scopes.emplace_back();
+        m_scopes.back().mod = py::reinterpret_borrow<py::module_>(mod);
+        return m_scopes.size() - 1;
+    }
+
+    void add_scope_header(size_t i, size_t idx) {
+        auto &headers = m_scopes[i].headers;
+        if (headers.empty() || headers.back() != idx) {
+            headers.push_back(idx);
+        }
+    }
+
+    // Returns the function that initializes the header of a class that is
+    // still hooked, or an empty object. Derived classes don't inherit it.
+    static py::object pending_init(PyTypeObject *tp) {
+        // the dict of static builtin types is not stored here
+        if (!tp->tp_dict) {
+            return py::object();
+        }
+#if PY_VERSION_HEX >= 0x030D0000
+        PyObject *init = nullptr;
+        if (PyDict_GetItemStringRef(tp->tp_dict, "__semiwrap_lazy_init__", &init) < 0) {
+            throw py::error_already_set();
+        }
+        return py::reinterpret_steal<py::object>(init);
+#else
+        return py::reinterpret_borrow<py::object>(
+            PyDict_GetItemString(tp->tp_dict, "__semiwrap_lazy_init__"));
+#endif
+    }
+
+    // The tp_alloc of a class until its header is initialized. Classes that
+    // derive from it inherit this, including classes in other modules whose
+    // bases may have been hooked by a different copy of this file, so each
+    // hooked class stores a python function that initializes its header.
+    static PyObject *alloc_hook(PyTypeObject *type, Py_ssize_t nitems) {
+        bool pending = false;
+        try {
+            py::tuple mro = py::reinterpret_borrow<py::tuple>(type->tp_mro);
+            for (auto base : mro) {
+                auto init = pending_init(reinterpret_cast<PyTypeObject *>(base.ptr()));
+                if (init) {
+                    pending = true;
+                    init();
+                }
+            }
+        } catch (py::error_already_set &e) {
+            // pybind11 doesn't check whether the allocation failed, so the
+            // instance is still created
+            e.discard_as_unraisable(type->tp_name);
+        } catch (std::exception &e) {
+            PyErr_SetString(PyExc_RuntimeError, e.what());
+            PyErr_WriteUnraisable(reinterpret_cast<PyObject *>(type));
+        }
+
+        if (!pending) {
+            // none of its bases are hooked anymore
+            type->tp_alloc = PyType_GenericAlloc;
+        }
+
+        return PyType_GenericAlloc(type, nitems);
+    }
+
+    void hook_type(size_t idx, py::handle type) {
+        auto tp = reinterpret_cast<PyTypeObject *>(type.ptr());
+        bool registered = py::detail::with_internals([&](py::detail::internals &internals) {
+            return internals.registered_types_py.count(tp) != 0;
+        });
+        if (!registered || pending_init(tp)) {
+            return;
+        }
+
+        // nested classes are registered by the same header
+        std::string qualname = py::str(type.attr("__qualname__"));
+        std::vector<py::object> nested;
+        for (auto item : type.attr("__dict__").attr("items")()) {
+            auto value = item[py::int_(1)];
+            if (PyType_Check(value.ptr()) &&
+                py::str(value.attr("__qualname__")).cast<std::string>() ==
+                    qualname + "." + item[py::int_(0)].cast<std::string>()) {
+                nested.push_back(py::reinterpret_borrow<py::object>(value));
+            }
+        }
+
+        auto &header = m_headers[idx];
+        if (!header.init) {
+            // The module is never unloaded, so the reference cycle between
+            // this and the hooks is fine
+            auto self = shared_from_this();
+            header.init = py::cpp_function(
+                [self, idx]() {
+                    auto locked = self->lock();
+                    self->materialize(idx);
+                },
+                py::name("__semiwrap_lazy_init__"));
+        }
+
+        if (PyObject_SetAttrString(type.ptr(), "__semiwrap_lazy_init__",
+                                   header.init.ptr()) != 0) {
+            throw py::error_already_set();
+        }
+        tp->tp_alloc = &alloc_hook;
+        header.types.push_back(py::reinterpret_borrow<py::object>(type));
+
+        for (auto &n : nested) {
+            hook_type(idx, n);
+        }
+    }
+
+    void materialize(size_t idx) {
+        auto &header = m_headers[idx];
+        if (header.done) {
+            return;
+        }
+        header.done = true;
+
+        for (auto dep : header.deps) {
+            materialize(dep);
+        }
+
+        for (auto &hidden : header.hidden) {
+            if (PyDict_SetItem(scope_dict(m_scopes[hidden.scope]).ptr(),
+                               hidden.name.ptr(), hidden.value.ptr()) != 0) {
+                throw py::error_already_set();
+            }
+        }
+
+        m_finishing++;
+        try {
+            header.finish();
+        } catch (...) {
+            m_finishing--;
+            throw;
+        }
+        m_finishing--;
+
+        // Until now another thread that creates an instance of these types
+        // waits in the hook for the methods to be added
+        for (auto &type : header.types) {
+            auto tp = reinterpret_cast<PyTypeObject *>(type.ptr());
+            if (tp->tp_alloc == &alloc_hook) {
+                tp->tp_alloc = PyType_GenericAlloc;
+            }
+            if (PyObject_DelAttrString(type.ptr(), "__semiwrap_lazy_init__") != 0) {
+                throw py::error_already_set();
+            }
+        }
+
+        header.hidden.clear();
+        header.types.clear();
+        header.init = py::object();
+
+        if (--m_remaining == 0) {
+            uninstall();
+        }
+    }
+
+    void materialize_all() {
+        for (size_t idx = 0; idx < m_headers.size(); idx++) {
+            materialize(idx);
+        }
+    }
+
+    void uninstall() {
+        for (auto &scope : m_scopes) {
+            PyObject *d = PyModule_GetDict(scope.mod.ptr());
+            if (PyDict_GetItemString(d, "__getattr__") == scope.getattr.ptr()) {
+                PyDict_DelItemString(d, "__getattr__");
+            }
+            if (PyDict_GetItemString(d, "__dir__") == scope.dir.ptr()) {
+                PyDict_DelItemString(d, "__dir__");
+            }
+        }
+    }
+
+    py::object module_getattr(size_t i, py::str name) {
+        auto locked = lock();
+        auto &scope = m_scopes[i];
+        auto found = scope.names.find(name.cast<std::string>());
+        if (found != scope.names.end()) {
+            auto headers = found->second;
+            for (auto idx : headers) {
+                materialize(idx);
+            }
+        } else if (!m_finishing && !is_dunder(name)) {
+            // Custom code in a header may have added it. While a header is
+            // being initialized, pybind11 looks up names that may not exist
+            // yet to find overloads, and must not trigger this.
+            if (i == 0) {
+                materialize_all();
+            } else {
+                auto headers = scope.headers;
+                for (auto idx : headers) {
+                    materialize(idx);
+                }
+            }
+        }
+
+        PyObject *value = PyDict_GetItemWithError(scope_dict(scope).ptr(), name.ptr());
+        if (value) {
+            return py::reinterpret_borrow<py::object>(value);
+        }
+        if (PyErr_Occurred()) {
+            throw py::error_already_set();
+        }
+
+        std::string modname = py::str(scope.mod.attr("__name__"));
+        throw py::attribute_error("module '" + modname + "' has no attribute '" +
+                                  name.cast<std::string>() + "'");
+    }
+
+    py::list module_dir(size_t i) {
+        auto locked = lock();
+        auto &scope = m_scopes[i];
+        py::set names;
+        for (auto item : scope_dict(scope)) {
+            if (!item.second.is(scope.getattr) && !item.second.is(scope.dir)) {
+                names.add(item.first);
+            }
+        }
+        for (auto &kv : scope.names) {
+            for (auto idx : kv.second) {
+                if (!m_headers[idx].done) {
+                    names.add(py::str(kv.first));
+                    break;
+                }
+            }
+        }
+
+        py::list result(names);
+        result.attr("sort")();
+        return result;
+    }
+
+    py::module_ m_module;
+    std::vector<Header> m_headers;
+    std::unordered_map<std::string, size_t> m_index;
+    std::vector<Scope> m_scopes;
+    std::recursive_mutex m_mutex;
+    size_t m_remaining = 0;
+    int m_finishing = 0;
+};
+
+} // namespace semiwrap
@@ -0,0 +1,5 @@
+// Precompiled header for extension modules that set precompiled_header. The
+// build defines SEMIWRAP_PCH_HEADER as the header generated for the module,
+// which includes the headers that most of its generated files start with.
+
+#include SEMIWRAP_PCH_HEADER
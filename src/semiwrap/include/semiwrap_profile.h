@@ -0,0 +1,267 @@
+#pragma once
+
+// Used by modules that set profile_init = true
+
+#include <pybind11/pybind11.h>
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <exception>
+#include <string>
+#include <unordered_map>
+#include <unordered_set>
+#include <vector>
+
+namespace py = pybind11;
+
+namespace semiwrap {
+
+/*
+    Records how long each header's initialization functions take and how
+    many objects they create. The results are stored in the module's
+    __semiwrap_init_profile__ dictionary:
+
+        {header: {"begin": seconds, "finish": seconds, "types": count,
+                  "objects": count, "templates": {name: seconds}}}
+
+    "types" is the number of classes and enums that were registered with
+    pybind11, and "objects" is the number of functions and attributes that
+    were added to the module and those classes. Time spent initializing
+    another header while a header is being finished (which can happen when
+    lazy_init is used) isn't included in its time.
+
+    If the SEMIWRAP_INIT_PROFILE environment variable is set to 1, a summary
+    is printed to stderr when the module has been imported.
+*/
+class InitProfile final {
+public:
+    using begin_fn = void (*)(py::module_ &);
+    using finish_fn = void (*)();
+
+    // This is never freed, because the module is never unloaded
+    static InitProfile *create(py::module_ &m) {
+        auto profile = new InitProfile();
+        profile->m_name = py::str(m.attr("__name__"));
+        profile->m_prefix = profile->m_name + ".";
+        profile->m_scopes.push_back(m);
+        profile->m_known = registered_types();
+        m.attr("__semiwrap_init_profile__") = profile->m_results;
+        return profile;
+    }
+
+    void begin(const char *name, begin_fn fn, py::module_ &m) {
+        size_t ntypes = registered_count();
+
+        auto start = std::chrono::steady_clock::now();
+        fn(m);
+        double elapsed = seconds_since(start);
+
+        py::dict entry;
+        entry["begin"] = elapsed;
+        entry["finish"] = py::none();
+        entry["types"] = registered_count() - ntypes;
+        entry["objects"] = 0;
+        entry["templates"] = py::dict();
+        m_results[name] = entry;
+
+        // find the classes and submodules that were just created, so that
+        // the objects added to them can be counted when the header is finished
+        auto &types = m_types[name];
+        for (auto tp : registered_types()) {
+            if (m_known.insert(tp).second) {
+                types.push_back(py::reinterpret_borrow<py::object>((PyObject *)tp));
+            }
+        }
+
+        for (auto item : py::reinterpret_borrow<py::dict>(PyModule_GetDict(m.ptr()))) {
+            if (PyModule_Check(item.second.ptr()) && !has_scope(item.second)) {
+                std::string modname = py::str(item.second.attr("__name__"));
+                if (modname.compare(0, m_prefix.size(), m_prefix) == 0) {
+                    m_scopes.push_back(py::reinterpret_borrow<py::object>(item.second));
+                }
+            }
+        }
+    }
+
+    void finish(const char *name, finish_fn fn) {
+        auto &types = m_types[name];
+        Py_ssize_t nobjects = count_objects(types);
+
+        auto previous = current();
+        current() = this;
+        m_stack.push_back({m_results[name], 0.0, 0});
+
+        auto start = std::chrono::steady_clock::now();
+        try {
+            fn();
+        } catch (...) {
+            m_stack.pop_back();
+            current() = previous;
+            throw;
+        }
+        double elapsed = seconds_since(start);
+
+        Frame frame = m_stack.back();
+        m_stack.pop_back();
+        current() = previous;
+
+        Py_ssize_t objects = count_objects(types) - nobjects;
+        frame.entry["finish"] = elapsed - frame.child_time;
+        frame.entry["objects"] = objects - frame.child_objects;
+        types.clear();
+
+        if (!m_stack.empty()) {
+            m_stack.back().child_time += elapsed;
+            m_stack.back().child_objects += objects;
+        }
+    }
+
+    // Called by SEMIWRAP_PROFILE_TEMPLATE while a header is being finished
+    void add_template(const char *name, double elapsed) {
+        if (!m_stack.empty()) {
+            py::dict templates = m_stack.back().entry["templates"];
+            templates[name] = elapsed;
+        }
+    }
+
+    // Prints a summary if SEMIWRAP_INIT_PROFILE is set
+    void report() {
+        const char *env = std::getenv("SEMIWRAP_INIT_PROFILE");
+        if (!env || std::strcmp(env, "1") != 0) {
+            return;
+        }
+
+        struct Row {
+            std::string name;
+            double begin, finish;
+            bool finished;
+            size_t types, objects;
+        };
+
+        std::vector<Row> rows;
+        double total = 0;
+        for (auto item : m_results) {
+            py::dict entry = py::reinterpret_borrow<py::dict>(item.second);
+            Row row{py::str(item.first), entry["begin"].cast<double>(), 0, false,
+                    entry["types"].cast<size_t>(), entry["objects"].cast<size_t>()};
+            if (!entry["finish"].is_none()) {
+                row.finish = entry["finish"].cast<double>();
+                row.finished = true;
+            }
+            total += row.begin + row.finish;
+            rows.push_back(row);
+        }
+
+        std::sort(rows.begin(), rows.end(), [](const Row &a, const Row &b) {
+            return a.begin + a.finish > b.begin + b.finish;
+        });
+
+        std::fprintf(stderr, "semiwrap: %s initialized in %.1fms\n", m_name.c_str(),
+                     total * 1000);
+        std::fprintf(stderr, "%10s %10s %10s %7s %8s  %s\n", "total", "begin", "finish",
+                     "types", "objects", "header");
+        for (auto &row : rows) {
+            char finish[32] = "-";
+            if (row.finished) {
+                std::snprintf(finish, sizeof(finish), "%.3fms", row.finish * 1000);
+            }
+            std::fprintf(stderr, "%8.3fms %8.3fms %10s %7zu %8zu  %s\n",
+                         (row.begin + row.finish) * 1000, row.begin * 1000, finish,
+                         row.types, row.objects, row.name.c_str());
+        }
+    }
+
+    // Profile of the module whose header is being finished by this thread
+    static InitProfile *&current() {
+        static thread_local InitProfile *profile = nullptr;
+        return profile;
+    }
+
+private:
+    InitProfile() = default;
+
+    struct Frame {
+        py::dict entry;
+        double child_time;
+        Py_ssize_t child_objects;
+    };
+
+    static double seconds_since(std::chrono::steady_clock::time_point start) {
+        return std::chrono::duration<double>(std::chrono::steady_clock::now() - start)
+            .count();
+    }
+
+    static size_t registered_count() {
+        return py::detail::with_internals([](py::detail::internals &internals) {
+            return internals.registered_types_py.size();
+        });
+    }
+
+    static std::unordered_set<PyTypeObject *> registered_types() {
+        return py::detail::with_internals([](py::detail::internals &internals) {
+            std::unordered_set<PyTypeObject *> types;
+            for (auto &kv : internals.registered_types_py) {
+                types.insert(kv.first);
+            }
+            return types;
+        });
+    }
+
+    bool has_scope(py::handle mod) {
+        for (auto &scope : m_scopes) {
+            if (scope.is(mod)) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    Py_ssize_t count_objects(const std::vector<py::object> &types) {
+        Py_ssize_t count = 0;
+        for (auto &scope : m_scopes) {
+            count += PyDict_Size(PyModule_GetDict(scope.ptr()));
+        }
+        for (auto &type : types) {
+            count += PyDict_Size(reinterpret_cast<PyTypeObject *>(type.ptr())->tp_dict);
+        }
+        return count;
+    }
+
+    std::string m_name;
+    std::string m_prefix;
+    py::dict m_results;
+    std::vector<py::object> m_scopes;
+    std::unordered_set<PyTypeObject *> m_known;
+    std::unordered_map<std::string, std::vector<py::object>> m_types;
+    std::vector<Frame> m_stack;
+};
+
+// Records the time taken by a template's finish() function
+class InitProfileTemplateScope final {
+public:
+    explicit InitProfileTemplateScope(const char *name) :
+        m_name(name), m_start(std::chrono::steady_clock::now()) {}
+
+    ~InitProfileTemplateScope() {
+        auto profile = InitProfile::current();
+        if (!profile || std::uncaught_exceptions()) {
+            return;
+        }
+
+        auto elapsed = std::chrono::steady_clock::now() - m_start;
+        try {
+            profile->add_template(m_name, std::chrono::duration<double>(elapsed).count());
+        } catch (...) {
+            // a profile isn't worth crashing over
+        }
+    }
+
+private:
+    const char *m_name;
+    std::chrono::steady_clock::time_point m_start;
+};
+
+} // namespace semiwrap
@@ -0,0 +1,180 @@
+#pragma once
+
+// Used by the generated code for functions that are vectorized
+
+#include <semiwrap.h>
+
+#include <memory>
+#include <type_traits>
+#include <vector>
+
+namespace semiwrap {
+
+inline py::ssize_t shape_size(const std::vector<py::ssize_t> &shape) {
+    py::ssize_t size = 1;
+    for (auto dim : shape) {
+        size *= dim;
+    }
+    return size;
+}
+
+/*
+    An argument of a vectorized function. It is loaded from a python scalar,
+    a C contiguous buffer with the same format as T, or a sequence, which is
+    copied. Buffers are not copied, so they are only safe to access while the
+    argument is alive.
+*/
+template <typename T> class VectorArg {
+    static_assert(std::is_arithmetic<T>::value, "vectorized arguments must be arithmetic");
+
+public:
+    const std::vector<py::ssize_t> &shape() const { return m_shape; }
+
+    py::ssize_t size() const { return m_size; }
+
+    // Python scalars have no shape
+    bool is_scalar() const { return m_shape.empty(); }
+
+    // Arguments with a single element are used for every call
+    T operator[](py::ssize_t i) const { return m_data[m_size == 1 ? 0 : i]; }
+
+    bool load(py::handle src, bool convert) {
+        if (PyObject_CheckBuffer(src.ptr())) {
+            py::buffer_info info;
+            try {
+                info = py::reinterpret_borrow<py::buffer>(src).request();
+            } catch (py::error_already_set &) {
+                return false;
+            }
+
+            if (info.item_type_is_equivalent_to<T>() &&
+                info.strides == py::detail::c_strides(info.shape, info.itemsize)) {
+                m_data = static_cast<const T *>(info.ptr);
+                m_size = info.size;
+                m_shape = info.shape;
+                m_info = std::move(info);
+                return true;
+            }
+        }
+
+        if (!convert) {
+            return false;
+        }
+
+        py::detail::make_caster<T> caster;
+        if (caster.load(src, true)) {
+            m_storage.reset(new T[1]{py::detail::cast_op<T>(caster)});
+            m_data = m_storage.get();
+            m_size = 1;
+            m_shape.clear();
+            return true;
+        }
+
+        if (!py::isinstance<py::sequence>(src) || py::isinstance<py::str>(src) ||
+            py::isinstance<py::bytes>(src)) {
+            return false;
+        }
+
+        auto seq = py::reinterpret_borrow<py::sequence>(src);
+        auto size = static_cast<py::ssize_t>(seq.size());
+        m_storage.reset(new T[size]);
+        for (py::ssize_t i = 0; i < size; i++) {
+            if (!caster.load(seq[i], true)) {
+                return false;
+            }
+            m_storage[i] = py::detail::cast_op<T>(caster);
+        }
+
+        m_data = m_storage.get();
+        m_size = size;
+        m_shape = {size};
+        return true;
+    }
+
+private:
+    const T *m_data = nullptr;
+    py::ssize_t m_size = 0;
+    std::vector<py::ssize_t> m_shape;
+    py::buffer_info m_info;
+    std::unique_ptr<T[]> m_storage;
+};
+
+// Arguments must be scalars, have a single element, or have the same shape
+// as the others. The result only has a single element if every argument does.
+template <typename... Ts>
+std::vector<py::ssize_t> broadcast_shape(const VectorArg<Ts> &...args) {
+    const std::vector<py::ssize_t> *shape = nullptr;
+    const std::vector<py::ssize_t> *single = nullptr;
+    auto check = [&shape, &single](const std::vector<py::ssize_t> &s, bool scalar,
+                                   py::ssize_t size) {
+        if (scalar) {
+            return;
+        } else if (size == 1) {
+            if (single == nullptr) {
+                single = &s;
+            }
+        } else if (shape == nullptr) {
+            shape = &s;
+        } else if (*shape != s) {
+            throw py::value_error("vectorized arguments must be scalars or have the same shape");
+        }
+    };
+    (check(args.shape(), args.is_scalar(), args.size()), ...);
+
+    if (shape != nullptr) {
+        return *shape;
+    } else if (single != nullptr) {
+        return *single;
+    }
+    return {};
+}
+
+// Results of a vectorized function, returned to python as a memoryview
+template <typename T> class VectorResult {
+public:
+    explicit VectorResult(const std::vector<py::ssize_t> &shape) :
+        m_shape(shape), m_size(shape_size(shape)), m_data(new T[m_size]()) {}
+
+    py::ssize_t size() const { return m_size; }
+
+    T &operator[](py::ssize_t i) { return m_data[i]; }
+
+    py::memoryview release() {
+        T *data = m_data.get();
+        py::capsule owner(m_data.release(),
+                          [](void *p) { delete[] static_cast<T *>(p); });
+        return detail::make_memoryview(std::move(owner), data, sizeof(T),
+                                       py::format_descriptor<T>::format(),
+                                       std::move(m_shape), false);
+    }
+
+private:
+    std::vector<py::ssize_t> m_shape;
+    py::ssize_t m_size;
+    std::unique_ptr<T[]> m_data;
+};
+
+} // namespace semiwrap
+
+namespace pybind11 {
+namespace detail {
+
+template <typename T> struct type_caster<semiwrap::VectorArg<T>> {
+    PYBIND11_TYPE_CASTER(semiwrap::VectorArg<T>,
+                         const_name("Buffer | Sequence[") + make_caster<T>::name +
+                             const_name("]"));
+
+    bool load(handle src, bool convert) { return value.load(src, convert); }
+};
+
+template <typename T> struct type_caster<semiwrap::VectorResult<T>> {
+    static constexpr auto name = const_name("memoryview");
+
+    static handle cast(semiwrap::VectorResult<T> src, return_value_policy /* policy */,
+                       handle /* parent */) {
+        return src.release().release();
+    }
+};
+
+} // namespace detail
+} // namespace pybind11
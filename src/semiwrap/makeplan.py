@@ -10,10 +10,12 @@ import sysconfig
 import typing as T
 
 from .casters import PKGCONF_CASTER_EXT
+from .compile_cost import estimate, get_weights, yaml_features
 from .config.autowrap_yml import AutowrapConfigYaml
 from .config.pyproject_toml import ExtensionModuleConfig, TypeCasterConfig
 from .name_transform import merge_name_transform_configs, name_transform_config_to_args
 from .pkgconf_cache import PkgconfCache
+from .plan_cache import PlanInputs
 from .pyproject import PyProject
 from .util import relpath_walk_up
 
@@ -56,6 +58,16 @@ class CompilerInfo:
     pass
 
 
+@dataclasses.dataclass(frozen=True)
+class PreprocessorCacheDir:
+    """
+    Represents a directory that header2dat can use to cache preprocessed
+    include files. It is shared by every header processed in a build.
+    """
+
+    pass
+
+
 @dataclasses.dataclass(frozen=True)
 class TrampolineIncludeRoot:
     """
@@ -86,6 +98,10 @@ class InputFile:
 class OutputFile:
     name: str
 
+    #: When a target with multiple outputs is installed, outputs with this
+    #: set to False are not installed
+    install: bool = True
+
 
 @dataclasses.dataclass(frozen=True)
 class Depfile:
@@ -116,6 +132,7 @@ class BuildTarget:
             BuildTargetOutput,
             CppMacroValue,
             CompilerInfo,
+            PreprocessorCacheDir,
         ],
         ...,
     ]
@@ -133,7 +150,7 @@ class ExtensionModule:
     #: full package name of installed extension
     package_name: str
 
-    sources: T.Tuple[BuildTarget, ...]
+    sources: T.Tuple[T.Union[BuildTarget, BuildTargetOutput], ...]
     depends: T.Tuple[T.Union[LocalDependency, str], ...]
 
     # extra include directories that won't be found via depends
@@ -144,6 +161,9 @@ class ExtensionModule:
     # Install path is always relative to py.get_install_dir(pure: false)
     install_path: pathlib.Path
 
+    #: header to precompile for all of the module's sources
+    precompiled_header: T.Optional[pathlib.Path] = None
+
 
 class PlanError(Exception):
     pass
@@ -159,11 +179,21 @@ def _split_ns(name: str) -> T.Tuple[str, str]:
 
 
 class _BuildPlanner:
-    def __init__(self, project_root: pathlib.Path, missing_yaml_ok: bool = False):
+    def __init__(
+        self,
+        project_root: pathlib.Path,
+        missing_yaml_ok: bool = False,
+        inputs: T.Optional[PlanInputs] = None,
+    ):
 
         self.project_root = project_root
         self.missing_yaml_ok = missing_yaml_ok
 
+        # records everything the plan depends on
+        self.inputs = inputs if inputs is not None else PlanInputs()
+        self.inputs.add_file(project_root / "pyproject.toml")
+        self.inputs.add_pkg_config_dirs()
+
         self.pyproject = PyProject(project_root / "pyproject.toml")
         self.pkgcache = PkgconfCache()
         self.pyproject_input = InputFile(pathlib.Path("pyproject.toml"))
@@ -174,13 +204,16 @@ class _BuildPlanner:
         self.local_caster_targets: T.Dict[str, BuildTargetOutput] = {}
         self.local_dependencies: T.Dict[str, LocalDependency] = {}
 
-        sw_path = self.pkgcache.get("semiwrap").type_casters_path
+        sw_entry = self.pkgcache.get("semiwrap")
+        sw_path = sw_entry.type_casters_path
         assert sw_path is not None
         self.semiwrap_type_caster_path = sw_path
 
     def generate(self):
 
         projectcfg = self.pyproject.project
+        self.compile_cost = projectcfg.compile_cost
+        self.compile_cost_weights = get_weights(projectcfg.compile_cost)
 
         #
         # Export type casters
@@ -297,6 +330,7 @@ class _BuildPlanner:
 
         # Detect the location of the package in the source tree
         package_init_py = self.pyproject.package_root / package_path / "__init__.py"
+        self.inputs.exists(package_init_py)
         self.pyi_args += [parent_package, package_init_py.as_posix()]
 
         depends = self.pyproject.get_extension_deps(extension)
@@ -373,24 +407,61 @@ class _BuildPlanner:
 
         datfiles, module_sources, subpackages = yield from self._process_headers(
             extension,
+            varname,
             package_path,
             include_directories_uniq.keys(),
             search_path,
             all_type_casters,
         )
 
+        modinit_args = [
+            module_name,
+            OutputFile(f"semiwrap_init.{package_name}.hpp"),
+            *datfiles,
+        ]
+        if extension.lazy_init:
+            modinit_args.insert(0, "--lazy")
+        if extension.profile_init:
+            modinit_args.insert(0, "--profile")
+
+        free_threaded = extension.free_threaded
+        if free_threaded is None:
+            free_threaded = self.pyproject.project.free_threaded
+        if free_threaded:
+            modinit_args.insert(0, "--free-threaded")
+
+        per_interpreter_gil = extension.per_interpreter_gil
+        if per_interpreter_gil is None:
+            per_interpreter_gil = self.pyproject.project.per_interpreter_gil
+        if per_interpreter_gil:
+            modinit_args.insert(0, "--per-interpreter-gil")
+
         modinit = BuildTarget(
             command="gen-modinit-hpp",
-            args=(
-                module_name,
-                OutputFile(f"semiwrap_init.{package_name}.hpp"),
-                *datfiles,
-            ),
+            args=tuple(modinit_args),
             install_path=None,
         )
         module_sources.append(modinit)
         yield modinit
 
+        precompiled_header = None
+        if extension.precompiled_header:
+            # The generated header can't be precompiled directly, because
+            # meson only accepts a header from the source tree, so the
+            # semiwrap header that is precompiled includes it via a define
+            pch_hpp = f"{varname}_pch.hpp"
+            pch = BuildTarget(
+                command="gen-pch-hpp",
+                args=(OutputFile(pch_hpp), *datfiles),
+                install_path=None,
+            )
+            module_sources.append(pch)
+            yield pch
+
+            # only queried when used, because it needs another pkgconf query
+            sw_include_path = self.pkgcache.get("semiwrap").include_path[0]
+            precompiled_header = sw_include_path / "semiwrap_pch.h"
+
         #
         # Emit the module
         #
@@ -414,19 +485,55 @@ class _BuildPlanner:
         yield local_dep
         self.local_dependencies[local_dep.name] = local_dep
 
+        defines = dict(extension.defines)
+        if extension.profile_init:
+            defines["SEMIWRAP_PROFILE_INIT"] = 1
+        if per_interpreter_gil:
+            defines["SEMIWRAP_PER_INTERPRETER_GIL"] = 1
+        if precompiled_header:
+            defines["SEMIWRAP_PCH_HEADER"] = f'"{pch_hpp}"'
+
         modobj = ExtensionModule(
             name=varname,
             package_name=package_name,
             sources=tuple(module_sources),
             depends=(local_dep,),
             include_directories=tuple(),
-            defines=tuple(extension.defines.items()),
+            defines=tuple(defines.items()),
             install_path=package_path,
+            precompiled_header=precompiled_header,
         )
         yield modobj
 
         self.pyi_args += [package_name, modobj]
 
+        if extension.stubs_from_headers:
+            # The stubs are generated from the parsed headers, so unlike
+            # make-pyi this doesn't need to wait for any modules to be built
+            # and works when cross-compiling
+            if os.environ.get("SEMIWRAP_SKIP_PYI") == "1":
+                return
+
+            if subpackages:
+                pyi_install_path = package_path / module_name
+                pyi_args = [OutputFile("__init__.pyi")]
+                for subpackage in sorted(subpackages):
+                    pyi_args += [
+                        "--subpackage",
+                        subpackage,
+                        OutputFile(f"{subpackage}.pyi"),
+                    ]
+            else:
+                pyi_install_path = package_path
+                pyi_args = [OutputFile(f"{module_name}.pyi")]
+
+            yield BuildTarget(
+                command="dat2pyi",
+                args=(package_name, all_type_casters, *pyi_args, *datfiles),
+                install_path=pyi_install_path,
+            )
+            return
+
         # This is not yielded here because pyi targets need to depend on all modules
         # via self.pyi_args.
         # - The output .pyi files vary based on whether there are subpackages or not. If no
@@ -530,24 +637,62 @@ class _BuildPlanner:
     def _process_headers(
         self,
         extension: ExtensionModuleConfig,
+        varname: str,
         package_path: pathlib.Path,
         include_directories_uniq: T.Iterable[pathlib.Path],
         search_path: T.List[pathlib.Path],
         all_type_casters: BuildTarget,
     ):
-        datfiles: T.List[BuildTarget] = []
-        module_sources: T.List[BuildTarget] = []
+        datfiles: T.List[T.Union[BuildTarget, BuildTargetOutput]] = []
+        module_sources: T.List[T.Union[BuildTarget, BuildTargetOutput]] = []
+        unity_sources: T.List[
+            T.Tuple[
+                T.Union[BuildTarget, BuildTargetOutput],
+                T.Union[BuildTarget, BuildTargetOutput],
+            ]
+        ] = []
         subpackages: T.Set[str] = set()
         define_args = []
 
+        # estimated compile time of each generated .cpp file
+        compile_costs: T.Dict[T.Union[BuildTarget, BuildTargetOutput], float] = {}
+
         yaml_path = self.pyproject.get_extension_yaml_path(extension)
 
         if extension.defines:
             for dname, dvalue in extension.defines.items():
                 define_args += ["-D", f"{dname} {dvalue}"]
 
+        selected_name_transform = merge_name_transform_configs(
+            self.pyproject.project.name_transform,
+            extension.name_transform,
+        )
+
+        # arguments that are the same for every header
+        common_args = []
+        for inc in include_directories_uniq:
+            common_args += ["-I", inc]
+
+        common_args.extend(define_args)
+
+        # https://github.com/pkgconf/pkgconf/issues/391
+        common_args += ["-I", sysconfig.get_path("include")]
+
+        common_args += ["--cpp", self._cpp_macro]
+        common_args += ["--pp-cache-dir", PreprocessorCacheDir()]
+
+        common_args.extend(name_transform_config_to_args(selected_name_transform))
+
+        release_gil_policy = (
+            extension.release_gil_policy or self.pyproject.project.release_gil_policy
+        )
+        if release_gil_policy is not None:
+            common_args += ["--release-gil-policy", release_gil_policy.value]
+
+        headers = []
         for yml, hdr in self.pyproject.get_extension_headers(extension):
             yml_input = InputFile(yaml_path / f"{yml}.yml")
+            self.inputs.add_file(self.project_root / yml_input.path)
 
             try:
                 ayml = AutowrapConfigYaml.from_file(self.project_root / yml_input.path)
@@ -560,49 +705,74 @@ class _BuildPlanner:
             # find the source header
             h_input, h_root = self._locate_header(hdr, search_path)
 
-            selected_name_transform = merge_name_transform_configs(
-                self.pyproject.project.name_transform,
-                extension.name_transform,
-            )
-
-            header2dat_args = []
-            for inc in include_directories_uniq:
-                header2dat_args += ["-I", inc]
-
-            header2dat_args.extend(define_args)
-
-            # https://github.com/pkgconf/pkgconf/issues/391
-            header2dat_args += ["-I", sysconfig.get_path("include")]
+            headers.append((yml, yml_input, h_input, h_root, ayml))
+
+        batch: T.Optional[BuildTarget] = None
+        if extension.batch_parse_headers and headers:
+            # Parse all of the headers with a single command
+            batch_args = list(common_args)
+            for yml, yml_input, h_input, h_root, _ in headers:
+                batch_args += [
+                    "--header",
+                    yml,
+                    yml_input,
+                    h_input,
+                    h_root,
+                    OutputFile(f"{yml}.dat"),
+                ]
 
-            header2dat_args += ["--cpp", self._cpp_macro]
+            batch_args.append(all_type_casters)
+            batch_args.append(Depfile(f"{varname}.d"))
+            batch_args.append(CompilerInfo())
 
-            header2dat_args.extend(
-                name_transform_config_to_args(selected_name_transform)
+            batch = BuildTarget(
+                command="header2dat-batch", args=tuple(batch_args), install_path=None
             )
+            yield batch
+
+        for i, (yml, yml_input, h_input, h_root, ayml) in enumerate(headers):
+            datfile: T.Union[BuildTarget, BuildTargetOutput]
+            if batch is not None:
+                datfile = BuildTargetOutput(batch, i)
+            else:
+                header2dat_args = list(common_args)
+                header2dat_args.append(yml)
+                header2dat_args.append(yml_input)
+                header2dat_args.append(h_input)
+                header2dat_args.append(h_root)
+                header2dat_args.append(all_type_casters)
+                header2dat_args.append(OutputFile(f"{yml}.dat"))
+                header2dat_args.append(Depfile(f"{yml}.d"))
+                header2dat_args.append(CompilerInfo())
+
+                datfile = BuildTarget(
+                    command="header2dat",
+                    args=tuple(header2dat_args),
+                    install_path=None,
+                )
+                yield datfile
 
-            header2dat_args.append(yml)
-            header2dat_args.append(yml_input)
-            header2dat_args.append(h_input)
-            header2dat_args.append(h_root)
-            header2dat_args.append(all_type_casters)
-            header2dat_args.append(OutputFile(f"{yml}.dat"))
-            header2dat_args.append(Depfile(f"{yml}.d"))
-            header2dat_args.append(CompilerInfo())
-
-            datfile = BuildTarget(
-                command="header2dat", args=tuple(header2dat_args), install_path=None
-            )
-            yield datfile
             datfiles.append(datfile)
 
-            # Every header has a .cpp file for binding
-            cppfile = BuildTarget(
-                command="dat2cpp",
-                args=(datfile, OutputFile(f"{yml}.cpp")),
+        # Which trampolines a trampoline needs to include depends on the
+        # classes in all of the headers
+        trampoline_bases: T.Optional[BuildTarget] = None
+        if any(
+            not cls.ignore
+            for _, _, _, _, ayml in headers
+            for cls in ayml.classes.values()
+        ):
+            trampoline_bases = BuildTarget(
+                command="gen-trampoline-bases",
+                args=(OutputFile(f"{varname}.trampolines.pkl"), *datfiles),
                 install_path=None,
             )
-            module_sources.append(cppfile)
-            yield cppfile
+            yield trampoline_bases
+
+        for (yml, yml_input, h_input, h_root, ayml), datfile in zip(headers, datfiles):
+            # Every header has a .cpp file for binding
+            cpp_output = OutputFile(f"{yml}.cpp", install=False)
+            cpp_cost = estimate(self.compile_cost_weights, yaml_features(ayml))
 
             # Detect subpackages
             if ayml.defaults.subpackage:
@@ -624,6 +794,7 @@ class _BuildPlanner:
                     subpackages.add(e.subpackage)
 
             # Every class gets a trampoline file, but some just have #error in them
+            trampolines: T.List[T.Tuple[str, OutputFile]] = []
             for name, ctx in ayml.classes.items():
                 if ctx.ignore:
                     continue
@@ -633,39 +804,140 @@ class _BuildPlanner:
 
                 cls_ns, cls_name = _split_ns(name)
                 cls_ns = cls_ns.replace(":", "_")
-                trampoline = BuildTarget(
-                    command="dat2trampoline",
-                    args=(datfile, name, OutputFile(f"{cls_ns}__{cls_name}.hpp")),
-                    install_path=package_path / "trampolines",
-                )
-                module_sources.append(trampoline)
-                yield trampoline
+                trampolines.append((name, OutputFile(f"{cls_ns}__{cls_name}.hpp")))
 
             # Even more files if there are templates
+            # - Every template instantiation gets a cpp file to lessen compiler
+            #   memory requirements, all of which use the same hpp file
+            tmpl_cpps: T.List[T.Tuple[str, OutputFile]] = []
+            tmpl_hpp: T.Optional[OutputFile] = None
             if ayml.templates:
-
-                # Every template instantiation gets a cpp file to lessen compiler
-                # memory requirements
                 for i, (name, tctx) in enumerate(ayml.templates.items(), start=1):
                     if tctx.subpackage:
                         subpackages.add(tctx.subpackage)
 
-                    tmpl_cpp = BuildTarget(
-                        command="dat2tmplcpp",
-                        args=(datfile, name, OutputFile(f"{yml}_tmpl{i}.cpp")),
-                        install_path=None,
+                    tmpl_cpps.append(
+                        (name, OutputFile(f"{yml}_tmpl{i}.cpp", install=False))
                     )
-                    module_sources.append(tmpl_cpp)
-                    yield tmpl_cpp
 
-                # All of which use this hpp file
-                tmpl_hpp = BuildTarget(
+                tmpl_hpp = OutputFile(f"{yml}_tmpl.hpp", install=False)
+
+            if extension.single_pass_codegen:
+                # Render everything from a single load of the .dat file
+                dat2all_args: T.List[T.Union[str, BuildTarget, OutputFile]] = [
+                    datfile,
+                    cpp_output,
+                ]
+                for name, output in trampolines:
+                    dat2all_args += ["--trampoline", name, output]
+                if trampolines and trampoline_bases is not None:
+                    dat2all_args += ["--trampoline-bases", trampoline_bases]
+                for name, output in tmpl_cpps:
+                    dat2all_args += ["--tmpl-cpp", name, output]
+                if tmpl_hpp is not None:
+                    dat2all_args += ["--tmpl-hpp", tmpl_hpp]
+                if extension.class_chunk_size is not None:
+                    dat2all_args += [
+                        "--class-chunk-size",
+                        str(extension.class_chunk_size),
+                    ]
+
+                allfiles = BuildTarget(
+                    command="dat2all",
+                    args=tuple(dat2all_args),
+                    install_path=(
+                        (package_path / "trampolines") if trampolines else None
+                    ),
+                )
+                if extension.unity_shards > 0:
+                    # the .cpp file is compiled as part of a shard, but the
+                    # rest of the outputs are still needed
+                    unity_sources.append((datfile, BuildTargetOutput(allfiles, 0)))
+                    noutputs = sum(1 for a in dat2all_args if isinstance(a, OutputFile))
+                    for idx in range(1, noutputs):
+                        module_sources.append(BuildTargetOutput(allfiles, idx))
+                else:
+                    module_sources.append(allfiles)
+                    compile_costs[allfiles] = cpp_cost
+                yield allfiles
+                continue
+
+            dat2cpp_args: T.List[
+                T.Union[str, BuildTarget, BuildTargetOutput, OutputFile]
+            ] = [datfile, cpp_output]
+            if extension.class_chunk_size is not None:
+                dat2cpp_args += ["--class-chunk-size", str(extension.class_chunk_size)]
+
+            cppfile = BuildTarget(
+                command="dat2cpp",
+                args=tuple(dat2cpp_args),
+                install_path=None,
+            )
+            if extension.unity_shards > 0:
+                unity_sources.append((datfile, cppfile))
+            else:
+                module_sources.append(cppfile)
+                compile_costs[cppfile] = cpp_cost
+            yield cppfile
+
+            for name, output in trampolines:
+                trampoline_args: T.Tuple[
+                    T.Union[str, BuildTarget, BuildTargetOutput, OutputFile], ...
+                ] = (datfile, name, output)
+                if trampoline_bases is not None:
+                    trampoline_args += ("--trampoline-bases", trampoline_bases)
+                trampoline = BuildTarget(
+                    command="dat2trampoline",
+                    args=trampoline_args,
+                    install_path=package_path / "trampolines",
+                )
+                module_sources.append(trampoline)
+                yield trampoline
+
+            for name, output in tmpl_cpps:
+                tmpl_cpp = BuildTarget(
+                    command="dat2tmplcpp",
+                    args=(datfile, name, output),
+                    install_path=None,
+                )
+                module_sources.append(tmpl_cpp)
+                yield tmpl_cpp
+
+            if tmpl_hpp is not None:
+                tmpl_hpp_tgt = BuildTarget(
                     command="dat2tmplhpp",
-                    args=(datfile, OutputFile(f"{yml}_tmpl.hpp")),
+                    args=(datfile, tmpl_hpp),
                     install_path=None,
                 )
-                module_sources.append(tmpl_hpp)
-                yield tmpl_hpp
+                module_sources.append(tmpl_hpp_tgt)
+                yield tmpl_hpp_tgt
+
+        if unity_sources:
+            unity_args: T.List[T.Union[str, BuildTarget, BuildTargetOutput, OutputFile]]
+            unity_args = []
+            for i in range(1, extension.unity_shards + 1):
+                unity_args += [
+                    "--output",
+                    OutputFile(f"{varname}_unity{i}.cpp", install=False),
+                ]
+            for datfile, cpp in unity_sources:
+                unity_args += ["--source", datfile, cpp]
+            for name, weight in sorted(self.compile_cost.items()):
+                unity_args += ["--compile-cost", f"{name}={weight!r}"]
+
+            unity = BuildTarget(
+                command="gen-unity-cpp",
+                args=tuple(unity_args),
+                install_path=None,
+            )
+            module_sources.append(unity)
+            yield unity
+
+        # When ninja has no previous build times, it starts the compiles that
+        # are ready in the order that they appear in the module's sources, so
+        # the most expensive files are put first to keep them from being the
+        # last ones left to compile
+        module_sources.sort(key=lambda src: -compile_costs.get(src, 0.0))
 
         return datfiles, module_sources, subpackages
 
@@ -673,7 +945,7 @@ class _BuildPlanner:
         phdr = pathlib.PurePosixPath(hdr)
         for p in search_path:
             h_path = p / phdr
-            if h_path.exists():
+            if self.inputs.exists(h_path):
                 # We should return this as an InputFile, but inputs must be relative to the
                 # project root, which may not be the case on windows. Incremental build should
                 # still work, because the header is included in a depfile
@@ -683,7 +955,11 @@ class _BuildPlanner:
         )
 
 
-def makeplan(project_root: pathlib.Path, missing_yaml_ok: bool = False) -> T.Generator[
+def makeplan(
+    project_root: pathlib.Path,
+    missing_yaml_ok: bool = False,
+    inputs: T.Optional[PlanInputs] = None,
+) -> T.Generator[
     T.Union[BuildTarget, Entrypoint, LocalDependency, ExtensionModule, CppMacroValue],
     None,
 ]:
@@ -691,8 +967,11 @@ def makeplan(project_root: pathlib.Path, missing_yaml_ok: bool = False) -> T.Gen
     Given the pyproject.toml configuration for a semiwrap project, reads the
     configuration and generates a series of commands that can be used to parse
     the input headers and generate the needed source code from them.
+
+    If inputs is specified, the files that the plan depends on are recorded
+    in it.
     """
-    planner = _BuildPlanner(project_root, missing_yaml_ok)
+    planner = _BuildPlanner(project_root, missing_yaml_ok, inputs)
     yield from planner.generate()
 
 
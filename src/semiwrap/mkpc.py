@@ -2,7 +2,7 @@ import pathlib
 import typing as T
 
 from .pkgconf_cache import INITPY_VARNAME
-from .util import relpath_walk_up
+from .util import maybe_write_file, relpath_walk_up
 
 
 def make_pc_file(
@@ -48,4 +48,4 @@ def make_pc_file(
 
     pc_content.append("")
 
-    pcfile.write_text("\n".join(pc_content), encoding="utf-8")
+    maybe_write_file(pcfile, "\n".join(pc_content), encoding="utf-8")
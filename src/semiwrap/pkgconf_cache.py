@@ -1,5 +1,23 @@
+"""
+Queries pkgconf for information about dependencies
+
+pkgconf can only answer one kind of query per process, so each field of a
+package is a separate query that is only ran the first time the field is
+used. The results are stored in a record for the package, which is saved to
+an on-disk cache that is shared by every semiwrap command. Records are
+reused as long as pkgconf would still find the same .pc file (and the .pc
+files of its requirements) with the same mtime.
+
+The cache is stored in the user's cache directory, or in
+SEMIWRAP_PKGCONF_CACHE_DIR if set. Set SEMIWRAP_PKGCONF_CACHE=0 to disable
+it, and SEMIWRAP_PKGCONF_DEBUG=1 to print each pkgconf command that is ran.
+"""
+
+import json
+import os
 import pathlib
 import shlex
+import sys
 import typing as T
 
 import pkgconf
@@ -7,90 +25,293 @@ import pkgconf
 
 INITPY_VARNAME = "pkgconf_pypi_initpy"
 
+CACHE_ENV = "SEMIWRAP_PKGCONF_CACHE"
+CACHE_DIR_ENV = "SEMIWRAP_PKGCONF_CACHE_DIR"
+DEBUG_ENV = "SEMIWRAP_PKGCONF_DEBUG"
+
+#: Increment this when the content of a record changes
+CACHE_VERSION = 1
+
+#: Environment variables that change what pkgconf returns
+_ENV_VARS = (
+    "PKG_CONFIG_PATH",
+    "PKG_CONFIG_LIBDIR",
+    "PKG_CONFIG_SYSROOT_DIR",
+    "PKG_CONFIG_TOP_BUILD_DIR",
+    "PKGCONF_PYPI_EMBEDDED_ONLY",
+)
+
+_spawn_count = 0
+
+
+def spawn_count() -> int:
+    """Number of pkgconf processes that this process has started"""
+    return _spawn_count
+
+
+def _run_pkgconf(name: str, *args: str) -> str:
+    global _spawn_count
+    _spawn_count += 1
+
+    if os.environ.get(DEBUG_ENV) == "1":
+        cmd = shlex.join(("pkgconf", name, *args))
+        print(f"semiwrap: [{_spawn_count}] {cmd}", file=sys.stderr)
+
+    r = pkgconf.run_pkgconf(name, *args, capture_output=True)
+    if r.returncode != 0:
+        msg = [f"Package '{name}' is not installed"]
+        if r.stderr:
+            msg.append("")
+            msg.append(f"> " + "\n> ".join(r.stderr.decode("utf-8").splitlines()))
+        raise RuntimeError("\n".join(msg))
+
+    return r.stdout.decode("utf-8").strip()
+
+
+def _parse_include_path(raw: str) -> T.List[str]:
+    include_path = []
+    for i in shlex.split(raw):
+        assert i.startswith("-I")
+        include_path.append(str(pathlib.Path(i[2:]).absolute()))
+    return include_path
+
+
+def pkg_config_dirs() -> T.List[str]:
+    """The directories that pkgconf.run_pkgconf searches first, in order"""
+    dirs = [d for d in os.environ.get("PKG_CONFIG_PATH", "").split(os.pathsep) if d]
+    dirs.extend(os.fspath(d) for d in pkgconf.get_pkg_config_path())
+    return list(dict.fromkeys(dirs))
+
+
+def _locate_pc(name: str) -> T.Optional[pathlib.Path]:
+    """
+    Finds the .pc file that pkgconf would use without running it. Returns
+    None if it can't be determined.
+    """
+    for d in pkg_config_dirs():
+        dpath = pathlib.Path(d)
+        if (dpath / f"{name}-uninstalled.pc").exists():
+            return None
+        pc_path = dpath / f"{name}.pc"
+        if pc_path.exists():
+            return pc_path
+    return None
+
+
+def _stat_mtime(path: pathlib.Path) -> T.Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _samefile(a: str, b: pathlib.Path) -> bool:
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def _query(name: str) -> T.Dict[str, T.Any]:
+    """Queries the fields that are needed to check if a record is valid"""
+    pc_path = pathlib.Path(_run_pkgconf(name, "--path"))
+    raw_requires = _run_pkgconf(name, "--print-requires")
+
+    type_caster_cfg = pc_path.with_suffix(".pybind11.json")
+
+    return {
+        "pc_path": str(pc_path),
+        "pc_mtime": _stat_mtime(pc_path),
+        "type_casters_mtime": _stat_mtime(type_caster_cfg),
+        "requires": [r for r in raw_requires.split("\n") if r],
+        "type_casters_path": (
+            str(type_caster_cfg) if type_caster_cfg.exists() else None
+        ),
+    }
+
+
+def _query_field(name: str, key: str) -> T.Any:
+    """Queries one of the other fields of a record"""
+    if key == "include_path":
+        raw = _run_pkgconf(name, "--cflags-only-I", "--maximum-traverse-depth=1")
+        return _parse_include_path(raw)
+    elif key == "full_include_path":
+        return _parse_include_path(_run_pkgconf(name, "--cflags-only-I"))
+    elif key == "libinit_py":
+        return _run_pkgconf(name, f"--variable={INITPY_VARNAME}") or None
+    raise KeyError(key)
+
+
+def default_cache_path() -> T.Optional[pathlib.Path]:
+    """Location of the on-disk cache, or None if it is disabled"""
+    if os.environ.get(CACHE_ENV) == "0":
+        return None
+
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if cache_dir:
+        return pathlib.Path(cache_dir) / "pkgconf.json"
+
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+
+    if not base:
+        return None
+
+    return pathlib.Path(base) / "semiwrap" / "pkgconf.json"
+
+
+class _DiskCache:
+    """Records of pkgconf queries, stored in a JSON file"""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self.records: T.Dict[str, T.Dict[str, T.Any]] = {}
+        self._valid: T.Dict[str, bool] = {}
+
+        # records are only valid for the same pkgconf and environment
+        self.env = [pkgconf.__version__] + [os.environ.get(v) for v in _ENV_VARS]
+
+        try:
+            with open(path) as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return
+
+        if (
+            isinstance(data, dict)
+            and data.get("version") == CACHE_VERSION
+            and data.get("env") == self.env
+        ):
+            self.records = data["records"]
+
+    def get(self, name: str) -> T.Optional[T.Dict[str, T.Any]]:
+        if self._is_valid(name, set()):
+            return self.records[name]
+        return None
+
+    def _is_valid(self, name: str, visiting: T.Set[str]) -> bool:
+        valid = self._valid.get(name)
+        if valid is not None:
+            return valid
+
+        record = self.records.get(name)
+        if record is None:
+            return False
+
+        # requirements may be circular
+        if name in visiting:
+            return True
+        visiting.add(name)
+
+        pc_path = _locate_pc(name)
+        valid = (
+            pc_path is not None
+            and _samefile(record["pc_path"], pc_path)
+            and _stat_mtime(pc_path) == record["pc_mtime"]
+            and _stat_mtime(pc_path.with_suffix(".pybind11.json"))
+            == record["type_casters_mtime"]
+            and all(self._is_valid(req, visiting) for req in record["requires"])
+        )
+
+        self._valid[name] = valid
+        return valid
+
+    def put(self, name: str, record: T.Dict[str, T.Any]) -> None:
+        if self.records.get(name) is not record:
+            self.records[name] = record
+            self._valid.pop(name, None)
+
+        data = {"version": CACHE_VERSION, "env": self.env, "records": self.records}
+
+        # The cache is an optimization, so don't fail if it can't be written
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, indent=1))
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
 
 class CacheEntry:
 
-    def __init__(self, name: str) -> None:
+    def __init__(self, name: str, cache: "PkgconfCache") -> None:
         self.name = name
         self.manual = False
+        self._cache = cache
+        self._record: T.Optional[T.Dict[str, T.Any]] = None
 
-    def _get_pkgconf_data(self, *args) -> str:
-        r = pkgconf.run_pkgconf(self.name, *args, capture_output=True)
-        if r.returncode != 0:
-            msg = [f"Package '{self.name}' is not installed"]
-            if r.stderr:
-                msg.append("")
-                msg.append(f"> " + "\n> ".join(r.stderr.decode("utf-8").splitlines()))
-            raise RuntimeError("\n".join(msg))
+    @property
+    def record(self) -> T.Dict[str, T.Any]:
+        if self._record is None:
+            self._record = self._cache._load(self.name)
+        return self._record
 
-        return r.stdout.decode("utf-8").strip()
+    def _field(self, key: str) -> T.Any:
+        record = self.record
+        if key not in record:
+            record[key] = _query_field(self.name, key)
+            self._cache._store(self.name, record)
+        return record[key]
 
     @property
     def requires(self) -> T.List[str]:
-        if not hasattr(self, "_requires"):
-            raw = self._get_pkgconf_data("--print-requires")
-            self._requires = [r for r in raw.split("\n") if r]
-
-        return self._requires
+        return self.record["requires"]
 
     @property
     def include_path(self) -> T.List[pathlib.Path]:
         """Only the include path for this package"""
-        if not hasattr(self, "_include_path"):
-            include_path = []
-            raw = self._get_pkgconf_data(
-                "--cflags-only-I", "--maximum-traverse-depth=1"
-            )
-            for i in shlex.split(raw):
-                assert i.startswith("-I")
-                include_path.append(pathlib.Path(i[2:]).absolute())
-
-            self._include_path = include_path
-
-        return self._include_path
+        return [pathlib.Path(p) for p in self._field("include_path")]
 
     @property
     def full_include_path(self) -> T.List[pathlib.Path]:
         """Include path for this package and requirements"""
-        if not hasattr(self, "_full_include_path"):
-            full_include_path = []
-            raw = self._get_pkgconf_data("--cflags-only-I")
-            for i in shlex.split(raw):
-                assert i.startswith("-I")
-                full_include_path.append(pathlib.Path(i[2:]).absolute())
-
-            self._full_include_path = full_include_path
-
-        return self._full_include_path
+        return [pathlib.Path(p) for p in self._field("full_include_path")]
 
     @property
     def type_casters_path(self) -> T.Optional[pathlib.Path]:
-        if not hasattr(self, "_type_casters_path"):
-            raw = self._get_pkgconf_data("--path")
-            pc_path = pathlib.Path(raw)
-            type_caster_cfg = pc_path.with_suffix(".pybind11.json")
-            if type_caster_cfg.exists():
-                self._type_casters_path = type_caster_cfg
-            else:
-                self._type_casters_path = None
-
-        return self._type_casters_path
+        tc = self.record["type_casters_path"]
+        return pathlib.Path(tc) if tc is not None else None
 
     @property
     def libinit_py(self) -> T.Optional[str]:
-        if not hasattr(self, "_libinit_py"):
-            raw = self._get_pkgconf_data(f"--variable={INITPY_VARNAME}")
-            if raw:
-                self._libinit_py = raw
-            else:
-                self._libinit_py = None
-
-        return self._libinit_py
+        return self._field("libinit_py")
 
 
 class PkgconfCache:
-    def __init__(self) -> None:
+    def __init__(self, cache_path: T.Optional[pathlib.Path] = None) -> None:
         self._cache: T.Dict[str, CacheEntry] = {}
+        self._loading: T.Set[str] = set()
+
+        if cache_path is None:
+            cache_path = default_cache_path()
+        self._disk = _DiskCache(cache_path) if cache_path is not None else None
+
+    def _load(self, name: str) -> T.Dict[str, T.Any]:
+        if self._disk is not None:
+            record = self._disk.get(name)
+            if record is not None:
+                return record
+
+        record = _query(name)
+
+        if self._disk is not None:
+            # a record is only valid if the records of its requirements are
+            self._loading.add(name)
+            try:
+                for req in record["requires"]:
+                    if req not in self._loading:
+                        self.get(req).record
+            finally:
+                self._loading.discard(name)
+            self._disk.put(name, record)
+
+        return record
+
+    def _store(self, name: str, record: T.Dict[str, T.Any]) -> None:
+        if self._disk is not None:
+            self._disk.put(name, record)
 
     def add_local(
         self,
@@ -100,21 +321,25 @@ class PkgconfCache:
         libinit_py: T.Optional[str] = None,
     ) -> CacheEntry:
         assert name not in self._cache
-        entry = CacheEntry(name)
+        entry = CacheEntry(name, self)
         entry.manual = True
-        entry._include_path = [inc.absolute() for inc in includes]
-        entry._full_include_path = entry._include_path[:]
-        entry._libinit_py = libinit_py
-        entry._type_casters_path = None
-        entry._requires = requires[:]
+        include_path = [str(inc.absolute()) for inc in includes]
+        full_include_path = include_path[:]
         for req in requires:
             dep = self.get(req)
-            entry._full_include_path.extend(dep.full_include_path)
+            full_include_path.extend(map(str, dep.full_include_path))
+        entry._record = {
+            "requires": requires[:],
+            "include_path": include_path,
+            "full_include_path": full_include_path,
+            "type_casters_path": None,
+            "libinit_py": libinit_py,
+        }
         self._cache[name] = entry
         return entry
 
     def get(self, depname: str) -> CacheEntry:
         entry = self._cache.get(depname)
         if entry is None:
-            self._cache[depname] = entry = CacheEntry(depname)
+            self._cache[depname] = entry = CacheEntry(depname, self)
         return entry
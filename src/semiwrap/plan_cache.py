@@ -0,0 +1,170 @@
+"""
+Caches the meson.build files rendered by the hatchling hook
+
+Rendering requires planning the build, which reads pyproject.toml and every
+YAML file, runs pkgconf for each dependency, and searches for each header.
+The plan only changes when one of those inputs changes, so the rendered
+output is stored together with a record of the inputs that produced it,
+and reused as long as all of them are unchanged.
+
+Set SEMIWRAP_PLAN_CACHE=0 to disable the cache.
+"""
+
+import hashlib
+import os
+import pathlib
+import pickle
+import sys
+import sysconfig
+import typing as T
+
+from .header_cache import semiwrap_fingerprint
+from .pkgconf_cache import pkg_config_dirs
+from .util import PICKLE_PROTOCOL
+
+CACHE_ENV = "SEMIWRAP_PLAN_CACHE"
+
+#: Environment variables that affect the plan or the rendered output
+ENV_VARS = (
+    "_PYTHON_HOST_PLATFORM",
+    "PYTHON_CROSSENV",
+    "SEMIWRAP_SKIP_PYI",
+    "SEMIWRAP_CODEGEN_WORKER",
+    "PKG_CONFIG_PATH",
+    "PKG_CONFIG_LIBDIR",
+    "PKG_CONFIG_SYSROOT_DIR",
+    "PKGCONF_PYPI_EMBEDDED_ONLY",
+)
+
+#: Files in the pkg-config search path that are used by the plan
+_PKGCONF_GLOBS = ("*.pc", "*.pybind11.json")
+
+
+def _hash_file(path: pathlib.Path) -> T.Optional[str]:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _list_dir(path: pathlib.Path) -> T.List[T.Tuple[str, int, int]]:
+    entries = []
+    for pattern in _PKGCONF_GLOBS:
+        for p in path.glob(pattern):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((p.name, st.st_mtime_ns, st.st_size))
+    return sorted(entries)
+
+
+class PlanInputs:
+    """
+    Records the files that a build plan was derived from, so that it can
+    be determined later whether the plan is still valid
+    """
+
+    def __init__(self) -> None:
+        #: file path: sha256 of contents, or None if it didn't exist
+        self.files: T.Dict[str, T.Optional[str]] = {}
+
+        #: path: whether it existed
+        self.probes: T.Dict[str, bool] = {}
+
+        #: pkg-config search directory: .pc and type caster files in it
+        self.dirs: T.Dict[str, T.List[T.Tuple[str, int, int]]] = {}
+
+    def add_file(self, path: pathlib.Path) -> None:
+        """Records a file whose content was used"""
+        key = os.fspath(path)
+        if key not in self.files:
+            self.files[key] = _hash_file(path)
+
+    def exists(self, path: pathlib.Path) -> bool:
+        """Checks whether a file exists and records the result"""
+        key = os.fspath(path)
+        exists = self.probes.get(key)
+        if exists is None:
+            self.probes[key] = exists = path.exists()
+        return exists
+
+    def add_pkg_config_dirs(self) -> None:
+        """Records the contents of the pkg-config search path"""
+        for d in pkg_config_dirs():
+            if d not in self.dirs:
+                self.dirs[d] = _list_dir(pathlib.Path(d))
+
+    def is_current(self) -> bool:
+        """Returns True if none of the recorded inputs have changed"""
+        if list(self.dirs) != pkg_config_dirs():
+            return False
+
+        for d, entries in self.dirs.items():
+            if _list_dir(pathlib.Path(d)) != entries:
+                return False
+
+        for path, exists in self.probes.items():
+            if pathlib.Path(path).exists() != exists:
+                return False
+
+        for path, digest in self.files.items():
+            if _hash_file(pathlib.Path(path)) != digest:
+                return False
+
+        return True
+
+
+def _make_key(*parts: str) -> T.Tuple[str, ...]:
+    env = [f"{name}={os.environ.get(name)}" for name in ENV_VARS]
+    return (
+        semiwrap_fingerprint().hex(),
+        sys.executable,
+        sys.version,
+        sysconfig.get_path("include"),
+        *env,
+        *parts,
+    )
+
+
+class PlanCache:
+    """
+    Stores a single rendered plan and the inputs that it was derived from
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+
+    @classmethod
+    def from_env(cls, path: pathlib.Path) -> T.Optional["PlanCache"]:
+        """Returns None if the cache is disabled by the environment"""
+        if os.environ.get(CACHE_ENV) == "0":
+            return None
+        return cls(path)
+
+    def get(self, *key: str) -> T.Any:
+        """
+        Returns the cached result if it was stored with the same key and
+        none of its inputs have changed, otherwise None
+        """
+        try:
+            with open(self.path, "rb") as fp:
+                stored_key, inputs, result = pickle.load(fp)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # corrupt or written by an incompatible version
+            return None
+
+        if stored_key != _make_key(*key) or not inputs.is_current():
+            return None
+
+        return result
+
+    def put(self, inputs: PlanInputs, result: T.Any, *key: str) -> None:
+        data = pickle.dumps((_make_key(*key), inputs, result), protocol=PICKLE_PROTOCOL)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, self.path)
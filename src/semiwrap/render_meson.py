@@ -20,8 +20,10 @@ from .makeplan import (
     TrampolineIncludeRoot,
     CppMacroValue,
     CompilerInfo,
+    PreprocessorCacheDir,
     makeplan,
 )
+from .plan_cache import PlanCache, PlanInputs
 from .util import maybe_write_file, relpath_walk_up
 
 # String escaping stolen from meson source code, Apache 2.0 license
@@ -40,6 +42,28 @@ ESCAPE_SEQUENCE_SINGLE_RE = re.compile(
 )
 
 
+#: meson variable suffix: semiwrap.cmd module
+_SW_COMMANDS = {
+    "gen_libinit_py": "gen_libinit",
+    "gen_pkgconf": "gen_pkgconf",
+    "publish_casters": "publish_casters",
+    "resolve_casters": "resolve_casters",
+    "header2dat": "header2dat",
+    "header2dat_batch": "header2dat_batch",
+    "dat2all": "dat2all",
+    "dat2cpp": "dat2cpp",
+    "dat2trampoline": "dat2trampoline",
+    "dat2tmplcpp": "dat2tmplcpp",
+    "dat2tmplhpp": "dat2tmplhpp",
+    "dat2pyi": "dat2pyi",
+    "gen_modinit_hpp": "gen_modinit_hpp",
+    "gen_pch_hpp": "gen_pch_hpp",
+    "gen_trampoline_bases": "gen_trampoline_bases",
+    "gen_unity_cpp": "gen_unity_cpp",
+    "make_pyi": "make_pyi",
+}
+
+
 def _decode_match(match: T.Match[str]) -> str:
     return codecs.decode(match.group(0).encode(), "unicode_escape")
 
@@ -57,6 +81,7 @@ VarTypes = T.Union[
     LocalDependency,
     CppMacroValue,
     CompilerInfo,
+    PreprocessorCacheDir,
 ]
 
 
@@ -95,6 +120,8 @@ class VarCache:
                 var = f"_sw_cpp_var_{name}"
             elif isinstance(item, CompilerInfo):
                 name = var = "_sw_compiler_info"
+            elif isinstance(item, PreprocessorCacheDir):
+                var = "_sw_pp_cache_dir"
             else:
                 assert False
 
@@ -133,7 +160,7 @@ def _render_build_target(r: RenderBuffer, vc: VarCache, bt: BuildTarget):
         elif isinstance(arg, ExtensionModule):
             cmd.append(f"'@INPUT{len(tinput)}@'")
             tinput.append(vc.getvar(arg))
-        elif isinstance(arg, (CppMacroValue, CompilerInfo)):
+        elif isinstance(arg, (CppMacroValue, CompilerInfo, PreprocessorCacheDir)):
             cmd.append(vc.getvar(arg))
         else:
             assert False, f"unexpected {arg!r} in {bt}"
@@ -151,9 +178,17 @@ def _render_build_target(r: RenderBuffer, vc: VarCache, bt: BuildTarget):
 
         if bt.install_path is not None:
             install_path = _make_string(bt.install_path.as_posix())
-            r.writeln(
-                f"install_dir: sw_py.get_install_dir(pure: false) / {install_path},"
-            )
+            install_dir = f"sw_py.get_install_dir(pure: false) / {install_path}"
+            outputs = [arg for arg in bt.args if isinstance(arg, OutputFile)]
+            if all(o.install for o in outputs):
+                r.writeln(f"install_dir: {install_dir},")
+            else:
+                # meson accepts one install_dir per output, false skips it
+                _render_meson_args(
+                    r,
+                    "install_dir",
+                    [install_dir if o.install else "false" for o in outputs],
+                )
             r.writeln("install: true,")
 
     r.writeln(")")
@@ -218,14 +253,17 @@ def _render_module_stage0(
             r.writeln("compile_args: [")
             with r.indent():
                 for dname, dvalue in m.defines:
-                    r.writeln(_make_string(f"-D{dname}={dvalue}"))
+                    r.writeln(_make_string(f"-D{dname}={dvalue}") + ",")
             r.writeln("],")
 
         if m.sources:
             r.writeln("sources: [")
             with r.indent():
                 for src in m.sources:
-                    r.writeln(f"{vc.getvar(src)},")
+                    if isinstance(src, BuildTargetOutput):
+                        r.writeln(f"{vc.getvar(src.target)}[{src.output_index}],")
+                    else:
+                        r.writeln(f"{vc.getvar(src)},")
 
             r.writeln("],")
 
@@ -276,6 +314,12 @@ def _render_module_stage1(
         if m.include_directories:
             _render_include_directories(r, m.include_directories, meson_build_path)
 
+        if m.precompiled_header:
+            pch = m.precompiled_header
+            if meson_build_path:
+                pch = relpath_walk_up(pch, meson_build_path.parent)
+            r.writeln(f"cpp_pch: {_make_string(pch.as_posix())},")
+
     r.writeln(")")
     r.writeln()
 
@@ -285,6 +329,7 @@ def render_meson(
     stage0_path: T.Optional[pathlib.Path],
     stage1_path: T.Optional[pathlib.Path],
     trampolines_path: T.Optional[pathlib.Path],
+    inputs: T.Optional[PlanInputs] = None,
 ) -> T.Tuple[str, str, str, T.List[Entrypoint]]:
     """
     Returns the contents of two meson.build files that build on each other, and
@@ -311,24 +356,34 @@ def render_meson(
         sw_py = import('python').find_installation()
         
         # internal commands for the autowrap machinery
-        _sw_cmd_gen_libinit_py = [sw_py, '-m', 'semiwrap.cmd.gen_libinit']
-        _sw_cmd_gen_pkgconf = [sw_py, '-m', 'semiwrap.cmd.gen_pkgconf']
-        _sw_cmd_publish_casters = [sw_py, '-m', 'semiwrap.cmd.publish_casters']
-        _sw_cmd_resolve_casters = [sw_py, '-m', 'semiwrap.cmd.resolve_casters']
-        _sw_cmd_header2dat = [sw_py, '-m', 'semiwrap.cmd.header2dat']
-        _sw_cmd_dat2cpp = [sw_py, '-m', 'semiwrap.cmd.dat2cpp']
-        _sw_cmd_dat2trampoline = [sw_py, '-m', 'semiwrap.cmd.dat2trampoline']
-        _sw_cmd_dat2tmplcpp = [sw_py, '-m', 'semiwrap.cmd.dat2tmplcpp']
-        _sw_cmd_dat2tmplhpp = [sw_py, '-m', 'semiwrap.cmd.dat2tmplhpp']
-        _sw_cmd_gen_modinit_hpp = [sw_py, '-m', 'semiwrap.cmd.gen_modinit_hpp']
-        _sw_cmd_make_pyi = [sw_py, '-m', 'semiwrap.cmd.make_pyi']
+    """
+    )
+
+    # The codegen worker keeps a warm python process around to run the
+    # commands instead of starting a new interpreter for each one
+    use_worker = os.environ.get("SEMIWRAP_CODEGEN_WORKER") == "1"
+    if use_worker:
+        r0.writeln(
+            "_sw_worker = [sw_py, '-m', 'semiwrap.cmd.worker', meson.project_build_root()]"
+        )
+
+    for varname, modname in _SW_COMMANDS.items():
+        if use_worker:
+            r0.writeln(f"_sw_cmd_{varname} = _sw_worker + ['{modname}']")
+        else:
+            r0.writeln(f"_sw_cmd_{varname} = [sw_py, '-m', 'semiwrap.cmd.{modname}']")
 
+    r0.writeln()
+    r0.write_trim(
+        """
         _sw_compiler_info = [
             meson.get_compiler('cpp').get_argument_syntax(),
             get_option('cpp_std'),
             meson.get_compiler('cpp').cmd_array()
         ]
 
+        _sw_pp_cache_dir = meson.current_build_dir() / 'semiwrap-pp-cache'
+
         #
         # internal custom targets for generating wrappers
         #
@@ -340,21 +395,26 @@ def render_meson(
     #     meson file easier to read, but I think expanded custom targets
     #     is simpler to generate
 
-    plan = makeplan(pathlib.Path(project_root))
+    plan = makeplan(pathlib.Path(project_root), inputs=inputs)
     macros: T.List[CppMacroValue] = []
     build_targets: T.List[BuildTarget] = []
     modules: T.List[ExtensionModule] = []
     pyi_targets: T.List[BuildTarget] = []
     local_deps: T.List[LocalDependency] = []
     trampoline_targets: T.List[BuildTarget] = []
+    unity_targets: T.List[BuildTarget] = []
 
     for item in plan:
         if isinstance(item, BuildTarget):
             if item.command == "make-pyi":
                 # defer these to the end
                 pyi_targets.append(item)
-            elif item.command == "dat2trampoline":
+            elif item.command in ("dat2trampoline", "dat2all"):
+                # trampoline headers must be output to the trampolines directory
                 trampoline_targets.append(item)
+            elif item.command == "gen-unity-cpp":
+                # these may use the outputs of targets in the trampolines directory
+                unity_targets.append(item)
             else:
                 build_targets.append(item)
         elif isinstance(item, ExtensionModule):
@@ -416,6 +476,11 @@ def render_meson(
         r0.writeln()
         r0.writeln("subdir('trampolines')")
 
+    if unity_targets:
+        r0.writeln()
+        for target in unity_targets:
+            _render_build_target(r0, vc, target)
+
     if modules:
         r0.writeln()
         r0.write_trim(
@@ -451,14 +516,26 @@ def render_meson_to_file(
     stage0: pathlib.Path,
     stage1: pathlib.Path,
     trampolines: pathlib.Path,
+    plan_cache: T.Optional[PlanCache] = None,
 ) -> T.List[Entrypoint]:
 
     # because of https://github.com/mesonbuild/meson/issues/2320
     assert trampolines.parent.parent == stage0.parent
 
-    s0_content, s1_content, t_content, eps = render_meson(
-        pathlib.Path(project_root), stage0, stage1, trampolines
-    )
+    key = tuple(map(str, (project_root, stage0, stage1, trampolines)))
+    result = None
+    if plan_cache is not None:
+        result = plan_cache.get(*key)
+
+    if result is None:
+        inputs = PlanInputs()
+        result = render_meson(
+            pathlib.Path(project_root), stage0, stage1, trampolines, inputs
+        )
+        if plan_cache is not None:
+            plan_cache.put(inputs, result, *key)
+
+    s0_content, s1_content, t_content, eps = result
 
     maybe_write_file(stage0, s0_content, encoding="utf-8")
     maybe_write_file(stage1, s1_content, encoding="utf-8")
@@ -2,6 +2,9 @@ import argparse
 import sys
 
 from .build_dep import BuildDep
+from .compile_costs import CompileCosts
+from .header_cache import HeaderCacheInfo
+from .include_fanout import IncludeFanout
 from .update_yaml import YamlUpdater
 from .create_imports import ImportCreator, UpdateInit
 from .scan_headers import HeaderScanner
@@ -19,6 +22,9 @@ def main():
         HeaderScanner,
         ImportCreator,
         UpdateInit,
+        HeaderCacheInfo,
+        CompileCosts,
+        IncludeFanout,
     ):
         cls.add_subparser(parent_parser, subparsers).set_defaults(cls=cls)
 
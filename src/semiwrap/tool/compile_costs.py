@@ -0,0 +1,141 @@
+import json
+import pathlib
+import shlex
+import subprocess
+import sys
+import tempfile
+import typing as T
+
+from ..autowrap.datfile import DatFile
+from ..compile_cost import FEATURES, estimate, fit, yaml_features
+from ..config.autowrap_yml import AutowrapConfigYaml
+
+# Runs a compile in a new process, so that the peak memory of the processes
+# that it waits for only includes the compiler
+_MEASURE_SCRIPT = """
+import resource, subprocess, sys, time
+start = time.perf_counter()
+subprocess.check_call(sys.argv[1:])
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+"""
+
+
+def _read_ninja_log(path: pathlib.Path) -> T.Dict[str, float]:
+    # output: seconds, the last entry for an output is the most recent
+    times = {}
+    with open(path) as fp:
+        for line in fp:
+            if line.startswith("#"):
+                continue
+            start, end, _, output, _ = line.rstrip("\n").split("\t")
+            times[output] = (int(end) - int(start)) / 1000
+    return times
+
+
+def _measure(entry: T.Dict[str, T.Any], tmpdir: pathlib.Path) -> T.Tuple[float, int]:
+    args = entry.get("arguments") or shlex.split(entry["command"])
+
+    # don't overwrite the outputs of the build
+    args = list(args)
+    for flag in ("-o", "-MF"):
+        if flag in args:
+            idx = args.index(flag) + 1
+            args[idx] = str(tmpdir / f"out{flag}")
+
+    out = subprocess.check_output(
+        [sys.executable, "-c", _MEASURE_SCRIPT, *args], cwd=entry["directory"]
+    )
+    elapsed, maxrss = out.split()[-2:]
+
+    # ru_maxrss is in bytes on macOS, and in kilobytes everywhere else
+    mb = int(maxrss) // (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return float(elapsed), mb
+
+
+class CompileCosts:
+    @classmethod
+    def add_subparser(cls, parent_parser, subparsers):
+        parser = subparsers.add_parser(
+            "compile-costs",
+            help="Fit the compile_cost weights to the compile times of a build",
+            parents=[parent_parser],
+        )
+        parser.add_argument(
+            "build_dir",
+            type=pathlib.Path,
+            help="meson build directory of a completed build",
+        )
+        parser.add_argument(
+            "--measure",
+            action="store_true",
+            help="Compile each generated file again one at a time, to measure its "
+            "compile time without other compiles running and its peak memory use",
+        )
+        return parser
+
+    def run(self, args):
+        build_dir: pathlib.Path = args.build_dir
+        compile_commands = build_dir / "compile_commands.json"
+        ninja_log = build_dir / ".ninja_log"
+
+        if not compile_commands.exists() or not ninja_log.exists():
+            print(
+                f"ERROR: {build_dir} does not contain a completed meson build",
+                file=sys.stderr,
+            )
+            return False
+
+        if args.measure and sys.platform == "win32":
+            print("ERROR: --measure is not supported on Windows", file=sys.stderr)
+            return False
+
+        with open(compile_commands) as fp:
+            entries = json.load(fp)
+
+        times = _read_ninja_log(ninja_log)
+
+        # the .cpp file generated for each header is next to its .dat file
+        rows = []
+        for entry in entries:
+            src = pathlib.Path(entry["directory"]) / entry["file"]
+            dat = src.with_suffix(".dat")
+            if not dat.exists():
+                continue
+
+            output = entry.get("output")
+            if output not in times:
+                continue
+
+            hctx = DatFile.load(dat).get_partial_header()
+            try:
+                ayml = AutowrapConfigYaml.from_file(hctx.orig_yaml)
+            except FileNotFoundError:
+                ayml = AutowrapConfigYaml()
+
+            rows.append([src.name, yaml_features(ayml), times[output], None, entry])
+
+        if not rows:
+            print(f"ERROR: no generated files found in {build_dir}", file=sys.stderr)
+            return False
+
+        if args.measure:
+            with tempfile.TemporaryDirectory() as tmp:
+                for i, row in enumerate(rows, start=1):
+                    print(f"[{i}/{len(rows)}] compiling {row[0]}", flush=True)
+                    row[2], row[3] = _measure(row[4], pathlib.Path(tmp))
+
+        weights = fit([(features, seconds) for _, features, seconds, _, _ in rows])
+
+        rows.sort(key=lambda row: -row[2])
+        width = max(len(row[0]) for row in rows)
+        print(f"{'source':<{width}}  {'estimate':>8}  {'actual':>8}  {'memory':>8}")
+        for name, features, seconds, mb, _ in rows:
+            mem = f"{mb}MB" if mb is not None else "-"
+            est = estimate(weights, features)
+            print(f"{name:<{width}}  {est:>7.1f}s  {seconds:>7.1f}s  {mem:>8}")
+
+        print()
+        print("[tool.semiwrap.compile_cost]")
+        for name in ("base", *FEATURES):
+            print(f"{name} = {weights[name]:.4g}")
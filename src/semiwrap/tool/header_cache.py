@@ -0,0 +1,53 @@
+import os
+import pathlib
+import sys
+
+from ..header_cache import CACHE_DIR_ENV, HeaderCache
+
+
+class HeaderCacheInfo:
+    @classmethod
+    def add_subparser(cls, parent_parser, subparsers):
+        parser = subparsers.add_parser(
+            "header-cache",
+            help="Show statistics for the header2dat result cache",
+            parents=[parent_parser],
+        )
+        parser.add_argument(
+            "--dir",
+            type=pathlib.Path,
+            default=os.environ.get(CACHE_DIR_ENV),
+            help=f"Cache directory (default: ${CACHE_DIR_ENV})",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Remove all cache entries and statistics",
+        )
+        return parser
+
+    def run(self, args):
+        if not args.dir:
+            print(
+                f"ERROR: specify --dir or set {CACHE_DIR_ENV}",
+                file=sys.stderr,
+            )
+            return False
+
+        cache = HeaderCache(pathlib.Path(args.dir), 0)
+        if args.clear:
+            cache.clear()
+            print("cleared", args.dir)
+            return
+
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = (stats["hits"] / lookups * 100) if lookups else 0.0
+
+        print(f"cache:     {args.dir}")
+        print(f"entries:   {stats['entries']}")
+        print(f"size:      {stats['size'] / (1024 * 1024):.1f} MiB")
+        print(f"hits:      {stats['hits']}")
+        print(f"misses:    {stats['misses']}")
+        print(f"hit rate:  {hit_rate:.1f}%")
+        print(f"evictions: {stats['evictions']}")
@@ -0,0 +1,75 @@
+import json
+import pathlib
+import re
+import sys
+import typing as T
+
+_trampoline_include_re = re.compile(r"^\s*#include <(trampolines/[^>]+)>", re.M)
+
+
+def _trampoline_includes(
+    path: pathlib.Path,
+    trampolines_dir: pathlib.Path,
+    seen: T.Set[pathlib.Path],
+):
+    for inc in _trampoline_include_re.findall(path.read_text(encoding="utf-8")):
+        hpp = trampolines_dir.parent / inc
+        if hpp not in seen and hpp.exists():
+            seen.add(hpp)
+            _trampoline_includes(hpp, trampolines_dir, seen)
+
+
+class IncludeFanout:
+    @classmethod
+    def add_subparser(cls, parent_parser, subparsers):
+        parser = subparsers.add_parser(
+            "include-fanout",
+            help="Show how many trampoline headers each generated file includes",
+            parents=[parent_parser],
+        )
+        parser.add_argument(
+            "build_dir",
+            type=pathlib.Path,
+            help="meson build directory of a completed build",
+        )
+        return parser
+
+    def run(self, args):
+        build_dir: pathlib.Path = args.build_dir
+        compile_commands = build_dir / "compile_commands.json"
+        if not compile_commands.exists():
+            print(
+                f"ERROR: {build_dir} does not contain a configured meson build",
+                file=sys.stderr,
+            )
+            return False
+
+        with open(compile_commands) as fp:
+            entries = json.load(fp)
+
+        rows = []
+        for entry in entries:
+            src = pathlib.Path(entry["directory"]) / entry["file"]
+            trampolines_dir = src.parent / "trampolines"
+            if not trampolines_dir.is_dir() or not src.exists():
+                continue
+
+            seen: T.Set[pathlib.Path] = set()
+            _trampoline_includes(src, trampolines_dir, seen)
+            size = sum(p.stat().st_size for p in seen)
+            rows.append((src.name, len(seen), size))
+
+        if not rows:
+            print(f"ERROR: no generated files found in {build_dir}", file=sys.stderr)
+            return False
+
+        rows.sort(key=lambda row: (-row[1], row[0]))
+        width = max(len(row[0]) for row in rows)
+        print(f"{'source':<{width}}  {'trampolines':>11}  {'size':>8}")
+        for name, count, size in rows:
+            print(f"{name:<{width}}  {count:>11}  {size / 1024:>6.1f}KB")
+
+        total = sum(row[1] for row in rows)
+        print()
+        print(f"files:       {len(rows)}")
+        print(f"trampolines: {total} ({total / len(rows):.1f} per file)")
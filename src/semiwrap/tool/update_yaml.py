@@ -1,7 +1,6 @@
-import concurrent.futures
+import argparse
 import os
 import pathlib
-import subprocess
 import sys
 import traceback
 import tempfile
@@ -13,7 +12,14 @@ import dictdiffer.utils
 from io import StringIO
 from ruamel.yaml import YAML
 
-from ..makeplan import InputFile, makeplan, BuildTarget, CompilerInfo
+from ..cmd import header2dat, header2dat_batch
+from ..makeplan import (
+    InputFile,
+    makeplan,
+    BuildTarget,
+    CompilerInfo,
+    PreprocessorCacheDir,
+)
 from ..pyproject import PyProject
 
 
@@ -102,16 +108,6 @@ class YamlUpdater:
             print("".join(msg), file=sys.stderr)
             sys.exit(1)
 
-    def _exec_header2dat(self, argv):
-        args = [sys.executable, "-m", "semiwrap.cmd.header2dat"] + argv
-        proc = subprocess.run(
-            args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding="utf-8"
-        )
-        if proc.returncode == 0:
-            return
-
-        return "+" + " ".join(args) + "\n" + proc.stdout.rstrip()
-
     def _run(
         self,
         args,
@@ -142,12 +138,16 @@ class YamlUpdater:
             else:
                 os.environ["PKG_CONFIG_PATH"] = os.pathsep.join(pcpaths)
 
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=args.max_jobs)
-        futs = []
+        # Parse all of the headers in a single pool of processes instead of
+        # starting a new process for each header
+        hargs_list: T.List[argparse.Namespace] = []
 
         plan = makeplan(project_root, missing_yaml_ok=True)
         for item in plan:
-            if not isinstance(item, BuildTarget) or item.command != "header2dat":
+            if not isinstance(item, BuildTarget) or item.command not in (
+                "header2dat",
+                "header2dat-batch",
+            ):
                 continue
 
             # convert args to string so we can parse it
@@ -167,21 +167,28 @@ class YamlUpdater:
                     argv.append(str(arg.absolute()))
                 elif isinstance(arg, CompilerInfo):
                     argv += ["pcpp", "ignored", "ignored"]
+                elif isinstance(arg, PreprocessorCacheDir):
+                    argv.append(str(generated_dir / "pp-cache"))
                 else:
                     # anything else shouldn't matter
                     argv.append("ignored")
 
             argv.append("--update-yaml")
 
-            # Execute the tool in parallel
-            futs.append(executor.submit(self._exec_header2dat, argv))
+            if item.command == "header2dat":
+                hargs_list.append(header2dat.make_argparser().parse_args(argv))
+            else:
+                batch_args = header2dat_batch.make_argparser().parse_args(argv)
+                hargs_list.extend(header2dat_batch.split_headers(batch_args, None))
+
+        results = header2dat_batch.run_all(hargs_list, args.max_jobs)
 
         fail = False
-        for fut in concurrent.futures.as_completed(futs):
-            result = fut.result()
+        for hargs, result in zip(hargs_list, results):
             if result is not None:
                 fail = True
-                print(result)
+                print(f"+ header2dat {hargs.src_h}")
+                print(result.rstrip())
 
         if fail:
             return False
@@ -1,21 +1,35 @@
+import os
 import os.path
 import pathlib
 import typing as T
 
 
+#: Pickle protocol used for intermediate files. It is pinned so that the same
+#: input always produces the same bytes regardless of python's default
+PICKLE_PROTOCOL = 4
+
+
 def maybe_write_file(
-    path: pathlib.Path, content: str, *, encoding: T.Optional[str] = None
+    path: pathlib.Path,
+    content: T.Union[str, bytes],
+    *,
+    encoding: T.Optional[str] = None,
 ) -> bool:
     # returns True if new content written
+    #
+    # Leaving the file alone when it hasn't changed keeps its mtime the same,
+    # which allows ninja (via restat) to skip rebuilding anything that
+    # depends on it
+    mode = "b" if isinstance(content, bytes) else ""
     if path.exists():
-        with open(path, encoding=encoding) as fp:
+        with open(path, "r" + mode, encoding=encoding) as fp:
             oldcontent = fp.read()
         if oldcontent == content:
             return False
     elif not path.parent.exists():
         path.parent.mkdir(parents=True)
 
-    with open(path, "w", encoding=encoding) as fp:
+    with open(path, "w" + mode, encoding=encoding) as fp:
         fp.write(content)
 
     return True
@@ -25,3 +39,25 @@ def relpath_walk_up(p: pathlib.Path, other: pathlib.Path) -> pathlib.Path:
     # walk_up=True was introduced in Python 3.12 so can't use that
     #   p.relative_to(other, walk_up=True)
     return pathlib.Path(os.path.relpath(p, other))
+
+
+def installed_record(package_dir: pathlib.Path) -> T.Optional[pathlib.Path]:
+    """
+    Returns the RECORD of the wheel that the package in package_dir was
+    installed from, or None for editable installs and source checkouts. The
+    RECORD is rewritten each time the wheel is installed, and it contains the
+    hash of every installed file.
+    """
+    name = package_dir.name
+    try:
+        with os.scandir(package_dir.parent) as it:
+            for entry in it:
+                if entry.name.startswith(f"{name}-") and entry.name.endswith(
+                    ".dist-info"
+                ):
+                    record = pathlib.Path(entry.path) / "RECORD"
+                    if record.exists():
+                        return record
+    except OSError:
+        pass
+    return None
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import subprocess
+import sys
+import typing as T
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT / "src"
+SW_TEST = ROOT / "tests" / "cpp" / "sw-test"
+FT_INCLUDE = SW_TEST / "src" / "swtest" / "ft" / "include"
+FT_YAML = SW_TEST / "semiwrap" / "ft"
+
+
+def _run_semiwrap(*args: T.Union[str, pathlib.Path], **env: str):
+    subprocess.run(
+        [sys.executable, "-m", *map(str, args)],
+        env={**os.environ, "PYTHONPATH": str(SRC_DIR), **env},
+        check=True,
+        stdout=subprocess.DEVNULL,
+        timeout=120,
+    )
+
+
+def _header_args(name: str, header: T.Optional[str] = None) -> T.List[str]:
+    return [
+        name,
+        str(FT_YAML / f"{name}.yml"),
+        str(FT_INCLUDE / (header or f"{name}.h")),
+        str(FT_INCLUDE),
+    ]
+
+
+@pytest.fixture(scope="session")
+def run_semiwrap():
+    """
+    Runs a semiwrap module (such as ``semiwrap.cmd.header2dat``) in a new
+    process. Keyword arguments are added to its environment.
+    """
+    return _run_semiwrap
+
+
+@pytest.fixture(scope="session")
+def header_args():
+    """
+    Returns the name, yaml file, header, and include root of a header in
+    sw-test's ft module, as passed to header2dat. The header is NAME.h unless
+    specified.
+    """
+    return _header_args
+
+
+@pytest.fixture(scope="session")
+def casters_pkl(tmp_path_factory) -> pathlib.Path:
+    """semiwrap's own type casters, resolved for header2dat"""
+    tmp_path = tmp_path_factory.mktemp("casters")
+    casters = tmp_path / "casters.pkl"
+    _run_semiwrap(
+        "semiwrap.cmd.resolve_casters",
+        casters,
+        tmp_path / "casters.d",
+        SRC_DIR / "semiwrap" / "semiwrap.pybind11.json",
+    )
+    return casters
+
+
+@pytest.fixture(scope="session")
+def make_dat(tmp_path_factory, casters_pkl: pathlib.Path):
+    """
+    Parses a header in sw-test's ft module with header2dat, and returns the
+    .dat file. The default output is shared by every test that uses the same
+    header, so specify ``dst`` to get a file that can be modified. ``yml``
+    replaces the header's yaml file, and keyword arguments are added to the
+    environment of header2dat.
+    """
+    shared_dir = tmp_path_factory.mktemp("dat")
+
+    def _make_dat(
+        name: str,
+        header: T.Optional[str] = None,
+        *,
+        yml: T.Optional[pathlib.Path] = None,
+        dst: T.Optional[pathlib.Path] = None,
+        **env: str,
+    ) -> pathlib.Path:
+        if dst is None:
+            assert yml is None and not env, "specify dst when changing the inputs"
+            dst = shared_dir / f"{name}.dat"
+            if dst.exists():
+                return dst
+
+        args = _header_args(name, header)
+        if yml is not None:
+            args[1] = str(yml)
+
+        _run_semiwrap(
+            "semiwrap.cmd.header2dat",
+            *args,
+            casters_pkl,
+            dst,
+            dst.with_suffix(".d"),
+            "pcpp",
+            "c++20",
+            "ignored",
+            **env,
+        )
+        return dst
+
+    return _make_dat
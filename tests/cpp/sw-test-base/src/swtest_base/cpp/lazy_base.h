@@ -0,0 +1,14 @@
+#pragma once
+
+class LazyBase {
+public:
+    virtual ~LazyBase() = default;
+
+    int base_value() const {
+        return 1;
+    }
+
+    virtual int get() const {
+        return 2;
+    }
+};
@@ -0,0 +1,20 @@
+#pragma once
+
+#include "lazy_base.h"
+
+class LazyChild : public LazyBase {
+public:
+    int get() const override {
+        return 3;
+    }
+
+    bool operator==(const LazyChild &) const {
+        return true;
+    }
+
+    struct Inner {
+        int value() const {
+            return 4;
+        }
+    };
+};
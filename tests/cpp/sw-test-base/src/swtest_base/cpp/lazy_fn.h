@@ -0,0 +1,23 @@
+#pragma once
+
+#include "lazy_child.h"
+
+enum class LazyEnum {
+    A = 1,
+    B = 2,
+};
+
+inline LazyChild make_lazy_child() {
+    return LazyChild();
+}
+
+inline int lazy_sub_fn() {
+    return 5;
+}
+
+template <typename T>
+struct LazyTemplate {
+    T get() const {
+        return T(3);
+    }
+};
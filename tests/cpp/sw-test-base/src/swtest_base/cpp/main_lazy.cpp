@@ -0,0 +1,5 @@
+#include <semiwrap_init.swtest_base._lazy.hpp>
+
+SEMIWRAP_PYBIND11_MODULE(m) {
+    initWrapper(m);
+}
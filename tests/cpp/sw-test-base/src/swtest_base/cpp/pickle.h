@@ -0,0 +1,17 @@
+#pragma once
+
+#include <string>
+#include <vector>
+
+struct Pose {
+    double x = 0;
+    double y = 0;
+    double heading = 0;
+    int frame = 0;
+};
+
+struct SampleFrame {
+    std::string name;
+    std::vector<double> samples;
+    Pose pose;
+};
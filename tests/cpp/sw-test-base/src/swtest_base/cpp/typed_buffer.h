@@ -0,0 +1,28 @@
+#pragma once
+
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+
+// Sums each row of a 2D array multiplied by the weight for each column
+inline double weighted_sum(const double *data, int rows, int cols, const double *weights) {
+    double total = 0;
+    for (int r = 0; r < rows; r++) {
+        for (int c = 0; c < cols; c++) {
+            total += data[r * cols + c] * weights[c];
+        }
+    }
+    return total;
+}
+
+// Sets each element to its index, and returns the number of elements
+inline size_t fill_index(int32_t *out, size_t n) {
+    for (size_t i = 0; i < n; i++) {
+        out[i] = static_cast<int32_t>(i);
+    }
+    return n;
+}
+
+inline float norm3(const float *v) {
+    return std::sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2]);
+}
@@ -0,0 +1,26 @@
+#pragma once
+
+#include <cmath>
+
+inline double mix(double a, double b, double t) {
+    return a + (b - a) * t;
+}
+
+inline void polar(double x, double y, double *r, double *theta) {
+    *r = std::hypot(x, y);
+    *theta = std::atan2(y, x);
+}
+
+inline bool is_positive(int x) {
+    return x > 0;
+}
+
+class Scaler {
+public:
+    explicit Scaler(double factor) : m_factor(factor) {}
+
+    double scale(double x) const { return x * m_factor; }
+
+private:
+    double m_factor;
+};
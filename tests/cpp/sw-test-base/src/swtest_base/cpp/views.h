@@ -0,0 +1,35 @@
+#pragma once
+
+#include <cstddef>
+#include <span>
+#include <vector>
+
+class Samples {
+public:
+    explicit Samples(size_t n) : m_data(n), values(n) {}
+
+    std::vector<double> &data() { return m_data; }
+    const std::vector<double> &samples() const { return m_data; }
+
+    const double *raw() const { return m_data.data(); }
+    size_t size() const { return m_data.size(); }
+
+    std::span<const float> weights() const { return values; }
+
+    int *grid() { return m_grid; }
+
+    double sum() const {
+        double total = 0;
+        for (auto v : m_data) {
+            total += v;
+        }
+        return total;
+    }
+
+    std::vector<float> values;
+    int counts[4] = {};
+
+private:
+    std::vector<double> m_data;
+    int m_grid[6] = {};
+};
@@ -0,0 +1,30 @@
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+
+struct VirtualCall {
+    virtual ~VirtualCall() = default;
+
+    virtual int value(int x) { return x + 1; }
+
+    virtual int scale() const { return 2; }
+};
+
+// Calls the virtual functions n times from C++ with the GIL released
+inline long long call_virtual_n(const VirtualCall &v, int n) {
+    long long total = 0;
+    for (int i = 0; i < n; i++) {
+        total += const_cast<VirtualCall &>(v).value(i) * v.scale();
+    }
+    return total;
+}
+
+// Fills the buffer from C++ with the GIL released, calling the virtual
+// functions for each byte
+inline size_t fill_virtual_buffer(const VirtualCall &v, uint8_t *data, size_t len) {
+    for (size_t i = 0; i < len; i++) {
+        data[i] = static_cast<uint8_t>(const_cast<VirtualCall &>(v).value(static_cast<int>(i)) * v.scale());
+    }
+    return len;
+}
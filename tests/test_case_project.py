@@ -1,3 +1,6 @@
+import pathlib
+
+import swcase
 from swcase import case_test
 
 
@@ -12,3 +15,11 @@ def test_pyproject_name_transform_mapping_applies_to_wrapped_project():
     assert case_test.CapsCaseEnum.VALUE_ONE.value == 21
     assert case_test.CapsCaseEnum.HTTP_SERVER.value == 22
     assert case_test.CapsCaseEnum.PREFIXED_VALUE.value == 23
+
+
+def test_single_pass_codegen_installs_trampolines():
+    # sw-case-test uses single_pass_codegen, so the trampoline is generated
+    # alongside the .cpp file, which must not be installed
+    trampolines = pathlib.Path(swcase.__file__).parent / "trampolines"
+    assert (trampolines / "__CapsCaseThing.hpp").exists()
+    assert not (trampolines / "case_test.cpp").exists()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import pathlib
+import re
+
+import pytest
+
+from semiwrap.autowrap.datfile import DatFile
+from semiwrap.autowrap.render_wrapped import render_wrapped_cpp
+
+
+@pytest.fixture(scope="module")
+def dats(make_dat) -> dict[str, pathlib.Path]:
+    return {name: make_dat(name) for name in ("nested", "overloads")}
+
+
+def _finish_body(content: str) -> list[str]:
+    body = content.split("void finish() {", 1)[1].split("\n  }\n", 1)[0]
+    return [line.strip() for line in body.splitlines() if line.strip()]
+
+
+def _statements(content: str) -> list[str]:
+    # the definitions, in the order that they are executed by finish()
+    fns = {}
+    for m in re.finditer(
+        r"SEMIWRAP_NOINLINE void (\w+)\(\) \{\n(.*?)\n  \}\n", content, re.S
+    ):
+        fns[m.group(1)] = [
+            line.strip()
+            for line in m.group(2).splitlines()
+            if line.strip() and not line.strip().startswith("using ")
+        ]
+
+    result = []
+    for call in _finish_body(content):
+        result.extend(fns.get(call[:-3], [call]))
+    return result
+
+
+def test_class_finish_functions(dats):
+    hctx = DatFile.load(dats["nested"]).get_header()
+    content = render_wrapped_cpp(hctx)
+
+    calls = _finish_body(content)
+    assert calls == [f"finish_{cls.var_name}();" for cls in hctx.classes]
+    for cls in hctx.classes:
+        assert f"SEMIWRAP_NOINLINE void finish_{cls.var_name}() {{" in content
+
+
+def test_class_chunks(dats):
+    hctx = DatFile.load(dats["overloads"]).get_header()
+    (cls,) = [c for c in hctx.classes if c.cpp_name == "OverloadedObject"]
+
+    unsplit = render_wrapped_cpp(hctx, 0)
+    assert f"finish_{cls.var_name}_2" not in unsplit
+
+    split = render_wrapped_cpp(hctx, 2)
+    calls = _finish_body(split)
+    assert f"finish_{cls.var_name}();" in calls
+    assert f"finish_{cls.var_name}_2();" in calls
+    assert f"finish_{cls.var_name}_3();" in calls
+
+    # every definition is still made in the same order
+    assert _statements(split) == _statements(unsplit)
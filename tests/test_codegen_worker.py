@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from semiwrap.cmd import worker
+
+SRC_DIR = pathlib.Path(__file__).resolve().parents[1] / "src"
+
+pytestmark = pytest.mark.skipif(
+    not worker._is_supported, reason="codegen worker requires fork/unix sockets"
+)
+
+
+def _run(tmp_path: pathlib.Path, *args: str, **env: str):
+    return subprocess.run(
+        [sys.executable, "-m", *args],
+        cwd=tmp_path,
+        env={
+            **os.environ,
+            "PYTHONPATH": str(SRC_DIR),
+            "SEMIWRAP_WORKER_IDLE_TIMEOUT": "5",
+            **env,
+        },
+        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=60,
+    )
+
+
+def test_worker_output_matches_direct(tmp_path: pathlib.Path):
+    build_root = tmp_path / "build"
+    build_root.mkdir()
+
+    direct = _run(tmp_path, "semiwrap.cmd.gen_libinit", "direct.py", "mod.a", "mod.b")
+    assert direct.returncode == 0, direct.stderr
+
+    # run twice: the first request starts the server, the second reuses it
+    for _ in range(2):
+        proc = _run(
+            tmp_path,
+            "semiwrap.cmd.worker",
+            str(build_root),
+            "gen_libinit",
+            "worker.py",
+            "mod.a",
+            "mod.b",
+        )
+        assert proc.returncode == 0, proc.stderr
+        assert (tmp_path / "worker.py").read_bytes() == (
+            tmp_path / "direct.py"
+        ).read_bytes()
+
+
+def test_worker_propagates_errors(tmp_path: pathlib.Path):
+    proc = _run(tmp_path, "semiwrap.cmd.worker", str(tmp_path), "gen_libinit")
+    assert proc.returncode == 1
+    assert "Generates a file" in proc.stderr
+
+
+def test_worker_disabled(tmp_path: pathlib.Path):
+    proc = _run(
+        tmp_path,
+        "semiwrap.cmd.worker",
+        str(tmp_path),
+        "gen_libinit",
+        "out.py",
+        "mod.a",
+        SEMIWRAP_WORKER_DISABLE="1",
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert (tmp_path / "out.py").read_text().endswith("import mod.a\n")
+
+
+def test_worker_install_fingerprint(tmp_path: pathlib.Path, monkeypatch):
+    sw_root = tmp_path / "semiwrap"
+    sw_root.mkdir()
+    (sw_root / "__init__.py").write_text("")
+
+    # without an installed RECORD, the sources are checked
+    fingerprint = worker._install_fingerprint(sw_root)
+    st = (sw_root / "__init__.py").stat()
+    os.utime(sw_root / "__init__.py", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert worker._install_fingerprint(sw_root) != fingerprint
+
+    # installed wheels only check the RECORD
+    dist_info = tmp_path / "semiwrap-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "RECORD").write_text("")
+
+    def _walk(*args):
+        raise AssertionError("should not walk an installed package")
+
+    monkeypatch.setattr(worker.os, "walk", _walk)
+    fingerprint = worker._install_fingerprint(sw_root)
+    assert str(dist_info / "RECORD") in fingerprint
+
+    st = (dist_info / "RECORD").stat()
+    os.utime(dist_info / "RECORD", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert worker._install_fingerprint(sw_root) != fingerprint
+
+
+def test_worker_socket_dir(tmp_path: pathlib.Path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+
+    path = worker.socket_path(str(tmp_path / "build"))
+    assert path.parent == tmp_path / f"semiwrap-{os.getuid()}"
+    assert path.parent.stat().st_mode & 0o777 == 0o700
+
+    # a directory that other users can access is not used
+    path.parent.chmod(0o755)
+    with pytest.raises(RuntimeError, match="only accessible by"):
+        worker.socket_path(str(tmp_path / "build"))
+
+    path.parent.rmdir()
+    (tmp_path / "elsewhere").mkdir(mode=0o700)
+    path.parent.symlink_to(tmp_path / "elsewhere")
+    with pytest.raises(RuntimeError, match="only accessible by"):
+        worker.socket_path(str(tmp_path / "build"))
+
+
+def test_worker_lock_nofollow(tmp_path: pathlib.Path):
+    target = tmp_path / "target"
+    (tmp_path / "w.lock").symlink_to(target)
+
+    with pytest.raises(OSError):
+        worker._bind(tmp_path / "w.sock")
+    assert not target.exists()
+
+
+def test_worker_checks_peer(tmp_path: pathlib.Path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.setenv("SEMIWRAP_WORKER_IDLE_TIMEOUT", "5")
+    monkeypatch.setenv(
+        "PYTHONPATH", os.pathsep.join([str(SRC_DIR), os.environ.get("PYTHONPATH", "")])
+    )
+
+    path = worker.socket_path(str(tmp_path))
+    sock = worker._connect(path)
+    with sock:
+        assert worker._peer_uid(sock) in (None, os.getuid())
+
+    # a server owned by another user never receives the request
+    monkeypatch.setattr(worker, "_peer_uid", lambda sock: os.getuid() + 1)
+    monkeypatch.setattr(worker.socket.socket, "sendmsg", None)
+    with pytest.raises(RuntimeError, match="owned by uid"):
+        worker.run_request(str(tmp_path), "gen_libinit", [])
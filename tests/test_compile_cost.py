@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import pathlib
+
+import pytest
+
+from semiwrap.compile_cost import (
+    DEFAULT_WEIGHTS,
+    FEATURES,
+    estimate,
+    fit,
+    get_weights,
+    yaml_features,
+)
+from semiwrap.config.autowrap_yml import AutowrapConfigYaml
+from semiwrap.makeplan import BuildTarget, ExtensionModule, OutputFile, makeplan
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+SW_TEST = ROOT / "tests" / "cpp" / "sw-test"
+FT_YAML = SW_TEST / "semiwrap" / "ft"
+
+
+def test_yaml_features(tmp_path: pathlib.Path):
+    yml = tmp_path / "test.yml"
+    yml.write_text(
+        "functions:\n"
+        "  fn:\n"
+        "    overloads:\n"
+        "      int:\n"
+        "      double:\n"
+        "      float:\n"
+        "        ignore: true\n"
+        "  ignored:\n"
+        "    ignore: true\n"
+        "enums:\n"
+        "  E:\n"
+        "classes:\n"
+        "  C:\n"
+        "    attributes:\n"
+        "      x:\n"
+        "    enums:\n"
+        "      Inner:\n"
+        "    methods:\n"
+        "      m1:\n"
+        "      m2:\n"
+        "  Ignored:\n"
+        "    ignore: true\n"
+        "    methods:\n"
+        "      m:\n"
+    )
+
+    assert yaml_features(AutowrapConfigYaml.from_file(yml)) == {
+        "classes": 1,
+        "methods": 2,
+        "functions": 1,
+        "overloads": 1,
+        "attributes": 1,
+        "enums": 2,
+    }
+
+
+def test_fit():
+    expected = {"base": 2.0, **dict.fromkeys(FEATURES, 0.0)}
+    expected.update(methods=0.5, enums=1.5)
+
+    samples = []
+    for i in range(20):
+        features = {f: (i * (j + 3)) % 7 for j, f in enumerate(FEATURES)}
+        samples.append((features, estimate(expected, features)))
+
+    weights = fit(samples)
+    assert weights == pytest.approx(expected, abs=1e-3)
+    assert all(w >= 0 for w in weights.values())
+
+
+def test_get_weights():
+    assert get_weights({"methods": 1.0}) == {**DEFAULT_WEIGHTS, "methods": 1.0}
+
+    with pytest.raises(ValueError, match="unknown compile_cost weights bogus"):
+        get_weights({"bogus": 1.0})
+
+
+def test_makeplan_orders_sources_by_cost():
+    plan = list(makeplan(SW_TEST))
+    (module,) = [
+        m
+        for m in plan
+        if isinstance(m, ExtensionModule) and m.package_name == "swtest.ft._ft"
+    ]
+
+    names = []
+    for src in module.sources:
+        if isinstance(src, BuildTarget) and src.command in ("dat2cpp", "dat2all"):
+            cpp = next(a for a in src.args if isinstance(a, OutputFile))
+            names.append(cpp.name[:-4])
+
+    costs = [
+        estimate(
+            DEFAULT_WEIGHTS,
+            yaml_features(AutowrapConfigYaml.from_file(FT_YAML / f"{name}.yml")),
+        )
+        for name in names
+    ]
+    assert len(costs) > 10
+    assert costs == sorted(costs, reverse=True)
+    assert costs[0] > costs[-1]
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import ast
+import pathlib
+import shutil
+
+import pytest
+
+from semiwrap.makeplan import BuildTarget, makeplan
+
+SW_TEST = pathlib.Path(__file__).resolve().parent / "cpp" / "sw-test"
+
+HEADERS = {
+    "IBase": "inheritance/ibase.h",
+    "IChild": "inheritance/ichild.h",
+    "docstrings": "docstrings.h",
+    "enums": "enums.h",
+    "nested": "nested.h",
+    "operators": "operators.h",
+    "parameters": "parameters.h",
+    "subpkg": "subpkg.h",
+    "tbasic": "templates/basic.h",
+}
+
+
+@pytest.fixture(scope="module")
+def stubs(tmp_path_factory, header_args, casters_pkl, run_semiwrap) -> tuple[str, str]:
+    tmp_path = tmp_path_factory.mktemp("pyi")
+
+    batch_args = []
+    dats = []
+    for name, h in HEADERS.items():
+        dat = tmp_path / f"{name}.dat"
+        batch_args += ["--header", *header_args(name, h), dat]
+        dats.append(dat)
+
+    run_semiwrap(
+        "semiwrap.cmd.header2dat_batch",
+        *batch_args,
+        casters_pkl,
+        tmp_path / "batch.d",
+        "pcpp",
+        "c++20",
+        "ignored",
+    )
+
+    init_pyi = tmp_path / "_ft" / "__init__.pyi"
+    subpkg_pyi = tmp_path / "_ft" / "subpkg.pyi"
+    run_semiwrap(
+        "semiwrap.cmd.dat2pyi",
+        "swtest.ft._ft",
+        casters_pkl,
+        init_pyi,
+        "--subpackage",
+        "subpkg",
+        subpkg_pyi,
+        *dats,
+    )
+
+    return init_pyi.read_text(), subpkg_pyi.read_text()
+
+
+def _defs(content: str) -> dict[str, ast.AST]:
+    defs = {}
+
+    def _walk(body, prefix: str):
+        for node in body:
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef)):
+                defs.setdefault(f"{prefix}{node.name}", node)
+                if isinstance(node, ast.ClassDef):
+                    _walk(node.body, f"{prefix}{node.name}.")
+            elif isinstance(node, ast.AnnAssign):
+                assert isinstance(node.target, ast.Name)
+                defs[f"{prefix}{node.target.id}"] = node
+
+    _walk(ast.parse(content).body, "")
+    return defs
+
+
+def _sig(node: ast.AST) -> str:
+    assert isinstance(node, ast.FunctionDef)
+    assert node.returns is not None
+    return f"({ast.unparse(node.args)}) -> {ast.unparse(node.returns)}"
+
+
+def test_dat2pyi_module(stubs):
+    content, _ = stubs
+    defs = _defs(content)
+
+    assert "from . import subpkg" in content
+    all_names = ast.literal_eval(
+        content.split("__all__: list[str] = ", 1)[1].split("\n")[0]
+    )
+    assert "subpkg" in all_names
+    assert "IChild" in all_names
+    assert "SPClass" not in all_names
+
+    # classes, inheritance, and nested classes
+    ichild = defs["IChild"]
+    assert isinstance(ichild, ast.ClassDef)
+    assert [ast.unparse(b) for b in ichild.bases] == ["IBase"]
+    assert _sig(defs["OuterNested.InnerNested.fn"]) == "(self) -> None"
+    assert _sig(defs["OuterNested.getInner"]) == "(self) -> OuterNested.InnerNested"
+
+    # parameters, defaults, and out parameters
+    assert _sig(defs["fnParamFundPtr"]) == "(x: int) -> tuple[int, int]"
+    assert _sig(defs["fnParamArrayOut"]) == "() -> tuple[int, list[int]]"
+    assert _sig(defs["fnParamDisableNone"]) == "(p: Param) -> bool"
+    assert (
+        _sig(defs["fnParamAutoDisableNone"])
+        == "(fn: collections.abc.Callable[[], None]) -> bool"
+    )
+
+    # operators
+    assert _sig(defs["HasOperator.__eq__"]) == "(self, other: HasOperator) -> bool"
+
+    # enums
+    assert "GE1" in defs["GEnum"].body[0].target.id  # type: ignore[attr-defined]
+    assert "EnumContainer.InnerEnum.IE1" in defs
+    assert "EnumContainer.UEX" in defs
+
+    # templates
+    assert "TBasic" not in defs
+    assert _sig(defs["TBasicString.getT"]) == "(self) -> str"
+    assert _sig(defs["TBasicString.setT"]) == "(self, t: str) -> None"
+
+    # docstrings
+    doc = ast.get_docstring(defs["DocClass"])  # type: ignore[arg-type]
+    assert doc == "A class with documentation\nThe docs are way cool."
+    doc = ast.get_docstring(defs["DocClass.fn2"])  # type: ignore[arg-type]
+    assert doc is not None and ":param from_: The from parameter" in doc
+
+
+def test_dat2pyi_subpackage(stubs):
+    _, content = stubs
+    defs = _defs(content)
+
+    assert "SPClass" in defs
+    assert "SPTemplate" in defs
+    assert _sig(defs["sp_func"]) == "() -> int"
+
+
+def test_dat2pyi_plan(tmp_path: pathlib.Path, monkeypatch):
+    monkeypatch.delenv("SEMIWRAP_SKIP_PYI", raising=False)
+    monkeypatch.setenv("_PYTHON_HOST_PLATFORM", "linux-aarch64")
+
+    project = tmp_path / "sw-test"
+    shutil.copytree(
+        SW_TEST,
+        project,
+        ignore=shutil.ignore_patterns("build", "dist", "*.so", "__pycache__"),
+    )
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(
+        pyproject.read_text().replace(
+            '[tool.semiwrap.extension_modules."swtest.ft._ft"]\n',
+            '[tool.semiwrap.extension_modules."swtest.ft._ft"]\n'
+            "stubs_from_headers = true\n",
+        )
+    )
+
+    targets = [t for t in makeplan(project) if isinstance(t, BuildTarget)]
+    assert not any(t.command == "make-pyi" for t in targets)
+
+    (pyi,) = [t for t in targets if t.command == "dat2pyi"]
+    assert pyi.args[0] == "swtest.ft._ft"
+    assert pyi.install_path == pathlib.Path("swtest", "ft", "_ft")
+    assert "--subpackage" in pyi.args
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import pathlib
+import pickle
+
+import pytest
+
+from semiwrap.autowrap import datfile
+from semiwrap.autowrap.datfile import DatFile, DatFileError
+from semiwrap.autowrap.render_cls_trampoline_hpp import render_cls_trampoline_hpp
+from semiwrap.autowrap.render_tmpl_inst import (
+    render_template_inst_cpp,
+    render_template_inst_hpp,
+)
+from semiwrap.autowrap.render_wrapped import render_wrapped_cpp
+
+
+@pytest.fixture(scope="module")
+def dats(make_dat) -> dict[str, pathlib.Path]:
+    return {
+        "nested": make_dat("nested"),
+        "tvbase": make_dat("tvbase", "templates/tvbase.h"),
+    }
+
+
+@pytest.mark.parametrize("name", ["nested", "tvbase"])
+def test_datfile_roundtrip(dats, name: str):
+    dat = DatFile.load(dats[name])
+    hctx = dat.get_header()
+
+    assert hctx.hname == dat.hname == name
+    assert hctx.class_hierarchy == dat.class_hierarchy
+
+    # trampoline classes are the same objects as the ones in the class tree
+    class_ids = {id(c) for c in datfile._iter_classes(hctx.classes)}
+    assert all(id(c) in class_ids for c in hctx.classes_with_trampolines)
+
+    # writing it again produces the same header
+    reloaded = DatFile(datfile.dumps(hctx)).get_header()
+    assert render_wrapped_cpp(reloaded) == render_wrapped_cpp(hctx)
+
+
+def test_datfile_partial_loads_render_identically(dats):
+    full = DatFile.load(dats["tvbase"]).get_header()
+    assert full.classes_with_trampolines
+    assert full.template_instances
+
+    for cls in full.classes_with_trampolines:
+        dat = DatFile.load(dats["tvbase"])
+        assert render_cls_trampoline_hpp(
+            dat.get_partial_header(), dat.get_class(cls.yml_id)
+        ) == render_cls_trampoline_hpp(full, cls)
+
+    for tmpl in full.template_instances:
+        dat = DatFile.load(dats["tvbase"])
+        assert render_template_inst_cpp(
+            dat.get_partial_header(trampolines=True), dat.get_template(tmpl.py_name)
+        ) == render_template_inst_cpp(full, tmpl)
+
+    dat = DatFile.load(dats["tvbase"])
+    assert dat.template_names == [t.py_name for t in full.template_instances]
+    partial = dat.get_partial_header()
+    partial.template_instances = [dat.get_template(n) for n in dat.template_names]
+    assert render_template_inst_hpp(partial) == render_template_inst_hpp(full)
+
+
+def test_datfile_nested_class(dats):
+    dat = DatFile.load(dats["nested"])
+    full = dat.get_header()
+    nested = [c for c in datfile._iter_classes(full.classes) if c.parent is not None]
+    assert nested
+
+    for cls in nested:
+        dat = DatFile.load(dats["nested"])
+        found = dat.get_class(cls.yml_id)
+        assert found.yml_id == cls.yml_id
+        assert found.parent is not None
+
+    assert render_wrapped_cpp(DatFile.load(dats["nested"]).get_header()) == (
+        render_wrapped_cpp(full)
+    )
+
+    with pytest.raises(ValueError, match="cannot find NotAClass"):
+        dat.get_class("NotAClass")
+
+
+def test_datfile_version_mismatch(dats, tmp_path: pathlib.Path):
+    data = dats["nested"].read_bytes()
+
+    bad = bytearray(data)
+    bad[len(datfile.MAGIC)] += 1
+    with pytest.raises(DatFileError, match="different version of semiwrap"):
+        DatFile(bytes(bad))
+
+    # a .dat from before the indexed format was a plain pickle
+    old = pickle.dumps(DatFile(data).get_header())
+    with pytest.raises(DatFileError, match="not a semiwrap .dat file"):
+        DatFile(old)
@@ -0,0 +1,135 @@
+import subprocess
+import sys
+import sysconfig
+import textwrap
+import threading
+
+import pytest
+
+from swtest_base._module2 import VirtualCall, call_virtual_n, fill_virtual_buffer
+
+NTHREADS = 8
+
+
+def _run_threads(fn):
+    barrier = threading.Barrier(NTHREADS)
+    errors = []
+
+    def _thread(i):
+        try:
+            barrier.wait()
+            fn(i)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_thread, args=(i,)) for i in range(NTHREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if errors:
+        raise errors[0]
+
+
+@pytest.mark.skipif(
+    not sysconfig.get_config_var("Py_GIL_DISABLED"),
+    reason="requires a free-threaded build of python",
+)
+def test_free_threaded_gil_not_enabled():
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            textwrap.dedent(
+                """
+                import sys
+                import swtest_base._module2
+                import swtest_base._lazy
+                assert not sys._is_gil_enabled()
+                """
+            ),
+        ],
+        check=True,
+        timeout=60,
+    )
+
+
+def test_free_threaded_trampolines_and_buffers():
+    class NotOverridden(VirtualCall):
+        pass
+
+    class Overridden(VirtualCall):
+        def scale(self):
+            return 3
+
+    class CallsSuper(VirtualCall):
+        def value(self, x):
+            return super().value(x) + 1
+
+    # each thread uses its own instances and some that are shared
+    shared = [NotOverridden(), Overridden(), CallsSuper()]
+
+    def _check(i):
+        objs = shared + [NotOverridden(), Overridden(), CallsSuper()]
+        expected = {
+            NotOverridden: lambda x: (x + 1) * 2,
+            Overridden: lambda x: (x + 1) * 3,
+            CallsSuper: lambda x: (x + 2) * 2,
+        }
+
+        for _ in range(50):
+            for obj in objs:
+                fn = expected[type(obj)]
+
+                assert call_virtual_n(obj, 10) == sum(fn(x) for x in range(10))
+
+                buf = bytearray(32 + i)
+                assert fill_virtual_buffer(obj, buf) == len(buf)
+                assert list(buf) == [fn(x) & 0xFF for x in range(len(buf))]
+
+    _run_threads(_check)
+
+
+def test_free_threaded_lazy_init():
+    # every thread accesses the module before anything is initialized
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            textwrap.dedent(
+                f"""
+                import threading
+                import swtest_base._lazy as m
+
+                barrier = threading.Barrier({NTHREADS})
+                errors = []
+
+                def _thread(i):
+                    try:
+                        barrier.wait()
+                        if i % 2:
+                            c = m.make_lazy_child()
+                            assert c.get() == 3
+                            assert c.base_value() == 1
+                        else:
+                            assert m.LazyChild().get() == 3
+                            assert m.LazyChild.Inner().value() == 4
+                        assert m.sub.lazy_sub_fn() == 5
+                    except BaseException as e:
+                        errors.append(e)
+
+                threads = [threading.Thread(target=_thread, args=(i,)) for i in range({NTHREADS})]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+
+                if errors:
+                    raise errors[0]
+                """
+            ),
+        ],
+        check=True,
+        timeout=60,
+    )
@@ -86,6 +86,12 @@ def test_buffers():
     assert bo == b"3456"
 
 
+def test_buffers_not_contiguous():
+    o = ft.Buffers()
+    with pytest.raises(ValueError, match="contiguous"):
+        o.set_buffer(memoryview(bytes(range(8)))[::2])
+
+
 def test_buffers_v():
     o = ft.Buffers()
     o.v_set_buffer(b"12345")
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import pathlib
+
+from semiwrap.makeplan import BuildTarget, BuildTargetOutput, makeplan
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+HEADERS = ("fields", "enums", "overloads")
+
+
+def test_header2dat_batch_matches_header2dat(
+    tmp_path: pathlib.Path, make_dat, header_args, casters_pkl, run_semiwrap
+):
+    batch_args = []
+    for name in HEADERS:
+        make_dat(name, dst=tmp_path / f"{name}.dat")
+        batch_args += ["--header", *header_args(name), tmp_path / f"batch_{name}.dat"]
+
+    run_semiwrap(
+        "semiwrap.cmd.header2dat_batch",
+        "-j",
+        "2",
+        *batch_args,
+        casters_pkl,
+        tmp_path / "batch.d",
+        "pcpp",
+        "c++20",
+        "ignored",
+    )
+
+    depfile = (tmp_path / "batch.d").read_text()
+    for name in HEADERS:
+        expected = (tmp_path / f"{name}.dat").read_bytes()
+        assert (tmp_path / f"batch_{name}.dat").read_bytes() == expected
+
+        # every output is a target in the combined depfile
+        assert f"batch_{name}.dat:" in depfile
+        assert f"{name}.h" in depfile
+
+
+def test_makeplan_batch_parse_headers():
+    project_root = ROOT / "tests" / "cpp" / "sw-case-test"
+    targets = [item for item in makeplan(project_root) if isinstance(item, BuildTarget)]
+
+    assert not [t for t in targets if t.command == "header2dat"]
+    (batch,) = [t for t in targets if t.command == "header2dat-batch"]
+
+    (dat2all,) = [t for t in targets if t.command == "dat2all"]
+    assert dat2all.args[0] == BuildTargetOutput(batch, 0)
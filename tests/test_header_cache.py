@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import shutil
+
+from semiwrap import header_cache
+from semiwrap.header_cache import HeaderCache
+
+
+def test_header_cache_lru(tmp_path: pathlib.Path):
+    cache = HeaderCache(tmp_path, max_size=250)
+
+    k1 = cache.make_key("a", b"1")
+    k2 = cache.make_key("a", b"2")
+    k3 = cache.make_key("a", b"3")
+    assert len({k1, k2, k3}) == 3
+    assert cache.make_key("ab", b"") != cache.make_key("a", b"b")
+
+    assert cache.get(k1) is None
+    cache.put(k1, b"1" * 100)
+    cache.put(k2, b"2" * 100)
+
+    # make k1 the most recently used
+    os.utime(cache._entry_path(k2), ns=(1, 1))
+    assert cache.get(k1) == b"1" * 100
+
+    # exceeds the size bound, so k2 is evicted
+    cache.put(k3, b"3" * 100)
+    assert cache.get(k2) is None
+    assert cache.get(k1) == b"1" * 100
+    assert cache.get(k3) == b"3" * 100
+
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["size"] == 200
+
+    cache.clear()
+    assert cache.stats() == {
+        "hits": 0,
+        "misses": 0,
+        "evictions": 0,
+        "entries": 0,
+        "size": 0,
+    }
+
+
+def test_header_cache_compacts_stats(tmp_path: pathlib.Path, monkeypatch):
+    monkeypatch.setattr(header_cache, "_STATS_COMPACT_SIZE", 10)
+    cache = HeaderCache(tmp_path, max_size=1000)
+
+    key = cache.make_key("a")
+    for _ in range(25):
+        cache.get(key)
+    cache.put(key, b"1")
+    for _ in range(5):
+        cache.get(key)
+
+    assert cache.stats_path.stat().st_size <= 10
+    assert cache.stats()["hits"] == 5
+    assert cache.stats()["misses"] == 25
+
+
+def test_header_cache_size_estimate(tmp_path: pathlib.Path, monkeypatch):
+    cache = HeaderCache(tmp_path, max_size=250)
+    cache.put(cache.make_key("1"), b"1" * 100)
+
+    # the entries are only listed when the estimate is over the bound
+    listed = []
+    iter_entries = HeaderCache._iter_entries
+
+    def _iter_entries(self):
+        listed.append(True)
+        return iter_entries(self)
+
+    monkeypatch.setattr(HeaderCache, "_iter_entries", _iter_entries)
+
+    cache.put(cache.make_key("2"), b"2" * 100)
+    assert not listed
+
+    cache.put(cache.make_key("3"), b"3" * 100)
+    assert listed
+    assert cache.stats()["evictions"] == 1
+    assert int(cache.size_path.read_bytes()) == 200
+
+
+def test_semiwrap_fingerprint(tmp_path: pathlib.Path, monkeypatch):
+    sw_root = tmp_path / "semiwrap"
+    sw_root.mkdir()
+    (sw_root / "__init__.py").write_text("")
+    monkeypatch.setattr(header_cache, "__file__", str(sw_root / "header_cache.py"))
+
+    def _fingerprint() -> bytes:
+        monkeypatch.setattr(header_cache, "_fingerprint", None)
+        return header_cache.semiwrap_fingerprint()
+
+    # without an installed RECORD, the sources are hashed
+    fingerprint = _fingerprint()
+    (sw_root / "__init__.py").write_text("x = 1\n")
+    assert _fingerprint() != fingerprint
+
+    # installed wheels only hash the RECORD
+    dist_info = tmp_path / "semiwrap-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "RECORD").write_text("semiwrap/__init__.py,sha256=1,6\n")
+
+    def _rglob(*args):
+        raise AssertionError("should not read the sources of an installed package")
+
+    monkeypatch.setattr(pathlib.Path, "rglob", _rglob)
+    fingerprint = _fingerprint()
+
+    # reinstalling the same wheel doesn't invalidate the cache
+    (dist_info / "RECORD").write_text("semiwrap/__init__.py,sha256=1,6\n")
+    assert _fingerprint() == fingerprint
+
+    (dist_info / "RECORD").write_text("semiwrap/__init__.py,sha256=2,6\n")
+    assert _fingerprint() != fingerprint
+
+
+def test_header2dat_uses_cache(tmp_path: pathlib.Path, make_dat, header_args):
+    yml = tmp_path / "fields.yml"
+    shutil.copy(header_args("fields")[1], yml)
+
+    def _header2dat(dat: pathlib.Path):
+        make_dat(
+            "fields",
+            yml=yml,
+            dst=dat,
+            SEMIWRAP_HEADER_CACHE_DIR=str(tmp_path / "cache"),
+        )
+
+    cache = HeaderCache(tmp_path / "cache", 0)
+
+    _header2dat(tmp_path / "1.dat")
+    assert cache.stats()["misses"] == 1
+
+    # same inputs: stored result is used, and the depfile is still written
+    _header2dat(tmp_path / "2.dat")
+    assert cache.stats()["hits"] == 1
+    assert (tmp_path / "1.dat").read_bytes() == (tmp_path / "2.dat").read_bytes()
+    assert "fields.h" in (tmp_path / "2.d").read_text()
+
+    # changing the yaml file invalidates it
+    yml.write_text(yml.read_text() + "\n# changed\n")
+    _header2dat(tmp_path / "3.dat")
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 2
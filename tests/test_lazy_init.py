@@ -0,0 +1,95 @@
+import subprocess
+import sys
+import textwrap
+
+
+def _run(code: str):
+    # each test needs a fresh module
+    subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        check=True,
+        timeout=60,
+    )
+
+
+def test_lazy_init_hidden():
+    _run(
+        """
+        import swtest_base._lazy as m
+
+        names = ["LazyBase", "LazyChild", "LazyEnum", "make_lazy_child", "sub"]
+        for name in names:
+            assert name not in vars(m), name
+            assert name in dir(m), name
+
+        # accessing a class initializes its header and the header of its base
+        assert m.LazyChild().get() == 3
+        assert "LazyBase" in vars(m)
+        assert "make_lazy_child" not in vars(m)
+        assert m.LazyChild.Inner().value() == 4
+        """
+    )
+
+
+def test_lazy_init_returned_instance():
+    _run(
+        """
+        import swtest_base._lazy as m
+
+        assert "LazyChild" not in vars(m)
+
+        # creating an instance initializes the header of its class
+        c = m.make_lazy_child()
+        assert "LazyChild" in vars(m)
+        assert c.get() == 3
+        assert c.base_value() == 1
+        assert c == m.LazyChild()
+        """
+    )
+
+
+def test_lazy_init_returned_instance_type():
+    _run(
+        """
+        import swtest_base._lazy as m
+
+        # the class is complete before an instance is returned, so operators
+        # and the class itself work before anything else accesses it
+        assert m.make_lazy_child() == m.make_lazy_child()
+        assert type(m.make_lazy_child()).get(m.make_lazy_child()) == 3
+        assert hasattr(type(m.make_lazy_child()), "base_value")
+        assert "__semiwrap_lazy_init__" not in dir(type(m.make_lazy_child()))
+        """
+    )
+
+
+def test_lazy_init_subpackage():
+    _run(
+        """
+        from swtest_base._lazy.sub import lazy_sub_fn
+        assert lazy_sub_fn() == 5
+
+        import swtest_base._lazy as m
+        assert m.sub.lazy_sub_fn() == 5
+        assert m.LazyEnum.B.value == 2
+        """
+    )
+
+
+def test_lazy_init_missing():
+    _run(
+        """
+        import swtest_base._lazy as m
+
+        try:
+            m.does_not_exist
+        except AttributeError as e:
+            assert "does_not_exist" in str(e)
+        else:
+            assert False
+
+        # everything was initialized, so the hooks were removed
+        assert "LazyChild" in vars(m)
+        assert "__getattr__" not in vars(m)
+        """
+    )
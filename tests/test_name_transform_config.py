@@ -1,10 +1,10 @@
 import dataclasses
 import pathlib
-import pickle
 
 from cxxheaderparser.options import ParserOptions
 
 from semiwrap.autowrap.cxxparser import parse_header
+from semiwrap.autowrap.datfile import DatFile
 from semiwrap.autowrap.generator_data import GeneratorData
 from semiwrap.cmd.header2dat import generate_wrapper
 from semiwrap.config.autowrap_yml import (
@@ -371,8 +371,7 @@ def test_header2dat_uses_cli_known_words_when_yaml_omits_known_words(tmp_path):
         name_transform_known_words=["KiB"],
     )
 
-    with open(dat, "rb") as fp:
-        hctx = pickle.load(fp)
+    hctx = DatFile.load(dat).get_header()
 
     assert hctx.functions[0].py_name == "get_kib_value"
 
@@ -413,8 +412,7 @@ def test_header2dat_yaml_known_words_override_cli_known_words(tmp_path):
         name_transform_known_words=["KiB"],
     )
 
-    with open(dat, "rb") as fp:
-        hctx = pickle.load(fp)
+    hctx = DatFile.load(dat).get_header()
 
     assert hctx.functions[0].py_name == "get_ki_b_value"
 
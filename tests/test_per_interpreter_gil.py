@@ -0,0 +1,76 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+NINTERPRETERS = 2
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 14), reason="requires concurrent.interpreters"
+)
+def test_per_interpreter_gil_concurrent_import():
+    # each interpreter imports the modules for the first time at the same time
+    code = textwrap.dedent(
+        """
+        from swtest_base._module2 import VirtualCall, call_virtual_n, fill_virtual_buffer
+
+        class Overridden(VirtualCall):
+            def scale(self):
+                return 3
+
+        assert call_virtual_n(VirtualCall(), 10) == sum((x + 1) * 2 for x in range(10))
+        assert call_virtual_n(Overridden(), 10) == sum((x + 1) * 3 for x in range(10))
+
+        buf = bytearray(16)
+        assert fill_virtual_buffer(Overridden(), buf) == 16
+        assert list(buf) == [(x + 1) * 3 for x in range(16)]
+
+        import swtest_base._lazy as m
+        assert m.LazyChild().get() == 3
+        assert m.make_lazy_child().base_value() == 1
+        """
+    )
+
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            textwrap.dedent(
+                f"""
+                import threading
+                from concurrent import interpreters
+
+                code = {code!r}
+                interps = [interpreters.create() for _ in range({NINTERPRETERS})]
+                barrier = threading.Barrier(len(interps))
+                errors = []
+
+                def _thread(interp):
+                    try:
+                        barrier.wait()
+                        interp.exec(code)
+                    except BaseException as e:
+                        errors.append(e)
+
+                threads = [threading.Thread(target=_thread, args=(i,)) for i in interps]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+
+                for interp in interps:
+                    interp.close()
+
+                if errors:
+                    raise errors[0]
+
+                # the main interpreter can still use the modules
+                exec(code)
+                """
+            ),
+        ],
+        check=True,
+        timeout=60,
+    )
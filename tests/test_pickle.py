@@ -0,0 +1,59 @@
+import copy
+import pickle
+
+import pytest
+
+from swtest_base._module2 import Pose, SampleFrame
+
+
+def _pose():
+    p = Pose()
+    p.x = 1.5
+    p.y = -2
+    p.heading = 0.25
+    p.frame = 7
+    return p
+
+
+def _fields(p: Pose):
+    return (p.x, p.y, p.heading, p.frame)
+
+
+# pybind11 objects can only be pickled with protocol 2 or later
+@pytest.mark.parametrize("protocol", range(2, pickle.HIGHEST_PROTOCOL + 1))
+def test_pickle_roundtrip(protocol):
+    p = pickle.loads(pickle.dumps(_pose(), protocol=protocol))
+    assert isinstance(p, Pose)
+    assert _fields(p) == (1.5, -2, 0.25, 7)
+
+
+def test_pickle_nested():
+    f = SampleFrame()
+    f.name = "front"
+    f.samples = [1, 2, 3]
+    f.pose = _pose()
+
+    f2 = pickle.loads(pickle.dumps(f))
+    assert f2.name == "front"
+    assert f2.samples == [1, 2, 3]
+    assert _fields(f2.pose) == (1.5, -2, 0.25, 7)
+
+
+def test_pickle_tuple_methods():
+    p = _pose()
+    assert p.to_tuple() == (1.5, -2, 0.25, 7)
+    assert p.__getstate__() == p.to_tuple()
+    assert _fields(Pose.from_tuple((3, 4, 5, 6))) == (3, 4, 5, 6)
+
+    with pytest.raises(ValueError, match="expected a tuple with 4 items"):
+        Pose.from_tuple((1, 2))
+
+
+def test_pickle_copy():
+    p = _pose()
+    for c in (copy.copy(p), copy.deepcopy(p)):
+        assert c is not p
+        assert _fields(c) == _fields(p)
+
+    c.x = 10
+    assert p.x == 1.5
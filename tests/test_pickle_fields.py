@@ -0,0 +1,65 @@
+import pytest
+
+from semiwrap.cmd.header2dat import generate_wrapper
+
+YAML = """
+classes:
+  S:
+    pickle:
+"""
+
+
+def _parse(tmp_path, fields: str):
+    header = tmp_path / "x.h"
+    yml = tmp_path / "x.yml"
+
+    header.write_text("struct S {\n" + fields + "\n};\n")
+    yml.write_text(YAML)
+
+    generate_wrapper(
+        name="x",
+        src_yml=yml,
+        src_h=header,
+        src_h_root=tmp_path,
+        include_paths=[],
+        compiler_flavor="pcpp",
+        compiler_args=[],
+        pp_defines=[],
+        casters={},
+        dst_dat=tmp_path / "x.dat",
+        dst_depfile=tmp_path / "x.d",
+        report_only=False,
+        name_transform_default=None,
+        name_transform_function=None,
+        name_transform_method=None,
+        name_transform_attribute=None,
+        name_transform_enum_value=None,
+        name_transform_parameter=None,
+        name_transform_known_words=[],
+    )
+
+
+def test_pickle_fields(tmp_path):
+    _parse(tmp_path, "int x;\ndouble y;")
+
+
+@pytest.mark.parametrize(
+    "field",
+    [
+        "const int x = 1;",
+        "int x[2];",
+        "int *x;",
+        "int &x;",
+        "int x : 3;",
+        "private: int x;",
+    ],
+)
+def test_pickle_unassignable_fields(tmp_path, field):
+    with pytest.raises(ValueError) as excinfo:
+        _parse(tmp_path, field)
+
+    # the error is wrapped by the parser
+    e = excinfo.value
+    while e.__cause__ is not None:
+        e = e.__cause__
+    assert "public and assignable (x)" in str(e)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import os
+import pathlib
+
+import pytest
+
+from semiwrap import pkgconf_cache
+from semiwrap.pkgconf_cache import PkgconfCache
+
+
+@pytest.fixture
+def pcdir(tmp_path: pathlib.Path, monkeypatch) -> pathlib.Path:
+    pcdir = tmp_path / "pc"
+    pcdir.mkdir()
+    (pcdir / "swpc-a.pc").write_text(
+        "prefix=${pcfiledir}\n"
+        "pkgconf_pypi_initpy=a._init\n"
+        "Name: swpc-a\n"
+        "Description: a\n"
+        "Version: 1\n"
+        "Requires: swpc-b\n"
+        "Cflags: -I${prefix}/a\n"
+    )
+    (pcdir / "swpc-b.pc").write_text(
+        "prefix=${pcfiledir}\n"
+        "Name: swpc-b\n"
+        "Description: b\n"
+        "Version: 1\n"
+        "Cflags: -I${prefix}/b\n"
+    )
+    (pcdir / "swpc-b.pybind11.json").write_text("{}")
+
+    monkeypatch.setenv("PKG_CONFIG_PATH", str(pcdir))
+    monkeypatch.setenv(pkgconf_cache.CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.delenv(pkgconf_cache.CACHE_ENV, raising=False)
+    return pcdir
+
+
+def _query_a():
+    before = pkgconf_cache.spawn_count()
+    a = PkgconfCache().get("swpc-a")
+    fields = (
+        a.requires,
+        a.include_path,
+        a.full_include_path,
+        a.type_casters_path,
+        a.libinit_py,
+    )
+    return fields, pkgconf_cache.spawn_count() - before
+
+
+def test_pkgconf_cache_fields(pcdir: pathlib.Path):
+    (requires, include_path, full_include_path, tc, libinit_py), spawned = _query_a()
+
+    assert requires == ["swpc-b"]
+    assert include_path == [pcdir / "a"]
+    assert full_include_path == [pcdir / "a", pcdir / "b"]
+    assert tc is None
+    assert libinit_py == "a._init"
+
+    b = PkgconfCache().get("swpc-b")
+    assert b.type_casters_path == pcdir / "swpc-b.pybind11.json"
+    assert b.libinit_py is None
+    assert b.requires == []
+
+    assert spawned > 0
+
+
+def test_pkgconf_cache_reused(pcdir: pathlib.Path):
+    fields, spawned = _query_a()
+    assert spawned > 0
+
+    # a new process reuses the records written by the first one
+    assert _query_a() == (fields, 0)
+
+    # modifying a requirement invalidates the records that depend on it
+    b = pcdir / "swpc-b.pc"
+    b.write_text(b.read_text().replace("/b\n", "/b2\n"))
+    st = b.stat()
+    os.utime(b, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    fields, spawned = _query_a()
+    assert spawned > 0
+    assert fields[2] == [pcdir / "a", pcdir / "b2"]
+
+
+def test_pkgconf_cache_only_used_fields(pcdir: pathlib.Path):
+    before = pkgconf_cache.spawn_count()
+    assert PkgconfCache().get("swpc-b").type_casters_path is not None
+    assert pkgconf_cache.spawn_count() - before == 2
+
+    # fields that weren't used before are queried and added to the record
+    before = pkgconf_cache.spawn_count()
+    assert PkgconfCache().get("swpc-b").full_include_path == [pcdir / "b"]
+    assert pkgconf_cache.spawn_count() - before == 1
+
+    before = pkgconf_cache.spawn_count()
+    assert PkgconfCache().get("swpc-b").full_include_path == [pcdir / "b"]
+    assert pkgconf_cache.spawn_count() == before
+
+
+def test_pkgconf_cache_disabled(pcdir: pathlib.Path, monkeypatch):
+    monkeypatch.setenv(pkgconf_cache.CACHE_ENV, "0")
+    assert pkgconf_cache.default_cache_path() is None
+
+    _, spawned = _query_a()
+    assert spawned > 0
+    _, spawned = _query_a()
+    assert spawned > 0
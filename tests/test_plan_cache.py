@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import pathlib
+import shutil
+
+import pytest
+
+from semiwrap.plan_cache import PlanCache
+from semiwrap.render_meson import render_meson, render_meson_to_file
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+SW_TEST = ROOT / "tests" / "cpp" / "sw-test"
+
+
+@pytest.fixture
+def project(tmp_path: pathlib.Path) -> pathlib.Path:
+    project = tmp_path / "sw-test"
+    shutil.copytree(
+        SW_TEST,
+        project,
+        ignore=shutil.ignore_patterns("build", "dist", "*.so", "__pycache__"),
+    )
+    return project
+
+
+def _paths(project: pathlib.Path):
+    stage0 = project / "semiwrap"
+    return (
+        project,
+        stage0 / "meson.build",
+        stage0 / "modules" / "meson.build",
+        stage0 / "trampolines" / "meson.build",
+    )
+
+
+def test_plan_cache_reused(project: pathlib.Path, monkeypatch):
+    monkeypatch.delenv("SEMIWRAP_SKIP_PYI", raising=False)
+    paths = _paths(project)
+    key = tuple(map(str, paths))
+    cache = PlanCache(project / "semiwrap" / ".plan-cache")
+
+    assert cache.get(*key) is None
+    eps = render_meson_to_file(*paths, cache)
+
+    result = cache.get(*key)
+    assert result is not None
+    assert result == render_meson(*paths)
+    assert render_meson_to_file(*paths, cache) == eps
+
+    # different output paths are a different plan
+    assert cache.get(str(project), *key[1:3], str(project / "other")) is None
+
+
+def test_plan_cache_invalidated(project: pathlib.Path, monkeypatch):
+    monkeypatch.delenv("SEMIWRAP_SKIP_PYI", raising=False)
+    paths = _paths(project)
+    key = tuple(map(str, paths))
+    cache = PlanCache(project / "semiwrap" / ".plan-cache")
+
+    def _rerender():
+        assert cache.get(*key) is None
+        render_meson_to_file(*paths, cache)
+        assert cache.get(*key) is not None
+
+    render_meson_to_file(*paths, cache)
+
+    # environment variables that change the output
+    monkeypatch.setenv("SEMIWRAP_SKIP_PYI", "1")
+    _rerender()
+    assert "make_pyi" not in paths[2].read_text()
+
+    # yaml files
+    yml = project / "semiwrap" / "ft" / "fields.yml"
+    yml.write_text(yml.read_text() + "\n# changed\n")
+    _rerender()
+
+    # pyproject.toml
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(pyproject.read_text() + "\n# changed\n")
+    _rerender()
+
+    # headers that moved to a different directory in the search path
+    include = project / "src" / "swtest" / "ft" / "include"
+    shutil.move(include / "fields.h", project / "src" / "swtest" / "ft" / "fields.h")
+    assert cache.get(*key) is None
+
+
+def test_plan_cache_disabled(monkeypatch, tmp_path: pathlib.Path):
+    monkeypatch.setenv("SEMIWRAP_PLAN_CACHE", "0")
+    assert PlanCache.from_env(tmp_path / ".plan-cache") is None
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import pathlib
+
+from semiwrap.makeplan import BuildTarget, ExtensionModule, makeplan
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+HEADERS = ("fields", "enums", "overloads")
+
+
+def _includes(path: pathlib.Path):
+    return [
+        line.split()[1]
+        for line in path.read_text().splitlines()
+        if line.startswith("#include")
+    ]
+
+
+def test_gen_pch_hpp(tmp_path: pathlib.Path, make_dat, run_semiwrap):
+    dats = [make_dat(name) for name in HEADERS]
+
+    # headers that are only included by one of the files are left out
+    run_semiwrap("semiwrap.cmd.gen_pch_hpp", tmp_path / "all.hpp", *dats)
+    assert _includes(tmp_path / "all.hpp") == ["<semiwrap.h>"]
+
+    run_semiwrap("semiwrap.cmd.gen_pch_hpp", tmp_path / "one.hpp", dats[0])
+    assert _includes(tmp_path / "one.hpp") == ["<semiwrap.h>", "<fields.h>"]
+
+
+def test_makeplan_precompiled_header():
+    project_root = ROOT / "tests" / "cpp" / "sw-test-base"
+    plan = list(makeplan(project_root))
+    modules = {m.package_name: m for m in plan if isinstance(m, ExtensionModule)}
+
+    module = modules["swtest_base._module2"]
+    assert module.precompiled_header is not None
+    assert module.precompiled_header.name == "semiwrap_pch.h"
+    assert module.precompiled_header.exists()
+
+    (pch,) = [
+        s
+        for s in module.sources
+        if isinstance(s, BuildTarget) and s.command == "gen-pch-hpp"
+    ]
+    assert pch.args[0].name == "swtest_base__module2_pch.hpp"
+    assert ("SEMIWRAP_PCH_HEADER", '"swtest_base__module2_pch.hpp"') in module.defines
+
+    assert modules["swtest_base._module"].precompiled_header is None
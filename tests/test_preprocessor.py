@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import pathlib
+
+from cxxheaderparser import preprocessor
+
+from semiwrap.autowrap.preprocessor import make_pcpp_preprocessor
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+CPP = ROOT / "tests" / "cpp"
+FT_INCLUDE = CPP / "sw-test" / "src" / "swtest" / "ft" / "include"
+BASE_INCLUDE = CPP / "sw-test-base" / "src" / "swtest_base" / "cpp"
+
+
+def test_preprocessor_matches_cxxheaderparser(tmp_path: pathlib.Path):
+    inc = tmp_path / "inc"
+    inc.mkdir()
+    (inc / "a.h").write_text(
+        "#pragma once\n"
+        '#include "b.h"\n'
+        "#define A_VALUE B_VALUE + 1\n"
+        "struct A { int a; };\n"
+    )
+    (inc / "b.h").write_text(
+        "#ifndef B_H\n#define B_H\n#define B_VALUE 2\nstruct B {};\n#endif\n"
+    )
+    h = tmp_path / "h.h"
+    h.write_text(
+        '#include "a.h"\n'
+        "\n"
+        "/** doc */\n"
+        "int fn(int x = A_VALUE);\n"
+        '#include "b.h"\n'
+        "struct C : B {};\n"
+    )
+
+    include_paths = [str(inc)]
+    expected = preprocessor.make_pcpp_preprocessor(include_paths=include_paths)(
+        str(h), None
+    )
+
+    cache_dir = tmp_path / "cache"
+    for _ in range(2):
+        preprocess = make_pcpp_preprocessor(
+            include_paths=include_paths,
+            depfile=tmp_path / "h.d",
+            deptarget=[str(tmp_path / "h.dat")],
+            token_cache_path=cache_dir,
+        )
+        assert preprocess(str(h), None) == expected
+
+    # included files are tokenized once and reused, the header itself is not cached
+    assert len(list(cache_dir.iterdir())) == 2
+
+    deps = (tmp_path / "h.d").read_text()
+    for name in ("h.h", "a.h", "b.h"):
+        assert name in deps
+
+
+def test_preprocessor_sw_test_headers(tmp_path: pathlib.Path):
+    include_paths = [str(FT_INCLUDE), str(BASE_INCLUDE)]
+    expected_pp = preprocessor.make_pcpp_preprocessor(include_paths=include_paths)
+    pp = make_pcpp_preprocessor(
+        include_paths=include_paths, token_cache_path=tmp_path / "cache"
+    )
+
+    for name in (
+        "inheritance/ichild.h",
+        "templates/dependent_param.h",
+        "remote_trampoline.h",
+        "docstrings.h",
+    ):
+        h = str(FT_INCLUDE / name)
+        assert pp(h, None) == expected_pp(h, None)
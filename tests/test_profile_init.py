@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+
+def test_profile_init():
+    import swtest_base._module as m
+
+    profile = m.__semiwrap_init_profile__
+    assert sorted(profile) == ["base_class", "fn"]
+
+    entry = profile["base_class"]
+    assert entry["begin"] >= 0
+    assert entry["finish"] >= 0
+    assert entry["types"] == 1
+    assert entry["objects"] >= 1
+    assert entry["templates"] == {}
+
+
+def test_profile_init_lazy():
+    code = """
+        import swtest_base._lazy as m
+
+        profile = m.__semiwrap_init_profile__
+        assert profile["lazy_fn"]["types"] == 2
+        assert profile["lazy_fn"]["finish"] is None
+
+        assert m.LazyTemplateInt().get() == 3
+        assert profile["lazy_fn"]["finish"] >= 0
+        assert list(profile["lazy_fn"]["templates"]) == ["LazyTemplateInt"]
+        assert profile["lazy_child"]["finish"] is None
+        """
+    subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)], check=True, timeout=60
+    )
+
+
+def test_profile_init_report():
+    result = subprocess.run(
+        [sys.executable, "-c", "import swtest_base._module"],
+        env={**os.environ, "SEMIWRAP_INIT_PROFILE": "1"},
+        stderr=subprocess.PIPE,
+        check=True,
+        text=True,
+        timeout=60,
+    )
+
+    lines = result.stderr.splitlines()
+    assert lines[0].startswith("semiwrap: swtest_base._module initialized in ")
+    assert lines[1].split() == [
+        "total",
+        "begin",
+        "finish",
+        "types",
+        "objects",
+        "header",
+    ]
+    assert sorted(line.split()[-1] for line in lines[2:]) == ["base_class", "fn"]
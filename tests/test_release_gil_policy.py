@@ -0,0 +1,117 @@
+import typing
+
+from semiwrap.autowrap.context import FunctionContext
+from semiwrap.autowrap.datfile import DatFile
+from semiwrap.cmd.header2dat import generate_wrapper
+from semiwrap.config.autowrap_yml import AutowrapConfigYaml, ReleaseGilPolicy
+
+HEADER = """
+struct Getters {
+    int field;
+
+    int inline_getter() const { return field; }
+    int noexcept_getter() const noexcept;
+    int throwing_getter() const noexcept(false);
+    constexpr int constexpr_getter() const { return 1; }
+    int declared_getter() const;
+    int mutate() { return ++field; }
+    virtual int virtual_getter() const { return field; }
+};
+
+constexpr int free_constexpr(int x) { return x; }
+inline int free_inline(int x) { return x; }
+"""
+
+YAML = """
+classes:
+  Getters:
+    attributes:
+      field:
+    methods:
+      inline_getter:
+      noexcept_getter:
+      throwing_getter:
+      constexpr_getter:
+      declared_getter:
+      mutate:
+      virtual_getter:
+functions:
+  free_constexpr:
+  free_inline:
+"""
+
+TRIVIAL = {"inline_getter", "noexcept_getter", "constexpr_getter", "free_constexpr"}
+
+
+def _parse(
+    tmp_path, yml_text: str, release_gil_policy: typing.Optional[str] = None
+) -> typing.Dict[str, FunctionContext]:
+    header = tmp_path / "x.h"
+    yml = tmp_path / "x.yml"
+    dat = tmp_path / "x.dat"
+
+    header.write_text(HEADER)
+    yml.write_text(yml_text)
+
+    generate_wrapper(
+        name="x",
+        src_yml=yml,
+        src_h=header,
+        src_h_root=tmp_path,
+        include_paths=[],
+        compiler_flavor="pcpp",
+        compiler_args=[],
+        pp_defines=[],
+        casters={},
+        dst_dat=dat,
+        dst_depfile=tmp_path / "x.d",
+        report_only=False,
+        name_transform_default=None,
+        name_transform_function=None,
+        name_transform_method=None,
+        name_transform_attribute=None,
+        name_transform_enum_value=None,
+        name_transform_parameter=None,
+        name_transform_known_words=[],
+        release_gil_policy=release_gil_policy,
+    )
+
+    hctx = DatFile.load(dat).get_header()
+    fns = {fn.cpp_name: fn for fn in hctx.functions}
+    for cls in hctx.classes:
+        fns.update((fn.cpp_name, fn) for fn in cls.wrapped_public_methods)
+    return fns
+
+
+def test_release_gil_policy_yaml(tmp_path):
+    yml = tmp_path / "x.yml"
+    yml.write_text("release_gil_policy: skip_trivial\n")
+    cfg = AutowrapConfigYaml.from_file(yml)
+    assert cfg.release_gil_policy == ReleaseGilPolicy.skip_trivial
+
+
+def test_release_gil_policy_always(tmp_path):
+    fns = _parse(tmp_path, YAML)
+
+    assert {name for name, fn in fns.items() if fn.trivial} == TRIVIAL
+    assert all(fn.release_gil for fn in fns.values())
+
+
+def test_release_gil_policy_skip_trivial(tmp_path):
+    fns = _parse(tmp_path, YAML, "skip_trivial")
+
+    assert {name for name, fn in fns.items() if not fn.release_gil} == TRIVIAL
+
+
+def test_release_gil_policy_overrides(tmp_path):
+    # the YAML file overrides the policy from pyproject.toml, and
+    # no_release_gil overrides the policy
+    yml = YAML.replace(
+        "      inline_getter:\n",
+        "      inline_getter:\n        no_release_gil: false\n",
+    )
+    fns = _parse(tmp_path, "release_gil_policy: skip_trivial\n" + yml, "always")
+
+    assert {name for name, fn in fns.items() if not fn.release_gil} == TRIVIAL - {
+        "inline_getter"
+    }
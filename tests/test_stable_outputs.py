@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import os
+import pathlib
+
+from semiwrap.util import maybe_write_file
+
+
+def test_maybe_write_file(tmp_path: pathlib.Path):
+    text = tmp_path / "out.txt"
+    assert maybe_write_file(text, "content\n")
+    assert not maybe_write_file(text, "content\n")
+    assert maybe_write_file(text, "changed\n")
+    assert text.read_text() == "changed\n"
+
+    binary = tmp_path / "sub" / "out.bin"
+    assert maybe_write_file(binary, b"\x00\x01")
+    assert not maybe_write_file(binary, b"\x00\x01")
+    assert maybe_write_file(binary, b"\x00\x02")
+    assert binary.read_bytes() == b"\x00\x02"
+
+
+def test_generated_outputs_are_stable(tmp_path: pathlib.Path, make_dat, run_semiwrap):
+    # The same input must produce the same bytes, regardless of hash seed
+    dat1 = make_dat("fields", dst=tmp_path / "fields1.dat", PYTHONHASHSEED="1")
+    dat2 = make_dat("fields", dst=tmp_path / "fields2.dat", PYTHONHASHSEED="2")
+    assert dat1.read_bytes() == dat2.read_bytes()
+
+    # .. and unchanged outputs are not rewritten, so ninja can skip dependents
+    cpp = tmp_path / "fields.cpp"
+    run_semiwrap("semiwrap.cmd.dat2cpp", dat1, cpp, PYTHONHASHSEED="0")
+
+    old_ns = 1_000_000_000
+    os.utime(dat1, ns=(old_ns, old_ns))
+    os.utime(cpp, ns=(old_ns, old_ns))
+
+    make_dat("fields", dst=dat1, PYTHONHASHSEED="3")
+    run_semiwrap("semiwrap.cmd.dat2cpp", dat1, cpp, PYTHONHASHSEED="0")
+
+    assert dat1.stat().st_mtime_ns == old_ns
+    assert cpp.stat().st_mtime_ns == old_ns
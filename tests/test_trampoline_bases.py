@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import pathlib
+
+import pytest
+
+from semiwrap.autowrap.datfile import DatFile
+from semiwrap.autowrap.render_cls_trampoline_hpp import render_cls_trampoline_hpp
+from semiwrap.cmd.gen_trampoline_bases import load_trampoline_bases
+
+HEADERS = {
+    "IBase": "inheritance/ibase.h",
+    "IChild": "inheritance/ichild.h",
+    "IMChild": "inheritance/imchild.h",
+    "mvi": "inheritance/mvi.h",
+}
+
+
+@pytest.fixture(scope="module")
+def dats(tmp_path_factory, make_dat, run_semiwrap) -> dict[str, pathlib.Path]:
+    result = {name: make_dat(name, header) for name, header in HEADERS.items()}
+
+    bases = tmp_path_factory.mktemp("trampolines") / "trampolines.pkl"
+    run_semiwrap("semiwrap.cmd.gen_trampoline_bases", bases, *result.values())
+    result["bases"] = bases
+    return result
+
+
+def _render(dats, name: str, yml_id: str, with_bases: bool) -> str:
+    dat = DatFile.load(dats[name])
+    known_bases = load_trampoline_bases(dats["bases"]) if with_bases else None
+    return render_cls_trampoline_hpp(
+        dat.get_partial_header(), dat.get_class(yml_id), known_bases
+    )
+
+
+def test_trampoline_includes_bases_with_overrides(dats):
+    # IBase has virtual methods that IChild doesn't override
+    content = _render(dats, "IChild", "inheritance::IChild", True)
+    assert "#include <trampolines/inheritance__IBase.hpp>" in content
+    assert content == _render(dats, "IChild", "inheritance::IChild", False)
+
+
+def test_trampoline_skips_bases_without_overrides(dats):
+    # IMOther only has a virtual destructor
+    content = _render(dats, "IMChild", "inheritance::IMChild", True)
+    assert "#include <trampolines/inheritance__IBase.hpp>" in content
+    assert "trampolines/inheritance__IMOther.hpp" not in content
+    assert "PyTrampoline_IMOther" not in content
+
+    content = _render(dats, "IMChild", "inheritance::IMChild", False)
+    assert "#include <trampolines/inheritance__IMOther.hpp>" in content
+
+
+def test_trampoline_skips_chain_of_empty_bases(dats):
+    content = _render(dats, "mvi", "inheritance::MVF", True)
+    assert "#include <trampolines/" not in content
+    assert "struct PyTrampoline_MVF : PyTrampolineBase {" in content
+
+    content = _render(dats, "mvi", "inheritance::MVF", False)
+    assert "#include <trampolines/inheritance__MVE.hpp>" in content
@@ -0,0 +1,61 @@
+from swtest_base._module2 import VirtualCall, call_virtual_n
+
+
+def test_trampoline_cache_not_overridden():
+    class NotOverridden(VirtualCall):
+        pass
+
+    obj = NotOverridden()
+    assert call_virtual_n(obj, 1) == 2
+    assert call_virtual_n(obj, 3) == 12
+
+
+def test_trampoline_cache_overridden():
+    class Overridden(VirtualCall):
+        def scale(self):
+            return 3
+
+    obj = Overridden()
+    assert call_virtual_n(obj, 1) == 3
+    assert call_virtual_n(obj, 3) == 18
+
+
+def test_trampoline_cache_super():
+    # calling the C++ implementation from the override must not make the
+    # function look like it isn't overridden
+    class CallsSuper(VirtualCall):
+        def value(self, x):
+            return super().value(x) + 10
+
+    obj = CallsSuper()
+    assert call_virtual_n(obj, 1) == 22
+    assert call_virtual_n(obj, 1) == 22
+
+
+def test_trampoline_cache_monkeypatch():
+    class Patched(VirtualCall):
+        pass
+
+    obj = Patched()
+    assert call_virtual_n(obj, 1) == 2
+
+    Patched.scale = lambda self: 5
+    assert call_virtual_n(obj, 1) == 5
+    assert call_virtual_n(Patched(), 1) == 5
+
+    del Patched.scale
+    assert call_virtual_n(obj, 1) == 2
+
+
+def test_trampoline_cache_monkeypatch_base():
+    class Base(VirtualCall):
+        pass
+
+    class Child(Base):
+        pass
+
+    obj = Child()
+    assert call_virtual_n(obj, 1) == 2
+
+    Base.value = lambda self, x: 7
+    assert call_virtual_n(obj, 1) == 14
@@ -0,0 +1,56 @@
+import array
+
+import pytest
+
+from swtest_base._module2 import fill_index, norm3, weighted_sum
+
+
+def _matrix(rows, cols, typecode="d"):
+    data = array.array(typecode, range(rows * cols))
+    return memoryview(data).cast("B").cast(typecode, [rows, cols])
+
+
+def test_typed_buffer_shape():
+    data = _matrix(2, 3)
+    weights = array.array("d", [1, 10, 100])
+    assert weighted_sum(data, weights) == (0 + 10 + 200) + (3 + 40 + 500)
+
+
+def test_typed_buffer_shape_mismatch():
+    with pytest.raises(ValueError, match="cols"):
+        weighted_sum(_matrix(2, 3), array.array("d", [1, 2]))
+
+
+def test_typed_buffer_ndim():
+    with pytest.raises(ValueError, match="2 dimensions, got 1"):
+        weighted_sum(array.array("d", [1, 2, 3]), array.array("d", [1, 2, 3]))
+
+
+def test_typed_buffer_dtype():
+    with pytest.raises(TypeError, match="format"):
+        weighted_sum(_matrix(2, 3, "f"), array.array("d", [1, 2, 3]))
+
+    with pytest.raises(TypeError, match="format"):
+        norm3(b"123")
+
+
+def test_typed_buffer_strides():
+    v = array.array("f", [3, 0, 0, 0, 4, 0])
+    assert norm3(memoryview(v)[2:5]) == 4
+    with pytest.raises(ValueError, match="C contiguous"):
+        norm3(memoryview(v)[::2])
+
+
+def test_typed_buffer_fixed_size():
+    assert norm3(array.array("f", [3, 4, 0])) == 5
+    with pytest.raises(ValueError, match="must have size 3"):
+        norm3(array.array("f", [3, 4]))
+
+
+def test_typed_buffer_out():
+    out = array.array("i", [0] * 5)
+    assert fill_index(out) == 5
+    assert list(out) == [0, 1, 2, 3, 4]
+
+    with pytest.raises(BufferError):
+        fill_index(bytes(20))
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import pathlib
+import shutil
+
+from semiwrap.cmd import gen_unity_cpp
+from semiwrap.cmd.gen_unity_cpp import _assign_shards
+from semiwrap.compile_cost import estimate, get_weights, yaml_features
+from semiwrap.config.autowrap_yml import AutowrapConfigYaml
+from semiwrap.makeplan import (
+    BuildTarget,
+    BuildTargetOutput,
+    ExtensionModule,
+    OutputFile,
+    makeplan,
+)
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+def test_assign_shards_balances_cost():
+    costs = [("a", 10), ("b", 7), ("c", 5), ("d", 4), ("e", 2)]
+    shards = _assign_shards(costs, 2)
+
+    assert shards == [[0, 3], [1, 2, 4]]
+    assert [sum(costs[i][1] for i in s) for s in shards] == [14, 14]
+
+
+def test_assign_shards_more_shards_than_sources():
+    assert _assign_shards([("a", 1)], 3) == [[0], [], []]
+
+
+def test_unity_shards_use_compile_cost(
+    tmp_path: pathlib.Path, make_dat, header_args, monkeypatch
+):
+    names = ("fields", "enums", "overloads")
+    sources = [(make_dat(name), tmp_path / f"{name}.cpp") for name in names]
+    weights = get_weights({"methods": 10.0})
+
+    costs = []
+
+    def _assign(c, nshards):
+        costs.extend(c)
+        return _assign_shards(c, nshards)
+
+    monkeypatch.setattr(gen_unity_cpp, "_assign_shards", _assign)
+    gen_unity_cpp._write_unity_cpp([tmp_path / "unity1.cpp"], sources, weights)
+
+    expected = []
+    for name in names:
+        ayml = AutowrapConfigYaml.from_file(pathlib.Path(header_args(name)[1]))
+        expected.append((name, estimate(weights, yaml_features(ayml))))
+    assert costs == expected
+
+
+def test_makeplan_unity_shards_compile_cost(tmp_path: pathlib.Path):
+    project = tmp_path / "sw-test-base"
+    shutil.copytree(
+        ROOT / "tests" / "cpp" / "sw-test-base",
+        project,
+        ignore=shutil.ignore_patterns("build", "dist", "*.so", "__pycache__"),
+    )
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(
+        pyproject.read_text() + "\n[tool.semiwrap.compile_cost]\nmethods = 0.5\n"
+    )
+
+    targets = [t for t in makeplan(project) if isinstance(t, BuildTarget)]
+    (unity,) = [t for t in targets if t.command == "gen-unity-cpp"]
+    assert unity.args[-2:] == ("--compile-cost", "methods=0.5")
+
+
+def test_makeplan_unity_shards():
+    project_root = ROOT / "tests" / "cpp" / "sw-test-base"
+    plan = list(makeplan(project_root))
+    (module,) = [
+        m
+        for m in plan
+        if isinstance(m, ExtensionModule) and m.package_name == "swtest_base._lazy"
+    ]
+
+    (unity,) = [s for s in module.sources if s.command == "gen-unity-cpp"]
+    outputs = [a.name for a in unity.args if isinstance(a, OutputFile)]
+    assert outputs == ["swtest_base__lazy_unity1.cpp", "swtest_base__lazy_unity2.cpp"]
+
+    # the generated .cpp files are only compiled as part of a shard
+    cpp_targets = [a for a in unity.args if isinstance(a, BuildTarget)]
+    dat2cpp = [t for t in cpp_targets if t.command == "dat2cpp"]
+    assert len(dat2cpp) == 3
+    for t in dat2cpp:
+        assert t not in module.sources
+
+
+def test_makeplan_unity_shards_single_pass():
+    project_root = ROOT / "tests" / "cpp" / "sw-case-test"
+    plan = list(makeplan(project_root))
+    targets = [item for item in plan if isinstance(item, BuildTarget)]
+    (module,) = [m for m in plan if isinstance(m, ExtensionModule)]
+
+    (dat2all,) = [t for t in targets if t.command == "dat2all"]
+    (unity,) = [t for t in targets if t.command == "gen-unity-cpp"]
+
+    assert BuildTargetOutput(dat2all, 0) in unity.args
+    assert dat2all not in module.sources
+    assert BuildTargetOutput(dat2all, 0) not in module.sources
+    assert unity in module.sources
@@ -0,0 +1,79 @@
+import array
+import math
+
+import pytest
+
+from swtest_base._module2 import Scaler, is_positive, mix, polar
+
+
+def test_vectorize_scalar_overload():
+    assert mix(1, 3, 0.5) == 2
+    assert is_positive(1) is True
+
+
+def test_vectorize_buffer():
+    t = array.array("d", [0, 0.25, 1])
+    result = mix(2, 6, t)
+    assert isinstance(result, memoryview)
+    assert result.format == "d"
+    assert result.tolist() == [2, 3, 6]
+
+
+def test_vectorize_sequence():
+    assert mix(0, 10, [0.1, 0.5]).tolist() == [1, 5]
+    assert is_positive([-1, 0, 2]).tolist() == [False, False, True]
+
+
+def test_vectorize_converts_format():
+    # buffers with another format are converted like a sequence
+    t = array.array("f", [0.5, 1])
+    assert mix(0, 2, t).tolist() == [1, 2]
+
+
+def test_vectorize_shape():
+    t = memoryview(array.array("d", [0, 0.5, 1, 0.5, 0, 1])).cast("B").cast("d", [2, 3])
+    result = mix(0, 4, t)
+    assert result.shape == (2, 3)
+    assert result.tolist() == [[0, 2, 4], [2, 0, 4]]
+
+
+def test_vectorize_out_params():
+    r, theta = polar([3, 0], [4, 2])
+    assert r.tolist() == [5, 2]
+    assert theta.tolist() == [math.atan2(4, 3), math.atan2(2, 0)]
+
+    # scalars are used for every element
+    r, theta = polar(0, [1, 2, 3])
+    assert r.tolist() == [1, 2, 3]
+
+
+def test_vectorize_single_element():
+    result = mix(0, 10, [0.5])
+    assert result.shape == (1,)
+    assert result.tolist() == [5]
+
+    r, theta = polar([3.0], [4.0])
+    assert r.shape == (1,) and theta.shape == (1,)
+    assert r.tolist() == [5]
+
+
+def test_vectorize_broadcast_single_element():
+    r, theta = polar([3.0], [0, 4])
+    assert r.shape == (2,)
+    assert r.tolist() == [3, 5]
+
+
+def test_vectorize_shape_mismatch():
+    with pytest.raises(ValueError, match="same shape"):
+        polar([1, 2], [1, 2, 3])
+
+
+def test_vectorize_method():
+    s = Scaler(3)
+    assert s.scale(2) == 6
+    assert s.scale(array.array("d", [1, 2, 3])).tolist() == [3, 6, 9]
+
+
+def test_vectorize_invalid():
+    with pytest.raises(TypeError):
+        mix(0, 1, ["a"])
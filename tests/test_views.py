@@ -0,0 +1,77 @@
+import gc
+
+import pytest
+
+from swtest_base._module2 import Samples
+
+
+def test_view_container_reference():
+    s = Samples(4)
+    data = s.data()
+    assert isinstance(data, memoryview)
+    assert data.format == "d"
+    assert data.shape == (4,)
+    assert not data.readonly
+
+    # writes are seen by C++ without a copy
+    data[1] = 2.5
+    data[3] = 1.5
+    assert s.sum() == 4
+    assert list(s.samples()) == [0, 2.5, 0, 1.5]
+
+
+def test_view_const_is_readonly():
+    s = Samples(3)
+    samples = s.samples()
+    assert samples.readonly
+    with pytest.raises(TypeError):
+        samples[0] = 1
+
+    raw = s.raw()
+    assert raw.readonly
+    assert raw.shape == (3,)
+
+
+def test_view_span():
+    s = Samples(5)
+    weights = s.weights()
+    assert weights.format == "f"
+    assert weights.shape == (5,)
+    assert weights.readonly
+
+
+def test_view_shape():
+    s = Samples(1)
+    grid = s.grid()
+    assert grid.shape == (2, 3)
+    assert grid.strides == (3 * grid.itemsize, grid.itemsize)
+
+    grid[1, 2] = 5
+    assert s.grid()[1, 2] == 5
+    assert s.grid().tolist() == [[0, 0, 0], [0, 0, 5]]
+
+
+def test_view_property():
+    s = Samples(2)
+
+    values = s.values
+    assert values.shape == (2,)
+    assert values.readonly
+
+    counts = s.counts
+    assert counts.shape == (4,)
+    counts[2] = 7
+    assert list(s.counts) == [0, 0, 7, 0]
+
+
+def test_view_keepalive():
+    s = Samples(3)
+    s.data()[2] = 4
+    view = s.data()[1:]
+    del s
+    gc.collect()
+
+    # the view keeps the object that owns the storage alive
+    assert list(view) == [0, 4]
+    view[0] = 3
+    assert list(view) == [3, 4]